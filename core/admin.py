@@ -1,4 +1,11 @@
+from datetime import date, datetime, time
+
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import models
+from django.utils import timezone
+from django.utils.functional import cached_property
+
 from .models import (
     Sexo, EstadoCivil, Region, Comuna, Empresa, Personal, DeptoEmpresa, 
     Cargo, InfoLaboral, TipoAusentismo, Ausentismo, TipoLicenciaMedica, 
@@ -6,6 +13,166 @@ from .models import (
 )
 
 
+# =============================================================================
+# LISTADOS DE TABLAS GRANDES (AuditLog, PersonalFaena)
+# =============================================================================
+# El admin por defecto cuenta la tabla completa (COUNT(*)), arma la jerarquía
+# de fechas y los filtros por valor con SELECT DISTINCT sobre toda la tabla.
+# Con cientos de miles de logs eso toma segundos en cada página. Estas clases
+# reemplazan esas consultas por búsquedas en los índices.
+
+# Filas que se cuentan como máximo en un listado filtrado
+LIMITE_CONTEO = 10000
+
+# Valores distintos que se muestran como máximo en un filtro por valor
+LIMITE_VALORES = 100
+
+
+def estimar_filas(queryset):
+    """
+    Cantidad aproximada de filas de una tabla: el rango de su clave primaria
+    autoincremental (MAX - MIN + 1, dos búsquedas en el índice)
+    """
+    pk = queryset.model._meta.pk.attname
+    claves = queryset.order_by(pk).values_list(pk, flat=True)
+    primera, ultima = claves.first(), claves.last()
+    return 0 if primera is None else ultima - primera + 1
+
+
+class PaginadorAcotado(Paginator):
+    """
+    Paginador que no cuenta la tabla completa
+
+    - Sin filtros: estima la cantidad de filas con estimar_filas.
+    - Con filtros: cuenta hasta LIMITE_CONTEO filas; si hay más, el listado
+      muestra LIMITE_CONTEO (hay que filtrar más para llegar al resto).
+    """
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            return estimar_filas(self.object_list)
+        return self.object_list.order_by()[:LIMITE_CONTEO].count()
+
+
+class ValoresIndexadosFilter(admin.AllValuesFieldListFilter):
+    """
+    Filtro por valor de una columna indexada
+
+    Los valores distintos se leen saltando de uno al siguiente en el índice
+    (una búsqueda por valor) en lugar de un SELECT DISTINCT sobre toda la tabla.
+    """
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        super().__init__(field, request, params, model, model_admin, field_path)
+        valores = model_admin.get_queryset(request).order_by(field.name).values_list(field.name, flat=True)
+        opciones = [None] if field.null and valores.filter(**{f'{field.name}__isnull': True}).exists() else []
+        valor = valores.filter(**{f'{field.name}__isnull': False}).first()
+        while valor is not None and len(opciones) < LIMITE_VALORES:
+            opciones.append(valor)
+            valor = valores.filter(**{f'{field.name}__gt': valor}).first()
+        self.lookup_choices = opciones
+
+
+def limites_periodo(dia, tipo):
+    """Primer día del año, mes o día ('year', 'month', 'day') que contiene a `dia` y del siguiente"""
+    if tipo == 'year':
+        return date(dia.year, 1, 1), date(dia.year + 1, 1, 1)
+    if tipo == 'month':
+        return date(dia.year, dia.month, 1), date(dia.year + dia.month // 12, dia.month % 12 + 1, 1)
+    return dia, date.fromordinal(dia.toordinal() + 1)
+
+
+class FechasIndexadas:
+    """
+    Reemplazo de cl.queryset para la jerarquía de fechas del admin (date_hierarchy)
+
+    El tag date_hierarchy de Django usa solo dos consultas del queryset del
+    listado: la fecha mínima y máxima (aggregate) y los años, meses o días
+    con registros (datetimes/dates), esta última con un SELECT DISTINCT que
+    recorre todas las filas del período. Aquí cada período con registros se
+    obtiene con una búsqueda en el índice de la columna: la primera fecha
+    desde el inicio del período siguiente.
+    """
+
+    def __init__(self, queryset, campo):
+        self.campo = campo
+        self.con_hora = isinstance(queryset.model._meta.get_field(campo), models.DateTimeField)
+        self.valores = queryset.order_by(campo).values_list(campo, flat=True)
+
+    def aggregate(self, **kwargs):
+        # SQLite solo resuelve MIN o MAX con el índice cuando van en consultas separadas
+        return {'first': self.valores.first(), 'last': self.valores.last()}
+
+    def valor_inicial(self, dia):
+        """Inicio de un día como valor de la columna"""
+        return timezone.make_aware(datetime.combine(dia, time.min)) if self.con_hora else dia
+
+    def periodos(self, tipo):
+        """Inicio de cada año, mes o día con registros, en orden"""
+        resultado = []
+        valor = self.valores.first()
+        while valor is not None:
+            inicio, siguiente = limites_periodo(timezone.localtime(valor).date() if self.con_hora else valor, tipo)
+            resultado.append(self.valor_inicial(inicio))
+            valor = self.valores.filter(**{f'{self.campo}__gte': self.valor_inicial(siguiente)}).first()
+        return resultado
+
+    def datetimes(self, campo, tipo):
+        return self.periodos(tipo)
+
+    dates = datetimes
+
+
+class ChangeListFechas:
+    """
+    ChangeList cuyo queryset es FechasIndexadas (para el tag date_hierarchy)
+
+    Los períodos se buscan en toda la tabla, acotada solo por el año, mes o
+    día elegido en la jerarquía: con otro filtro activo (ej. acción) la
+    búsqueda en el índice de fechas tendría que saltar las filas que no lo
+    cumplen, así que un período puede aparecer aunque no tenga filas con
+    ese filtro.
+    """
+
+    def __init__(self, cl):
+        self.cl = cl
+        campo = cl.date_hierarchy
+        queryset = cl.root_queryset
+        fechas = FechasIndexadas(queryset, campo)
+        anio = cl.params.get(f'{campo}__year')
+        if anio:
+            mes = cl.params.get(f'{campo}__month')
+            dia = cl.params.get(f'{campo}__day')
+            tipo = 'day' if dia else 'month' if mes else 'year'
+            desde, hasta = limites_periodo(date(int(anio), int(mes or 1), int(dia or 1)), tipo)
+            queryset = queryset.filter(**{
+                f'{campo}__gte': fechas.valor_inicial(desde),
+                f'{campo}__lt': fechas.valor_inicial(hasta),
+            })
+            fechas = FechasIndexadas(queryset, campo)
+        self.queryset = fechas
+
+    def __getattr__(self, nombre):
+        return getattr(self.cl, nombre)
+
+
+class VigenteFilter(admin.SimpleListFilter):
+    """Asignaciones vigentes hoy (índices de vigencia de PersonalFaena)"""
+    title = 'vigente hoy'
+    parameter_name = 'vigente'
+
+    def lookups(self, request, model_admin):
+        return [('si', 'Sí'), ('no', 'No')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'si':
+            return queryset.activas_en()
+        if self.value() == 'no':
+            return queryset.exclude(pk__in=PersonalFaena.objects.activas_en().values('pk'))
+        return queryset
+
+
 @admin.register(Sexo)
 class SexoAdmin(admin.ModelAdmin):
     list_display = ['sexo_id', 'sexo']
@@ -142,10 +309,12 @@ class FaenaAdmin(admin.ModelAdmin):
 @admin.register(PersonalFaena)
 class PersonalFaenaAdmin(admin.ModelAdmin):
     list_display = ['personal_faena_id', 'personal', 'faena', 'tipo_turno', 'fecha_inicio', 'fecha_fin_calculada', 'activo', 'esta_activa']
-    list_filter = ['activo', 'faena', 'tipo_turno', 'fecha_inicio']
+    list_filter = ['activo', VigenteFilter, 'faena', 'tipo_turno', 'fecha_inicio']
     search_fields = ['personal__nombre', 'personal__apepat', 'personal__apemat', 'faena__nombre']
-    readonly_fields = ['personal_faena_id', 'fecha_asignacion', 'fecha_creacion', 'fecha_modificacion', 'fecha_fin_calculada', 'duracion_dias', 'proximo_cambio_turno']
+    readonly_fields = ['personal_faena_id', 'fecha_asignacion', 'fecha_creacion', 'fecha_modificacion', 'fecha_fin_calculada', 'fecha_termino', 'duracion_dias', 'proximo_cambio_turno']
     date_hierarchy = 'fecha_inicio'
+    paginator = PaginadorAcotado
+    show_full_result_count = False
     
     fieldsets = (
         ('Asignación', {
@@ -156,7 +325,7 @@ class PersonalFaenaAdmin(admin.ModelAdmin):
             'description': 'Define cuándo entra la persona y qué turno tendrá (usa el de la faena si no se especifica)'
         }),
         ('Información Calculada', {
-            'fields': ('fecha_fin_calculada', 'duracion_dias', 'proximo_cambio_turno'),
+            'fields': ('fecha_fin_calculada', 'fecha_termino', 'duracion_dias', 'proximo_cambio_turno'),
             'description': 'Estos campos se calculan automáticamente basándose en el turno y la duración de la faena',
             'classes': ('collapse',)
         }),
@@ -171,22 +340,40 @@ class PersonalFaenaAdmin(admin.ModelAdmin):
     )
     
     def get_queryset(self, request):
-        """Optimizar consultas"""
-        return super().get_queryset(request).select_related('personal', 'faena', 'tipo_turno')
+        """Optimizar consultas: la vigencia de cada fila se calcula en la misma consulta"""
+        return super().get_queryset(request).select_related('personal', 'faena', 'tipo_turno').con_vigencia()
+    
+    @admin.display(boolean=True, ordering='vigente', description='Está activa')
+    def esta_activa(self, obj):
+        return obj.vigente
 
 
 @admin.register(AuditLog)
 class AuditLogAdmin(admin.ModelAdmin):
-    list_display = ['log_id', 'usuario', 'accion', 'tabla_afectada', 'registro_id', 'fecha_hora', 'ip_address']
-    list_filter = ['accion', 'tabla_afectada', 'fecha_hora', 'usuario']
-    search_fields = ['usuario', 'accion', 'tabla_afectada', 'descripcion']
+    list_display = ['log_id', 'usuario', 'accion', 'tabla_afectada', 'registro_id', 'personal_nombre', 'faena_nombre', 'fecha_hora', 'ip_address']
+    list_filter = [
+        ('accion', ValoresIndexadosFilter),
+        ('tabla_afectada', ValoresIndexadosFilter),
+        'fecha_hora',
+        ('usuario', ValoresIndexadosFilter),
+    ]
+    search_fields = ['usuario', 'accion', 'tabla_afectada', 'descripcion', '=rut']
     readonly_fields = ['log_id', 'fecha_hora']
+    # La jerarquía de fechas se arma con FechasIndexadas (ver templates/admin/core/auditlog/change_list.html)
     date_hierarchy = 'fecha_hora'
+    # Los logs se leen en orden de log_id, igual que el panel de logs del calendario
+    ordering = ['-log_id']
+    paginator = PaginadorAcotado
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
     
     fieldsets = (
         ('Información del Cambio', {
             'fields': ('usuario', 'accion', 'tabla_afectada', 'registro_id', 'descripcion')
         }),
+        ('Personal y Faena Afectados', {
+            'fields': ('personal_id', 'personal_nombre', 'rut', 'cargo', 'faena_id', 'faena_nombre')
+        }),
         ('Datos del Cambio', {
             'fields': ('datos_anteriores', 'datos_nuevos', 'detalles_adicionales'),
             'classes': ('collapse',)
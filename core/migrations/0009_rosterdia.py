@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_auditlog_detalles_adicionales_alter_auditlog_accion_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RosterDia',
+            fields=[
+                ('roster_dia_id', models.AutoField(primary_key=True, serialize=False)),
+                ('fecha', models.DateField()),
+                ('estado', models.CharField(max_length=20)),
+                ('orden', models.PositiveSmallIntegerField(default=0)),
+                ('tabla_origen', models.CharField(max_length=50)),
+                ('registro_origen', models.IntegerField(blank=True, null=True)),
+                ('faena', models.ForeignKey(blank=True, db_column='faena_id', null=True, on_delete=django.db.models.deletion.CASCADE, to='core.faena')),
+                ('personal', models.ForeignKey(db_column='personal_id', on_delete=django.db.models.deletion.CASCADE, to='core.personal')),
+            ],
+            options={
+                'verbose_name': 'Roster Diario',
+                'verbose_name_plural': 'Roster Diario',
+                'db_table': 'RosterDia',
+                'indexes': [models.Index(fields=['personal', 'fecha'], name='rosterdia_personal_fecha')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_rosterdia'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='personal',
+            index=models.Index(fields=['apepat', 'nombre', 'personal_id'], name='personal_orden'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:55
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Copia de la normalización de planning.busqueda al crear esta migración: la
+# migración no debe cambiar su resultado si después cambia el código de la app
+
+def normalizar(texto):
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).upper()
+
+
+def palabras(texto):
+    return [palabra for palabra in re.split(r'[^0-9A-Z]+', normalizar(texto)) if palabra]
+
+
+def terminos(nombre, apepat, apemat, rut, dvrut):
+    resultado = set()
+    for texto in (nombre, apepat, apemat):
+        resultado.update(palabras(texto))
+    rut = normalizar(rut).strip()
+    if rut:
+        resultado.add(rut)
+        resultado.add(rut + normalizar(dvrut).strip())
+    return resultado
+
+
+def indexar_personal(apps, schema_editor):
+    """Crear los términos de búsqueda del personal existente"""
+    Personal = apps.get_model('core', 'Personal')
+    PersonalTermino = apps.get_model('core', 'PersonalTermino')
+    filas = [
+        PersonalTermino(personal_id=personal_id, termino=termino)
+        for personal_id, *datos in Personal.objects.values_list('personal_id', 'nombre', 'apepat', 'apemat', 'rut', 'dvrut').iterator()
+        for termino in terminos(*datos)
+    ]
+    PersonalTermino.objects.bulk_create(filas, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_personal_orden'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonalTermino',
+            fields=[
+                ('personal_termino_id', models.AutoField(primary_key=True, serialize=False)),
+                ('termino', models.CharField(max_length=100)),
+                ('personal', models.ForeignKey(db_column='personal_id', on_delete=django.db.models.deletion.CASCADE, related_name='terminos', to='core.personal')),
+            ],
+            options={
+                'verbose_name': 'Término de Búsqueda',
+                'verbose_name_plural': 'Términos de Búsqueda',
+                'db_table': 'PersonalTermino',
+                'indexes': [models.Index(fields=['termino', 'personal'], name='personaltermino_termino')],
+            },
+        ),
+        migrations.RunPython(indexar_personal, migrations.RunPython.noop),
+    ]
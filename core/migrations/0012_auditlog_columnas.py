@@ -0,0 +1,143 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:03
+
+from bisect import bisect_right
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def _entero(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _datos(log):
+    """datos_anteriores y datos_nuevos combinados (los nuevos tienen prioridad)"""
+    datos = {}
+    for valor in (log.datos_anteriores, log.datos_nuevos):
+        if isinstance(valor, dict):
+            datos.update(valor)
+    return datos
+
+
+def completar_columnas(apps, schema_editor):
+    """
+    Completar personal, faena y cargo de los logs existentes
+
+    La persona y la faena salen de la asignación afectada (logs de
+    PersonalFaena) o, si ya no existe, de los IDs guardados en los JSON. El
+    cargo es el vigente a la fecha del log según InfoLaboral.
+    """
+    AuditLog = apps.get_model('core', 'AuditLog')
+    PersonalFaena = apps.get_model('core', 'PersonalFaena')
+    Personal = apps.get_model('core', 'Personal')
+    Faena = apps.get_model('core', 'Faena')
+    InfoLaboral = apps.get_model('core', 'InfoLaboral')
+
+    logs = list(AuditLog.objects.only('log_id', 'tabla_afectada', 'registro_id', 'datos_anteriores', 'datos_nuevos', 'fecha_hora'))
+    if not logs:
+        return
+
+    asignaciones = dict(
+        (pk, (personal_id, faena_id))
+        for pk, personal_id, faena_id in PersonalFaena.objects.filter(
+            personal_faena_id__in={log.registro_id for log in logs if log.tabla_afectada == 'PersonalFaena'}
+        ).values_list('personal_faena_id', 'personal_id', 'faena_id')
+    )
+    for log in logs:
+        datos = _datos(log)
+        personal_id, faena_id = asignaciones.get(log.registro_id, (None, None)) if log.tabla_afectada == 'PersonalFaena' else (None, None)
+        log.personal_id = personal_id or _entero(datos.get('personal_id'))
+        log.faena_id = faena_id or _entero(datos.get('faena_id'))
+
+    personas = Personal.objects.in_bulk({log.personal_id for log in logs if log.personal_id})
+    faenas = Faena.objects.in_bulk({log.faena_id for log in logs if log.faena_id})
+    contratos = defaultdict(list)
+    for personal_id, fecha, cargo in (
+        InfoLaboral.objects.filter(personal_id__in=personas)
+        .order_by('personal_id', 'fechacontrata', 'infolab_id')
+        .values_list('personal_id', 'fechacontrata', 'cargo_id__cargo')
+    ):
+        contratos[personal_id].append((fecha, cargo))
+
+    for log in logs:
+        # Si la persona o la faena ya no existen quedan los datos guardados en los JSON
+        datos = _datos(log)
+        log.personal_nombre = datos.get('personal_nombre')
+        log.rut = datos.get('personal_rut')
+        log.faena_nombre = datos.get('faena_nombre')
+        persona = personas.get(log.personal_id)
+        if persona is not None:
+            log.personal_nombre = f"{persona.nombre} {persona.apepat}"
+            log.rut = f"{persona.rut}-{persona.dvrut}"
+            historial = contratos.get(persona.pk)
+            if historial:
+                # Último contrato iniciado a la fecha del log (o el primero si el log es anterior)
+                posicion = bisect_right([fecha for fecha, _ in historial], log.fecha_hora.date())
+                log.cargo = historial[max(posicion - 1, 0)][1]
+        faena = faenas.get(log.faena_id)
+        if faena is not None:
+            log.faena_nombre = faena.nombre
+
+    AuditLog.objects.bulk_update(
+        logs, ['personal_id', 'personal_nombre', 'rut', 'cargo', 'faena_id', 'faena_nombre'], batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_personaltermino'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditlog',
+            name='cargo',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='faena_id',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='faena_nombre',
+            field=models.CharField(blank=True, max_length=150, null=True),
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='personal_id',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='personal_nombre',
+            field=models.CharField(blank=True, max_length=160, null=True),
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='rut',
+            field=models.CharField(blank=True, max_length=10, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['-fecha_hora'], name='auditlog_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['personal_id', '-fecha_hora'], name='auditlog_personal'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['faena_id', '-fecha_hora'], name='auditlog_faena'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['rut'], name='auditlog_rut'),
+        ),
+        migrations.RunPython(completar_columnas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_auditlog_columnas'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='auditlog_personal',
+        ),
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='auditlog_faena',
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['personal_id', '-log_id'], name='auditlog_personal_log'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['faena_id', '-log_id'], name='auditlog_faena_log'),
+        ),
+    ]
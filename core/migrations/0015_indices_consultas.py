@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_auditlog_fecha_hora'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ausentismo',
+            index=models.Index(fields=['personal_id', 'fechaini', 'fechafin'], name='ausentismo_personal_fechas'),
+        ),
+        migrations.AddIndex(
+            model_name='licenciamedicaporpersonal',
+            index=models.Index(fields=['personal_id', 'fechaEmision', 'fecha_fin_licencia'], name='licencia_personal_fechas'),
+        ),
+        migrations.AddIndex(
+            model_name='personalfaena',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['personal', 'fecha_inicio'], name='personalfaena_activa'),
+        ),
+        migrations.AddIndex(
+            model_name='personalfaena',
+            index=models.Index(fields=['fecha_modificacion'], name='personalfaena_modificacion'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:27
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def _fecha_fin(fecha_inicio, fecha_fin_faena, dias_trabajo, dias_descanso):
+    """Copia de core.models.calcular_fecha_fin al momento de esta migración"""
+    if not fecha_inicio or dias_trabajo is None or not fecha_fin_faena:
+        return None
+    dias_disponibles = (fecha_fin_faena - fecha_inicio).days + 1
+    ciclos_completos = dias_disponibles // (dias_trabajo + dias_descanso)
+    fecha_fin = fecha_inicio + timedelta(days=ciclos_completos * dias_trabajo - 1)
+    return min(fecha_fin, fecha_fin_faena)
+
+
+def completar_fecha_fin(apps, schema_editor):
+    """Calcular fecha_fin_calculada de las asignaciones existentes"""
+    PersonalFaena = apps.get_model('core', 'PersonalFaena')
+    cambiadas = []
+    for asignacion in PersonalFaena.objects.select_related('faena__tipo_turno', 'tipo_turno').iterator(chunk_size=2000):
+        turno = asignacion.tipo_turno or asignacion.faena.tipo_turno
+        if turno is None:
+            continue
+        asignacion.fecha_fin_calculada = _fecha_fin(
+            asignacion.fecha_inicio, asignacion.faena.fecha_fin, turno.dias_trabajo, turno.dias_descanso,
+        )
+        cambiadas.append(asignacion)
+    PersonalFaena.objects.bulk_update(cambiadas, ['fecha_fin_calculada'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='personalfaena',
+            name='fecha_fin_calculada',
+            field=models.DateField(blank=True, editable=False, help_text='Fin de la asignación según el turno y el fin de la faena', null=True),
+        ),
+        migrations.RunPython(completar_fecha_fin, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='personalfaena',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['fecha_fin_calculada', 'fecha_inicio'], name='personalfaena_vigencia'),
+        ),
+        migrations.AddIndex(
+            model_name='personalfaena',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['faena', 'fecha_fin_calculada', 'fecha_inicio'], name='personalfaena_faena_vigencia'),
+        ),
+    ]
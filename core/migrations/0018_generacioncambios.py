@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:40
+
+from django.db import migrations, models
+
+
+def crear_generacion(apps, schema_editor):
+    """Crear la única fila del contador de cambios"""
+    GeneracionCambios = apps.get_model('core', 'GeneracionCambios')
+    GeneracionCambios.objects.get_or_create(pk=1, defaults={'valor': 0})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_indices_admin_auditoria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeneracionCambios',
+            fields=[
+                ('generacion_id', models.AutoField(primary_key=True, serialize=False)),
+                ('valor', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Generación de Cambios',
+                'verbose_name_plural': 'Generación de Cambios',
+                'db_table': 'GeneracionCambios',
+            },
+        ),
+        migrations.RunPython(crear_generacion, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_generacioncambios'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='personalfaena',
+            name='fecha_termino',
+            field=models.DateField(blank=True, editable=False, help_text='Último día de una asignación removida desde una fecha', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='personalfaena',
+            index=models.Index(condition=models.Q(('fecha_termino__isnull', False)), fields=['personal', 'fecha_inicio'], name='personalfaena_terminada'),
+        ),
+    ]
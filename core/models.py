@@ -95,6 +95,10 @@ class Personal(models.Model):
 
     class Meta:
         db_table = 'Personal'
+        indexes = [
+            # Orden y paginación por cursor del calendario (planning.personal)
+            models.Index(fields=['apepat', 'nombre', 'personal_id'], name='personal_orden'),
+        ]
 
     def __str__(self):
         return f"{self.nombre} {self.apepat} {self.apemat}"
@@ -114,12 +118,12 @@ class Personal(models.Model):
     
     @property
     def faenas_activas(self):
-        """Retorna las faenas activas del personal"""
-        return self.personalfaena.filter(activo=True, esta_activa=True)
+        """Retorna las asignaciones a faenas vigentes hoy del personal"""
+        return self.personalfaena_set.activas_en()
     
     @property
     def faena_principal(self):
-        """Retorna la faena principal (la más reciente activa)"""
+        """Retorna la asignación principal (la vigente más reciente)"""
         return self.faenas_activas.order_by('-fecha_inicio').first()
 
 
@@ -140,6 +144,24 @@ class Cargo(models.Model):
         return self.cargo
 
 
+class InfoLaboralQuerySet(models.QuerySet):
+    """Consultas del historial de contratos del personal"""
+
+    def cargos_vigentes(self, personal_ids):
+        """
+        Cargo más reciente (por fecha de contrata) de cada persona, en una consulta
+
+        Retorna: dict {personal_id: nombre del cargo}
+        """
+        filas = (
+            self.filter(personal_id__in=personal_ids)
+            .order_by('personal_id', 'fechacontrata', 'infolab_id')
+            .values_list('personal_id', 'cargo_id__cargo')
+        )
+        # Cada persona queda con la última fila: la de contrata más reciente
+        return dict(filas)
+
+
 class InfoLaboral(models.Model):
     infolab_id = models.AutoField(primary_key=True, null=False, blank=False)
     personal_id = models.ForeignKey(Personal, on_delete=models.CASCADE, db_column='personal_id', null=False, blank=False)
@@ -148,6 +170,8 @@ class InfoLaboral(models.Model):
     cargo_id = models.ForeignKey(Cargo, on_delete=models.CASCADE, db_column='cargo_id', blank=False, null=False)
     fechacontrata = models.DateField(blank=False, null=False)
 
+    objects = InfoLaboralQuerySet.as_manager()
+
 
 class TipoAusentismo(models.Model):
     tipoausen_id = models.AutoField(primary_key=True, null=False, blank=False)
@@ -165,6 +189,12 @@ class Ausentismo(models.Model):
     fechafin = models.DateField(null=False, blank=False)
     observacion = models.TextField(max_length=250, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Ausentismos de las personas que se superponen con un rango (planning.estados)
+            models.Index(fields=['personal_id', 'fechaini', 'fechafin'], name='ausentismo_personal_fechas'),
+        ]
+
     def __str__(self):
         trabajador = f"{self.personal_id.nombre} {self.personal_id.apepat} {self.personal_id.apemat}"
         return f"{self.tipoausen_id} - {trabajador} ({self.fechaini} a {self.fechafin})"
@@ -189,6 +219,12 @@ class LicenciaMedicaPorPersonal(models.Model):
     rutaDoc = models.FileField(upload_to=obtener_ruta_documento, null=False, blank=False)
     observacion = models.TextField(max_length=250, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Licencias de las personas que se superponen con un rango (planning.estados)
+            models.Index(fields=['personal_id', 'fechaEmision', 'fecha_fin_licencia'], name='licencia_personal_fechas'),
+        ]
+
     def save(self, *args, **kwargs):
         from datetime import timedelta
         if self.fechaEmision and self.dias_licencia:
@@ -249,7 +285,7 @@ class Faena(models.Model):
 
     def __str__(self):
         return self.nombre
-    
+
     def clean(self):
         """Validar que fecha_fin sea posterior a fecha_inicio"""
         from django.core.exceptions import ValidationError
@@ -275,8 +311,8 @@ class Faena(models.Model):
     
     @property
     def personal_asignado(self):
-        """Retorna el personal activamente asignado a esta faena"""
-        return self.personalfaena.filter(activo=True, esta_activa=True)
+        """Retorna las asignaciones a esta faena vigentes hoy"""
+        return self.personalfaena_set.activas_en()
     
     @property
     def cantidad_personal(self):
@@ -284,6 +320,91 @@ class Faena(models.Model):
         return self.personal_asignado.count()
 
 
+def fin_asignacion(fecha_fin_faena, fecha_termino):
+    """
+    Último día en que una asignación puede generar estados: el fin de la
+    faena o, si se removió a la persona desde una fecha, el día anterior a
+    esa fecha (el que sea primero; None si no tiene ninguno)
+    """
+    if fecha_termino and (not fecha_fin_faena or fecha_termino < fecha_fin_faena):
+        return fecha_termino
+    return fecha_fin_faena
+
+
+def calcular_fecha_fin(fecha_inicio, fecha_fin_faena, dias_trabajo, dias_descanso):
+    """
+    Fecha de fin de una asignación: el último día de trabajo del último
+    ciclo completo del turno antes del fin de la faena
+
+    Retorna None si la asignación no tiene turno (propio ni de la faena) o
+    la faena no tiene fecha de fin.
+    """
+    if not fecha_inicio or dias_trabajo is None or not fecha_fin_faena:
+        return None
+    from datetime import timedelta
+
+    dias_disponibles = (fecha_fin_faena - fecha_inicio).days + 1
+    ciclos_completos = dias_disponibles // (dias_trabajo + dias_descanso)
+    fecha_fin = fecha_inicio + timedelta(days=ciclos_completos * dias_trabajo - 1)
+    return min(fecha_fin, fecha_fin_faena)
+
+
+class PersonalFaenaQuerySet(models.QuerySet):
+    """Consultas de vigencia de las asignaciones sobre la columna fecha_fin_calculada"""
+
+    def activas_en(self, fecha=None):
+        """Asignaciones activas vigentes en una fecha (default: hoy)"""
+        fecha = fecha or timezone.localdate()
+        return self.activas_entre(fecha, fecha)
+
+    def activas_entre(self, desde, hasta):
+        """Asignaciones activas vigentes en algún día del rango (inclusive)"""
+        # Las condiciones comunes van repetidas en cada rama del OR para que
+        # SQLite busque cada rama en el índice personalfaena_vigencia
+        # (MULTI-INDEX OR) en vez de recorrerlo completo
+        vigentes = models.Q(activo=True, fecha_inicio__lte=hasta)
+        return self.filter(
+            (vigentes & models.Q(fecha_fin_calculada__isnull=True))
+            | (vigentes & models.Q(fecha_fin_calculada__gte=desde))
+        )
+
+    def con_vigencia(self, fecha=None):
+        """Anotar 'vigente': si la asignación está activa en una fecha (default: hoy), sin consultas por fila"""
+        fecha = fecha or timezone.localdate()
+        vigente = models.Q(activo=True, fecha_inicio__lte=fecha) & (
+            models.Q(fecha_fin_calculada__isnull=True) | models.Q(fecha_fin_calculada__gte=fecha)
+        )
+        return self.annotate(vigente=models.ExpressionWrapper(vigente, output_field=models.BooleanField()))
+
+    def en_calendario(self, **condiciones):
+        """
+        Asignaciones que generan estados en el calendario: las activas y las
+        removidas desde una fecha, que se siguen mostrando hasta fecha_termino
+
+        Las condiciones van repetidas en cada rama del OR, como en
+        activas_entre, para que SQLite busque cada una en su índice parcial
+        (personalfaena_activa y personalfaena_terminada).
+        """
+        return self.filter(
+            models.Q(activo=True, **condiciones) | models.Q(fecha_termino__isnull=False, **condiciones)
+        )
+
+    def recalcular_fecha_fin(self):
+        """
+        Recalcular fecha_fin_calculada (tras cambiar la faena o el turno)
+
+        Retorna: cantidad de asignaciones actualizadas
+        """
+        cambiadas = []
+        for asignacion in self.select_related('faena__tipo_turno', 'tipo_turno').iterator(chunk_size=2000):
+            fecha_fin = asignacion.calcular_fecha_fin()
+            if fecha_fin != asignacion.fecha_fin_calculada:
+                asignacion.fecha_fin_calculada = fecha_fin
+                cambiadas.append(asignacion)
+        PersonalFaena.objects.bulk_update(cambiadas, ['fecha_fin_calculada'], batch_size=500)
+        return len(cambiadas)
+
+
 class PersonalFaena(models.Model):
     """Modelo intermedio para relación muchos a muchos entre Personal y Faena"""
     personal_faena_id = models.AutoField(primary_key=True)
@@ -301,6 +422,15 @@ class PersonalFaena(models.Model):
     # Estado de la asignación
     activo = models.BooleanField(default=True, help_text="Indica si la asignación está activa")
     
+    # Se mantiene al guardar la asignación y, con las señales de planning, al cambiar su faena o turno (ver calcular_fecha_fin)
+    fecha_fin_calculada = models.DateField(null=True, blank=True, editable=False,
+                                           help_text="Fin de la asignación según el turno y el fin de la faena")
+    
+    # Una asignación removida desde una fecha queda inactiva, pero el calendario
+    # conserva sus días anteriores hasta este día (ver en_calendario y fin_asignacion)
+    fecha_termino = models.DateField(null=True, blank=True, editable=False,
+                                     help_text="Último día de una asignación removida desde una fecha")
+    
     # Información adicional
     observaciones = models.TextField(blank=True, null=True, help_text="Observaciones sobre la asignación")
     
@@ -312,6 +442,32 @@ class PersonalFaena(models.Model):
         verbose_name = 'Asignación de Personal a Faena'
         verbose_name_plural = 'Asignaciones de Personal a Faena'
         unique_together = ['personal', 'faena', 'fecha_inicio']
+        indexes = [
+            # Asignaciones activas de las personas hasta una fecha (planning.estados):
+            # solo las activas, que son las que consulta el calendario
+            models.Index(
+                fields=['personal', 'fecha_inicio'], name='personalfaena_activa',
+                condition=models.Q(activo=True),
+            ),
+            # Última modificación para los validadores HTTP (planning.validadores)
+            models.Index(fields=['fecha_modificacion'], name='personalfaena_modificacion'),
+            # Vigencia en una fecha (activas_en / activas_entre), en total y por faena
+            models.Index(
+                fields=['fecha_fin_calculada', 'fecha_inicio'], name='personalfaena_vigencia',
+                condition=models.Q(activo=True),
+            ),
+            models.Index(
+                fields=['faena', 'fecha_fin_calculada', 'fecha_inicio'], name='personalfaena_faena_vigencia',
+                condition=models.Q(activo=True),
+            ),
+            # Asignaciones removidas desde una fecha que el calendario sigue mostrando (en_calendario)
+            models.Index(
+                fields=['personal', 'fecha_inicio'], name='personalfaena_terminada',
+                condition=models.Q(fecha_termino__isnull=False),
+            ),
+        ]
+
+    objects = PersonalFaenaQuerySet.as_manager()
 
     def __str__(self):
         turno_info = f" - {self.tipo_turno.nombre}" if self.tipo_turno else ""
@@ -332,7 +488,7 @@ class PersonalFaena(models.Model):
         # Validar que los turnos no sobrepasen las fechas de la faena
         if self.faena and self.fecha_inicio and self.turno_efectivo:
             # Calcular la fecha fin de la asignación basada en el turno
-            fecha_fin_asignacion = self.fecha_fin_calculada
+            fecha_fin_asignacion = self.calcular_fecha_fin()
             
             if fecha_fin_asignacion and self.faena.fecha_fin:
                 if fecha_fin_asignacion > self.faena.fecha_fin:
@@ -347,46 +503,34 @@ class PersonalFaena(models.Model):
         """Retorna el turno que se debe usar (el específico o el de la faena)"""
         return self.tipo_turno or self.faena.tipo_turno
     
-    @property
-    def fecha_fin_calculada(self):
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if self.activo and self.fecha_termino is not None:
+            # Reactivada: vuelve a regir hasta el fin de la faena
+            self.fecha_termino = None
+            if update_fields is not None:
+                kwargs['update_fields'] = update_fields = {*update_fields, 'fecha_termino'}
+        if update_fields is None or {'fecha_inicio', 'faena', 'tipo_turno'} & set(update_fields):
+            self.fecha_fin_calculada = self.calcular_fecha_fin()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'fecha_fin_calculada'}
+        super().save(*args, **kwargs)
+    
+    def calcular_fecha_fin(self):
         """Calcula la fecha de fin basándose en el turno y la duración de la faena"""
-        if not self.fecha_inicio or not self.turno_efectivo:
+        turno = self.turno_efectivo
+        if turno is None:
             return None
-        
-        from datetime import date, timedelta
-        
-        # Si la faena tiene fecha fin, usar esa como límite
-        fecha_limite = self.faena.fecha_fin if self.faena.fecha_fin else None
-        
-        # Calcular cuántos ciclos completos puede hacer la persona
-        if fecha_limite:
-            dias_disponibles = (fecha_limite - self.fecha_inicio).days + 1
-            ciclos_completos = dias_disponibles // self.turno_efectivo.duracion_ciclo
-            dias_trabajo_total = ciclos_completos * self.turno_efectivo.dias_trabajo
-            
-            # La fecha fin será inicio + días de trabajo
-            fecha_fin = self.fecha_inicio + timedelta(days=dias_trabajo_total - 1)
-            
-            # Asegurar que no pase la fecha límite de la faena
-            if fecha_fin > fecha_limite:
-                fecha_fin = fecha_limite
-            
-            return fecha_fin
-        
-        return None
+        return calcular_fecha_fin(self.fecha_inicio, self.faena.fecha_fin, turno.dias_trabajo, turno.dias_descanso)
     
     @property
     def esta_activa(self):
         """Retorna True si la asignación está activa en la fecha actual"""
-        from datetime import date
-        today = date.today()
-        if not self.activo:
-            return False
-        if self.fecha_inicio <= today:
-            fecha_fin = self.fecha_fin_calculada
-            if fecha_fin is None or today <= fecha_fin:
-                return True
-        return False
+        hoy = timezone.localdate()
+        return (
+            self.activo and self.fecha_inicio <= hoy
+            and (self.fecha_fin_calculada is None or hoy <= self.fecha_fin_calculada)
+        )
     
     @property
     def duracion_dias(self):
@@ -433,6 +577,61 @@ class PersonalFaena(models.Model):
         return proximo_cambio
 
 
+class RosterDia(models.Model):
+    """Estado materializado de una persona en un día del calendario de planificación"""
+    roster_dia_id = models.AutoField(primary_key=True)
+    personal = models.ForeignKey(Personal, on_delete=models.CASCADE, db_column='personal_id')
+    fecha = models.DateField()
+    estado = models.CharField(max_length=20)  # 'en_faena', 'descanso', 'licencia', 'vacaciones', 'permiso', 'ausencia'
+    orden = models.PositiveSmallIntegerField(default=0)  # Posición del estado dentro del día
+    faena = models.ForeignKey(Faena, on_delete=models.CASCADE, db_column='faena_id', null=True, blank=True)
+    tabla_origen = models.CharField(max_length=50)  # 'PersonalFaena', 'Ausentismo', 'LicenciaMedicaPorPersonal'
+    registro_origen = models.IntegerField(null=True, blank=True)  # ID del registro que origina el estado
+
+    class Meta:
+        db_table = 'RosterDia'
+        verbose_name = 'Roster Diario'
+        verbose_name_plural = 'Roster Diario'
+        indexes = [
+            models.Index(fields=['personal', 'fecha'], name='rosterdia_personal_fecha'),
+        ]
+
+    def __str__(self):
+        return f"{self.personal_id} - {self.fecha} - {self.estado}"
+
+
+class PersonalTermino(models.Model):
+    """Término de búsqueda normalizado de una persona (nombre, apellido o RUT)"""
+    personal_termino_id = models.AutoField(primary_key=True)
+    personal = models.ForeignKey(Personal, on_delete=models.CASCADE, db_column='personal_id', related_name='terminos')
+    termino = models.CharField(max_length=100)  # Sin tildes y en mayúsculas (ver planning.busqueda)
+
+    class Meta:
+        db_table = 'PersonalTermino'
+        verbose_name = 'Término de Búsqueda'
+        verbose_name_plural = 'Términos de Búsqueda'
+        indexes = [
+            models.Index(fields=['termino', 'personal'], name='personaltermino_termino'),
+        ]
+
+    def __str__(self):
+        return f"{self.personal_id} - {self.termino}"
+
+
+class GeneracionCambios(models.Model):
+    """Contador de cambios en los datos del calendario (una sola fila, ver planning.cambios)"""
+    generacion_id = models.AutoField(primary_key=True)
+    valor = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'GeneracionCambios'
+        verbose_name = 'Generación de Cambios'
+        verbose_name_plural = 'Generación de Cambios'
+
+    def __str__(self):
+        return str(self.valor)
+
+
 # Agregar campo faena_id a InfoLaboral después de que Faena esté definido
 InfoLaboral.add_to_class('faena_id', models.ForeignKey(Faena, on_delete=models.CASCADE, db_column='faena_id', null=True, blank=True))
 
@@ -446,26 +645,56 @@ class AuditLog(models.Model):
     registro_id = models.IntegerField()  # ID del registro afectado
     datos_anteriores = models.JSONField(null=True, blank=True)  # Estado anterior del registro
     datos_nuevos = models.JSONField(null=True, blank=True)  # Nuevo estado del registro
-    fecha_hora = models.DateTimeField(auto_now_add=True)  # Cuándo ocurrió el cambio
+    fecha_hora = models.DateTimeField(default=timezone.now, editable=False)  # Cuándo ocurrió el cambio (no cuándo se escribió el log)
     ip_address = models.GenericIPAddressField(null=True, blank=True)  # IP desde donde se hizo el cambio
     descripcion = models.TextField()  # Descripción detallada del cambio
     detalles_adicionales = models.JSONField(null=True, blank=True)  # Información adicional como contexto
 
+    # Copia de la persona y faena afectadas al momento del cambio, para filtrar
+    # y mostrar los logs sin leer los JSON ni consultar otras tablas. Son IDs
+    # simples (no ForeignKey): el log se conserva aunque se elimine el registro.
+    personal_id = models.IntegerField(null=True, blank=True)
+    personal_nombre = models.CharField(max_length=160, null=True, blank=True)  # 'Nombre Apellido'
+    rut = models.CharField(max_length=10, null=True, blank=True)  # '12345678-5'
+    cargo = models.CharField(max_length=50, null=True, blank=True)  # Cargo vigente al momento del cambio
+    faena_id = models.IntegerField(null=True, blank=True)
+    faena_nombre = models.CharField(max_length=150, null=True, blank=True)
+
     class Meta:
         db_table = 'AuditLog'
         ordering = ['-fecha_hora']  # Más recientes primero
         verbose_name = 'Log de Auditoría'
         verbose_name_plural = 'Logs de Auditoría'
+        indexes = [
+            models.Index(fields=['-fecha_hora'], name='auditlog_fecha'),
+            models.Index(fields=['personal_id', '-log_id'], name='auditlog_personal_log'),
+            models.Index(fields=['faena_id', '-log_id'], name='auditlog_faena_log'),
+            models.Index(fields=['rut'], name='auditlog_rut'),
+            # Filtros del admin: valores distintos y filtrado por valor, en orden de log_id
+            models.Index(fields=['accion'], name='auditlog_accion'),
+            models.Index(fields=['tabla_afectada'], name='auditlog_tabla'),
+            models.Index(fields=['usuario'], name='auditlog_usuario'),
+        ]
 
     def __str__(self):
         return f"{self.accion} en {self.tabla_afectada} - {self.fecha_hora.strftime('%d/%m/%Y %H:%M')}"
 
     @classmethod
-    def crear_log(cls, accion, tabla_afectada, registro_id, descripcion, 
-                  usuario=None, datos_anteriores=None, datos_nuevos=None, 
-                  ip_address=None, detalles_adicionales=None):
-        """Método de clase para crear logs de manera consistente"""
-        return cls.objects.create(
+    def construir_log(cls, accion, tabla_afectada, registro_id, descripcion,
+                      usuario=None, datos_anteriores=None, datos_nuevos=None,
+                      ip_address=None, detalles_adicionales=None,
+                      personal=None, faena=None, cargo=None):
+        """
+        Log sin guardar, para escribirlo junto con otros (ver planning.auditoria)
+
+        `personal` y `faena` son las instancias afectadas: se copian su ID,
+        nombre y RUT al log. Si no se entrega `cargo` se consulta el cargo
+        vigente de la persona; quien arma varios logs lo obtiene antes para
+        todos con InfoLaboral.objects.cargos_vigentes.
+        """
+        if personal is not None and cargo is None:
+            cargo = InfoLaboral.objects.cargos_vigentes([personal.personal_id]).get(personal.personal_id)
+        return cls(
             usuario=usuario,
             accion=accion,
             tabla_afectada=tabla_afectada,
@@ -474,5 +703,18 @@ class AuditLog(models.Model):
             datos_nuevos=datos_nuevos,
             ip_address=ip_address,
             descripcion=descripcion,
-            detalles_adicionales=detalles_adicionales
+            detalles_adicionales=detalles_adicionales,
+            personal_id=personal.personal_id if personal is not None else None,
+            personal_nombre=f"{personal.nombre} {personal.apepat}" if personal is not None else None,
+            rut=f"{personal.rut}-{personal.dvrut}" if personal is not None else None,
+            cargo=cargo,
+            faena_id=faena.faena_id if faena is not None else None,
+            faena_nombre=faena.nombre if faena is not None else None,
         )
+
+    @classmethod
+    def crear_log(cls, *args, **kwargs):
+        """Método de clase para crear logs de manera consistente (mismos parámetros que construir_log)"""
+        log = cls.construir_log(*args, **kwargs)
+        log.save()
+        return log
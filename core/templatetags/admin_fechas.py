@@ -0,0 +1,19 @@
+"""
+Jerarquía de fechas del admin resuelta con búsquedas en el índice
+
+Ver core.admin.FechasIndexadas.
+"""
+
+from django import template
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+
+from core.admin import ChangeListFechas
+
+
+register = template.Library()
+
+
+@register.inclusion_tag('admin/date_hierarchy.html')
+def date_hierarchy_indexada(cl):
+    """Igual que el tag date_hierarchy de Django, con las fechas de FechasIndexadas"""
+    return date_hierarchy(ChangeListFechas(cl))
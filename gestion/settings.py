@@ -49,6 +49,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'planning.diagnostico.DiagnosticoMiddleware',
+    'planning.auditoria.AuditoriaMiddleware',
 ]
 
 ROOT_URLCONF = 'gestion.urls'
@@ -79,9 +81,21 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Un atomic() toma el bloqueo de escritura al comenzar y espera
+            # su turno (busy_timeout) en vez de fallar con "database is locked"
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Planificación: PRAGMA que se aplican a cada conexión de SQLite, además de
+# los valores por defecto de planning/sqlite.py (busy_timeout, mmap_size,
+# cache_size y, en modo WAL, synchronous). None omite un PRAGMA y
+# PLANNING_SQLITE_PRAGMAS = None no aplica ninguno. El modo WAL se activa
+# una vez con: python manage.py modo_journal wal
+PLANNING_SQLITE_PRAGMAS = {}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -122,6 +136,71 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Planificación: leer y mantener los estados del calendario en la tabla RosterDia
+# (activar después de poblarla con `python manage.py reconstruir_roster`)
+PLANNING_ROSTER_MATERIALIZADO = False
+
+# Caché
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Con varios procesos usar un backend compartido (Redis, Memcached o base de
+# datos) para que la invalidación del caché de estados llegue a todos.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {
+            # Una entrada por persona y mes consultado
+            'MAX_ENTRIES': 100000,
+        },
+    }
+}
+
+# Planificación: caché de estados del calendario por persona y mes, con
+# invalidación precisa al modificar asignaciones, ausentismos, licencias,
+# faenas o turnos. Requiere un backend de CACHES compartido entre procesos:
+# con LocMemCache se ignora (chequeo planning.W001)
+PLANNING_CACHE_ESTADOS = False
+PLANNING_CACHE_ESTADOS_TIMEOUT = 60 * 60  # segundos
+
+# Planificación: mensajes de diagnóstico de las vistas (logger 'planning.diagnostico').
+# Apagados por defecto; se pueden activar para todo el sistema o, si
+# PLANNING_DIAGNOSTICO_POR_REQUEST está activo, para un request con ?debug=1
+PLANNING_DIAGNOSTICO = False
+PLANNING_DIAGNOSTICO_POR_REQUEST = DEBUG
+
+# Planificación: los logs de auditoría de un request se escriben juntos al
+# terminarlo. Fuera de un request (comandos, tareas) se escriben de inmediato,
+# o cada N segundos desde un hilo de fondo si se define este intervalo
+PLANNING_AUDITORIA_INTERVALO = None
+
+# Planificación: `python manage.py archivar_auditoria` mueve los logs más
+# antiguos que el horizonte a archivos mensuales comprimidos en este directorio
+PLANNING_AUDITORIA_ARCHIVO = BASE_DIR / 'archivo_auditoria'
+PLANNING_AUDITORIA_HORIZONTE_DIAS = 180
+
+# Logging
+# https://docs.djangoproject.com/en/4.2/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'planning': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+        'planning.diagnostico': {
+            # Solo emite si el diagnóstico está activo (ver planning/diagnostico.py)
+            'level': 'DEBUG',
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class PlanningConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'planning'
+
+    def ready(self):
+        # Registrar las señales que mantienen la tabla RosterDia
+        from . import signals  # noqa: F401
+        # Perfil de conexión de SQLite (WAL, busy_timeout, etc.)
+        from . import sqlite  # noqa: F401
@@ -0,0 +1,271 @@
+"""
+Archivo histórico de los logs de auditoría
+
+Los logs más antiguos que el horizonte (PLANNING_AUDITORIA_HORIZONTE_DIAS)
+se mueven de la tabla AuditLog a archivos por mes, para que la tabla que se
+lista y filtra a diario se mantenga chica:
+
+    archivo_auditoria/
+        indice.json                 rango de log_id y fechas de cada mes y
+                                    los valores de sus columnas filtrables
+        auditlog-2025-01.jsonl.gz   un log por línea (JSON), comprimido
+        auditlog-2025-02.jsonl.gz
+        ...
+
+Los archivos solo crecen: cada ejecución agrega un miembro gzip nuevo al
+final del archivo del mes (un .gz con varios miembros se lee como uno
+solo). Se archiva con:
+
+    python manage.py archivar_auditoria
+
+get_audit_logs sigue leyendo el historial desde estos archivos cuando la
+tabla se queda sin logs (ver planning.auditoria.paginar_logs). Con los
+valores del índice, un filtro por persona, faena, acción, tabla o usuario
+descomprime solo los meses que pueden tener logs que lo cumplan.
+"""
+
+import gzip
+import heapq
+import json
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.models import AuditLog
+
+
+HORIZONTE_DIAS = 180
+TAMANO_LOTE = 5000
+NOMBRE_INDICE = 'indice.json'
+
+# Columnas que se guardan de cada log
+CAMPOS = [campo.attname for campo in AuditLog._meta.concrete_fields]
+
+# Columnas filtrables cuyos valores distintos se guardan por segmento en el índice
+CAMPOS_INDICE = ('personal_id', 'rut', 'faena_id', 'accion', 'tabla_afectada', 'usuario')
+
+# Índice leído por directorio: {directorio: (fecha de modificación, índice)}
+_indices = {}
+
+
+def directorio_archivo():
+    """Directorio de los archivos (setting PLANNING_AUDITORIA_ARCHIVO)"""
+    return str(getattr(settings, 'PLANNING_AUDITORIA_ARCHIVO', settings.BASE_DIR / 'archivo_auditoria'))
+
+
+def horizonte_dias():
+    """Días de logs que se mantienen en la tabla (setting PLANNING_AUDITORIA_HORIZONTE_DIAS)"""
+    return getattr(settings, 'PLANNING_AUDITORIA_HORIZONTE_DIAS', HORIZONTE_DIAS)
+
+
+def nombre_segmento(mes):
+    return f'auditlog-{mes}.jsonl.gz'
+
+
+# =============================================================================
+# ÍNDICE
+# =============================================================================
+
+def leer_indice(directorio=None):
+    """
+    Índice de los segmentos archivados
+
+    Retorna: dict {mes 'AAAA-MM': {archivo, cantidad, desde_id, hasta_id, desde, hasta,
+    valores}} donde valores es {columna de CAMPOS_INDICE: set de valores}
+    (sin valores en los segmentos archivados antes de guardarlos). Vacío si
+    todavía no se archiva nada.
+    """
+    directorio = directorio or directorio_archivo()
+    ruta = os.path.join(directorio, NOMBRE_INDICE)
+    try:
+        modificado = os.stat(ruta).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+
+    guardado = _indices.get(directorio)
+    if guardado and guardado[0] == modificado:
+        return guardado[1]
+    with open(ruta, encoding='utf-8') as archivo:
+        indice = json.load(archivo)['segmentos']
+    for segmento in indice.values():
+        if 'valores' in segmento:
+            segmento['valores'] = {campo: set(valores) for campo, valores in segmento['valores'].items()}
+    _indices[directorio] = (modificado, indice)
+    return indice
+
+
+def maximo_archivado(directorio=None):
+    """Mayor log_id archivado (None si no hay archivo)"""
+    indice = leer_indice(directorio)
+    return max((segmento['hasta_id'] for segmento in indice.values()), default=None)
+
+
+def escribir_indice(directorio, indice):
+    """Reemplazar el índice de una vez (un lector nunca ve un índice a medio escribir)"""
+    ruta = os.path.join(directorio, NOMBRE_INDICE)
+    temporal = ruta + '.tmp'
+    segmentos = {
+        mes: {**segmento, 'valores': {campo: sorted(valores) for campo, valores in segmento['valores'].items()}}
+        if 'valores' in segmento else segmento
+        for mes, segmento in indice.items()
+    }
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        json.dump({'version': 1, 'segmentos': segmentos}, archivo, indent=1, sort_keys=True)
+        archivo.flush()
+        os.fsync(archivo.fileno())
+    os.replace(temporal, ruta)
+
+
+# =============================================================================
+# ARCHIVAR
+# =============================================================================
+
+def _agregar_segmento(directorio, mes, filas):
+    """Agregar un miembro gzip con las filas al archivo del mes"""
+    ruta = os.path.join(directorio, nombre_segmento(mes))
+    # fecha_hora con isoformat(): DjangoJSONEncoder la trunca a milisegundos y
+    # los logs archivados se ordenarían y filtrarían distinto que en la tabla
+    lineas = ''.join(
+        json.dumps({**fila, 'fecha_hora': fila['fecha_hora'].isoformat()}, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+        for fila in filas
+    )
+    with open(ruta, 'ab') as archivo:
+        archivo.write(gzip.compress(lineas.encode('utf-8')))
+        archivo.flush()
+        os.fsync(archivo.fileno())
+
+
+def archivar(horizonte=None, directorio=None, lote=TAMANO_LOTE, progreso=None):
+    """
+    Mover a los archivos mensuales los logs anteriores al horizonte
+
+    Por cada lote (en orden de log_id): se agregan los logs a los archivos
+    de su mes, se actualiza el índice y recién entonces se borran de la
+    tabla. Si el proceso se interrumpe entre ambos pasos, la siguiente
+    ejecución vuelve a archivar esos logs y la lectura descarta los
+    duplicados.
+
+    Parámetros:
+    - horizonte: días que se mantienen en la tabla (default: setting)
+    - directorio: directorio de los archivos (default: setting)
+    - lote: logs que se leen, escriben y borran por vez
+    - progreso: función opcional que recibe un mensaje por lote
+
+    Retorna: dict con la cantidad de logs archivados y de meses tocados
+    """
+    avisar = progreso or (lambda mensaje: None)
+    directorio = directorio or directorio_archivo()
+    horizonte = horizonte_dias() if horizonte is None else horizonte
+    limite = timezone.now() - timedelta(days=horizonte)
+    os.makedirs(directorio, exist_ok=True)
+
+    indice = dict(leer_indice(directorio))
+    total, meses = 0, set()
+    while True:
+        filas = list(
+            AuditLog.objects.filter(fecha_hora__lt=limite).order_by('log_id').values(*CAMPOS)[:lote]
+        )
+        if not filas:
+            break
+
+        por_mes = {}
+        for fila in filas:
+            por_mes.setdefault(timezone.localtime(fila['fecha_hora']).strftime('%Y-%m'), []).append(fila)
+        for mes, filas_mes in por_mes.items():
+            _agregar_segmento(directorio, mes, filas_mes)
+            segmento = dict(indice[mes]) if mes in indice else {
+                'archivo': nombre_segmento(mes), 'cantidad': 0,
+                'desde_id': filas_mes[0]['log_id'], 'hasta_id': filas_mes[0]['log_id'],
+                'desde': filas_mes[0]['fecha_hora'].isoformat(), 'hasta': filas_mes[0]['fecha_hora'].isoformat(),
+                'valores': {campo: set() for campo in CAMPOS_INDICE},
+            }
+            if 'valores' in segmento:
+                # Un segmento archivado sin valores sigue sin ellos: no se conocen los anteriores
+                segmento['valores'] = {
+                    campo: segmento['valores'][campo] | {fila[campo] for fila in filas_mes if fila[campo] is not None}
+                    for campo in CAMPOS_INDICE
+                }
+            segmento['cantidad'] += len(filas_mes)
+            segmento['desde_id'] = min(segmento['desde_id'], filas_mes[0]['log_id'])
+            segmento['hasta_id'] = max(segmento['hasta_id'], filas_mes[-1]['log_id'])
+            fechas = [fila['fecha_hora'] for fila in filas_mes]
+            segmento['desde'] = min(parse_datetime(segmento['desde']), *fechas).isoformat()
+            segmento['hasta'] = max(parse_datetime(segmento['hasta']), *fechas).isoformat()
+            indice[mes] = segmento
+        escribir_indice(directorio, indice)
+
+        AuditLog.objects.filter(
+            fecha_hora__lt=limite, log_id__gte=filas[0]['log_id'], log_id__lte=filas[-1]['log_id'],
+        ).delete()
+        total += len(filas)
+        meses.update(por_mes)
+        avisar(f'{total} logs archivados (hasta log_id {filas[-1]["log_id"]})')
+
+    return {'archivados': total, 'meses': len(meses)}
+
+
+# =============================================================================
+# LEER
+# =============================================================================
+
+def _leer_segmento(ruta):
+    """Filas de un archivo mensual (un miembro incompleto al final se ignora)"""
+    filas = []
+    with gzip.open(ruta, 'rt', encoding='utf-8') as archivo:
+        try:
+            for linea in archivo:
+                filas.append(json.loads(linea))
+        except (EOFError, json.JSONDecodeError):
+            # Un archivado en curso o interrumpido: lo escrito hasta ahí es válido
+            pass
+    return filas
+
+
+def _log(fila):
+    """AuditLog (sin guardar) a partir de una fila archivada"""
+    return AuditLog(**{**fila, 'fecha_hora': parse_datetime(fila['fecha_hora'])})
+
+
+def leer_archivados(antes_de=None, directorio=None, segmento_util=None):
+    """
+    Logs archivados del más nuevo al más antiguo (por log_id)
+
+    Se leen y descomprimen solo los meses necesarios: los segmentos se
+    abren en orden de su mayor log_id y uno más se agrega a la mezcla
+    recién cuando puede contener el siguiente log a entregar.
+
+    Parámetros:
+    - antes_de: entregar solo los logs con log_id menor
+    - segmento_util: función que recibe un segmento del índice y retorna
+      False si no puede tener logs de interés (no se abre)
+
+    Retorna: generador de AuditLog sin guardar
+    """
+    directorio = directorio or directorio_archivo()
+    segmentos = sorted(
+        (
+            s for s in leer_indice(directorio).values()
+            if (antes_de is None or s['desde_id'] < antes_de) and (segmento_util is None or segmento_util(s))
+        ),
+        key=lambda s: s['hasta_id'],
+    )
+    monton = []  # (-log_id, orden, fila)
+    orden = 0
+    ultimo = None
+    while segmentos or monton:
+        while segmentos and (not monton or segmentos[-1]['hasta_id'] >= -monton[0][0]):
+            for fila in _leer_segmento(os.path.join(directorio, segmentos.pop()['archivo'])):
+                if antes_de is None or fila['log_id'] < antes_de:
+                    heapq.heappush(monton, (-fila['log_id'], orden, fila))
+                    orden += 1
+        if not monton:
+            break
+        _, _, fila = heapq.heappop(monton)
+        if fila['log_id'] == ultimo:
+            continue
+        ultimo = fila['log_id']
+        yield _log(fila)
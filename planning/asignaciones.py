@@ -0,0 +1,369 @@
+"""
+Asignación de personal a faenas en lote
+
+assign_personal_to_faena trabaja con una persona por request. Para dotar
+una faena completa, asignar_en_lote recibe todas las filas de una vez:
+
+1. Carga la faena, las personas y los turnos de todas las filas (3 consultas)
+2. Valida cada fila en memoria con las mismas reglas de PersonalFaena.clean
+3. Si todas son válidas, en una transacción:
+   - desactiva con un UPDATE las otras asignaciones activas a la faena
+   - reactiva con un bulk_update las asignaciones con la misma fecha de inicio
+   - crea las nuevas con un bulk_create
+   - registra los logs de auditoría juntos (planning.auditoria)
+
+Si alguna fila es inválida no se guarda nada y se informan todos los errores.
+
+remover_en_lote hace lo inverso para una lista de personas o para toda la
+faena: un solo UPDATE sobre PersonalFaena y los logs de auditoría de todas
+las asignaciones en un solo bulk_create. La remoción rige desde su fecha:
+el calendario conserva los días anteriores (PersonalFaena.fecha_termino). El cierre anticipado de la faena
+solo adelanta su fecha de término: las asignaciones siguen activas y el
+calendario conserva los días trabajados hasta el cierre.
+"""
+
+from datetime import date, datetime, timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, DateField, Q, Value, When
+from django.utils import timezone
+
+from core.models import AuditLog, Faena, InfoLaboral, Personal, PersonalFaena, TipoTurno
+
+from .auditoria import registrar_logs
+from .cambios import afectados_asignaciones, nueva_generacion, registrar_cambio
+from .roster import unir_rangos
+
+
+MAX_ASIGNACIONES = 1000
+
+
+def _entero(valor):
+    """int de un ID recibido en el JSON (None si no viene o no es válido)"""
+    if valor in (None, ''):
+        return None
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def validar_asignaciones(faena, filas, fecha_inicio=None, turno_id=None):
+    """
+    Validar en memoria las filas de una asignación en lote
+
+    Parámetros:
+    - faena: Faena destino (con su tipo_turno cargado)
+    - filas: lista de dicts {personal_id, turno_id, fecha_inicio}
+    - fecha_inicio, turno_id: valores para las filas que no los traen (o los traen vacíos)
+
+    Retorna: (lista de PersonalFaena sin guardar, lista de errores) donde
+    cada error es {indice, personal_id, error}
+    """
+    personal_ids = {_entero(fila.get('personal_id')) for fila in filas if isinstance(fila, dict)}
+    turno_ids = {_entero(fila.get('turno_id') or turno_id) for fila in filas if isinstance(fila, dict)}
+    personas = Personal.objects.in_bulk(personal_ids - {None})
+    turnos = TipoTurno.objects.in_bulk(turno_ids - {None})
+
+    asignaciones, errores, vistos = [], [], set()
+    for indice, fila in enumerate(filas):
+        if not isinstance(fila, dict):
+            errores.append({'indice': indice, 'personal_id': None, 'error': 'Fila inválida'})
+            continue
+
+        personal_id = _entero(fila.get('personal_id'))
+        # Una fila sin turno (o con turno_id null) usa el del lote
+        turno = fila.get('turno_id') or turno_id
+        fecha = fila.get('fecha_inicio') or fecha_inicio
+
+        def error(mensaje):
+            errores.append({'indice': indice, 'personal_id': fila.get('personal_id'), 'error': mensaje})
+
+        if personal_id not in personas:
+            error('Personal no encontrado')
+            continue
+        if personal_id in vistos:
+            error('Personal repetido en la lista')
+            continue
+        vistos.add(personal_id)
+        if turno not in (None, '') and _entero(turno) not in turnos:
+            error('Turno no encontrado')
+            continue
+        try:
+            fecha = datetime.strptime(fecha, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            error('Fecha de inicio inválida (formato YYYY-MM-DD)')
+            continue
+
+        asignacion = PersonalFaena(
+            personal=personas[personal_id],
+            faena=faena,
+            tipo_turno=turnos.get(_entero(turno)),
+            fecha_inicio=fecha,
+            activo=True,
+        )
+        try:
+            # Las reglas de fechas de la faena y del turno (sin consultas: todo está cargado)
+            asignacion.clean()
+        except ValidationError as e:
+            error(' '.join(e.messages))
+            continue
+        # bulk_create y bulk_update no pasan por PersonalFaena.save()
+        asignacion.fecha_fin_calculada = asignacion.calcular_fecha_fin()
+        asignaciones.append(asignacion)
+
+    return asignaciones, errores
+
+
+def _log_asignacion(asignacion, cargo, usuario, ip_address, cantidad):
+    """Log 'asignar' de una asignación del lote (mismos datos que assign_personal_to_faena)"""
+    personal, faena = asignacion.personal, asignacion.faena
+    fecha_inicio = asignacion.fecha_inicio.strftime('%Y-%m-%d')
+    turno_info = f" (Turno: {asignacion.tipo_turno.nombre})" if asignacion.tipo_turno else ""
+    return AuditLog.construir_log(
+        accion='asignar',
+        tabla_afectada='PersonalFaena',
+        registro_id=asignacion.personal_faena_id,
+        descripcion=f"Se asignó a {personal.nombre} {personal.apepat} a la faena '{faena.nombre}' desde {fecha_inicio}{turno_info}",
+        usuario=usuario,
+        datos_nuevos={
+            'personal_id': personal.personal_id,
+            'personal_nombre': f"{personal.nombre} {personal.apepat}",
+            'personal_rut': f"{personal.rut}-{personal.dvrut}",
+            'faena_id': faena.faena_id,
+            'faena_nombre': faena.nombre,
+            'fecha_inicio': fecha_inicio,
+            'turno_id': asignacion.tipo_turno_id,
+        },
+        ip_address=ip_address,
+        detalles_adicionales={'lote': cantidad},
+        personal=personal,
+        faena=faena,
+        cargo=cargo,
+    )
+
+
+def logs_remocion(asignaciones, usuario=None, ip_address=None, datos_nuevos=None, detalles_adicionales=None):
+    """
+    Logs de auditoría para las asignaciones que se van a remover
+
+    Lee las asignaciones con su persona, faena y turno en una consulta y los
+    cargos de todas las personas en otra, en vez de consultar por asignación.
+
+    Parámetros:
+    - asignaciones: QuerySet o lista de PersonalFaena (una lista debe venir
+      con persona, faena y turno cargados)
+    - datos_nuevos, detalles_adicionales: datos comunes a todos los logs
+
+    Retorna: lista de AuditLog sin guardar (para registrar_logs)
+    """
+    if not isinstance(asignaciones, list):
+        asignaciones = list(asignaciones.select_related('personal', 'faena', 'tipo_turno'))
+    cargos = InfoLaboral.objects.cargos_vigentes({asignacion.personal_id for asignacion in asignaciones})
+
+    logs = []
+    for asignacion in asignaciones:
+        personal = asignacion.personal
+        faena = asignacion.faena
+        turno_info = f" (Turno: {asignacion.tipo_turno.nombre})" if asignacion.tipo_turno else ""
+
+        logs.append(AuditLog.construir_log(
+            accion='remover',
+            tabla_afectada='PersonalFaena',
+            registro_id=asignacion.personal_faena_id,
+            descripcion=f"Se removió a {personal.nombre} {personal.apepat} de la faena '{faena.nombre}'{turno_info}",
+            usuario=usuario,
+            datos_anteriores={
+                'personal_id': asignacion.personal_id,
+                'personal_rut': f"{personal.rut}-{personal.dvrut}",
+                'faena_id': asignacion.faena_id,
+                'tipo_turno_id': asignacion.tipo_turno_id,
+                'fecha_inicio': asignacion.fecha_inicio.strftime('%Y-%m-%d') if asignacion.fecha_inicio else None,
+                'activo': True
+            },
+            datos_nuevos=datos_nuevos,
+            ip_address=ip_address,
+            detalles_adicionales=detalles_adicionales,
+            personal=personal,
+            faena=faena,
+            cargo=cargos.get(asignacion.personal_id),
+        ))
+    return logs
+
+
+def asignar_en_lote(faena_id, filas, fecha_inicio=None, turno_id=None, usuario=None, ip_address=None):
+    """
+    Asignar varias personas a una faena en una sola transacción
+
+    Igual que una asignación nueva de assign_personal_to_faena, para cada
+    persona se desactivan sus otras asignaciones activas a la faena y, si ya
+    tenía una asignación con la misma fecha de inicio, se reactiva en vez de
+    crear otra.
+
+    Retorna: (resumen, errores); resumen es None si hubo errores
+    """
+    faena = Faena.objects.select_related('tipo_turno').filter(faena_id=faena_id).first()
+    if faena is None:
+        return None, [{'indice': None, 'personal_id': None, 'error': 'Faena no encontrada'}]
+
+    asignaciones, errores = validar_asignaciones(faena, filas, fecha_inicio, turno_id)
+    if errores:
+        return None, errores
+    if not asignaciones:
+        return {'creadas': 0, 'reactivadas': 0, 'desactivadas': 0, 'asignaciones': []}, []
+
+    personal_ids = [asignacion.personal_id for asignacion in asignaciones]
+    ahora = timezone.now()
+    with transaction.atomic():
+        # Asignaciones de estas personas a la faena: las activas y las de la misma fecha de inicio
+        existentes = {
+            (asignacion.personal_id, asignacion.fecha_inicio): asignacion
+            for asignacion in PersonalFaena.objects.filter(
+                Q(activo=True) | Q(fecha_inicio__in={a.fecha_inicio for a in asignaciones}),
+                faena=faena,
+                personal_id__in=personal_ids,
+            )
+        }
+        reactivadas, nuevas = [], []
+        for asignacion in asignaciones:
+            existente = existentes.pop((asignacion.personal_id, asignacion.fecha_inicio), None)
+            if existente is None:
+                nuevas.append(asignacion)
+                continue
+            asignacion.personal_faena_id = existente.personal_faena_id
+            asignacion.fecha_asignacion = existente.fecha_asignacion
+            asignacion.fecha_creacion = existente.fecha_creacion
+            asignacion.observaciones = existente.observaciones
+            asignacion.fecha_modificacion = ahora
+            reactivadas.append(asignacion)
+        # Lo que queda activo son otras asignaciones de las mismas personas a la faena
+        desactivar = [existente.personal_faena_id for existente in existentes.values() if existente.activo]
+
+        # update() y bulk_* no disparan señales: registrar el cambio a mano
+        afectados = afectados_asignaciones(PersonalFaena.objects.filter(pk__in=desactivar))
+        PersonalFaena.objects.filter(pk__in=desactivar).update(activo=False, fecha_modificacion=ahora)
+        PersonalFaena.objects.bulk_update(reactivadas, ['tipo_turno', 'activo', 'fecha_fin_calculada', 'fecha_termino', 'fecha_modificacion'])
+        PersonalFaena.objects.bulk_create(nuevas)
+
+        guardadas = PersonalFaena.objects.filter(pk__in=[a.personal_faena_id for a in asignaciones])
+        persona_ids, rango = afectados_asignaciones(guardadas)
+        registrar_cambio(set(persona_ids) | set(afectados[0]), unir_rangos(rango, afectados[1]))
+
+        cargos = InfoLaboral.objects.cargos_vigentes(personal_ids)
+        registrar_logs(
+            _log_asignacion(asignacion, cargos.get(asignacion.personal_id), usuario, ip_address, len(asignaciones))
+            for asignacion in asignaciones
+        )
+        nueva_generacion()
+
+    return {
+        'creadas': len(nuevas),
+        'reactivadas': len(reactivadas),
+        'desactivadas': len(desactivar),
+        'asignaciones': [
+            {'personal_id': asignacion.personal_id, 'assignment_id': asignacion.personal_faena_id}
+            for asignacion in asignaciones
+        ],
+    }, []
+
+
+def remover_en_lote(faena_id, personal_ids=None, fecha=None, cerrar=False, usuario=None, ip_address=None):
+    """
+    Remover de una faena a varias personas, o a todo su personal, o cerrar la faena en una fecha
+
+    Las asignaciones se desactivan como en remove_personal_from_faena, pero
+    su fecha_termino queda en el día anterior a la remoción: el calendario,
+    la dotación y los conflictos conservan los días anteriores. Como la
+    desactivación rige de inmediato, no se acepta una fecha futura.
+    Con cerrar=True (cierre anticipado) no se remueve a nadie: la faena pasa
+    a terminar en esa fecha, lo que acota el calendario y la
+    fecha_fin_calculada de todo su personal sin borrar los días anteriores.
+
+    Parámetros:
+    - personal_ids: IDs de las personas a remover (None: todo el personal)
+    - fecha: date o 'YYYY-MM-DD' desde la que rige la remoción o el cierre
+      (default: hoy)
+
+    Retorna: (resumen, error); resumen es None si hubo error
+    """
+    faena = Faena.objects.filter(faena_id=faena_id).first()
+    if faena is None:
+        return None, 'Faena no encontrada'
+
+    if fecha in (None, ''):
+        fecha = timezone.localdate()
+    elif not isinstance(fecha, date):
+        try:
+            fecha = datetime.strptime(fecha, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            return None, 'Fecha inválida (formato YYYY-MM-DD)'
+
+    if personal_ids is not None:
+        ids = {_entero(personal_id) for personal_id in personal_ids}
+        if None in ids:
+            return None, 'IDs de personal inválidos'
+        personal_ids = ids
+    if cerrar:
+        if personal_ids is not None:
+            return None, 'El cierre aplica a toda la faena, no a una lista de personas'
+        if fecha <= faena.fecha_inicio:
+            return None, f'La fecha de cierre debe ser posterior al inicio de la faena ({faena.fecha_inicio})'
+    elif fecha > timezone.localdate():
+        return None, 'La fecha de remoción no puede ser posterior a hoy (para terminar la faena en una fecha futura, ciérrela)'
+
+    asignaciones = PersonalFaena.objects.filter(faena=faena, activo=True)
+    if personal_ids is not None:
+        asignaciones = asignaciones.filter(personal_id__in=personal_ids)
+
+    with transaction.atomic():
+        removidas = [] if cerrar else list(asignaciones.select_related('personal', 'faena', 'tipo_turno'))
+        if removidas:
+            # update() no dispara señales: registrar el cambio a mano
+            afectados = afectados_asignaciones(asignaciones)
+            PersonalFaena.objects.filter(pk__in=[a.personal_faena_id for a in removidas]).update(
+                activo=False,
+                # Las que ya habían empezado se siguen mostrando hasta el día anterior a la remoción
+                fecha_termino=Case(
+                    When(fecha_inicio__lt=fecha, then=Value(fecha - timedelta(days=1))),
+                    default=Value(None), output_field=DateField(),
+                ),
+                fecha_modificacion=timezone.now(),
+            )
+            registrar_cambio(*afectados)
+            registrar_logs(logs_remocion(
+                removidas, usuario, ip_address,
+                datos_nuevos={'activo': False, 'fecha_remocion': fecha.strftime('%Y-%m-%d')},
+                detalles_adicionales={'lote': len(removidas)},
+            ))
+
+        cerrada = cerrar and (faena.fecha_fin is None or fecha < faena.fecha_fin)
+        if cerrada:
+            anterior = faena.fecha_fin
+            # save() para que las señales de Faena registren el cambio de fechas
+            faena.fecha_fin = fecha
+            faena.save(update_fields=['fecha_fin', 'fecha_modificacion'])
+            registrar_logs([AuditLog.construir_log(
+                accion='editar',
+                tabla_afectada='Faena',
+                registro_id=faena.faena_id,
+                descripcion=f"Se cerró la faena '{faena.nombre}' el {fecha.strftime('%Y-%m-%d')}",
+                usuario=usuario,
+                datos_anteriores={'fecha_fin': anterior.strftime('%Y-%m-%d') if anterior else None},
+                datos_nuevos={'fecha_fin': fecha.strftime('%Y-%m-%d')},
+                ip_address=ip_address,
+                detalles_adicionales={'cierre': True, 'asignaciones_activas': asignaciones.count()},
+                faena=faena,
+            )])
+        if removidas:
+            nueva_generacion()
+
+    removidas_ids = {asignacion.personal_id for asignacion in removidas}
+    return {
+        'removidas': len(removidas),
+        'personas': len(removidas_ids),
+        'fecha': fecha.strftime('%Y-%m-%d'),
+        'faena_cerrada': cerrada,
+        'sin_asignacion': sorted(personal_ids - removidas_ids) if personal_ids is not None else [],
+        'asignaciones': [asignacion.personal_faena_id for asignacion in removidas],
+    }, None
@@ -0,0 +1,401 @@
+"""
+Filtrado y datos de los logs de auditoría del panel lateral
+
+Cada AuditLog guarda una copia de la persona (ID, nombre, RUT y cargo) y de
+la faena (ID y nombre) afectadas al momento del cambio. Los filtros usan
+solo esas columnas indexadas, sin buscar dentro de los JSON, y cada log se
+muestra tal como quedó guardado, sin consultar la asignación, la persona
+ni su InfoLaboral.
+
+Los logs se leen en orden de log_id (la clave primaria), del más nuevo al
+más antiguo. El panel pide la cabeza una vez y después solo lo que falta:
+
+    ?since_id=N   → logs nuevos (log_id > N), para el refresco periódico
+    ?before_id=N  → página anterior (log_id < N), para el historial
+
+Ambos son recorridos de rango sobre la clave primaria que terminan en LIMIT.
+Los logs más antiguos que el horizonte se leen desde el archivo histórico
+(planning.archivo_auditoria) cuando la tabla no alcanza a llenar la página.
+
+Los logs se escriben en lote: las vistas arman cada log con
+AuditLog.construir_log y lo entregan a registrar_logs, que lo escribe junto
+con los demás del mismo request (AuditoriaMiddleware) con un solo
+bulk_create y, si se registró dentro de una transacción, solo si esta se
+confirma. Ver "ESCRITURA EN LOTE" más abajo.
+"""
+
+import atexit
+import heapq
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from itertools import islice
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from core.models import AuditLog, Faena, Personal
+
+from .archivo_auditoria import leer_archivados, maximo_archivado
+from .busqueda import FIN_PREFIJO, PATRON_RUT, filtrar_busqueda, terminos_consulta
+
+
+logger = logging.getLogger(__name__)
+
+LIMITE_LOGS = 50
+MAX_LOGS = 500
+
+
+def _contiene(buscado, valor):
+    """Equivalente en Python de __icontains"""
+    return buscado.lower() in (valor or '').lower()
+
+
+class FiltroLogs:
+    """
+    Filtros del panel de logs
+
+    Se aplican como consulta sobre la tabla (queryset) y, con las mismas
+    reglas, a los logs archivados que se leen fuera de la base de datos
+    (acepta) y a los valores de cada mes archivado, para no abrir los que
+    no pueden tener logs que los cumplan (puede_contener).
+
+    Parámetros:
+    - accion, tabla, usuario: texto contenido en la columna respectiva
+    - personal: nombre o RUT de la persona afectada (búsqueda indexada de
+      planning.busqueda; los RUT también se buscan por prefijo en la
+      columna rut, por si la persona ya no existe)
+    - faena: ID exacto o parte del nombre de la faena afectada
+    """
+
+    def __init__(self, accion='', tabla='', usuario='', personal='', faena=''):
+        self.accion = accion or ''
+        self.tabla = tabla or ''
+        self.usuario = usuario if usuario and usuario.strip() else ''
+        self.personal = (personal or '').strip()
+        self.faena = (faena or '').strip()
+        self.rut = self.personal.replace('.', '').upper() if PATRON_RUT.match(self.personal) else None
+
+    def personas(self):
+        """Subconsulta de las personas que coinciden con el filtro de personal (None si no hay términos)"""
+        if not terminos_consulta(self.personal):
+            return None
+        return filtrar_busqueda(Personal.objects.all(), self.personal).values('personal_id')
+
+    def faenas(self):
+        """Subconsulta de las faenas cuyo nombre contiene el filtro de faena"""
+        return Faena.objects.filter(nombre__icontains=self.faena).values('faena_id')
+
+    def queryset(self):
+        """QuerySet de AuditLog ordenado del más nuevo al más antiguo (por log_id)"""
+        logs = AuditLog.objects.all()
+
+        if self.accion:
+            logs = logs.filter(accion__icontains=self.accion)
+        if self.tabla:
+            logs = logs.filter(tabla_afectada__icontains=self.tabla)
+        if self.usuario:
+            logs = logs.filter(usuario__icontains=self.usuario)
+
+        if self.personal:
+            personas = self.personas()
+            personal_q = Q(personal_id__in=personas) if personas is not None else Q(pk__in=[])
+            if self.rut:
+                personal_q |= Q(rut__gte=self.rut, rut__lt=self.rut + FIN_PREFIJO)
+            logs = logs.filter(personal_q)
+
+        if self.faena:
+            faena_q = Q(faena_id__in=self.faenas())
+            if self.faena.isdigit():
+                faena_q |= Q(faena_id=int(self.faena))
+            logs = logs.filter(faena_q)
+
+        return logs.order_by('-log_id')
+
+    @cached_property
+    def personal_ids(self):
+        personas = self.personas()
+        return set(personas.values_list('personal_id', flat=True)) if personas is not None else set()
+
+    @cached_property
+    def faena_ids(self):
+        ids = set(self.faenas().values_list('faena_id', flat=True))
+        if self.faena.isdigit():
+            ids.add(int(self.faena))
+        return ids
+
+    def puede_contener(self, segmento):
+        """False si un segmento archivado no tiene ningún log que cumpla los filtros (según el índice)"""
+        valores = segmento.get('valores')
+        if valores is None:
+            # Archivado antes de guardar los valores en el índice
+            return True
+        if self.accion and not any(_contiene(self.accion, valor) for valor in valores['accion']):
+            return False
+        if self.tabla and not any(_contiene(self.tabla, valor) for valor in valores['tabla_afectada']):
+            return False
+        if self.usuario and not any(_contiene(self.usuario, valor) for valor in valores['usuario']):
+            return False
+        if self.personal and self.personal_ids.isdisjoint(valores['personal_id']):
+            if not (self.rut and any(rut.startswith(self.rut) for rut in valores['rut'])):
+                return False
+        if self.faena and self.faena_ids.isdisjoint(valores['faena_id']):
+            return False
+        return True
+
+    def acepta(self, log):
+        """True si un log (archivado) cumple los filtros"""
+        if self.accion and not _contiene(self.accion, log.accion):
+            return False
+        if self.tabla and not _contiene(self.tabla, log.tabla_afectada):
+            return False
+        if self.usuario and not _contiene(self.usuario, log.usuario):
+            return False
+        if self.personal and log.personal_id not in self.personal_ids:
+            if not (self.rut and (log.rut or '').startswith(self.rut)):
+                return False
+        if self.faena and log.faena_id not in self.faena_ids:
+            return False
+        return True
+
+
+def paginar_logs(filtro, since_id=None, before_id=None, limite=LIMITE_LOGS):
+    """
+    Una página de logs a partir de un cursor de log_id
+
+    - sin cursor: los `limite` logs más nuevos
+    - since_id: los logs posteriores a since_id, empezando por los más
+      antiguos para no dejar huecos si hay más de `limite`
+    - before_id: los `limite` logs anteriores a before_id
+
+    Si la tabla no alcanza a llenar una página hacia atrás, se sigue con
+    los logs archivados (planning.archivo_auditoria), filtrados igual. Los
+    logs nuevos siempre están en la tabla.
+
+    Retorna: (lista de AuditLog del más nuevo al más antiguo, hay_mas) donde
+    hay_mas indica que quedan logs en la dirección pedida
+    """
+    logs = filtro.queryset()
+    if since_id is not None:
+        pagina = list(logs.filter(log_id__gt=since_id).order_by('log_id')[:limite + 1])
+        hay_mas = len(pagina) > limite
+        return pagina[:limite][::-1], hay_mas
+
+    if before_id is not None:
+        logs = logs.filter(log_id__lt=before_id)
+    pagina = list(logs.order_by('-log_id')[:limite + 1])
+
+    # Los archivados son los más antiguos: normalmente solo hacen falta cuando
+    # la tabla se acaba, pero si sus log_id se cruzan con los de la página
+    # (logs escritos con atraso) se mezclan por log_id.
+    tope = maximo_archivado()
+    if tope is not None and (len(pagina) <= limite or pagina[-1].log_id < tope):
+        archivados = leer_archivados(antes_de=before_id, segmento_util=filtro.puede_contener)
+        archivados = islice((log for log in archivados if filtro.acepta(log)), limite + 1)
+        mezcla = []
+        for log in heapq.merge(pagina, archivados, key=lambda log: -log.log_id):
+            if mezcla and mezcla[-1].log_id == log.log_id:
+                # Archivado sin alcanzar a borrarse de la tabla
+                continue
+            mezcla.append(log)
+            if len(mezcla) > limite:
+                break
+        pagina = mezcla
+    return pagina[:limite], len(pagina) > limite
+
+
+def leer_cursor(valor):
+    """
+    log_id de un parámetro since_id/before_id
+
+    Retorna: int o None si no viene; lanza ValueError si no es válido
+    """
+    if valor in (None, ''):
+        return None
+    log_id = int(valor)
+    if log_id < 0:
+        raise ValueError(valor)
+    return log_id
+
+
+def serializar_log(log):
+    """Datos de un log para el panel lateral"""
+    if log.personal_id is not None:
+        personal_info = f"{log.personal_nombre} ({log.rut})" if log.rut else (log.personal_nombre or 'Personal no disponible')
+        cargo_info = log.cargo or 'Sin cargo asignado'
+    else:
+        personal_info = cargo_info = 'N/A'
+
+    return {
+        'id': log.log_id,
+        'usuario': log.usuario or 'Usuario Calendario',
+        'accion': log.accion,
+        'cargo': cargo_info,
+        'personal': personal_info,
+        'faena': log.faena_nombre or 'N/A',
+        'descripcion': log.descripcion,
+        'fecha_hora': timezone.localtime(log.fecha_hora).strftime('%d/%m/%Y %H:%M:%S'),
+        'datos_anteriores': log.datos_anteriores,
+        'datos_nuevos': log.datos_nuevos,
+        'detalles_adicionales': log.descripcion,
+    }
+
+
+# =============================================================================
+# ESCRITURA EN LOTE
+# =============================================================================
+
+# Logs del lote abierto en el contexto actual (lo fija lote_auditoria)
+_lote = ContextVar('planning_auditoria_lote', default=None)
+
+
+def escribir_logs(logs):
+    """
+    Escribir logs con un solo bulk_create
+
+    Un error al escribir se registra y no interrumpe a quien hizo el cambio,
+    igual que los try/except alrededor de crear_log en las vistas. Los logs
+    quedan sin guardar (sin ID), listos para reintentarse.
+
+    Retorna: True si se escribieron (o no había logs)
+    """
+    if not logs:
+        return True
+    try:
+        AuditLog.objects.bulk_create(logs, batch_size=500)
+    except Exception:
+        logger.exception("Error al escribir %s logs de auditoría", len(logs))
+        # bulk_create es atómico: si un lote ya había recibido IDs, se revirtió con los demás
+        for log in logs:
+            log.pk = None
+            log._state.adding = True
+        return False
+    return True
+
+
+def registrar_logs(logs):
+    """
+    Registrar logs de auditoría (instancias sin guardar de AuditLog)
+
+    - Dentro de una transacción se encolan al confirmarla (transaction.on_commit):
+      si se revierte, sus logs se descartan con ella.
+    - Dentro de lote_auditoria (todo request, con AuditoriaMiddleware) se
+      escriben al cerrar el lote, junto con los demás.
+    - Fuera de un lote, con PLANNING_AUDITORIA_INTERVALO los escribe el hilo
+      de fondo; sin él se escriben de inmediato con un bulk_create.
+    """
+    logs = list(logs)
+    if not logs:
+        return
+    lote = _lote.get()
+    if lote is not None:
+        destino = lote.extend
+    elif intervalo_hilo():
+        destino = cola.agregar
+    else:
+        destino = escribir_logs
+
+    if connection.in_atomic_block:
+        transaction.on_commit(partial(destino, logs))
+    else:
+        destino(logs)
+
+
+def registrar_log(log):
+    """Registrar un log de auditoría (ver registrar_logs)"""
+    registrar_logs([log])
+
+
+@contextmanager
+def lote_auditoria():
+    """
+    Reunir los logs registrados en el bloque y escribirlos juntos al salir
+
+    Los lotes anidados se suman al exterior. Si el bloque termina dentro de
+    una transacción, la escritura espera a que se confirme. Los logs de
+    cambios ya confirmados se escriben aunque el bloque termine con error.
+    """
+    if _lote.get() is not None:
+        yield
+        return
+
+    logs = []
+    token = _lote.set(logs)
+    try:
+        yield
+    finally:
+        _lote.reset(token)
+        if connection.in_atomic_block:
+            # Registrado después de los on_commit que agregan al lote: corre después de ellos
+            transaction.on_commit(partial(escribir_logs, logs))
+        else:
+            escribir_logs(logs)
+
+
+class AuditoriaMiddleware:
+    """Escribir los logs de auditoría de cada request con un solo bulk_create al terminar"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with lote_auditoria():
+            return self.get_response(request)
+
+
+def intervalo_hilo():
+    """Segundos entre escrituras del hilo de fondo (None si está desactivado)"""
+    return getattr(settings, 'PLANNING_AUDITORIA_INTERVALO', None)
+
+
+class ColaAuditoria:
+    """
+    Logs registrados fuera de requests y transacciones (comandos, tareas)
+
+    Un hilo de fondo los escribe cada PLANNING_AUDITORIA_INTERVALO segundos
+    con un bulk_create. El hilo se inicia con el primer log y al terminar el
+    proceso se escriben los que queden pendientes (atexit).
+
+    Cada escritura toma el lock `escritura` hasta terminar: el vaciado de
+    atexit espera a la que esté en curso en el hilo (que es daemon) en vez
+    de salir con ese lote a medio escribir. Un lote que no se pudo escribir
+    vuelve al comienzo de la cola y se reintenta en la próxima escritura.
+    """
+
+    def __init__(self):
+        self.logs = []
+        self.lock = threading.Lock()
+        self.escritura = threading.Lock()
+        self.hilo = None
+
+    def agregar(self, logs):
+        with self.lock:
+            self.logs.extend(logs)
+            if self.hilo is None:
+                self.hilo = threading.Thread(target=self.ciclo, name='planning-auditoria', daemon=True)
+                self.hilo.start()
+                atexit.register(self.vaciar)
+
+    def vaciar(self):
+        """Escribir los logs pendientes (los que fallan vuelven a la cola)"""
+        with self.escritura:
+            with self.lock:
+                logs, self.logs = self.logs, []
+            if not escribir_logs(logs):
+                with self.lock:
+                    self.logs[:0] = logs
+
+    def ciclo(self):
+        while True:
+            time.sleep(intervalo_hilo() or 1)
+            self.vaciar()
+            close_old_connections()
+
+
+cola = ColaAuditoria()
@@ -0,0 +1,165 @@
+"""
+Búsqueda indexada de personal por nombre y RUT
+
+Cada persona tiene en la tabla PersonalTermino una fila por término de
+búsqueda: cada palabra de su nombre y apellidos normalizada (sin tildes y
+en mayúsculas), su RUT y su RUT con dígito verificador. Las búsquedas por
+prefijo son recorridos de rango sobre el índice (termino, personal), sin
+recorrer la tabla Personal:
+
+    'gonz'          → términos desde 'GONZ' hasta 'GONZ' + FIN_PREFIJO
+    'juan gonzalez' → personas con un término por cada palabra
+    '12.345.678-5'  → término '123456785' (RUT con DV)
+    '12345678'      → RUT con o sin DV
+
+Los términos se mantienen al día con las señales de Personal (ver
+planning.signals). Para regenerarlos desde cero:
+
+    python manage.py indexar_busqueda
+"""
+
+import re
+import unicodedata
+
+from django.db import transaction
+
+from core.models import Personal, PersonalTermino
+
+
+LIMITE_RESULTADOS = 10
+MAX_RESULTADOS = 50
+MIN_CARACTERES = 2
+
+# Límite superior del rango de un prefijo
+FIN_PREFIJO = '\uffff'
+
+# RUT escrito con o sin puntos, guion y dígito verificador
+PATRON_RUT = re.compile(r'^[\d.]+(-?[\dkK])?$')
+
+
+def normalizar(texto):
+    """Texto sin tildes ni diéresis y en mayúsculas ('Muñoz' → 'MUNOZ')"""
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).upper()
+
+
+def palabras(texto):
+    """Palabras normalizadas de un texto (separa por espacios, guiones, etc.)"""
+    return [palabra for palabra in re.split(r'[^0-9A-Z]+', normalizar(texto)) if palabra]
+
+
+def terminos(nombre, apepat, apemat, rut, dvrut):
+    """Términos de búsqueda de una persona"""
+    resultado = set()
+    for texto in (nombre, apepat, apemat):
+        resultado.update(palabras(texto))
+    rut = normalizar(rut).strip()
+    if rut:
+        resultado.add(rut)
+        resultado.add(rut + normalizar(dvrut).strip())
+    return resultado
+
+
+def terminos_consulta(consulta):
+    """
+    Términos de una consulta del usuario
+
+    Las palabras con forma de RUT ('12.345.678-5', '12345678-5') se
+    convierten en un solo término sin puntos ni guion; el resto se separa
+    en palabras normalizadas.
+    """
+    resultado = []
+    for palabra in (consulta or '').split():
+        if PATRON_RUT.match(palabra):
+            resultado.append(normalizar(palabra.replace('.', '').replace('-', '')))
+        else:
+            resultado.extend(palabras(palabra))
+    return list(dict.fromkeys(resultado))
+
+
+# =============================================================================
+# INDEXACIÓN
+# =============================================================================
+
+def indexar(persona_ids=None, lote=2000):
+    """
+    Regenerar los términos de búsqueda de las personas (o de todas)
+
+    Retorna: cantidad de términos creados
+    """
+    personas = Personal.objects.order_by('personal_id')
+    if persona_ids is not None:
+        persona_ids = list(persona_ids)
+        if not persona_ids:
+            return 0
+        personas = personas.filter(personal_id__in=persona_ids)
+
+    total = 0
+    with transaction.atomic():
+        if persona_ids is None:
+            PersonalTermino.objects.all().delete()
+        else:
+            PersonalTermino.objects.filter(personal_id__in=persona_ids).delete()
+
+        filas = []
+        for personal_id, *datos in personas.values_list('personal_id', 'nombre', 'apepat', 'apemat', 'rut', 'dvrut').iterator(chunk_size=lote):
+            filas.extend(PersonalTermino(personal_id=personal_id, termino=termino) for termino in terminos(*datos))
+            if len(filas) >= lote:
+                PersonalTermino.objects.bulk_create(filas, batch_size=lote)
+                total += len(filas)
+                filas = []
+        PersonalTermino.objects.bulk_create(filas, batch_size=lote)
+        total += len(filas)
+    return total
+
+
+# =============================================================================
+# CONSULTA
+# =============================================================================
+
+def filtrar_busqueda(personas_qs, consulta):
+    """
+    Filtrar un QuerySet de Personal por una consulta de nombre o RUT
+
+    Cada término de la consulta debe ser prefijo de algún término de la
+    persona. Sin términos válidos el QuerySet no se filtra.
+    """
+    for termino in terminos_consulta(consulta):
+        coincidencias = PersonalTermino.objects.filter(
+            termino__gte=termino,
+            termino__lt=termino + FIN_PREFIJO,
+        ).values('personal_id')
+        personas_qs = personas_qs.filter(personal_id__in=coincidencias)
+    return personas_qs
+
+
+def buscar(consulta, limite=LIMITE_RESULTADOS, personas_qs=None):
+    """
+    Las personas que mejor coinciden con una consulta
+
+    Primero las que tienen todas las palabras de la consulta completas (ej:
+    el apellido exacto antes que otro que solo empieza igual) y después las
+    que coinciden por prefijo, cada grupo por apellido y nombre. Las dos
+    consultas terminan en LIMIT recorriendo el índice de orden del
+    personal, así que no cuentan ni ordenan todas las coincidencias de un
+    prefijo corto.
+
+    Retorna: lista de Personal (vacía si la consulta es muy corta)
+    """
+    consulta_terminos = terminos_consulta(consulta)
+    if not consulta_terminos or len(''.join(consulta_terminos)) < MIN_CARACTERES:
+        return []
+
+    if personas_qs is None:
+        personas_qs = Personal.objects.filter(activo=True)
+    personas_qs = personas_qs.order_by('apepat', 'nombre', 'personal_id')
+
+    exactas = personas_qs
+    for termino in consulta_terminos:
+        exactas = exactas.filter(personal_id__in=PersonalTermino.objects.filter(termino=termino).values('personal_id'))
+    resultados = list(exactas[:limite])
+
+    if len(resultados) < limite:
+        prefijo = filtrar_busqueda(personas_qs, consulta).exclude(personal_id__in=[p.personal_id for p in resultados])
+        resultados.extend(prefijo[:limite - len(resultados)])
+    return resultados
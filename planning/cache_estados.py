@@ -0,0 +1,263 @@
+"""
+Caché de estados del calendario por persona y mes
+
+Los estados de una persona en un mes solo cambian cuando cambian sus
+asignaciones, ausentismos o licencias (o las faenas y turnos que usan), así
+que se guardan en el caché de Django con la clave (persona, año, mes). Una
+consulta por 500 personas en que cambiaron 3 recalcula solo esas 3.
+
+Cada entrada guarda la lista de estados de cada día del mes completo; las
+consultas por rango arman su resultado juntando y recortando meses.
+
+Las entradas son versionadas: cada persona y mes tiene un contador de
+versión en el caché y la clave de sus estados lo incluye. La invalidación
+es precisa: planning.cambios (llamado por las señales y por las vistas que
+usan QuerySet.update()) sube, después del commit de la transacción, la
+versión solo de las personas y meses afectados por cada cambio. Una
+consulta que leyó la versión antes del cambio y guarda sus estados después
+los deja bajo una clave que ya nadie lee (en vez de volver a guardar
+estados antiguos sobre una clave recién borrada). Los contadores de
+aciertos y fallos se guardan en el mismo caché y se exponen en
+get_cache_estados.
+
+Se activa con el setting PLANNING_CACHE_ESTADOS y solo con un caché
+compartido entre procesos (Redis, Memcached, base de datos, archivos): con
+LocMemCache cada proceso (gunicorn, etc.) tendría su propia copia y la
+invalidación llegaría solo al proceso que hizo el cambio, así que el
+setting se ignora y el chequeo planning.W001 lo advierte.
+"""
+
+import time
+from datetime import date
+from calendar import monthrange
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from core.models import Personal
+
+from .estados import claves_rango
+
+
+# Subir si cambia el formato de los estados guardados (descarta las entradas antiguas)
+VERSION_CACHE = 1
+
+CLAVE_ACIERTOS = 'planning:estados:aciertos'
+CLAVE_FALLOS = 'planning:estados:fallos'
+
+
+def cache_compartido():
+    """Retorna True si el caché por defecto es compartido entre procesos (no LocMemCache)"""
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def cache_activo():
+    """Retorna True si los estados del calendario se guardan en caché (ver docstring del módulo)"""
+    return getattr(settings, 'PLANNING_CACHE_ESTADOS', False) and cache_compartido()
+
+
+@checks.register(checks.Tags.caches)
+def revisar_cache_estados(app_configs, **kwargs):
+    """Advertir si PLANNING_CACHE_ESTADOS está activo sobre un caché por proceso"""
+    if getattr(settings, 'PLANNING_CACHE_ESTADOS', False) and not cache_compartido():
+        return [checks.Warning(
+            'PLANNING_CACHE_ESTADOS está activo pero el caché por defecto es LocMemCache: '
+            'se ignora, porque la invalidación no llegaría a los demás procesos.',
+            hint='Configurar CACHES con un backend compartido (Redis, Memcached, base de datos o archivos).',
+            id='planning.W001',
+        )]
+    return []
+
+
+def clave_version(personal_id, year, month):
+    """Clave de caché del contador de versión de una persona en un mes"""
+    return f'planning:estados:version:{personal_id}:{year}:{month}'
+
+
+def clave_mes(personal_id, year, month, version):
+    """Clave de caché de los estados de una persona en un mes, en una versión"""
+    return f'planning:estados:{personal_id}:{year}:{month}:{version}'
+
+
+def leer_versiones(meses_persona):
+    """
+    Versión vigente de cada (persona, año, mes)
+
+    Se lee antes de calcular: si un cambio se confirma mientras tanto, los
+    estados calculados quedan bajo la versión anterior. Los contadores que
+    no existen (primera consulta, o desalojados del caché) se crean con un
+    valor nuevo basado en la hora, que no coincide con ninguna versión ya
+    usada: una entrada antigua nunca vuelve a leerse.
+
+    Retorna: dict {(persona, año, mes): versión}
+    """
+    claves = {clave_version(*mes): mes for mes in meses_persona}
+    guardadas = cache.get_many(claves, version=VERSION_CACHE)
+    nuevas = {clave: time.time_ns() for clave in claves if clave not in guardadas}
+    if nuevas:
+        cache.set_many(nuevas, timeout=None, version=VERSION_CACHE)
+        guardadas.update(nuevas)
+    return {mes: guardadas[clave] for clave, mes in claves.items()}
+
+
+def meses_rango(desde, hasta):
+    """Lista de (año, mes) que toca un rango de fechas, en orden"""
+    meses = []
+    year, month = desde.year, desde.month
+    while (year, month) <= (hasta.year, hasta.month):
+        meses.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return meses
+
+
+def limites_mes(year, month):
+    """Primer y último día de un mes"""
+    return date(year, month, 1), date(year, month, monthrange(year, month)[1])
+
+
+# =============================================================================
+# LECTURA
+# =============================================================================
+
+def estados_con_cache(personas, desde, hasta, calcular, clave_dia=None):
+    """
+    Estados del calendario usando el caché por persona y mes
+
+    Parámetros:
+    - personas, desde, hasta, clave_dia: igual que planning.estados.calcular_estados
+    - calcular: función que calcula los estados que no están en caché
+      (calcular_estados o planning.roster.leer_estados)
+
+    Retorna: el mismo resultado que calcular(personas, desde, hasta, clave_dia)
+    """
+    persona_ids = list(personas.values_list('personal_id', flat=True))
+    meses = meses_rango(desde, hasta)
+    versiones = leer_versiones((pid, year, month) for pid in persona_ids for year, month in meses)
+    claves = {clave_mes(*mes, version): mes for mes, version in versiones.items()}
+
+    guardados = cache.get_many(claves, version=VERSION_CACHE)
+    faltantes = [clave for clave in claves if clave not in guardados]
+    registrar_consulta(len(guardados), len(faltantes))
+
+    if faltantes:
+        nuevos = calcular_faltantes({claves[clave]: versiones[claves[clave]] for clave in faltantes}, calcular)
+        guardados.update({clave_mes(*mes, versiones[mes]): estados for mes, estados in nuevos.items()})
+
+    # Juntar los meses de cada persona y recortar al rango pedido
+    inicio_meses = limites_mes(*meses[0])[0]
+    recorte = slice((desde - inicio_meses).days, (hasta - inicio_meses).days + 1)
+    dias = claves_rango(desde, hasta, clave_dia)
+
+    results = {}
+    for pid in persona_ids:
+        estados = []
+        for year, month in meses:
+            estados.extend(guardados[clave_mes(pid, year, month, versiones[pid, year, month])])
+        results[str(pid)] = dict(zip(dias, estados[recorte]))
+    return results
+
+
+def calcular_faltantes(faltantes, calcular):
+    """
+    Calcular y guardar en caché los meses faltantes
+
+    Se recalculan solo las personas con algún mes faltante, en un solo
+    llamado que cubre desde el primer hasta el último mes faltante. Cada mes
+    se guarda bajo la versión leída antes de calcular (ver leer_versiones).
+
+    Parámetros:
+    - faltantes: dict {(persona, año, mes): versión}
+
+    Retorna: dict {(persona, año, mes): [estados de cada día del mes]}
+    """
+    persona_ids = sorted({pid for pid, _, _ in faltantes})
+    desde = min(limites_mes(year, month)[0] for _, year, month in faltantes)
+    hasta = max(limites_mes(year, month)[1] for _, year, month in faltantes)
+
+    calculados = calcular(Personal.objects.filter(personal_id__in=persona_ids), desde, hasta)
+
+    nuevos = {}
+    for pid, year, month in faltantes:
+        inicio, fin = limites_mes(year, month)
+        dias = list(calculados[str(pid)].values())
+        nuevos[pid, year, month] = dias[(inicio - desde).days:(fin - desde).days + 1]
+
+    cache.set_many(
+        {clave_mes(*mes, version): nuevos[mes] for mes, version in faltantes.items()},
+        timeout=getattr(settings, 'PLANNING_CACHE_ESTADOS_TIMEOUT', 3600), version=VERSION_CACHE,
+    )
+    return nuevos
+
+
+# =============================================================================
+# INVALIDACIÓN
+# =============================================================================
+
+def subir_versiones(claves):
+    """
+    Subir los contadores de versión: las entradas anteriores dejan de leerse
+
+    Un contador que no existe (nunca leído, o desalojado del caché) parte
+    en un valor nuevo, como en leer_versiones.
+    """
+    for clave in claves:
+        try:
+            cache.incr(clave, version=VERSION_CACHE)
+        except ValueError:
+            cache.set(clave, time.time_ns(), timeout=None, version=VERSION_CACHE)
+
+
+def invalidar_estados(persona_ids, rango):
+    """
+    Subir la versión de los meses del rango de las personas afectadas
+
+    Se ejecuta al confirmar la transacción: una consulta que leyó los datos
+    anteriores guarda sus estados bajo la versión vieja, que ya no se lee.
+    """
+    if not cache_activo() or not persona_ids or not rango:
+        return
+    desde, hasta = rango
+    claves = [
+        clave_version(pid, year, month)
+        for pid in persona_ids
+        for year, month in meses_rango(desde, hasta)
+    ]
+    transaction.on_commit(lambda: subir_versiones(claves))
+
+
+# =============================================================================
+# CONTADORES
+# =============================================================================
+
+def _incrementar(clave, cantidad):
+    if not cantidad:
+        return
+    cache.add(clave, 0, timeout=None)
+    try:
+        cache.incr(clave, cantidad)
+    except ValueError:
+        # La clave expiró o fue desalojada entre add e incr
+        cache.set(clave, cantidad, timeout=None)
+
+
+def registrar_consulta(aciertos, fallos):
+    """Sumar los aciertos y fallos de una consulta a los contadores"""
+    _incrementar(CLAVE_ACIERTOS, aciertos)
+    _incrementar(CLAVE_FALLOS, fallos)
+
+
+def estadisticas_cache():
+    """Retorna los contadores de aciertos y fallos del caché de estados"""
+    valores = cache.get_many([CLAVE_ACIERTOS, CLAVE_FALLOS])
+    aciertos = valores.get(CLAVE_ACIERTOS, 0)
+    fallos = valores.get(CLAVE_FALLOS, 0)
+    total = aciertos + fallos
+    return {
+        'activo': cache_activo(),
+        'aciertos': aciertos,
+        'fallos': fallos,
+        'tasa_aciertos': round(aciertos / total, 4) if total else None,
+    }
@@ -0,0 +1,72 @@
+"""
+Propagación de cambios a las estructuras derivadas del calendario
+
+Cuando cambia un registro que afecta los estados del calendario, las
+estructuras derivadas deben actualizarse solo para las personas y el rango
+de fechas afectados:
+- la tabla materializada RosterDia (planning.roster)
+- el caché de estados por persona y mes (planning.cache_estados)
+
+Las señales (planning.signals) llaman a registrar_cambio en cada save/delete.
+Los QuerySet.update() no disparan señales, así que las vistas que los usan
+calculan los afectados ANTES del update y registran el cambio después:
+
+    afectados = afectados_asignaciones(asignaciones)
+    asignaciones.update(activo=False)
+    registrar_cambio(*afectados)
+"""
+
+from django.db.models import F
+
+from core.models import GeneracionCambios
+
+from .cache_estados import cache_activo, invalidar_estados
+from .roster import actualizar_roster, rango_asignaciones, roster_activo
+
+
+def seguimiento_activo():
+    """Retorna True si alguna estructura derivada necesita enterarse de los cambios"""
+    return roster_activo() or cache_activo()
+
+
+def registrar_cambio(persona_ids, rango):
+    """Actualizar el roster e invalidar el caché de las personas en el rango afectado"""
+    if not persona_ids or not rango:
+        return
+    actualizar_roster(persona_ids, rango)
+    invalidar_estados(persona_ids, rango)
+
+
+def afectados_asignaciones(asignaciones):
+    """Retorna (personas, rango de fechas) que cubre un QuerySet de PersonalFaena"""
+    if not seguimiento_activo():
+        return (), None
+    return set(asignaciones.values_list('personal_id', flat=True)), rango_asignaciones(asignaciones)
+
+
+# =============================================================================
+# GENERACIÓN DE CAMBIOS
+# =============================================================================
+
+# La generación se guarda en la base de datos (tabla GeneracionCambios, una
+# sola fila) y no en el caché: así la ven todos los procesos y sobrevive a
+# los reinicios, sin volver a valores que un cliente ya tiene en su ETag
+ID_GENERACION = 1
+
+
+def generacion_cambios():
+    """
+    Contador que aumenta con cada cambio guardado en los modelos de core
+
+    Complementa las fechas de modificación en los validadores HTTP
+    (planning.validadores) para los modelos que no las tienen, como
+    Personal, Ausentismo o LicenciaMedicaPorPersonal.
+    """
+    return GeneracionCambios.objects.filter(pk=ID_GENERACION).values_list('valor', flat=True).first() or 0
+
+
+def nueva_generacion():
+    """Aumentar el contador de cambios (un UPDATE atómico)"""
+    if not GeneracionCambios.objects.filter(pk=ID_GENERACION).update(valor=F('valor') + 1):
+        # La fila aún no existe (la crea la migración; por ejemplo, se borró a mano)
+        GeneracionCambios.objects.get_or_create(pk=ID_GENERACION, defaults={'valor': 1})
@@ -0,0 +1,104 @@
+"""
+Formato compacto para la respuesta de estados del calendario
+
+La respuesta normal repite en cada celda los mismos dicts de estado y de
+detalle. El formato compacto los envía una sola vez en tablas y deja, por
+persona, una lista de códigos enteros comprimida por tramos (run-length)
+de días consecutivos iguales.
+
+Estructura:
+- dias: claves de los días, en orden
+- plantillas: estados únicos {tipo, color, texto, prioridad}
+- detalles: registros de detalle únicos
+- celdas: combinaciones únicas de estados de un día. Cada estado es
+  [plantilla] si no tiene detalle, o [plantilla, detalle] (detalle puede
+  ser null)
+- results: {personal_id: [celda, repeticiones, celda, repeticiones, ...]}
+
+El frontend (calendar.html, decodificarEstados) reconstruye exactamente el
+mismo mapa persona → día → estados del formato normal.
+"""
+
+import json
+
+
+FORMATO_COMPACTO = 'compacto'
+
+
+def codificar_compacto(results):
+    """
+    Convertir el resultado de calcular_estados al formato compacto
+
+    Parámetros:
+    - results: dict {personal_id: {clave_dia: [estados]}}
+
+    Retorna: dict serializable con el formato descrito en el módulo
+    """
+    plantillas, indice_plantillas = [], {}
+    detalles, indice_detalles = [], {}
+    celdas, indice_celdas = [], {}
+    # Los detalles se comparten entre celdas (un dict por registro), así que
+    # se indexan primero por identidad para no serializarlos en cada celda
+    detalles_por_id = {}
+
+    def codigo_detalle(detalle):
+        if detalle is None:
+            return None
+        codigo = detalles_por_id.get(id(detalle))
+        if codigo is None:
+            clave = json.dumps(detalle, sort_keys=True)
+            codigo = indice_detalles.get(clave)
+            if codigo is None:
+                codigo = indice_detalles[clave] = len(detalles)
+                detalles.append(detalle)
+            detalles_por_id[id(detalle)] = codigo
+        return codigo
+
+    def codigo_estado(estado):
+        clave = (estado['tipo'], estado['color'], estado['texto'], estado['prioridad'])
+        codigo = indice_plantillas.get(clave)
+        if codigo is None:
+            codigo = indice_plantillas[clave] = len(plantillas)
+            plantillas.append({
+                'tipo': estado['tipo'],
+                'color': estado['color'],
+                'texto': estado['texto'],
+                'prioridad': estado['prioridad'],
+            })
+        if 'detalles' in estado:
+            return (codigo, codigo_detalle(estado['detalles']))
+        return (codigo,)
+
+    dias = []
+    codificado = {}
+    for pid, days in results.items():
+        if not dias:
+            dias = list(days)
+
+        tramos = []
+        anterior, repeticiones = None, 0
+        for estados in days.values():
+            clave = tuple(codigo_estado(estado) for estado in estados)
+            codigo = indice_celdas.get(clave)
+            if codigo is None:
+                codigo = indice_celdas[clave] = len(celdas)
+                celdas.append([list(estado) for estado in clave])
+
+            if codigo == anterior:
+                repeticiones += 1
+            else:
+                if anterior is not None:
+                    tramos.extend((anterior, repeticiones))
+                anterior, repeticiones = codigo, 1
+        if anterior is not None:
+            tramos.extend((anterior, repeticiones))
+        codificado[pid] = tramos
+
+    return {
+        'formato': FORMATO_COMPACTO,
+        'dias': dias,
+        'plantillas': plantillas,
+        'detalles': detalles,
+        'celdas': celdas,
+        'results': codificado,
+    }
@@ -0,0 +1,203 @@
+"""
+Conflictos de programación de todo el personal
+
+Detecta, para un rango de fechas y toda la empresa, a las personas
+programadas para trabajar en una faena mientras:
+- licencia: tienen una licencia médica vigente
+- ausentismo: tienen un ausentismo (de cualquier tipo, que se informa)
+- doble_asignacion: están programadas para trabajar en otra faena
+
+El cálculo se hace en una pasada sobre intervalos, sin recorrer día por día:
+
+1. Cuatro consultas en bloque: asignaciones con su turno, licencias,
+   ausentismos y los datos de las personas con algún conflicto.
+2. Cada asignación se convierte en sus tramos de días de trabajo
+   (planning.turnos.tramos_de_trabajo, las mismas reglas del calendario);
+   los tramos de una misma persona en la misma faena se unen, como en la
+   dotación.
+3. Los tramos, licencias y ausentismos se recorren con un barrido ordenado
+   por persona y fecha (planning.intervalos.superposiciones), que entrega
+   solo los pares que se superponen: O(n log n) más los conflictos.
+4. Los fragmentos de un mismo par de registros se agrupan en un conflicto
+   con su primer y último día y el total de días en conflicto.
+"""
+
+from datetime import date
+
+from django.db.models import Q
+
+from core.models import Ausentismo, LicenciaMedicaPorPersonal, Personal, PersonalFaena, fin_asignacion
+
+from .intervalos import superposiciones
+from .turnos import tramos_de_trabajo
+
+
+# Tipos de conflicto, en el orden del resumen
+TIPOS_CONFLICTO = ('licencia', 'ausentismo', 'doble_asignacion')
+
+# Clases de intervalo del barrido
+_TRABAJO, _LICENCIA, _AUSENTISMO = 'trabajo', 'licencia', 'ausentismo'
+
+
+def _unir_tramos(tramos):
+    """
+    Unir tramos (inicio, fin) que se superponen o son contiguos
+
+    Retorna: lista ordenada de tramos disjuntos
+    """
+    unidos = []
+    for inicio, fin in sorted(tramos):
+        if unidos and inicio <= unidos[-1][1] + 1:
+            unidos[-1][1] = max(unidos[-1][1], fin)
+        else:
+            unidos.append([inicio, fin])
+    return unidos
+
+
+def _par_en_conflicto(valor_a, valor_b):
+    """
+    Tipo de conflicto y registros (faena, otro) de un par superpuesto
+
+    Retorna: (tipo, faena_id, otro) o None si el par no es un conflicto
+    (dos ausencias)
+    """
+    if valor_a[0] != _TRABAJO:
+        valor_a, valor_b = valor_b, valor_a
+    if valor_a[0] != _TRABAJO:
+        return None
+    if valor_b[0] != _TRABAJO:
+        return valor_b[0], valor_a[1], valor_b[1]
+
+    # Dos faenas (los tramos de una misma faena ya están unidos): una sola vez por par
+    return ('doble_asignacion', *sorted((valor_a[1], valor_b[1])))
+
+
+def detectar_conflictos(desde, hasta):
+    """
+    Listar los conflictos de programación de todo el personal en un rango
+
+    Parámetros:
+    - desde, hasta: rango de fechas (inclusive)
+
+    Retorna: dict con
+    - conflictos: lista ordenada por persona, fecha y tipo de dicts con
+      tipo, personal_id, nombre, rut, faena_id, faena, desde, hasta, dias
+      (días en conflicto) y el registro en conflicto: licencia_id,
+      ausentismo_id y tipo_ausentismo, u otra_faena_id y otra_faena
+    - resumen: cantidad de conflictos por tipo (TIPOS_CONFLICTO)
+    """
+    # =============================================================================
+    # CONSULTAS EN BLOQUE
+    # =============================================================================
+
+    asignaciones = list(
+        PersonalFaena.objects.en_calendario().filter(
+            Q(faena__fecha_fin__isnull=True) | Q(faena__fecha_fin__gte=desde),
+            Q(fecha_termino__isnull=True) | Q(fecha_termino__gte=desde),
+            fecha_inicio__lte=hasta,
+        ).values_list(
+            'personal_id', 'faena_id', 'faena__nombre', 'fecha_inicio', 'faena__fecha_fin',
+            'tipo_turno__dias_trabajo', 'tipo_turno__dias_descanso',
+            'faena__tipo_turno__dias_trabajo', 'faena__tipo_turno__dias_descanso', 'fecha_termino',
+        )
+    )
+    resumen = dict.fromkeys(TIPOS_CONFLICTO, 0)
+    if not asignaciones:
+        return {'conflictos': [], 'resumen': resumen}
+
+    licencias = {
+        licencia[0]: licencia
+        for licencia in LicenciaMedicaPorPersonal.objects
+        .filter(fechaEmision__lte=hasta, fecha_fin_licencia__gte=desde)
+        .values_list('licenciaMedicaPorPersonal_id', 'personal_id', 'fechaEmision', 'fecha_fin_licencia')
+    }
+    ausentismos = {
+        ausentismo[0]: ausentismo
+        for ausentismo in Ausentismo.objects
+        .filter(fechaini__lte=hasta, fechafin__gte=desde)
+        .values_list('ausentismo_id', 'personal_id', 'fechaini', 'fechafin', 'tipoausen_id__tipo')
+    }
+
+    # =============================================================================
+    # INTERVALOS: TRAMOS DE TRABAJO, LICENCIAS Y AUSENTISMOS
+    # =============================================================================
+
+    # Cada asignación usa el turno específico de la persona o, si no tiene, el de la faena
+    tramos = {}  # (persona, faena) -> tramos de trabajo de sus asignaciones
+    nombres_faena = {}
+    for (personal_id, faena_id, faena, fecha_inicio, fecha_fin_faena,
+         trabajo_persona, descanso_persona, trabajo_faena, descanso_faena, fecha_termino) in asignaciones:
+        nombres_faena[faena_id] = faena
+        tramos.setdefault((personal_id, faena_id), []).extend(tramos_de_trabajo(
+            fecha_inicio, fin_asignacion(fecha_fin_faena, fecha_termino),
+            trabajo_persona or trabajo_faena, descanso_persona or descanso_faena,
+            desde, hasta,
+        ))
+    intervalos = [
+        (personal_id, inicio, fin, (_TRABAJO, faena_id))
+        for (personal_id, faena_id), tramos_par in tramos.items()
+        for inicio, fin in (_unir_tramos(tramos_par) if len(tramos_par) > 1 else tramos_par)
+    ]
+    primer_dia, ultimo_dia = desde.toordinal(), hasta.toordinal()
+    intervalos += [
+        (personal_id, max(inicio.toordinal(), primer_dia), min(fin.toordinal(), ultimo_dia), (_LICENCIA, licencia_id))
+        for licencia_id, personal_id, inicio, fin in licencias.values()
+    ]
+    intervalos += [
+        (personal_id, max(inicio.toordinal(), primer_dia), min(fin.toordinal(), ultimo_dia), (_AUSENTISMO, ausentismo_id))
+        for ausentismo_id, personal_id, inicio, fin, _ in ausentismos.values()
+    ]
+
+    # =============================================================================
+    # BARRIDO Y AGRUPACIÓN POR PAR DE REGISTROS
+    # =============================================================================
+
+    # (tipo, persona, faena, otro registro) -> [desde, hasta, días]
+    pares = {}
+    for personal_id, inicio, fin, valor_a, valor_b in superposiciones(intervalos):
+        par = _par_en_conflicto(valor_a, valor_b)
+        if par is None:
+            continue
+        par = (par[0], personal_id, *par[1:])
+        acumulado = pares.get(par)
+        if acumulado is None:
+            pares[par] = [inicio, fin, fin - inicio + 1]
+        else:
+            acumulado[0] = min(acumulado[0], inicio)
+            acumulado[1] = max(acumulado[1], fin)
+            acumulado[2] += fin - inicio + 1
+
+    personas = {
+        persona[0]: persona
+        for persona in Personal.objects
+        .filter(personal_id__in={personal_id for _, personal_id, _, _ in pares})
+        .values_list('personal_id', 'nombre', 'apepat', 'apemat', 'rut', 'dvrut')
+    }
+
+    conflictos = []
+    for (tipo, personal_id, faena_id, otro), (inicio, fin, dias) in pares.items():
+        _, nombre, apepat, apemat, rut, dvrut = personas[personal_id]
+        conflicto = {
+            'tipo': tipo,
+            'personal_id': personal_id,
+            'nombre': ' '.join(filter(None, (nombre, apepat, apemat))),
+            'rut': f'{rut}-{dvrut}',
+            'faena_id': faena_id,
+            'faena': nombres_faena[faena_id],
+            'desde': date.fromordinal(inicio),
+            'hasta': date.fromordinal(fin),
+            'dias': dias,
+        }
+        if tipo == 'licencia':
+            conflicto['licencia_id'] = otro
+        elif tipo == 'ausentismo':
+            conflicto['ausentismo_id'] = otro
+            conflicto['tipo_ausentismo'] = ausentismos[otro][4]
+        else:
+            conflicto['otra_faena_id'] = otro
+            conflicto['otra_faena'] = nombres_faena[otro]
+        conflictos.append(conflicto)
+        resumen[tipo] += 1
+
+    conflictos.sort(key=lambda c: (c['personal_id'], c['desde'], TIPOS_CONFLICTO.index(c['tipo']), c['faena_id']))
+    return {'conflictos': conflictos, 'resumen': resumen}
@@ -0,0 +1,399 @@
+"""
+Datos sintéticos para pruebas de carga del calendario de planificación
+
+Genera personal, cargos, faenas, asignaciones con rotaciones de turno,
+ausentismos, licencias y logs de auditoría con una semilla fija: la misma
+semilla, escala y fecha base producen siempre los mismos datos.
+
+La escala es lineal. Cada unidad agrega 100 personas, 2 faenas y unas 500
+asignaciones, así que la escala 100 equivale a 10.000 personas, 200 faenas
+y 50.000 asignaciones.
+
+Los registros generados quedan marcados para poder borrarlos sin tocar los
+datos reales: el correo del personal termina en DOMINIO_CORREO, el nombre
+de las faenas empieza con PREFIJO_FAENA y los logs llevan
+{'sintetico': True} en detalles_adicionales. Los catálogos (cargos, tipos de
+turno, etc.) se reutilizan si ya existen.
+
+Uso:
+    python manage.py generar_datos_sinteticos --escala 10
+    python manage.py generar_datos_sinteticos --limpiar
+"""
+
+import random
+from datetime import date, datetime, time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import (
+    AuditLog,
+    Ausentismo,
+    Cargo,
+    Comuna,
+    DeptoEmpresa,
+    Empresa,
+    Faena,
+    InfoLaboral,
+    LicenciaMedicaPorPersonal,
+    Personal,
+    PersonalFaena,
+    Region,
+    TipoAusentismo,
+    TipoLicenciaMedica,
+    TipoTurno,
+)
+
+from .busqueda import indexar
+from .cambios import nueva_generacion
+from .roster import reconstruir, roster_activo
+
+
+PERSONAS_POR_ESCALA = 100
+FAENAS_POR_ESCALA = 2
+SEMILLA = 2024
+FECHA_BASE = date(2025, 1, 1)
+
+DOMINIO_CORREO = '@SINTETICO.LOCAL'
+PREFIJO_FAENA = 'SINTÉTICA'
+RUT_INICIAL = 90000000
+TAMANO_LOTE = 2000
+
+NOMBRES = (
+    'JUAN', 'PEDRO', 'LUIS', 'CARLOS', 'JORGE', 'MANUEL', 'FRANCISCO', 'JOSÉ',
+    'CRISTIAN', 'RODRIGO', 'PATRICIO', 'SEBASTIÁN', 'MARÍA', 'CAROLINA', 'ANDREA',
+    'CAMILA', 'FRANCISCA', 'VALENTINA', 'PAULA', 'CLAUDIA', 'DANIELA', 'JAVIERA',
+)
+APELLIDOS = (
+    'GONZÁLEZ', 'MUÑOZ', 'ROJAS', 'DÍAZ', 'PÉREZ', 'SOTO', 'CONTRERAS', 'SILVA',
+    'MARTÍNEZ', 'SEPÚLVEDA', 'MORALES', 'RODRÍGUEZ', 'LÓPEZ', 'FUENTES', 'HERNÁNDEZ',
+    'TORRES', 'ARAYA', 'FLORES', 'ESPINOZA', 'VALENZUELA', 'CASTILLO', 'TAPIA',
+)
+LUGARES = (
+    'ESCONDIDA', 'CHUQUICAMATA', 'EL TENIENTE', 'LOS BRONCES', 'COLLAHUASI',
+    'CENTINELA', 'SPENCE', 'ZALDÍVAR', 'CANDELARIA', 'ANDINA', 'GABY', 'RADOMIRO TOMIC',
+)
+REGIONES = {
+    'ANTOFAGASTA': ('ANTOFAGASTA', 'CALAMA', 'TALTAL'),
+    'ATACAMA': ('COPIAPÓ', 'VALLENAR'),
+    'COQUIMBO': ('LA SERENA', 'COQUIMBO', 'OVALLE'),
+}
+EMPRESAS = ('MINERA NORTE', 'SERVICIOS ANDINOS', 'TRANSPORTES DEL DESIERTO')
+CARGOS = {
+    'OPERACIONES': ('OPERADOR CAMIÓN', 'OPERADOR PALA', 'OPERADOR PERFORADORA', 'CONDUCTOR'),
+    'MANTENCIÓN': ('MECÁNICO', 'ELÉCTRICO', 'SOLDADOR', 'LUBRICADOR'),
+    'ADMINISTRACIÓN': ('SUPERVISOR', 'PREVENCIONISTA', 'BODEGUERO', 'ADMINISTRATIVO'),
+}
+# (días de trabajo, días de descanso)
+TURNOS = ((7, 7), (14, 14), (10, 5), (4, 4), (5, 2), (21, 7))
+# Tipo de ausentismo y su peso relativo
+TIPOS_AUSENTISMO = (('VACACIONES', 6), ('PERMISO', 3), ('DESCANSO', 1))
+TIPOS_LICENCIA = ('ENFERMEDAD COMÚN', 'ACCIDENTE LABORAL', 'MATERNAL')
+
+
+def digito_verificador(rut):
+    """Dígito verificador de un RUT (módulo 11)"""
+    suma, factor = 0, 2
+    for digito in reversed(str(rut)):
+        suma += int(digito) * factor
+        factor = 2 if factor == 7 else factor + 1
+    resto = 11 - suma % 11
+    return {11: '0', 10: 'K'}.get(resto, str(resto))
+
+
+# =============================================================================
+# LIMPIEZA
+# =============================================================================
+
+def limpiar():
+    """
+    Borrar los datos sintéticos (personal, faenas y logs marcados)
+
+    Las asignaciones, ausentismos, licencias, información laboral y filas
+    del roster se borran en cascada con su personal o faena.
+
+    Retorna: cantidad de personas borradas
+    """
+    with transaction.atomic():
+        AuditLog.objects.filter(detalles_adicionales__sintetico=True).delete()
+        personas = Personal.objects.filter(correo__endswith=DOMINIO_CORREO)
+        cantidad = personas.count()
+        personas.delete()
+        Faena.objects.filter(nombre__startswith=PREFIJO_FAENA).delete()
+    return cantidad
+
+
+# =============================================================================
+# GENERACIÓN
+# =============================================================================
+
+def _catalogos():
+    """Obtener o crear los catálogos que usan los datos sintéticos"""
+    comunas = []
+    for region_nombre, comuna_nombres in REGIONES.items():
+        region, _ = Region.objects.get_or_create(nombre=region_nombre)
+        for nombre in comuna_nombres:
+            comuna, _ = Comuna.objects.get_or_create(nombre=nombre, region_id=region)
+            comunas.append(comuna)
+
+    cargos = []
+    for depto_nombre, cargo_nombres in CARGOS.items():
+        depto, _ = DeptoEmpresa.objects.get_or_create(depto=depto_nombre)
+        for nombre in cargo_nombres:
+            cargo, _ = Cargo.objects.get_or_create(cargo=nombre, depto_id=depto)
+            cargos.append(cargo)
+
+    turnos = []
+    for trabajo, descanso in TURNOS:
+        turno, _ = TipoTurno.objects.get_or_create(
+            nombre=f'{trabajo}x{descanso}',
+            defaults={'dias_trabajo': trabajo, 'dias_descanso': descanso},
+        )
+        turnos.append(turno)
+
+    return {
+        'comunas': comunas,
+        'empresas': [Empresa.objects.get_or_create(nombre=nombre)[0] for nombre in EMPRESAS],
+        'cargos': cargos,
+        'turnos': turnos,
+        'tipos_ausentismo': [
+            (TipoAusentismo.objects.get_or_create(tipo=tipo)[0], peso)
+            for tipo, peso in TIPOS_AUSENTISMO
+        ],
+        'tipos_licencia': [
+            TipoLicenciaMedica.objects.get_or_create(tipoLicenciaMedica=tipo)[0]
+            for tipo in TIPOS_LICENCIA
+        ],
+    }
+
+
+def _faenas(rnd, cantidad, fecha_base, turnos):
+    faenas = []
+    for i in range(cantidad):
+        inicio = fecha_base - timedelta(days=rnd.randint(0, 365))
+        faenas.append(Faena(
+            nombre=f'{PREFIJO_FAENA} {rnd.choice(LUGARES)} {i + 1:04d}',
+            tipo_turno=rnd.choice(turnos) if rnd.random() < 0.9 else None,
+            ubicacion=rnd.choice(LUGARES),
+            fecha_inicio=inicio,
+            fecha_fin=inicio + timedelta(days=rnd.randint(180, 900)),
+        ))
+    return Faena.objects.bulk_create(faenas, batch_size=TAMANO_LOTE)
+
+
+def _personal(rnd, cantidad, comunas):
+    personas = []
+    for i in range(cantidad):
+        rut = RUT_INICIAL + i
+        nombre, apepat, apemat = rnd.choice(NOMBRES), rnd.choice(APELLIDOS), rnd.choice(APELLIDOS)
+        comuna = rnd.choice(comunas) if rnd.random() < 0.8 else None
+        # bulk_create no pasa por Personal.save(): los textos ya van en mayúsculas
+        personas.append(Personal(
+            rut=str(rut),
+            dvrut=digito_verificador(rut),
+            nombre=nombre,
+            apepat=apepat,
+            apemat=apemat,
+            correo=f'{rut}{DOMINIO_CORREO}',
+            comuna_id=comuna,
+            region_id=comuna.region_id if comuna else None,
+            fechanac=date(1960, 1, 1) + timedelta(days=rnd.randint(0, 365 * 40)),
+        ))
+    return Personal.objects.bulk_create(personas, batch_size=TAMANO_LOTE)
+
+
+def _info_laboral(rnd, personas, empresas, cargos, fecha_base):
+    registros = []
+    for persona in personas:
+        contrato = fecha_base - timedelta(days=rnd.randint(30, 365 * 8))
+        for _ in range(rnd.choice((1, 1, 1, 2))):
+            cargo = rnd.choice(cargos)
+            registros.append(InfoLaboral(
+                personal_id=persona,
+                empresa_id=rnd.choice(empresas),
+                depto_id_id=cargo.depto_id_id,
+                cargo_id=cargo,
+                fechacontrata=contrato,
+            ))
+            contrato += timedelta(days=rnd.randint(90, 720))
+    InfoLaboral.objects.bulk_create(registros, batch_size=TAMANO_LOTE)
+    return len(registros)
+
+
+def _asignaciones(rnd, personas, faenas, turnos):
+    """
+    Historial de asignaciones de cada persona (de 3 a 7)
+
+    Las asignaciones van en orden cronológico. La última queda activa y el
+    20% de las personas tiene además una segunda asignación activa.
+
+    Retorna: lista de PersonalFaena creados (con su ID)
+    """
+    asignaciones = []
+    for persona in personas:
+        cantidad = rnd.randint(3, 7)
+        activas = 2 if rnd.random() < 0.2 else 1
+        vistas = set()
+        elegidas = sorted((rnd.choice(faenas) for _ in range(cantidad)), key=lambda f: f.fecha_inicio)
+        for n, faena in enumerate(elegidas):
+            margen = max((faena.fecha_fin - faena.fecha_inicio).days - 30, 0)
+            inicio = faena.fecha_inicio + timedelta(days=rnd.randint(0, margen))
+            if (faena.faena_id, inicio) in vistas:
+                continue
+            vistas.add((faena.faena_id, inicio))
+            asignacion = PersonalFaena(
+                personal=persona,
+                faena=faena,
+                fecha_inicio=inicio,
+                tipo_turno=rnd.choice(turnos) if rnd.random() < 0.3 else None,
+                activo=n >= cantidad - activas,
+            )
+            # bulk_create no pasa por PersonalFaena.save()
+            asignacion.fecha_fin_calculada = asignacion.calcular_fecha_fin()
+            asignaciones.append(asignacion)
+    return PersonalFaena.objects.bulk_create(asignaciones, batch_size=TAMANO_LOTE)
+
+
+def _ausentismos(rnd, personas, tipos, fecha_base):
+    tipos, pesos = zip(*tipos)
+    registros = []
+    for persona in personas:
+        for _ in range(rnd.choice((0, 1, 1, 2))):
+            inicio = fecha_base + timedelta(days=rnd.randint(-180, 180))
+            registros.append(Ausentismo(
+                tipoausen_id=rnd.choices(tipos, pesos)[0],
+                personal_id=persona,
+                fechaini=inicio,
+                fechafin=inicio + timedelta(days=rnd.randint(0, 14)),
+            ))
+    Ausentismo.objects.bulk_create(registros, batch_size=TAMANO_LOTE)
+    return len(registros)
+
+
+def _licencias(rnd, personas, tipos, fecha_base):
+    registros = []
+    for persona in personas:
+        if rnd.random() >= 0.3:
+            continue
+        emision = fecha_base + timedelta(days=rnd.randint(-180, 180))
+        dias = rnd.randint(1, 30)
+        # bulk_create no pasa por save(): calcular la fecha de fin aquí
+        registros.append(LicenciaMedicaPorPersonal(
+            personal_id=persona,
+            tipoLicenciaMedica_id=rnd.choice(tipos),
+            numero_folio=str(rnd.randint(1000000, 9999999)),
+            fechaEmision=emision,
+            dias_licencia=dias,
+            fecha_fin_licencia=emision + timedelta(days=dias - 1),
+            rutaDoc='Licencias_Medicas/sintetica.pdf',
+        ))
+    LicenciaMedicaPorPersonal.objects.bulk_create(registros, batch_size=TAMANO_LOTE)
+    return len(registros)
+
+
+def _logs(rnd, asignaciones, personas, faenas):
+    """Un log 'asignar' por asignación y un log 'remover' por cada asignación inactiva"""
+    personas = {p.personal_id: p for p in personas}
+    faenas = {f.faena_id: f for f in faenas}
+    cargos = InfoLaboral.objects.cargos_vigentes(list(personas))
+    zona = timezone.get_current_timezone()
+
+    logs, fechas = [], []
+    for asignacion in asignaciones:
+        persona = personas[asignacion.personal_id]
+        faena = faenas[asignacion.faena_id]
+        datos = {
+            'personal_id': persona.personal_id,
+            'personal_nombre': f'{persona.nombre} {persona.apepat}',
+            'personal_rut': f'{persona.rut}-{persona.dvrut}',
+            'faena_id': faena.faena_id,
+            'faena_nombre': faena.nombre,
+            'fecha_inicio': asignacion.fecha_inicio.strftime('%Y-%m-%d'),
+            'turno_id': asignacion.tipo_turno_id,
+        }
+        columnas = {
+            'personal_id': persona.personal_id,
+            'personal_nombre': datos['personal_nombre'],
+            'rut': datos['personal_rut'],
+            'cargo': cargos.get(persona.personal_id),
+            'faena_id': faena.faena_id,
+            'faena_nombre': faena.nombre,
+        }
+        asignado = datetime.combine(asignacion.fecha_inicio - timedelta(days=rnd.randint(1, 20)), time(8), zona)
+        logs.append(AuditLog(
+            usuario=rnd.choice(APELLIDOS).title(),
+            accion='asignar',
+            tabla_afectada='PersonalFaena',
+            registro_id=asignacion.personal_faena_id,
+            datos_nuevos=datos,
+            descripcion=f"Se asignó a {datos['personal_nombre']} a la faena '{faena.nombre}' desde {datos['fecha_inicio']}",
+            detalles_adicionales={'sintetico': True},
+            **columnas,
+        ))
+        fechas.append(asignado + timedelta(minutes=rnd.randint(0, 600)))
+
+        if not asignacion.activo:
+            logs.append(AuditLog(
+                usuario=rnd.choice(APELLIDOS).title(),
+                accion='remover',
+                tabla_afectada='PersonalFaena',
+                registro_id=asignacion.personal_faena_id,
+                datos_anteriores=dict(datos, activo=True),
+                descripcion=f"Se removió a {datos['personal_nombre']} de la faena '{faena.nombre}'",
+                detalles_adicionales={'sintetico': True},
+                **columnas,
+            ))
+            fechas.append(asignado + timedelta(days=rnd.randint(30, 120)))
+
+    for log, fecha in zip(logs, fechas):
+        log.fecha_hora = fecha
+    # En orden cronológico, como los reales: log_id crece con fecha_hora
+    logs.sort(key=lambda log: log.fecha_hora)
+    AuditLog.objects.bulk_create(logs, batch_size=TAMANO_LOTE)
+    return len(logs)
+
+
+def generar(escala=1, semilla=SEMILLA, fecha_base=FECHA_BASE, progreso=None):
+    """
+    Generar los datos sintéticos, reemplazando los generados antes
+
+    Parámetros:
+    - escala: unidades de PERSONAS_POR_ESCALA personas y FAENAS_POR_ESCALA faenas
+    - semilla: semilla del generador aleatorio
+    - fecha_base: fecha en torno a la que se reparten faenas, ausentismos y licencias
+    - progreso: función opcional que recibe un mensaje por cada etapa
+
+    Los registros se crean con bulk_create, que no dispara señales: se
+    indexa la búsqueda del personal creado y al terminar se reconstruye el
+    roster (si está activo) y se aumenta la generación de cambios de los
+    validadores HTTP.
+
+    Retorna: dict con la cantidad de registros creados por modelo
+    """
+    avisar = progreso or (lambda mensaje: None)
+    rnd = random.Random(f'{semilla}:{escala}')
+
+    limpiar()
+    with transaction.atomic():
+        catalogos = _catalogos()
+        faenas = _faenas(rnd, max(1, FAENAS_POR_ESCALA * escala), fecha_base, catalogos['turnos'])
+        avisar(f'{len(faenas)} faenas')
+        personas = _personal(rnd, PERSONAS_POR_ESCALA * escala, catalogos['comunas'])
+        indexar(persona.personal_id for persona in personas)
+        avisar(f'{len(personas)} personas')
+
+        resumen = {'faenas': len(faenas), 'personal': len(personas)}
+        resumen['info_laboral'] = _info_laboral(rnd, personas, catalogos['empresas'], catalogos['cargos'], fecha_base)
+        asignaciones = _asignaciones(rnd, personas, faenas, catalogos['turnos'])
+        resumen['asignaciones'] = len(asignaciones)
+        avisar(f'{len(asignaciones)} asignaciones')
+        resumen['ausentismos'] = _ausentismos(rnd, personas, catalogos['tipos_ausentismo'], fecha_base)
+        resumen['licencias'] = _licencias(rnd, personas, catalogos['tipos_licencia'], fecha_base)
+        resumen['logs'] = _logs(rnd, asignaciones, personas, faenas)
+        avisar(f"{resumen['logs']} logs de auditoría")
+
+    if roster_activo():
+        avisar('Reconstruyendo el roster...')
+        resumen['roster'] = reconstruir()
+    nueva_generacion()
+    return resumen
@@ -0,0 +1,79 @@
+"""
+Diagnóstico opcional de las vistas de planificación
+
+Reemplaza los print() de depuración por mensajes del logger
+'planning.diagnostico'. Por defecto está apagado y no hace ningún trabajo:
+los mensajes se formatean solo si se emiten (estilo logging, con %s) y los
+valores que requieren consultas se envuelven en perezoso() o en un bloque
+`if diagnostico_activo():`.
+
+Se activa:
+- para todo el sistema con el setting PLANNING_DIAGNOSTICO = True
+- para un request con el parámetro ?debug=1 o el header X-Planning-Debug: 1
+  (requiere DiagnosticoMiddleware y PLANNING_DIAGNOSTICO_POR_REQUEST, que por
+  defecto sigue a DEBUG)
+
+Los mensajes se emiten con nivel DEBUG; ver LOGGING en gestion/settings.py.
+"""
+
+import logging
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+logger = logging.getLogger('planning.diagnostico')
+
+# Diagnóstico activado para el request en curso (lo fija DiagnosticoMiddleware)
+_activo_en_request = ContextVar('planning_diagnostico', default=False)
+
+
+def diagnostico_activo():
+    """Retorna True si se deben emitir los mensajes de diagnóstico"""
+    return _activo_en_request.get() or getattr(settings, 'PLANNING_DIAGNOSTICO', False)
+
+
+def debug(mensaje, *args):
+    """
+    Registrar un mensaje de diagnóstico
+
+    Igual que logger.debug: los argumentos se formatean con %s solo si el
+    mensaje se emite. No hace nada si el diagnóstico no está activo.
+    """
+    if diagnostico_activo():
+        logger.debug(mensaje, *args)
+
+
+class perezoso:
+    """
+    Valor que se calcula solo al formatear el mensaje
+
+    Para argumentos que requieren consultas o recorrer datos, ej:
+        debug('Personas: %s', perezoso(lambda: personas_qs.count()))
+    """
+
+    def __init__(self, funcion):
+        self.funcion = funcion
+
+    def __str__(self):
+        return str(self.funcion())
+
+    __repr__ = __str__
+
+
+class DiagnosticoMiddleware:
+    """Activar el diagnóstico solo para los requests que lo piden"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'PLANNING_DIAGNOSTICO_POR_REQUEST', settings.DEBUG):
+            return self.get_response(request)
+
+        activo = request.GET.get('debug') == '1' or request.headers.get('X-Planning-Debug') == '1'
+        token = _activo_en_request.set(activo)
+        try:
+            return self.get_response(request)
+        finally:
+            _activo_en_request.reset(token)
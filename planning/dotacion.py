@@ -0,0 +1,252 @@
+"""
+Dotación diaria por faena y cargo
+
+Para planificar camas de campamento, buses y alimentación se necesita, por
+cada faena y cada día de un mes o un año, cuántas personas de cada cargo
+están trabajando, descansando o con licencia/ausentismo.
+
+El cálculo usa las mismas reglas que el calendario (planning.estados) pero
+sin armar celdas por persona:
+
+1. Cuatro consultas en bloque para todo el rango: asignaciones con su
+   turno, licencias y ausentismos de las personas asignadas y el cargo
+   vigente de cada persona (InfoLaboral.objects.cargos_vigentes).
+2. El motor de turnos (planning.turnos) calcula las máscaras de trabajo y
+   descanso de cada asignación; las asignaciones de una misma persona en
+   la misma faena se combinan en una fila.
+3. Las licencias y ausentismos se convierten en máscaras persona × día con
+   arreglos de diferencias (sin recorrer día por día).
+4. Cada celda par × día recibe su categoría y un solo np.bincount cuenta
+   las celdas por (faena, cargo), día y categoría.
+
+Categorías de cada persona en cada día cubierto por su asignación:
+- licencia: tiene una licencia médica o un ausentismo (vacaciones, permiso
+  u otra ausencia)
+- trabajando: día de trabajo del turno, sin licencia ni ausentismo
+- descansando: día de descanso del turno o ausentismo de tipo descanso
+
+Una persona asignada a dos faenas el mismo día se cuenta en ambas.
+"""
+
+import numpy as np
+from django.db.models import Q
+
+from core.models import Ausentismo, InfoLaboral, LicenciaMedicaPorPersonal, PersonalFaena, fin_asignacion
+
+from .estados import clasificar_ausentismo
+from .turnos import calcular_mascaras
+
+
+SIN_CARGO = 'Sin cargo asignado'
+
+# Categorías de la dotación, en el orden de la respuesta
+CATEGORIAS = ('trabajando', 'descansando', 'licencia')
+
+# Campos que se leen de cada asignación
+CAMPOS_DOTACION = (
+    'personal_id', 'faena_id', 'faena__nombre', 'fecha_inicio', 'faena__fecha_fin',
+    'tipo_turno__dias_trabajo', 'tipo_turno__dias_descanso',
+    'faena__tipo_turno__dias_trabajo', 'faena__tipo_turno__dias_descanso', 'fecha_termino',
+)
+
+
+def mascara_intervalos(filas, inicios, fines, n_filas, desde, n_dias):
+    """
+    Máscara fila × día de una lista de intervalos de fechas (inclusive)
+
+    Cada intervalo suma 1 en su primer día y resta 1 el día siguiente al
+    último; la suma acumulada por fila es positiva en los días cubiertos.
+
+    Parámetros:
+    - filas: fila del resultado de cada intervalo
+    - inicios, fines: fechas de cada intervalo
+    - n_filas, n_dias: dimensiones del resultado (la columna 0 es `desde`)
+    """
+    base = desde.toordinal()
+    filas = np.asarray(filas, dtype=np.int64)
+    inicio = np.fromiter((f.toordinal() for f in inicios), dtype=np.int64, count=len(filas)) - base
+    fin = np.fromiter((f.toordinal() for f in fines), dtype=np.int64, count=len(filas)) - base
+    inicio = np.clip(inicio, 0, n_dias)
+    fin = np.clip(fin + 1, 0, n_dias)
+
+    # Posición plana de cada marca en la matriz fila × (n_dias + 1)
+    ancho = n_dias + 1
+    total = n_filas * ancho
+    diferencias = (
+        np.bincount(filas * ancho + inicio, minlength=total)
+        - np.bincount(filas * ancho + fin, minlength=total)
+    ).reshape(n_filas, ancho)
+    return np.cumsum(diferencias[:, :-1], axis=1) > 0
+
+
+def _agrupar(claves):
+    """
+    Ordenar claves enteras y ubicar el inicio de cada grupo de claves iguales
+
+    Retorna: (orden, inicios, claves únicas); claves no debe estar vacío
+    """
+    orden = np.argsort(claves, kind='stable')
+    ordenadas = claves[orden]
+    inicios = np.flatnonzero(np.r_[True, ordenadas[1:] != ordenadas[:-1]])
+    return orden, inicios, ordenadas[inicios]
+
+
+def _combinar_filas(mascaras, orden, inicios):
+    """
+    OR lógico de las filas de cada grupo de _agrupar, una fila por grupo
+
+    Casi todos los grupos tienen una sola fila: se copian tal cual y solo
+    las filas restantes de los grupos repetidos se combinan con np.logical_or.at.
+    """
+    primeras = orden[inicios]
+    resultado = [mascara[primeras] for mascara in mascaras]
+    restantes = np.ones(len(orden), dtype=bool)
+    restantes[inicios] = False
+    if restantes.any():
+        grupo = np.cumsum(~restantes)[restantes] - 1
+        for combinada, mascara in zip(resultado, mascaras):
+            np.logical_or.at(combinada, grupo, mascara[orden[restantes]])
+    return resultado
+
+
+def calcular_dotacion(desde, hasta, faena_ids=None):
+    """
+    Calcular la dotación diaria de cada faena por cargo
+
+    Parámetros:
+    - desde, hasta: rango de fechas (inclusive)
+    - faena_ids: limitar el cálculo a estas faenas (por defecto todas)
+
+    Retorna: lista ordenada por nombre de faena de dicts con
+    - faena_id, nombre
+    - cargos: lista de {cargo, trabajando, descansando, licencia}, donde
+      cada categoría es una lista con la cantidad de personas por día
+    - total: {trabajando, descansando, licencia} sumando todos los cargos
+    Solo se incluyen las faenas y cargos con alguna persona en el rango.
+    """
+    n_dias = (hasta - desde).days + 1
+
+    # =============================================================================
+    # CONSULTAS EN BLOQUE
+    # =============================================================================
+
+    asignaciones_qs = PersonalFaena.objects.en_calendario().filter(
+        Q(faena__fecha_fin__isnull=True) | Q(faena__fecha_fin__gte=desde),
+        Q(fecha_termino__isnull=True) | Q(fecha_termino__gte=desde),
+        fecha_inicio__lte=hasta,
+    )
+    if faena_ids is not None:
+        asignaciones_qs = asignaciones_qs.filter(faena_id__in=faena_ids)
+
+    asignaciones = list(asignaciones_qs.values_list(*CAMPOS_DOTACION))
+    if not asignaciones:
+        return []
+
+    personas = asignaciones_qs.values('personal_id')
+    licencias = list(
+        LicenciaMedicaPorPersonal.objects
+        .filter(personal_id__in=personas, fechaEmision__lte=hasta, fecha_fin_licencia__gte=desde)
+        .values_list('personal_id', 'fechaEmision', 'fecha_fin_licencia')
+    )
+    ausentismos = list(
+        Ausentismo.objects
+        .filter(personal_id__in=personas, fechaini__lte=hasta, fechafin__gte=desde)
+        .values_list('personal_id', 'fechaini', 'fechafin', 'tipoausen_id__tipo')
+    )
+    cargos = InfoLaboral.objects.cargos_vigentes(personas)
+
+    # =============================================================================
+    # MÁSCARAS DE TURNO POR PERSONA Y FAENA
+    # =============================================================================
+
+    # Cada asignación usa el turno específico de la persona o, si no tiene, el de la faena
+    trabajo, descanso = calcular_mascaras(
+        [
+            {
+                'fecha_inicio': fecha_inicio,
+                'dias_trabajo': trabajo_persona or trabajo_faena,
+                'dias_descanso': descanso_persona or descanso_faena,
+                'fecha_fin_faena': fin_asignacion(fecha_fin_faena, fecha_termino),
+            }
+            for (_, _, _, fecha_inicio, fecha_fin_faena,
+                 trabajo_persona, descanso_persona, trabajo_faena, descanso_faena, fecha_termino) in asignaciones
+        ],
+        desde, hasta,
+    )
+
+    personal_ids = np.fromiter((a[0] for a in asignaciones), dtype=np.int64, count=len(asignaciones))
+    faenas = np.fromiter((a[1] for a in asignaciones), dtype=np.int64, count=len(asignaciones))
+
+    # Una fila por par (persona, faena): OR de sus asignaciones
+    personas_unicas, fila_persona = np.unique(personal_ids, return_inverse=True)
+    orden, inicios, pares = _agrupar(faenas * len(personas_unicas) + fila_persona)
+    trabajo, descanso = _combinar_filas((trabajo, descanso), orden, inicios)
+    par_faena = pares // len(personas_unicas)
+    par_persona = pares % len(personas_unicas)
+
+    # =============================================================================
+    # MÁSCARAS DE LICENCIAS Y AUSENTISMOS POR PERSONA
+    # =============================================================================
+
+    # Los registros se consultan solo para las personas asignadas (subconsulta),
+    # así que todas están en personas_unicas
+    def mascara_personas(registros):
+        ids = np.fromiter((r[0] for r in registros), dtype=np.int64, count=len(registros))
+        return mascara_intervalos(
+            np.searchsorted(personas_unicas, ids), [r[1] for r in registros], [r[2] for r in registros],
+            len(personas_unicas), desde, n_dias,
+        )
+
+    # El ausentismo de tipo descanso es un descanso, no una ausencia (igual que en el calendario)
+    descansos = [r for r in ausentismos if clasificar_ausentismo(r[3]) == 'descanso']
+    ausencias = licencias + [r for r in ausentismos if clasificar_ausentismo(r[3]) != 'descanso']
+    ausente = mascara_personas(ausencias)[par_persona]
+    en_descanso = mascara_personas(descansos)[par_persona]
+
+    # =============================================================================
+    # CATEGORÍAS Y SUMA POR FAENA Y CARGO
+    # =============================================================================
+
+    # Categoría de cada par en cada día: 0 fuera de la faena, 1.. según CATEGORIAS
+    cubierto = trabajo | descanso
+    licencia = cubierto & ausente
+    trabajando = trabajo & ~ausente & ~en_descanso
+    descansando = cubierto & ~licencia & ~trabajando
+    categoria = trabajando.view(np.int8) + 2 * descansando.view(np.int8) + 3 * licencia.view(np.int8)
+
+    cargo_persona = [cargos.get(pid) or SIN_CARGO for pid in personas_unicas.tolist()]
+    nombres_cargo = sorted(set(cargo_persona))
+    indices_cargo = {cargo: i for i, cargo in enumerate(nombres_cargo)}
+    cargo_persona = np.array([indices_cargo[cargo] for cargo in cargo_persona], dtype=np.int64)
+    grupos, fila_grupo = np.unique(par_faena * len(nombres_cargo) + cargo_persona[par_persona], return_inverse=True)
+
+    # Conteo grupo × día × categoría con un solo bincount sobre todas las celdas
+    columnas = len(CATEGORIAS) + 1
+    celdas = (fila_grupo[:, None] * n_dias + np.arange(n_dias)) * columnas + categoria
+    conteos = np.bincount(celdas.ravel(), minlength=len(grupos) * n_dias * columnas)
+    conteos = conteos.reshape(len(grupos), n_dias, columnas)[:, :, 1:].transpose(0, 2, 1)
+
+    # Los grupos quedan ordenados por faena: el total de cada faena es una suma por tramos
+    grupo_faena = grupos // len(nombres_cargo)
+    inicios_faena = np.flatnonzero(np.r_[True, grupo_faena[1:] != grupo_faena[:-1]])
+    totales = np.add.reduceat(conteos, inicios_faena, axis=0)
+
+    nombres_faena = {a[1]: a[2] for a in asignaciones}
+    resultado = []
+    for faena_id, cargos_faena, total in zip(
+        grupo_faena[inicios_faena].tolist(),
+        np.split(np.arange(len(grupos)), inicios_faena[1:]),
+        totales.tolist(),
+    ):
+        filas = [
+            {'cargo': nombres_cargo[grupos[i] % len(nombres_cargo)], **dict(zip(CATEGORIAS, conteos[i].tolist()))}
+            for i in cargos_faena if conteos[i].any()
+        ]
+        if filas:
+            resultado.append({
+                'faena_id': faena_id,
+                'nombre': nombres_faena[faena_id],
+                'cargos': filas,
+                'total': dict(zip(CATEGORIAS, total)),
+            })
+    return sorted(resultado, key=lambda faena: (faena['nombre'] or '', faena['faena_id']))
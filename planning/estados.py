@@ -0,0 +1,368 @@
+"""
+Cálculo de estados del calendario de planificación
+
+Arma, para un grupo de personas y un rango de fechas cualquiera, la lista de
+estados de cada persona en cada día (faena, descanso, licencia, ausentismo,
+disponible). Las consultas de licencias, ausentismos y asignaciones se hacen
+una sola vez para todo el rango.
+
+El cálculo tiene dos etapas:
+1. calcular_celdas: estados "crudos" de cada día como tuplas
+   (estado, tabla_origen, registro_origen), más los registros de origen.
+   Es lo que se guarda en la tabla materializada RosterDia.
+2. renderizar_estados: convierte las celdas crudas en los dicts que recibe
+   el frontend (color, texto, prioridad y detalles del registro de origen).
+"""
+
+from datetime import timedelta
+
+from core.models import (
+    Ausentismo,
+    LicenciaMedicaPorPersonal,
+    PersonalFaena,
+    fin_asignacion,
+)
+
+from .diagnostico import debug, diagnostico_activo
+from .turnos import calcular_roster
+from .intervalos import IndiceIntervalos
+
+
+# Máxima cantidad de días que se puede consultar en una sola llamada
+MAX_DIAS_RANGO = 366
+
+# Tablas de origen de cada estado
+TABLA_ASIGNACION = 'PersonalFaena'
+TABLA_AUSENTISMO = 'Ausentismo'
+TABLA_LICENCIA = 'LicenciaMedicaPorPersonal'
+
+# Campos que se leen de cada tabla de origen
+CAMPOS_ASIGNACION = (
+    'personal_faena_id', 'personal_id', 'faena_id', 'faena__nombre', 'fecha_inicio', 'faena__fecha_fin', 'fecha_termino',
+    'tipo_turno__dias_trabajo', 'tipo_turno__dias_descanso', 'faena__tipo_turno__dias_trabajo',
+    'faena__tipo_turno__dias_descanso', 'faena__tipo_turno__nombre',
+)
+CAMPOS_AUSENTISMO = ('ausentismo_id', 'personal_id', 'fechaini', 'fechafin', 'tipoausen_id__tipo')
+CAMPOS_LICENCIA = ('licenciaMedicaPorPersonal_id', 'personal_id', 'fechaEmision', 'fecha_fin_licencia')
+
+# Presentación de cada estado: (color, texto, prioridad)
+# Prioridad 1: Estados base (disponible, en faena, descanso) - Se muestran ARRIBA
+# Prioridad 2: Estados secundarios (turno, vacaciones, permiso) - Se muestran ABAJO
+# Prioridad 3: Estados de alta prioridad (licencia médica) - Se muestran AL FINAL
+PLANTILLAS_ESTADO = {
+    'en_faena': ('celeste', 'Faena', 1),
+    'descanso': ('verde', 'Descanso', 1),
+    'licencia': ('salmon', 'Licencia', 3),
+    'vacaciones': ('amarillo', 'Vac', 2),
+    'permiso': ('naranjo', 'Perm', 2),
+    'ausencia': ('gris', None, 2),  # El texto es el nombre del tipo de ausentismo
+}
+
+
+def clasificar_ausentismo(tipo):
+    """Retorna el estado del calendario que corresponde a un tipo de ausentismo"""
+    tipo = (tipo or '').lower()
+    if 'vacacion' in tipo:
+        return 'vacaciones'
+    if 'descanso' in tipo:
+        # El descanso es un estado base (prioridad 1), no un ausentismo secundario
+        return 'descanso'
+    if 'permiso' in tipo:
+        return 'permiso'
+    return 'ausencia'
+
+
+def fecha_en_espanol(fecha):
+    """Formatear una fecha como '05 de agosto de 2025' (según el locale configurado)"""
+    return fecha.strftime('%d de %B de %Y') if fecha else 'No especificada'
+
+
+def rango_detalle(asignacion):
+    """
+    Rango en que se muestra el detalle de una asignación:
+    3 ciclos del turno específico de la persona (o 30 días si no tiene),
+    sin pasar la fecha fin de la faena ni la de término de la asignación
+    """
+    fecha_inicio = asignacion['fecha_inicio']
+    if asignacion['tipo_turno__dias_trabajo'] and asignacion['tipo_turno__dias_descanso']:
+        dias_ciclo = asignacion['tipo_turno__dias_trabajo'] + asignacion['tipo_turno__dias_descanso']
+        fecha_fin = fecha_inicio + timedelta(days=dias_ciclo * 3)  # 3 ciclos como máximo
+    else:
+        fecha_fin = fecha_inicio + timedelta(days=30)
+    fin = fin_asignacion(asignacion['faena__fecha_fin'], asignacion['fecha_termino'])
+    if fin:
+        fecha_fin = min(fecha_fin, fin)
+    return fecha_inicio, fecha_fin
+
+
+def cargar_origenes(asignacion_ids=(), ausentismo_ids=(), licencia_ids=()):
+    """Cargar por ID los registros de origen de un conjunto de estados"""
+    return {
+        TABLA_ASIGNACION: {
+            a['personal_faena_id']: a
+            for a in PersonalFaena.objects.filter(personal_faena_id__in=asignacion_ids).values(*CAMPOS_ASIGNACION)
+        } if asignacion_ids else {},
+        TABLA_AUSENTISMO: {
+            a['ausentismo_id']: a
+            for a in Ausentismo.objects.filter(ausentismo_id__in=ausentismo_ids).values(*CAMPOS_AUSENTISMO)
+        } if ausentismo_ids else {},
+        TABLA_LICENCIA: {
+            l['licenciaMedicaPorPersonal_id']: l
+            for l in LicenciaMedicaPorPersonal.objects.filter(licenciaMedicaPorPersonal_id__in=licencia_ids).values(*CAMPOS_LICENCIA)
+        } if licencia_ids else {},
+    }
+
+
+def calcular_celdas(personas, desde, hasta):
+    """
+    Calcular los estados crudos de cada persona para cada día del rango
+
+    Parámetros:
+    - personas: QuerySet de Personal a consultar (se usa como subconsulta)
+    - desde, hasta: rango de fechas (inclusive)
+
+    Retorna: dict con
+    - 'persona_ids': IDs de las personas, en el orden del QuerySet
+    - 'celdas': {personal_id: [lista de (estado, tabla_origen, registro_origen) por día]}
+    - 'origenes': {tabla_origen: {registro_origen: registro}}
+
+    Los estados de cada día quedan en orden de aplicación: faena, descanso,
+    licencias y ausentismos. Un día sin estados es "disponible".
+    """
+    n_dias = (hasta - desde).days + 1
+    persona_ids = list(personas.values_list('personal_id', flat=True))
+    celdas = {pid: [[] for _ in range(n_dias)] for pid in persona_ids}
+
+    # Helper para iterar sobre los índices de un rango de fechas respetando los límites consultados
+    def iter_days(start, end):
+        return range(max((start - desde).days, 0), min((end - desde).days, n_dias - 1) + 1)
+
+    # =============================================================================
+    # CARGAR LICENCIAS MÉDICAS Y AUSENTISMOS DEL RANGO
+    # =============================================================================
+
+    # Obtener licencias médicas que se superponen con el rango consultado
+    licencias = (
+        LicenciaMedicaPorPersonal.objects
+        .filter(
+            personal_id__in=personas,
+            fechaEmision__lte=hasta,
+            fecha_fin_licencia__gte=desde,
+        )
+        .values(*CAMPOS_LICENCIA)
+    )
+
+    # Obtener ausentismos (vacaciones, permisos, etc.) que se superponen con el rango
+    ausentismos = (
+        Ausentismo.objects
+        .filter(
+            personal_id__in=personas,
+            fechaini__lte=hasta,
+            fechafin__gte=desde,
+        )
+        .values(*CAMPOS_AUSENTISMO)
+    )
+
+    # =============================================================================
+    # CARGAR ASIGNACIONES DE FAENA (ESTADO BASE)
+    # =============================================================================
+
+    # Consulta optimizada para obtener todas las asignaciones de faena del rango
+    # Incluye información de turnos tanto de la persona como de la faena
+    asignaciones_faena = list(
+        PersonalFaena.objects
+        .en_calendario(
+            personal_id__in=personas,
+            fecha_inicio__lte=hasta
+        )
+        .values(*CAMPOS_ASIGNACION)
+    )
+
+    if diagnostico_activo():
+        debug("asignaciones_faena encontradas: %s", len(asignaciones_faena))
+        for a in asignaciones_faena:
+            debug(
+                "Asignación - Personal: %s, Faena: %s, Fecha inicio: %s, Fecha fin faena: %s",
+                a['personal_id'], a['faena__nombre'], a['fecha_inicio'], a['faena__fecha_fin'],
+            )
+
+    # =============================================================================
+    # CALCULAR DÍAS DE TRABAJO Y DESCANSO (MOTOR VECTORIZADO)
+    # =============================================================================
+
+    # Cada asignación usa el turno específico de la persona o, si no tiene, el de la faena.
+    # El motor calcula de una vez la matriz persona × día de trabajo y descanso,
+    # respetando la fecha de inicio de la asignación y su último día (fin de la faena o término).
+    filas_turno = [
+        {
+            'personal_id': a['personal_id'],
+            'fecha_inicio': a['fecha_inicio'],
+            'dias_trabajo': a['tipo_turno__dias_trabajo'] or a['faena__tipo_turno__dias_trabajo'],
+            'dias_descanso': a['tipo_turno__dias_descanso'] or a['faena__tipo_turno__dias_descanso'],
+            'fecha_fin_faena': fin_asignacion(a['faena__fecha_fin'], a['fecha_termino']),
+        }
+        for a in asignaciones_faena
+    ]
+    roster = calcular_roster(filas_turno, persona_ids, desde, hasta)
+
+    # Convertir las máscaras a listas de Python para accesos rápidos por celda
+    dias_en_faena = roster['trabajo'].tolist()
+    dias_de_descanso = roster['descanso'].tolist()
+    filas_personas = roster['filas']
+
+    # La asignación cuyo detalle se muestra en cada día se indexa por su rango
+    # efectivo (ver rango_detalle). Cada celda la busca en O(log n).
+    indice_asignaciones = IndiceIntervalos(
+        (a['personal_id'], *rango_detalle(a), a['personal_faena_id'])
+        for a in asignaciones_faena
+    )
+
+    # Aplicar estados base por día: en faena y descanso del turno
+    fechas = [desde + timedelta(days=i) for i in range(n_dias)]
+    for pid, dias in celdas.items():
+        fila = filas_personas[pid]
+        en_faena_persona = dias_en_faena[fila]
+        en_descanso_persona = dias_de_descanso[fila]
+        for i, estados in enumerate(dias):
+            if en_faena_persona[i]:
+                estados.append(('en_faena', TABLA_ASIGNACION, indice_asignaciones.buscar(pid, fechas[i])))
+            if en_descanso_persona[i]:
+                estados.append(('descanso', TABLA_ASIGNACION, indice_asignaciones.buscar(pid, fechas[i])))
+
+    # Aplicar licencias médicas (se superponen a la faena y turno)
+    for l in licencias:
+        if l['personal_id'] in celdas:
+            estado = ('licencia', TABLA_LICENCIA, l['licenciaMedicaPorPersonal_id'])
+            for i in iter_days(l['fechaEmision'], l['fecha_fin_licencia']):
+                celdas[l['personal_id']][i].append(estado)
+
+    # Aplicar ausentismos (se superponen a la faena)
+    for a in ausentismos:
+        if a['personal_id'] in celdas:
+            estado = (clasificar_ausentismo(a['tipoausen_id__tipo']), TABLA_AUSENTISMO, a['ausentismo_id'])
+            for i in iter_days(a['fechaini'], a['fechafin']):
+                celdas[a['personal_id']][i].append(estado)
+
+    return {
+        'persona_ids': persona_ids,
+        'celdas': celdas,
+        'origenes': {
+            TABLA_ASIGNACION: {a['personal_faena_id']: a for a in asignaciones_faena},
+            TABLA_AUSENTISMO: {a['ausentismo_id']: a for a in ausentismos},
+            TABLA_LICENCIA: {l['licenciaMedicaPorPersonal_id']: l for l in licencias},
+        },
+    }
+
+
+def renderizar_estados(persona_ids, celdas, origenes, claves):
+    """
+    Convertir estados crudos en los dicts de estado que recibe el frontend
+
+    Parámetros:
+    - persona_ids: IDs de las personas del resultado
+    - celdas: {personal_id: [estados crudos por día]} (personas sin entrada: todo disponible)
+    - origenes: registros de origen por tabla (ver calcular_celdas)
+    - claves: clave de cada día en el resultado
+
+    Retorna: dict {personal_id (str): {clave_dia: [estados]}}
+    """
+    # Los detalles se arman una sola vez por registro de origen
+    detalles = {}
+
+    def detalle(tabla, registro_id):
+        clave = (tabla, registro_id)
+        if clave in detalles:
+            return detalles[clave]
+        registro = origenes[tabla].get(registro_id) if registro_id is not None else None
+        if registro is None:
+            info = None
+        elif tabla == TABLA_ASIGNACION:
+            info = {
+                'faena_id': registro['faena_id'],
+                'faena_nombre': registro['faena__nombre'],
+                'fecha_inicio': fecha_en_espanol(registro['fecha_inicio']),
+                'turno': f"{registro['tipo_turno__dias_trabajo']}x{registro['tipo_turno__dias_descanso']}" if registro['tipo_turno__dias_trabajo'] and registro['tipo_turno__dias_descanso'] else registro['faena__tipo_turno__nombre'] or 'Turno no especificado'
+            }
+        elif tabla == TABLA_LICENCIA:
+            info = {
+                'fecha_inicio': fecha_en_espanol(registro['fechaEmision']),
+                'fecha_fin': fecha_en_espanol(registro['fecha_fin_licencia']),
+                'tipo': 'Licencia Médica'
+            }
+        else:
+            info = {
+                'fecha_inicio': fecha_en_espanol(registro['fechaini']),
+                'fecha_fin': fecha_en_espanol(registro['fechafin']),
+                'tipo': registro['tipoausen_id__tipo']
+            }
+        detalles[clave] = info
+        return info
+
+    def estado_dict(estado, tabla, registro_id):
+        color, texto, prioridad = PLANTILLAS_ESTADO[estado]
+        if texto is None:
+            texto = origenes[tabla][registro_id]['tipoausen_id__tipo']
+        return {
+            'tipo': estado,
+            'color': color,
+            'texto': texto,
+            'prioridad': prioridad,
+            'detalles': detalle(tabla, registro_id)
+        }
+
+    results = {}
+    for pid in persona_ids:
+        dias = celdas.get(pid)
+        results[str(pid)] = por_dia = {}
+        for i, clave in enumerate(claves):
+            crudos = dias[i] if dias else ()
+            if not crudos:
+                # Sin otros estados la persona está disponible
+                por_dia[clave] = [{
+                    'tipo': 'disponible',
+                    'color': 'gris',
+                    'texto': 'Disp',
+                    'prioridad': 1
+                }]
+                continue
+
+            # Ordenar estados por prioridad (menor número = mayor prioridad visual)
+            # Esto determina el orden en que se muestran los estados en el calendario
+            estados = [estado_dict(*crudo) for crudo in crudos]
+            estados.sort(key=lambda x: x['prioridad'])
+            por_dia[clave] = estados
+    return results
+
+
+def calcular_estados(personas, desde, hasta, clave_dia=None):
+    """
+    Calcular los estados de cada persona para cada día del rango
+
+    Parámetros:
+    - personas: QuerySet de Personal a consultar (se usa como subconsulta)
+    - desde, hasta: rango de fechas (inclusive)
+    - clave_dia: función fecha → clave del día en el resultado
+      (por defecto la fecha en formato ISO)
+
+    Retorna: dict {personal_id (str): {clave_dia: [estados]}}
+    """
+    calculo = calcular_celdas(personas, desde, hasta)
+    results = renderizar_estados(
+        calculo['persona_ids'], calculo['celdas'], calculo['origenes'], claves_rango(desde, hasta, clave_dia),
+    )
+
+    if diagnostico_activo():
+        debug("resultados para %s personas", len(results))
+        for pid, days in results.items():
+            # Mostrar algunos ejemplos de estados (solo primeros 3 días para no saturar)
+            for day, estados in list(days.items())[:3]:
+                debug("    Persona %s, Día %s: %s", pid, day, [estado['tipo'] for estado in estados])
+
+    return results
+
+
+def claves_rango(desde, hasta, clave_dia=None):
+    """Claves de los días de un rango (por defecto la fecha en formato ISO)"""
+    if clave_dia is None:
+        clave_dia = lambda fecha: fecha.isoformat()
+    return [clave_dia(desde + timedelta(days=i)) for i in range((hasta - desde).days + 1)]
@@ -0,0 +1,109 @@
+"""
+Índice de intervalos por persona
+
+Permite responder "qué registro cubre el día d para la persona p" con una
+búsqueda binaria, en lugar de recorrer todas las asignaciones en cada celda
+del calendario.
+
+superposiciones encuentra, con un barrido ordenado, todos los pares de
+intervalos de una misma persona que se superponen (ver planning.conflictos).
+"""
+
+import heapq
+from bisect import bisect_right
+
+
+class IndiceIntervalos:
+    """
+    Índice ordenado de intervalos de fechas por persona
+
+    Se construye con tuplas (personal_id, inicio, fin, valor), donde inicio y
+    fin son fechas inclusive. Cuando varios intervalos de una misma persona se
+    superponen, gana el que aparece primero en la entrada (el mismo criterio
+    que recorrer la lista y quedarse con la primera coincidencia).
+
+    Internamente cada persona queda con una lista de tramos disjuntos y
+    ordenados, por lo que cada consulta es O(log n).
+    """
+
+    def __init__(self, intervalos):
+        por_persona = {}
+        for personal_id, inicio, fin, valor in intervalos:
+            if inicio is None or fin is None or fin < inicio:
+                continue
+            por_persona.setdefault(personal_id, []).append((inicio.toordinal(), fin.toordinal(), valor))
+
+        self._tramos = {
+            personal_id: self._segmentar(lista)
+            for personal_id, lista in por_persona.items()
+        }
+
+    @staticmethod
+    def _segmentar(intervalos):
+        """Convertir intervalos superpuestos en tramos disjuntos (inicios, fines, valores)"""
+        if len(intervalos) == 1:
+            inicio, fin, valor = intervalos[0]
+            return [inicio], [fin], [valor]
+
+        bordes = sorted({inicio for inicio, _, _ in intervalos} | {fin + 1 for _, fin, _ in intervalos})
+        inicios, fines, valores = [], [], []
+        anterior = None
+        for desde, hasta in zip(bordes, bordes[1:]):
+            # El ganador es constante dentro de cada tramo elemental
+            ganador = next(
+                (i for i, (inicio, fin, _) in enumerate(intervalos) if inicio <= desde <= fin),
+                None,
+            )
+            if ganador is None:
+                continue
+            # Unir con el tramo anterior si es contiguo y del mismo intervalo
+            if ganador == anterior and fines[-1] == desde - 1:
+                fines[-1] = hasta - 1
+            else:
+                inicios.append(desde)
+                fines.append(hasta - 1)
+                valores.append(intervalos[ganador][2])
+            anterior = ganador
+        return inicios, fines, valores
+
+    def buscar(self, personal_id, fecha):
+        """Retornar el valor del intervalo que cubre `fecha` para la persona, o None"""
+        tramos = self._tramos.get(personal_id)
+        if not tramos:
+            return None
+        inicios, fines, valores = tramos
+        ordinal = fecha.toordinal()
+        i = bisect_right(inicios, ordinal) - 1
+        if i >= 0 and ordinal <= fines[i]:
+            return valores[i]
+        return None
+
+
+def superposiciones(intervalos):
+    """
+    Pares de intervalos superpuestos de una misma persona (barrido ordenado)
+
+    Los intervalos se recorren ordenados por persona e inicio. Se mantienen
+    abiertos (en un heap por fin) los que todavía pueden superponerse con los
+    siguientes: cada intervalo nuevo descarta los que terminaron antes de su
+    inicio y se compara solo con los que quedan. El costo es O(n log n) más
+    la cantidad de pares encontrados.
+
+    Parámetros:
+    - intervalos: tuplas (personal_id, inicio, fin, valor) con inicio y fin
+      inclusive, comparables entre sí (fechas u ordinales)
+
+    Retorna: generador de (personal_id, desde, hasta, valor_a, valor_b) por
+    cada par superpuesto, donde desde/hasta es la superposición y el
+    intervalo de valor_a empieza antes (o el mismo día)
+    """
+    abiertos = []  # (fin, orden, inicio, valor) de la persona actual
+    persona = None
+    for orden, (personal_id, inicio, fin, valor) in enumerate(sorted(intervalos, key=lambda i: (i[0], i[1]))):
+        if personal_id != persona:
+            abiertos, persona = [], personal_id
+        while abiertos and abiertos[0][0] < inicio:
+            heapq.heappop(abiertos)
+        for fin_abierto, _, _, valor_abierto in abiertos:
+            yield personal_id, inicio, min(fin, fin_abierto), valor_abierto, valor
+        heapq.heappush(abiertos, (fin, orden, inicio, valor))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from planning.archivo_auditoria import TAMANO_LOTE, archivar, directorio_archivo, horizonte_dias
+
+
+class Command(BaseCommand):
+    help = (
+        'Mueve los logs de auditoría más antiguos que el horizonte a archivos mensuales '
+        'comprimidos (JSONL + gzip), que get_audit_logs sigue leyendo'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias', type=int, default=None,
+            help=f'Días de logs que se mantienen en la tabla (default: {horizonte_dias()})',
+        )
+        parser.add_argument(
+            '--directorio', default=None,
+            help=f'Directorio de los archivos (default: {directorio_archivo()})',
+        )
+        parser.add_argument(
+            '--lote', type=int, default=TAMANO_LOTE,
+            help=f'Cantidad de logs que se archivan por lote (default: {TAMANO_LOTE})',
+        )
+
+    def handle(self, *args, **options):
+        resumen = archivar(
+            horizonte=options['dias'],
+            directorio=options['directorio'],
+            lote=options['lote'],
+            progreso=lambda mensaje: self.stdout.write(mensaje) if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Logs de auditoría archivados: {resumen['archivados']} en {resumen['meses']} meses"
+        ))
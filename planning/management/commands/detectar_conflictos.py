@@ -0,0 +1,53 @@
+import json
+from calendar import monthrange
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from planning.conflictos import TIPOS_CONFLICTO, detectar_conflictos
+
+
+class Command(BaseCommand):
+    help = (
+        'Lista las personas programadas para trabajar estando con licencia, con ausentismo '
+        'o en dos faenas a la vez, para todo el personal en un rango de fechas'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=date.fromisoformat, help='Primer día (default: inicio del mes actual)')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='Último día (default: fin del mes de --desde)')
+        parser.add_argument('--json', help='Guardar el reporte en este archivo JSON')
+
+    def handle(self, *args, **options):
+        desde = options['desde'] or timezone.localdate().replace(day=1)
+        hasta = options['hasta'] or desde.replace(day=monthrange(desde.year, desde.month)[1])
+        if hasta < desde:
+            raise CommandError('La fecha hasta no puede ser anterior a la fecha desde')
+
+        resultado = detectar_conflictos(desde, hasta)
+
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as archivo:
+                json.dump(
+                    {'desde': desde, 'hasta': hasta, **resultado}, archivo,
+                    cls=DjangoJSONEncoder, ensure_ascii=False, indent=2,
+                )
+
+        for c in resultado['conflictos']:
+            if c['tipo'] == 'licencia':
+                detalle = f"licencia {c['licencia_id']}"
+            elif c['tipo'] == 'ausentismo':
+                detalle = f"ausentismo {c['ausentismo_id']} ({c['tipo_ausentismo']})"
+            else:
+                detalle = f"también en {c['otra_faena']}"
+            self.stdout.write(
+                f"{c['desde']} a {c['hasta']} ({c['dias']} días)  {c['rut']} {c['nombre']}  "
+                f"{c['faena']}: {c['tipo']}, {detalle}"
+            )
+
+        resumen = ', '.join(f"{tipo}: {resultado['resumen'][tipo]}" for tipo in TIPOS_CONFLICTO)
+        self.stdout.write(self.style.SUCCESS(
+            f"Conflictos entre {desde} y {hasta}: {len(resultado['conflictos'])} ({resumen})"
+        ))
@@ -0,0 +1,42 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from planning.datos_sinteticos import FECHA_BASE, SEMILLA, generar, limpiar
+
+
+class Command(BaseCommand):
+    help = 'Genera datos sintéticos deterministas (personal, faenas, asignaciones, ausentismos, licencias y logs) para pruebas de carga'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--escala', type=int, default=1,
+            help='Unidades de 100 personas y 2 faenas (default: 1; 100 = 10.000 personas)',
+        )
+        parser.add_argument(
+            '--semilla', type=int, default=SEMILLA,
+            help=f'Semilla del generador aleatorio (default: {SEMILLA})',
+        )
+        parser.add_argument(
+            '--fecha-base', type=date.fromisoformat, default=FECHA_BASE,
+            help=f'Fecha en torno a la que se reparten los registros, YYYY-MM-DD (default: {FECHA_BASE})',
+        )
+        parser.add_argument(
+            '--limpiar', action='store_true',
+            help='Solo borrar los datos sintéticos generados antes',
+        )
+
+    def handle(self, *args, **options):
+        if options['limpiar']:
+            cantidad = limpiar()
+            self.stdout.write(self.style.SUCCESS(f'Datos sintéticos borrados: {cantidad} personas'))
+            return
+
+        resumen = generar(
+            escala=options['escala'],
+            semilla=options['semilla'],
+            fecha_base=options['fecha_base'],
+            progreso=self.stdout.write,
+        )
+        detalle = ', '.join(f'{cantidad} {modelo}' for modelo, cantidad in resumen.items())
+        self.stdout.write(self.style.SUCCESS(f'Datos sintéticos generados: {detalle}'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from planning.busqueda import indexar
+
+
+class Command(BaseCommand):
+    help = 'Regenera desde cero los términos de búsqueda del personal (tabla PersonalTermino)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=2000,
+            help='Cantidad de términos que se insertan por lote (default: 2000)',
+        )
+
+    def handle(self, *args, **options):
+        total = indexar(lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'Búsqueda de personal indexada: {total} términos'))
@@ -0,0 +1,40 @@
+import json
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from planning.datos_sinteticos import FECHA_BASE, SEMILLA
+from planning.rendimiento import DURACION, ESCRITORES, LECTORES, formatear_concurrencia, medir_concurrencia
+
+
+class Command(BaseCommand):
+    help = 'Mide lecturas y escrituras simultáneas sobre SQLite con y sin el perfil de conexión (WAL, busy_timeout, etc.)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', type=int, default=1, help='Escala de los datos sintéticos (default: 1)')
+        parser.add_argument('--lectores', type=int, default=LECTORES, help=f'Hilos lectores (default: {LECTORES})')
+        parser.add_argument('--escritores', type=int, default=ESCRITORES, help=f'Hilos escritores (default: {ESCRITORES})')
+        parser.add_argument(
+            '--duracion', type=float, default=DURACION,
+            help=f'Segundos de medición por perfil (default: {DURACION})',
+        )
+        parser.add_argument('--semilla', type=int, default=SEMILLA)
+        parser.add_argument('--fecha-base', type=date.fromisoformat, default=FECHA_BASE)
+        parser.add_argument('--json', help='Guardar los resultados en este archivo JSON')
+
+    def handle(self, *args, **options):
+        resultados = medir_concurrencia(
+            escala=options['escala'],
+            lectores=options['lectores'],
+            escritores=options['escritores'],
+            duracion=options['duracion'],
+            semilla=options['semilla'],
+            fecha_base=options['fecha_base'],
+            progreso=lambda mensaje: self.stderr.write(mensaje),
+        )
+
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, ensure_ascii=False, indent=2)
+
+        self.stdout.write(formatear_concurrencia(resultados))
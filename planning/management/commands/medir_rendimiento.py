@@ -0,0 +1,45 @@
+import json
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from planning.datos_sinteticos import FECHA_BASE, SEMILLA
+from planning.rendimiento import ESCALAS, REPETICIONES, formatear_tabla, medir_escalas
+
+
+class Command(BaseCommand):
+    help = 'Mide latencia, consultas y memoria de las APIs del calendario sobre datos sintéticos a distintas escalas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--escalas', type=int, nargs='+', default=list(ESCALAS),
+            help='Escalas a medir (default: 1 10 100)',
+        )
+        parser.add_argument(
+            '--repeticiones', type=int, default=REPETICIONES,
+            help=f'Repeticiones por escenario para la mediana (default: {REPETICIONES})',
+        )
+        parser.add_argument('--semilla', type=int, default=SEMILLA)
+        parser.add_argument('--fecha-base', type=date.fromisoformat, default=FECHA_BASE)
+        parser.add_argument('--json', help='Guardar los resultados en este archivo JSON')
+        parser.add_argument('--base', help='Comparar con los resultados guardados en este archivo JSON')
+
+    def handle(self, *args, **options):
+        base = None
+        if options['base']:
+            with open(options['base'], encoding='utf-8') as archivo:
+                base = json.load(archivo)
+
+        resultados = medir_escalas(
+            escalas=options['escalas'],
+            repeticiones=options['repeticiones'],
+            semilla=options['semilla'],
+            fecha_base=options['fecha_base'],
+            progreso=lambda mensaje: self.stderr.write(mensaje),
+        )
+
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, ensure_ascii=False, indent=2)
+
+        self.stdout.write(formatear_tabla(resultados, base))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from planning.sqlite import MODOS_JOURNAL, cambiar_modo_journal
+
+
+class Command(BaseCommand):
+    help = (
+        'Cambia el modo del journal de la base de datos SQLite (WAL: los lectores no bloquean al escritor). '
+        'El modo queda guardado en el archivo de la base de datos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('modo', choices=MODOS_JOURNAL)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Base de datos (default: "default")')
+
+    def handle(self, *args, **options):
+        conexion = connections[options['database']]
+        if conexion.vendor != 'sqlite':
+            raise CommandError('El modo del journal es de SQLite')
+        vigente = cambiar_modo_journal(conexion, options['modo'])
+        if vigente != options['modo']:
+            raise CommandError(
+                f'La base de datos sigue en modo {vigente} (¿hay otras conexiones abiertas?)'
+            )
+        self.stdout.write(self.style.SUCCESS(f'Journal en modo {vigente}'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from planning.roster import reconstruir
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye desde cero la tabla materializada RosterDia del calendario de planificación'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=500,
+            help='Cantidad de personas que se recalculan por lote (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        total = reconstruir(lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'RosterDia reconstruido: {total} filas'))
@@ -0,0 +1,262 @@
+"""
+Filtrado y datos del personal del calendario
+
+Comparte el filtro por cargos y faena entre get_personas y get_grid: el
+QuerySet filtrado se usa tanto para armar los datos de cada persona como
+de subconsulta para calcular sus estados, sin ir y volver con listas de IDs.
+
+El personal se ordena en la base de datos por ORDEN_PERSONAL y se puede
+paginar por cursor (keyset): cada página pide las personas que vienen
+después de la última clave (apepat, nombre, personal_id) de la anterior,
+usando el índice personal_orden de Personal, sin OFFSET.
+"""
+
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+
+from core.models import InfoLaboral, Personal, PersonalFaena
+
+from .diagnostico import debug, perezoso
+
+
+# Claves estables del orden del personal (personal_id desempata)
+ORDEN_PERSONAL = ('apepat', 'nombre', 'personal_id')
+MAX_POR_PAGINA = 500
+
+
+def filtrar_personal(cargos_filter, faena_id):
+    """
+    Filtrar el personal activo por cargos y faena
+    
+    Parámetros:
+    - cargos_filter: lista de IDs de cargos (sin cargos no se muestra personal)
+    - faena_id: ID de faena específica, 'sin_asignar' o vacío (todas)
+    
+    Retorna: QuerySet de Personal (sin duplicados, ordenado por ORDEN_PERSONAL)
+    """
+    
+    # =============================================================================
+    # QUERY BASE: OBTENER TODO EL PERSONAL ACTIVO
+    # =============================================================================
+    
+    # Obtener todas las personas activas en el sistema
+    personas_qs = Personal.objects.filter(activo=True)
+    debug("Total de personal activo: %s", perezoso(lambda: personas_qs.count()))
+    
+    # =============================================================================
+    # FILTRADO POR CARGOS (PRIMER FILTRO)
+    # =============================================================================
+    
+    # Aplicar filtro de cargos si se especifican
+    if cargos_filter:
+        # Filtrar por múltiples cargos usando Q objects para OR lógico
+        cargo_filters = Q()
+        for cargo_id in cargos_filter:
+            cargo_filters |= Q(infolaboral__cargo_id=cargo_id)
+        
+        # Aplicar el filtro de cargos
+        personas_qs = personas_qs.filter(cargo_filters)
+        debug("Personas después del filtro de cargos: %s", perezoso(lambda: personas_qs.count()))
+        
+    else:
+        # Si no hay cargos seleccionados, no mostrar personal
+        personas_qs = Personal.objects.none()
+        debug("No hay filtro de cargos: no se mostrará personal")
+    
+    # =============================================================================
+    # FILTRADO POR FAENA (SEGUNDO FILTRO)
+    # =============================================================================
+    
+    # Aplicar filtro de faena si se especifica
+    if faena_id:
+        if faena_id == 'sin_asignar':
+            # Filtrar personas que NO tienen faenas asignadas activas
+            personas_qs = personas_qs.exclude(
+                personalfaena__activo=True
+            )
+            debug("Personas sin asignar: %s", perezoso(lambda: personas_qs.count()))
+        else:
+            # Filtrar personas que SÍ tienen la faena específica asignada
+            personas_qs = personas_qs.filter(
+                personalfaena__faena_id=faena_id,
+                personalfaena__activo=True
+            )
+            debug("Personas después del filtro de faena: %s", perezoso(lambda: personas_qs.count()))
+
+    # =============================================================================
+    # OPTIMIZACIÓN DE QUERY
+    # =============================================================================
+    
+    # Eliminar duplicados, ordenar en la base de datos y traer la comuna en la
+    # misma consulta (select_related() sin argumentos no sigue las FK que
+    # aceptan NULL, como comuna_id)
+    personas_qs = personas_qs.distinct().select_related('comuna_id').order_by(*ORDEN_PERSONAL)
+
+    return personas_qs
+
+
+# =============================================================================
+# PAGINACIÓN POR CURSOR
+# =============================================================================
+
+def codificar_cursor(clave):
+    """Cursor opaco para la clave (apepat, nombre, personal_id) de la última persona de una página"""
+    return base64.urlsafe_b64encode(json.dumps(list(clave)).encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    """
+    Clave (apepat, nombre, personal_id) de un cursor
+
+    Lanza ValueError si el cursor no es válido.
+    """
+    try:
+        apepat, nombre, personal_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeError, TypeError, ValueError):
+        raise ValueError(f'Cursor inválido: {cursor}')
+    if not isinstance(apepat, str) or not isinstance(nombre, str) or not isinstance(personal_id, int):
+        raise ValueError(f'Cursor inválido: {cursor}')
+    return apepat, nombre, personal_id
+
+
+def paginar_personal(personas_qs, despues, limite):
+    """
+    Página de un QuerySet de personal filtrado
+
+    Parámetros:
+    - personas_qs: QuerySet de filtrar_personal
+    - despues: clave (apepat, nombre, personal_id) de la última persona de
+      la página anterior, o None para la primera página
+    - limite: cantidad de personas por página
+
+    Retorna: tupla (QuerySet de la página en orden, cursor de la página
+    siguiente o None si es la última)
+    """
+    if despues:
+        apepat, nombre, personal_id = despues
+        personas_qs = personas_qs.filter(
+            Q(apepat__gt=apepat)
+            | Q(apepat=apepat, nombre__gt=nombre)
+            | Q(apepat=apepat, nombre=nombre, personal_id__gt=personal_id)
+        )
+
+    # Se pide una persona de más para saber si hay otra página
+    claves = list(personas_qs.values_list(*ORDEN_PERSONAL)[:limite + 1])
+    siguiente = codificar_cursor(claves[limite - 1]) if len(claves) > limite else None
+
+    # La página como QuerySet sin LIMIT, para usarla de subconsulta en
+    # serializar_personal y en el cálculo de estados
+    pagina = Personal.objects.filter(
+        personal_id__in=[personal_id for _, _, personal_id in claves[:limite]]
+    ).select_related('comuna_id').order_by(*ORDEN_PERSONAL)
+    return pagina, siguiente
+
+
+def serializar_personal(personas_qs, faena_id):
+    """
+    Construir los datos de cada persona para el frontend
+    
+    Incluye las faenas activas (solo la faena filtrada si se filtra por una),
+    los cargos y los datos personales.
+    
+    Hace una cantidad fija de consultas sin importar cuántas personas haya:
+    personas (con su comuna), asignaciones activas y cargos.
+    
+    Retorna: lista de dicts, en el orden del QuerySet
+    """
+    
+    # =============================================================================
+    # OBTENER INFORMACIÓN DETALLADA DE FAENAS Y CARGOS
+    # =============================================================================
+    
+    # Diccionarios para almacenar información de faenas y cargos por persona
+    faenas_actuales = {}
+    cargos_actuales = {}
+    
+    # =============================================================================
+    # CONSULTA DE ASIGNACIONES DE FAENA
+    # =============================================================================
+    
+    # Si se filtra por faena específica, obtener solo las asignaciones a esa faena
+    if faena_id and faena_id != 'sin_asignar':
+        asignaciones = PersonalFaena.objects.filter(
+            personal_id__in=personas_qs,
+            faena_id=faena_id,
+            activo=True
+        ).values('personal_id', 'faena__nombre', 'faena_id', 'fecha_inicio', 'tipo_turno__nombre', 'faena__tipo_turno__nombre')
+    else:
+        # Si no se filtra por faena o es 'sin_asignar', obtener todas las faenas activas de las personas
+        asignaciones = PersonalFaena.objects.filter(
+            personal_id__in=personas_qs,
+            activo=True
+        ).values('personal_id', 'faena__nombre', 'faena_id', 'fecha_inicio', 'tipo_turno__nombre', 'faena__tipo_turno__nombre')
+    
+    debug("Asignaciones encontradas: %s", perezoso(lambda: list(asignaciones)))
+    
+    # =============================================================================
+    # PROCESAR ASIGNACIONES Y CONSTRUIR INFORMACIÓN DE FAENAS
+    # =============================================================================
+    
+    # Agrupar múltiples faenas por persona
+    for asignacion in asignaciones:
+        personal_id = asignacion['personal_id']
+        if personal_id not in faenas_actuales:
+            faenas_actuales[personal_id] = []
+        
+        # Construir información de la faena con lógica de turno mejorada
+        # Si no hay turno específico asignado, usar el turno de la faena
+        turno_info = asignacion['tipo_turno__nombre'] or asignacion['faena__tipo_turno__nombre'] or 'Turno no especificado'
+        
+        faenas_actuales[personal_id].append({
+            'nombre': asignacion['faena__nombre'],
+            'faena_id': asignacion['faena_id'],
+            'fecha_inicio': asignacion['fecha_inicio'].isoformat() if asignacion['fecha_inicio'] else None,
+            'turno': turno_info
+        })
+    
+    # =============================================================================
+    # OBTENER CARGOS ACTUALES DE CADA PERSONA
+    # =============================================================================
+    
+    # Una sola consulta para los cargos de todas las personas, en el orden
+    # en que se registraron en InfoLaboral
+    cargos_personas = InfoLaboral.objects.filter(
+        personal_id__in=personas_qs
+    ).order_by('personal_id', 'infolab_id').values_list('personal_id', 'cargo_id__cargo')
+    
+    for personal_id, cargo in cargos_personas:
+        cargos_actuales.setdefault(personal_id, []).append(cargo)
+
+    # =============================================================================
+    # CONSTRUIR RESPUESTA FINAL PARA EL FRONTEND
+    # =============================================================================
+    
+    # Lista que contendrá todos los datos de las personas
+    data = []
+    for p in personas_qs:
+        # Obtener faenas y cargo de la persona
+        faenas_persona = faenas_actuales.get(p.personal_id, [])
+        cargos_persona = cargos_actuales.get(p.personal_id)
+        cargo_actual = ', '.join(cargos_persona) if cargos_persona else 'Sin cargo'
+        
+        # Para compatibilidad, mantener faena_actual como string (primera faena)
+        faena_actual = faenas_persona[0]['nombre'] if faenas_persona else None
+        
+        # Construir objeto de datos de la persona
+        data.append({
+            'id': p.personal_id,
+            'nombre': f"{p.nombre} {p.apepat} {p.apemat}",
+            'rut': f"{p.rut}-{p.dvrut}",
+            'faena_actual': faena_actual,
+            'faenas_detalladas': faenas_persona,  # Nueva información detallada
+            'cargo_actual': cargo_actual,
+            'correo': p.correo,
+            'direccion': p.direccion,
+            'comuna_nombre': p.comuna_id.nombre if p.comuna_id else None,
+            'fechanac': p.fechanac
+        })
+
+    return data
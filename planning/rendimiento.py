@@ -0,0 +1,480 @@
+"""
+Medición de rendimiento del calendario de planificación
+
+Mide las APIs principales sobre los datos sintéticos de
+planning.datos_sinteticos a distintas escalas (por defecto 1×, 10× y 100×)
+y reporta por escenario:
+- latencia en frío (caché de estados vacío) y mediana de las repeticiones
+- cantidad de consultas SQL
+- memoria Python máxima asignada durante el request (tracemalloc)
+
+Todo corre sobre una base de datos de pruebas creada para la medición
+(como la de `manage.py test`) y con un caché local propio, así que no toca
+los datos ni el caché reales. Los resultados se pueden guardar en JSON y
+comparar con una medición anterior:
+
+    python manage.py medir_rendimiento --json base.json
+    python manage.py medir_rendimiento --base base.json
+
+medir_concurrencia mide en cambio el rendimiento con varios lectores y
+escritores simultáneos (hilos con su propia conexión, sobre una base de
+datos en archivo), con y sin el perfil de conexión de planning.sqlite:
+
+    python manage.py medir_concurrencia
+"""
+
+import json
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import Count, Q
+from django.test import Client
+from django.test.utils import override_settings
+
+from core.models import AuditLog, Cargo, Faena, Personal, PersonalFaena
+
+from .datos_sinteticos import FECHA_BASE, SEMILLA, generar
+from .sqlite import PRAGMAS_SIN_PERFIL, leer_pragmas, pragmas_configurados
+
+
+ESCALAS = (1, 10, 100)
+REPETICIONES = 5
+
+CACHE_MEDICION = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'planning-rendimiento',
+        'OPTIONS': {'MAX_ENTRIES': 10000000},
+    }
+}
+
+
+@contextmanager
+def base_de_pruebas(archivo=None):
+    """
+    Crear una base de datos de pruebas migrada y destruirla al terminar
+
+    Con SQLite la base de pruebas es en memoria; si se entrega `archivo`
+    se crea en ese archivo (para medir con varias conexiones).
+    """
+    nombre_original = connection.settings_dict['NAME']
+    test_original = connection.settings_dict.get('TEST', {})
+    if archivo:
+        connection.settings_dict['TEST'] = {**test_original, 'NAME': archivo}
+    try:
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(CACHES=CACHE_MEDICION, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                yield
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+    finally:
+        connection.settings_dict['TEST'] = test_original
+
+
+class ContadorConsultas:
+    """
+    Contar las consultas SQL ejecutadas (para connection.execute_wrapper)
+
+    A diferencia de CaptureQueriesContext no depende de connection.queries,
+    que se vacía al comenzar cada request y guarda como máximo 9000 consultas.
+    """
+
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        return execute(sql, params, many, context)
+
+
+# =============================================================================
+# ESCENARIOS
+# =============================================================================
+
+def escenarios(fecha_base):
+    """
+    Escenarios a medir: lista de (nombre, función(client, i) -> response)
+
+    Las funciones reciben el número de repetición para que las escrituras
+    usen cada vez una persona distinta.
+    """
+    # El calendario envía siempre los cargos seleccionados (por defecto todos)
+    cargos = {'cargos[]': list(Cargo.objects.values_list('cargo_id', flat=True))}
+    mes = {**cargos, 'month': fecha_base.month, 'year': fecha_base.year}
+    anio = {'desde': fecha_base.isoformat(), 'hasta': (fecha_base + timedelta(days=364)).isoformat()}
+    # La faena con más personal asignado
+    faena = (
+        Faena.objects
+        .annotate(asignados=Count('personalfaena', filter=Q(personalfaena__activo=True)))
+        .order_by('-asignados', 'faena_id')
+        .first()
+    )
+    personas = list(Personal.objects.order_by('personal_id').values_list('personal_id', flat=True))
+    de_faena = list(PersonalFaena.objects.filter(faena=faena, activo=True).values_list('personal_id', flat=True))
+    ultimo_log = AuditLog.objects.order_by('-log_id').values_list('log_id', flat=True).first() or 0
+    asignadas = list(
+        PersonalFaena.objects.filter(activo=True).order_by('personal_faena_id').values_list('personal_id', 'faena_id')
+    )
+
+    def asignar(client, i):
+        return client.post('/assign_personal_to_faena/', json.dumps({
+            'personal_id': personas[i * 7 % len(personas)],
+            'faena_id': faena.faena_id,
+            'fecha_inicio': faena.fecha_inicio.strftime('%Y-%m-%d'),
+        }), content_type='application/json')
+
+    def remover(client, i):
+        personal_id, faena_id = asignadas[i * 7 % len(asignadas)]
+        return client.post('/remove_personal_from_faena/', json.dumps({
+            'personal_id': personal_id,
+            'faena_id': faena_id,
+        }), content_type='application/json')
+
+    return [
+        ('get_personas', lambda client, i: client.get('/get_personas/', cargos)),
+        ('get_personas (faena)', lambda client, i: client.get('/get_personas/', {**cargos, 'faena_id': faena.faena_id})),
+        ('get_estados (mes)', lambda client, i: client.get('/get_estados/', {**mes, 'personas': ','.join(map(str, personas))})),
+        ('get_estados (faena)', lambda client, i: client.get('/get_estados/', {**mes, 'personas': ','.join(map(str, de_faena))})),
+        ('get_grid (página)', lambda client, i: client.get('/get_grid/', {**mes, 'formato': 'compacto', 'limit': 100})),
+        ('get_dotacion (año)', lambda client, i: client.get('/get_dotacion/', anio)),
+        ('get_conflictos (año)', lambda client, i: client.get('/get_conflictos/', anio)),
+        ('get_audit_logs', lambda client, i: client.get('/get_audit_logs/')),
+        ('get_audit_logs (personal)', lambda client, i: client.get('/get_audit_logs/', {'personal': 'GONZ'})),
+        ('get_audit_logs (nuevos)', lambda client, i: client.get('/get_audit_logs/', {'since_id': ultimo_log})),
+        ('asignar', asignar),
+        ('remover', remover),
+    ]
+
+
+def medir(funcion, repeticiones):
+    """
+    Medir un escenario
+
+    1. Una ejecución en frío (caché vaciado) para la latencia
+    2. Otra en frío contando las consultas y con tracemalloc para la memoria
+    3. `repeticiones` ejecuciones para la mediana (en caliente para las lecturas)
+
+    Retorna: dict con ms_frio, ms_mediana, consultas y memoria_kb
+    """
+    client = Client()
+
+    cache.clear()
+    inicio = time.perf_counter()
+    respuesta = funcion(client, 0)
+    ms_frio = (time.perf_counter() - inicio) * 1000
+    if respuesta.status_code != 200:
+        raise RuntimeError(f'Respuesta {respuesta.status_code}: {respuesta.content[:200]!r}')
+
+    cache.clear()
+    consultas = ContadorConsultas()
+    tracemalloc.start()
+    try:
+        with connection.execute_wrapper(consultas):
+            funcion(client, 1)
+        memoria = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    tiempos = []
+    for i in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(client, i + 2)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+
+    return {
+        'ms_frio': round(ms_frio, 1),
+        'ms_mediana': round(statistics.median(tiempos), 1) if tiempos else None,
+        'consultas': consultas.total,
+        'memoria_kb': round(memoria / 1024),
+    }
+
+
+def medir_escalas(escalas=ESCALAS, repeticiones=REPETICIONES, semilla=SEMILLA, fecha_base=FECHA_BASE, progreso=None):
+    """
+    Generar los datos de cada escala y medir todos los escenarios
+
+    Retorna: lista de dicts {escala, escenario, personal, ms_frio, ms_mediana, consultas, memoria_kb}
+    """
+    avisar = progreso or (lambda mensaje: None)
+    resultados = []
+    with base_de_pruebas():
+        for escala in escalas:
+            call_command('flush', interactive=False, verbosity=0)
+            avisar(f'Escala {escala}×: generando datos...')
+            resumen = generar(escala=escala, semilla=semilla, fecha_base=fecha_base)
+            for nombre, funcion in escenarios(fecha_base):
+                avisar(f'Escala {escala}×: {nombre}')
+                resultados.append({
+                    'escala': escala,
+                    'escenario': nombre,
+                    'personal': resumen['personal'],
+                    **medir(funcion, repeticiones),
+                })
+    return resultados
+
+
+# =============================================================================
+# CONCURRENCIA
+# =============================================================================
+
+LECTORES = 4
+ESCRITORES = 2
+DURACION = 5  # segundos por perfil
+PERSONAS_POR_ESCRITURA = 5
+
+
+def perfiles_concurrencia():
+    """
+    Perfiles de conexión a comparar: {nombre: (PRAGMA, transaction_mode)}
+
+    'sin perfil' reproduce la configuración por defecto de SQLite y de
+    Django; 'configurado' usa PLANNING_SQLITE_PRAGMAS y el transaction_mode
+    de DATABASES, y 'configurado + WAL' además pasa la base de pruebas a
+    modo WAL (lo que hace modo_journal en la base de producción).
+    """
+    transaction_mode = connection.settings_dict['OPTIONS'].get('transaction_mode')
+    return {
+        'sin perfil': (PRAGMAS_SIN_PERFIL, None),
+        'configurado': (pragmas_configurados(), transaction_mode),
+        'configurado + WAL': ({**pragmas_configurados(wal=True), 'journal_mode': 'WAL'}, transaction_mode),
+    }
+
+
+@contextmanager
+def perfil_conexion(pragmas, transaction_mode):
+    """Abrir las conexiones de la medición con estos PRAGMA y transaction_mode"""
+    opciones = connection.settings_dict['OPTIONS']
+    original = opciones.get('transaction_mode')
+    # Las conexiones abiertas conservan el perfil anterior (y journal_mode
+    # solo cambia si no hay otras conexiones a la base)
+    connections.close_all()
+    opciones['transaction_mode'] = transaction_mode
+    try:
+        with override_settings(PLANNING_SQLITE_PRAGMAS=pragmas):
+            yield
+    finally:
+        connections.close_all()
+        opciones['transaction_mode'] = original
+
+
+def operaciones_concurrencia(fecha_base, escritores):
+    """
+    Operaciones de lectores y escritores: (lectura(client, i), [escritura(client, i) por escritor])
+
+    Los lectores alternan el calendario de la faena con más personal y la
+    lista de personal. Cada escritor asigna y remueve en lote, por turnos,
+    a su propio grupo de personas en otra faena, así los escritores compiten
+    por la base de datos pero no por los mismos registros.
+    """
+    cargos = {'cargos[]': list(Cargo.objects.values_list('cargo_id', flat=True))}
+    faenas = list(
+        Faena.objects
+        .annotate(asignados=Count('personalfaena', filter=Q(personalfaena__activo=True)))
+        .order_by('-asignados', 'faena_id')[:2]
+    )
+    mas_grande, destino = faenas[0], faenas[-1]
+    de_faena = ','.join(map(str, PersonalFaena.objects.filter(faena=mas_grande, activo=True).values_list('personal_id', flat=True)))
+    libres = list(
+        Personal.objects.exclude(personalfaena__faena=destino).order_by('personal_id').values_list('personal_id', flat=True)
+    )
+
+    def lectura(client, i):
+        if i % 2:
+            return client.get('/get_personas/', cargos)
+        return client.get('/get_estados/', {**cargos, 'month': fecha_base.month, 'year': fecha_base.year, 'personas': de_faena})
+
+    def escritura(grupo):
+        def escribir(client, i):
+            if i % 2:
+                return client.post('/remove_personal_from_faena_bulk/', json.dumps({
+                    'faena_id': destino.faena_id, 'personal_ids': grupo,
+                }), content_type='application/json')
+            return client.post('/assign_personal_to_faena_bulk/', json.dumps({
+                'faena_id': destino.faena_id,
+                'fecha_inicio': destino.fecha_inicio.strftime('%Y-%m-%d'),
+                'asignaciones': [{'personal_id': personal_id} for personal_id in grupo],
+            }), content_type='application/json')
+        return escribir
+
+    grupos = [libres[n * PERSONAS_POR_ESCRITURA:(n + 1) * PERSONAS_POR_ESCRITURA] for n in range(escritores)]
+    return lectura, [escritura(grupo) for grupo in grupos]
+
+
+def _trabajar(funcion, duracion, barrera, resultado):
+    """Ejecutar una operación durante `duracion` segundos (un hilo, con su propia conexión)"""
+    client = Client(raise_request_exception=False)
+    tiempos, errores, i = [], 0, 0
+    try:
+        barrera.wait()
+        fin = time.perf_counter() + duracion
+        while time.perf_counter() < fin:
+            inicio = time.perf_counter()
+            try:
+                correcta = funcion(client, i).status_code == 200
+            except Exception:
+                correcta = False
+            if correcta:
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+                i += 1
+            else:
+                # Se reintenta la misma operación, como lo haría el usuario
+                errores += 1
+    finally:
+        connection.close()
+        resultado.update(tiempos=tiempos, errores=errores)
+
+
+def _percentil(tiempos, percentil):
+    if not tiempos:
+        return None
+    return round(statistics.quantiles(tiempos, n=100, method='inclusive')[percentil - 1], 1) if len(tiempos) > 1 else round(tiempos[0], 1)
+
+
+def medir_perfil(lectura, escrituras, lectores, duracion):
+    """
+    Correr lectores y escritores a la vez durante `duracion` segundos
+
+    Retorna: dict con operaciones por segundo, errores y latencia (p50 y
+    p95) de lecturas y escrituras
+    """
+    hilos = [(lectura, 'lectura') for _ in range(lectores)] + [(escritura, 'escritura') for escritura in escrituras]
+    barrera = threading.Barrier(len(hilos))
+    resultados = [({}, tipo) for _, tipo in hilos]
+    trabajadores = [
+        threading.Thread(target=_trabajar, args=(funcion, duracion, barrera, resultado))
+        for (funcion, _), (resultado, _) in zip(hilos, resultados)
+    ]
+    for trabajador in trabajadores:
+        trabajador.start()
+    for trabajador in trabajadores:
+        trabajador.join()
+
+    medicion = {}
+    for tipo in ('lectura', 'escritura'):
+        tiempos = [t for resultado, t_tipo in resultados if t_tipo == tipo for t in resultado['tiempos']]
+        medicion[f'{tipo}s_s'] = round(len(tiempos) / duracion, 1)
+        medicion[f'errores_{tipo}'] = sum(resultado['errores'] for resultado, t_tipo in resultados if t_tipo == tipo)
+        medicion[f'{tipo}_p50_ms'] = _percentil(tiempos, 50)
+        medicion[f'{tipo}_p95_ms'] = _percentil(tiempos, 95)
+    return medicion
+
+
+def medir_concurrencia(escala=1, lectores=LECTORES, escritores=ESCRITORES, duracion=DURACION,
+                       semilla=SEMILLA, fecha_base=FECHA_BASE, progreso=None):
+    """
+    Medir lectores y escritores simultáneos con cada perfil de conexión
+
+    La base de pruebas se crea en un archivo temporal (las bases en memoria
+    no tienen bloqueos entre conexiones) y el caché de estados se apaga para
+    que cada lectura llegue a la base de datos.
+
+    Retorna: lista de dicts {perfil, journal_mode, lectores, escritores, ...medir_perfil}
+    """
+    if connection.vendor != 'sqlite':
+        raise RuntimeError('La medición de concurrencia es para SQLite')
+
+    avisar = progreso or (lambda mensaje: None)
+    perfiles = perfiles_concurrencia()
+    resultados = []
+    with tempfile.TemporaryDirectory() as directorio:
+        with base_de_pruebas(os.path.join(directorio, 'concurrencia.sqlite3')), override_settings(PLANNING_CACHE_ESTADOS=False):
+            avisar(f'Escala {escala}×: generando datos...')
+            generar(escala=escala, semilla=semilla, fecha_base=fecha_base)
+            lectura, escrituras = operaciones_concurrencia(fecha_base, escritores)
+
+            # Los "database is locked" se cuentan como errores, sin registrar cada uno
+            logging.disable(logging.ERROR)
+            try:
+                for nombre, (pragmas, transaction_mode) in perfiles.items():
+                    with perfil_conexion(pragmas, transaction_mode):
+                        avisar(f'Perfil {nombre}: {lectores} lectores y {escritores} escritores durante {duracion} s')
+                        connection.ensure_connection()
+                        journal_mode = leer_pragmas(connection.connection, ['journal_mode'])['journal_mode']
+                        connection.close()
+                        resultados.append({
+                            'perfil': nombre,
+                            'journal_mode': journal_mode,
+                            'lectores': lectores,
+                            'escritores': escritores,
+                            **medir_perfil(lectura, escrituras, lectores, duracion),
+                        })
+            finally:
+                logging.disable(logging.NOTSET)
+    return resultados
+
+
+def formatear_concurrencia(resultados):
+    """Tabla de texto con los resultados de medir_concurrencia"""
+    columnas = [
+        'perfil', 'journal', 'lecturas/s', 'p50 ms', 'p95 ms', 'errores',
+        'escrituras/s', 'p50 ms', 'p95 ms', 'errores',
+    ]
+    filas = [
+        [
+            r['perfil'], r['journal_mode'],
+            r['lecturas_s'], r['lectura_p50_ms'], r['lectura_p95_ms'], r['errores_lectura'],
+            r['escrituras_s'], r['escritura_p50_ms'], r['escritura_p95_ms'], r['errores_escritura'],
+        ]
+        for r in resultados
+    ]
+    return tabla_texto(columnas, filas)
+
+
+# =============================================================================
+# REPORTE
+# =============================================================================
+
+def formatear_tabla(resultados, base=None):
+    """
+    Tabla de texto con los resultados
+
+    Si se entrega `base` (resultados de una medición anterior), agrega la
+    variación porcentual de la mediana y de las consultas.
+    """
+    anteriores = {(r['escala'], r['escenario']): r for r in base or ()}
+    columnas = ['escala', 'escenario', 'personal', 'ms_frio', 'ms_mediana', 'consultas', 'memoria_kb']
+    if base is not None:
+        columnas += ['Δ ms', 'Δ consultas']
+
+    filas = []
+    for r in resultados:
+        fila = [f"{r['escala']}×", r['escenario'], r['personal'], r['ms_frio'], r['ms_mediana'], r['consultas'], r['memoria_kb']]
+        if base is not None:
+            anterior = anteriores.get((r['escala'], r['escenario']))
+            fila += [
+                variacion(anterior and anterior['ms_mediana'], r['ms_mediana']),
+                variacion(anterior and anterior['consultas'], r['consultas']),
+            ]
+        filas.append(fila)
+
+    return tabla_texto(columnas, filas)
+
+
+def tabla_texto(columnas, filas):
+    """Columnas alineadas con un separador bajo los encabezados"""
+    filas = [[str(valor) for valor in fila] for fila in filas]
+    anchos = [max(len(columna), *(len(fila[i]) for fila in filas)) for i, columna in enumerate(columnas)]
+    lineas = ['  '.join(columna.ljust(ancho) for columna, ancho in zip(columnas, anchos))]
+    lineas.append('  '.join('-' * ancho for ancho in anchos))
+    lineas.extend('  '.join(valor.ljust(ancho) for valor, ancho in zip(fila, anchos)) for fila in filas)
+    return '\n'.join(lineas)
+
+
+def variacion(anterior, actual):
+    """Variación porcentual entre dos mediciones ('-' si no hay con qué comparar)"""
+    if not anterior or actual is None:
+        return '-'
+    return f'{(actual - anterior) / anterior * 100:+.0f}%'
+
@@ -0,0 +1,194 @@
+"""
+Roster materializado (tabla RosterDia)
+
+Guarda los estados crudos del calendario (ver planning.estados.calcular_celdas)
+como filas persona × día, para que leer cualquier mes sea un solo recorrido
+por índice (personal_id, fecha) en lugar de recalcular los turnos.
+
+La tabla se mantiene al día desde planning.cambios (llamado por las señales
+y por las vistas que usan QuerySet.update()), recalculando solo las personas y el rango de fechas
+afectados por cada cambio. Para poblarla desde cero:
+
+    python manage.py reconstruir_roster
+
+Todo esto se activa con el setting PLANNING_ROSTER_MATERIALIZADO.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+
+from core.models import (
+    Personal,
+    PersonalFaena,
+    Ausentismo,
+    LicenciaMedicaPorPersonal,
+    RosterDia,
+)
+
+from .estados import (
+    TABLA_ASIGNACION,
+    TABLA_AUSENTISMO,
+    TABLA_LICENCIA,
+    calcular_celdas,
+    cargar_origenes,
+    claves_rango,
+    renderizar_estados,
+)
+from .turnos import DIAS_SIN_TURNO
+
+
+def roster_activo():
+    """Retorna True si el calendario usa y mantiene la tabla RosterDia"""
+    return getattr(settings, 'PLANNING_ROSTER_MATERIALIZADO', False)
+
+
+# =============================================================================
+# RANGO DE FECHAS AFECTADO POR CADA REGISTRO
+# =============================================================================
+
+def rango_asignacion(fecha_inicio, fecha_fin_faena):
+    """
+    Rango de días en que una asignación puede generar estados:
+    desde su inicio hasta el fin de la faena (o DIAS_SIN_TURNO días si no tiene turno)
+    """
+    fin = fecha_inicio + timedelta(days=DIAS_SIN_TURNO)
+    if fecha_fin_faena and fecha_fin_faena > fin:
+        fin = fecha_fin_faena
+    return fecha_inicio, fin
+
+
+def rango_asignaciones(asignaciones):
+    """Rango que cubre todas las asignaciones de un QuerySet de PersonalFaena (o None)"""
+    limites = asignaciones.aggregate(desde=Min('fecha_inicio'), hasta_inicio=Max('fecha_inicio'), hasta=Max('faena__fecha_fin'))
+    if limites['desde'] is None:
+        return None
+    _, hasta = rango_asignacion(limites['hasta_inicio'], limites['hasta'])
+    return limites['desde'], hasta
+
+
+def unir_rangos(*rangos):
+    """Menor rango que contiene a todos los rangos dados (ignora los None)"""
+    rangos = [r for r in rangos if r]
+    if not rangos:
+        return None
+    return min(r[0] for r in rangos), max(r[1] for r in rangos)
+
+
+# =============================================================================
+# ESCRITURA: RECALCULAR PERSONAS Y RANGOS AFECTADOS
+# =============================================================================
+
+def materializar(persona_ids, desde, hasta):
+    """
+    Recalcular y guardar las filas RosterDia de las personas en el rango
+
+    Borra las filas existentes del rango y las reemplaza por el cálculo
+    actual, dentro de una transacción.
+
+    Retorna: cantidad de filas creadas
+    """
+    persona_ids = list(persona_ids)
+    if not persona_ids or hasta < desde:
+        return 0
+
+    with transaction.atomic():
+        calculo = calcular_celdas(Personal.objects.filter(personal_id__in=persona_ids), desde, hasta)
+        asignaciones = calculo['origenes'][TABLA_ASIGNACION]
+
+        filas = []
+        for pid, dias in calculo['celdas'].items():
+            for i, crudos in enumerate(dias):
+                fecha = desde + timedelta(days=i)
+                for orden, (estado, tabla, registro_id) in enumerate(crudos):
+                    asignacion = asignaciones.get(registro_id) if tabla == TABLA_ASIGNACION else None
+                    filas.append(RosterDia(
+                        personal_id=pid,
+                        fecha=fecha,
+                        estado=estado,
+                        orden=orden,
+                        faena_id=asignacion['faena_id'] if asignacion else None,
+                        tabla_origen=tabla,
+                        registro_origen=registro_id,
+                    ))
+
+        RosterDia.objects.filter(personal_id__in=persona_ids, fecha__range=(desde, hasta)).delete()
+        RosterDia.objects.bulk_create(filas, batch_size=2000)
+    return len(filas)
+
+
+def actualizar_roster(persona_ids, rango):
+    """Recalcular el roster de las personas en el rango afectado, si el roster está activo"""
+    if not roster_activo() or not persona_ids or not rango:
+        return
+    materializar(persona_ids, *rango)
+
+
+def rango_personas(persona_ids):
+    """Rango que cubre todos los registros de las personas que generan estados (o None)"""
+    rango_faenas = rango_asignaciones(PersonalFaena.objects.en_calendario(personal_id__in=persona_ids))
+    ausentismos = Ausentismo.objects.filter(personal_id__in=persona_ids).aggregate(desde=Min('fechaini'), hasta=Max('fechafin'))
+    licencias = LicenciaMedicaPorPersonal.objects.filter(personal_id__in=persona_ids).aggregate(desde=Min('fechaEmision'), hasta=Max('fecha_fin_licencia'))
+    return unir_rangos(
+        rango_faenas,
+        (ausentismos['desde'], ausentismos['hasta']) if ausentismos['desde'] else None,
+        (licencias['desde'], licencias['hasta']) if licencias['desde'] else None,
+    )
+
+
+def reconstruir(lote=500):
+    """
+    Reconstruir la tabla RosterDia completa, por lotes de personas
+
+    Retorna: cantidad de filas creadas
+    """
+    RosterDia.objects.all().delete()
+    persona_ids = list(Personal.objects.order_by('personal_id').values_list('personal_id', flat=True))
+
+    total = 0
+    for inicio in range(0, len(persona_ids), lote):
+        grupo = persona_ids[inicio:inicio + lote]
+        rango = rango_personas(grupo)
+        if rango:
+            total += materializar(grupo, *rango)
+    return total
+
+
+# =============================================================================
+# LECTURA: ESTADOS DEL CALENDARIO DESDE LA TABLA
+# =============================================================================
+
+def leer_estados(personas, desde, hasta, clave_dia=None):
+    """
+    Leer los estados del calendario desde RosterDia
+
+    Mismos parámetros y resultado que planning.estados.calcular_estados.
+    Hace un recorrido por índice (personal_id, fecha) y carga por ID los
+    registros de origen para armar los detalles.
+    """
+    persona_ids = list(personas.values_list('personal_id', flat=True))
+    n_dias = (hasta - desde).days + 1
+
+    filas = (
+        RosterDia.objects
+        .filter(personal_id__in=personas, fecha__range=(desde, hasta))
+        .order_by('personal_id', 'fecha', 'orden')
+        .values_list('personal_id', 'fecha', 'estado', 'tabla_origen', 'registro_origen')
+    )
+
+    celdas = {}
+    registros = {TABLA_ASIGNACION: set(), TABLA_AUSENTISMO: set(), TABLA_LICENCIA: set()}
+    for pid, fecha, estado, tabla, registro_id in filas:
+        dias = celdas.get(pid)
+        if dias is None:
+            dias = celdas[pid] = [[] for _ in range(n_dias)]
+        dias[(fecha - desde).days].append((estado, tabla, registro_id))
+        if registro_id is not None:
+            registros[tabla].add(registro_id)
+
+    origenes = cargar_origenes(
+        registros[TABLA_ASIGNACION], registros[TABLA_AUSENTISMO], registros[TABLA_LICENCIA],
+    )
+    return renderizar_estados(persona_ids, celdas, origenes, claves_rango(desde, hasta, clave_dia))
@@ -0,0 +1,208 @@
+"""
+Señales que mantienen al día el roster materializado, el caché de estados
+y los términos de búsqueda del personal
+
+Cada vez que se guarda o elimina un registro que genera estados en el
+calendario (asignaciones, ausentismos, licencias) o que cambia su cálculo
+o sus detalles (faenas, tipos de turno, tipos de ausentismo), se registra
+el cambio solo para las personas y el rango de fechas afectados (ver
+planning.cambios). Esto cubre tanto las vistas de planificación como las
+ediciones desde el admin.
+
+Con los mismos valores anteriores de faenas y tipos de turno se recalcula
+la fecha_fin_calculada de las asignaciones cuando cambia el fin de la
+faena o el ciclo del turno (siempre, aunque no haya seguimiento activo).
+"""
+
+from django.apps import apps
+from django.db.models import Max, Min, Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.models import (
+    AuditLog,
+    Ausentismo,
+    Faena,
+    GeneracionCambios,
+    LicenciaMedicaPorPersonal,
+    Personal,
+    PersonalFaena,
+    PersonalTermino,
+    RosterDia,
+    TipoAusentismo,
+    TipoTurno,
+)
+
+from .busqueda import indexar
+from .cambios import afectados_asignaciones, nueva_generacion, registrar_cambio, seguimiento_activo
+from .roster import rango_asignacion, unir_rangos
+
+
+# Campos que influyen en los estados o en sus detalles
+CAMPOS_FAENA = ('nombre', 'fecha_fin', 'tipo_turno_id')
+CAMPOS_TIPO_TURNO = ('nombre', 'dias_trabajo', 'dias_descanso')
+CAMPOS_TIPO_AUSENTISMO = ('tipo',)
+
+# Campos que definen la fecha_fin_calculada de las asignaciones
+CAMPOS_FIN_FAENA = ('fecha_fin', 'tipo_turno_id')
+CAMPOS_FIN_TIPO_TURNO = ('dias_trabajo', 'dias_descanso')
+
+
+def _fecha(instance, campo):
+    """Valor de un campo fecha como date (las vistas a veces asignan strings)"""
+    return instance._meta.get_field(campo).to_python(getattr(instance, campo))
+
+
+def _afectados(instance):
+    """Retorna (personal_id, rango de fechas) en que un registro afecta los estados"""
+    if isinstance(instance, PersonalFaena):
+        return instance.personal_id, rango_asignacion(_fecha(instance, 'fecha_inicio'), instance.faena.fecha_fin)
+    if isinstance(instance, Ausentismo):
+        return instance.personal_id_id, (_fecha(instance, 'fechaini'), _fecha(instance, 'fechafin'))
+    return instance.personal_id_id, (_fecha(instance, 'fechaEmision'), _fecha(instance, 'fecha_fin_licencia'))
+
+
+# =============================================================================
+# ASIGNACIONES, AUSENTISMOS Y LICENCIAS
+# =============================================================================
+
+@receiver(pre_save, sender=PersonalFaena)
+@receiver(pre_save, sender=Ausentismo)
+@receiver(pre_save, sender=LicenciaMedicaPorPersonal)
+def guardar_estado_anterior(sender, instance, **kwargs):
+    """Recordar a quién y qué fechas afectaba el registro antes de modificarlo"""
+    if not seguimiento_activo() or instance.pk is None:
+        return
+    anterior = sender.objects.filter(pk=instance.pk).first()
+    instance._afectados_anterior = _afectados(anterior) if anterior else None
+
+
+@receiver(post_save, sender=PersonalFaena)
+@receiver(post_save, sender=Ausentismo)
+@receiver(post_save, sender=LicenciaMedicaPorPersonal)
+def registrar_cambio_registro(sender, instance, **kwargs):
+    """Registrar el cambio en las fechas que el registro afectaba antes y después de guardarlo"""
+    if not seguimiento_activo():
+        return
+    personal_id, rango = _afectados(instance)
+    anterior = getattr(instance, '_afectados_anterior', None)
+    if anterior and anterior[0] != personal_id:
+        # El registro cambió de persona: registrar también a la persona anterior
+        registrar_cambio([anterior[0]], anterior[1])
+    elif anterior:
+        rango = unir_rangos(rango, anterior[1])
+    registrar_cambio([personal_id], rango)
+
+
+@receiver(post_delete, sender=PersonalFaena)
+@receiver(post_delete, sender=Ausentismo)
+@receiver(post_delete, sender=LicenciaMedicaPorPersonal)
+def registrar_eliminacion_registro(sender, instance, **kwargs):
+    """Registrar el cambio en las fechas que afectaba un registro eliminado"""
+    if not seguimiento_activo():
+        return
+    personal_id, rango = _afectados(instance)
+    registrar_cambio([personal_id], rango)
+
+
+# =============================================================================
+# FAENAS, TIPOS DE TURNO Y TIPOS DE AUSENTISMO
+# =============================================================================
+
+def _campos(sender):
+    if sender is Faena:
+        return CAMPOS_FAENA
+    if sender is TipoTurno:
+        return CAMPOS_TIPO_TURNO
+    return CAMPOS_TIPO_AUSENTISMO
+
+
+def _cambiaron(instance, campos):
+    """Retorna True si alguno de los campos cambió respecto del valor guardado antes"""
+    anterior = getattr(instance, '_estado_anterior', None)
+    if not anterior:
+        return False
+    return any(anterior[campo] != instance._meta.get_field(campo).to_python(getattr(instance, campo)) for campo in campos)
+
+
+@receiver(pre_save, sender=Faena)
+@receiver(pre_save, sender=TipoTurno)
+@receiver(pre_save, sender=TipoAusentismo)
+def guardar_campos_anteriores(sender, instance, **kwargs):
+    """Recordar los campos que influyen en los estados y en el fin de las asignaciones del personal asociado"""
+    if instance.pk is None or (sender is TipoAusentismo and not seguimiento_activo()):
+        return
+    instance._estado_anterior = sender.objects.filter(pk=instance.pk).values(*_campos(sender)).first()
+
+
+@receiver(post_save, sender=Faena)
+def registrar_cambio_faena(sender, instance, **kwargs):
+    """Si cambió el nombre, el fin o el turno de la faena, registrar el cambio de su personal asignado"""
+    if _cambiaron(instance, CAMPOS_FIN_FAENA):
+        # El fin y el turno de la faena limitan el fin de sus asignaciones
+        instance.personalfaena_set.recalcular_fecha_fin()
+    if not seguimiento_activo() or not _cambiaron(instance, CAMPOS_FAENA):
+        return
+    persona_ids, rango = afectados_asignaciones(PersonalFaena.objects.en_calendario(faena=instance))
+    if rango:
+        # Cubrir también los días hasta el fin anterior, si la faena se acortó
+        rango = unir_rangos(rango, rango_asignacion(rango[0], instance._estado_anterior['fecha_fin']))
+    registrar_cambio(persona_ids, rango)
+
+
+@receiver(post_save, sender=TipoTurno)
+def registrar_cambio_tipo_turno(sender, instance, **kwargs):
+    """Si cambió el ciclo o el nombre del turno, registrar el cambio de todos los que lo usan"""
+    if _cambiaron(instance, CAMPOS_FIN_TIPO_TURNO):
+        # El ciclo cambia el fin de las asignaciones con este turno (propio o de la faena)
+        PersonalFaena.objects.filter(
+            Q(tipo_turno=instance) | Q(tipo_turno__isnull=True, faena__tipo_turno=instance)
+        ).recalcular_fecha_fin()
+    if not seguimiento_activo() or not _cambiaron(instance, CAMPOS_TIPO_TURNO):
+        return
+    # El nombre se muestra con el turno de la faena; el ciclo puede venir de la asignación o de la faena
+    asignaciones = PersonalFaena.objects.en_calendario().filter(
+        Q(tipo_turno=instance) | Q(faena__tipo_turno=instance),
+    )
+    registrar_cambio(*afectados_asignaciones(asignaciones))
+
+
+@receiver(post_save, sender=TipoAusentismo)
+def registrar_cambio_tipo_ausentismo(sender, instance, **kwargs):
+    """Si cambió el nombre del tipo (que define vacaciones, permiso, etc.), registrar el cambio de sus ausentismos"""
+    if not seguimiento_activo() or not _cambiaron(instance, CAMPOS_TIPO_AUSENTISMO):
+        return
+    ausentismos = Ausentismo.objects.filter(tipoausen_id=instance)
+    limites = ausentismos.aggregate(desde=Min('fechaini'), hasta=Max('fechafin'))
+    if limites['desde'] is None:
+        return
+    persona_ids = set(ausentismos.values_list('personal_id', flat=True))
+    registrar_cambio(persona_ids, (limites['desde'], limites['hasta']))
+
+
+# =============================================================================
+# BÚSQUEDA DE PERSONAL
+# =============================================================================
+
+@receiver(post_save, sender=Personal)
+def indexar_personal(sender, instance, raw=False, **kwargs):
+    """Regenerar los términos de búsqueda de la persona guardada (se borran en cascada al eliminarla)"""
+    if raw:
+        return
+    indexar([instance.personal_id])
+
+
+# =============================================================================
+# GENERACIÓN DE CAMBIOS (VALIDADORES HTTP)
+# =============================================================================
+
+@receiver(post_save)
+@receiver(post_delete)
+def registrar_generacion(sender, **kwargs):
+    """Aumentar la generación de cambios con cualquier cambio en los datos de core"""
+    # Los modelos históricos de las migraciones (RunPython) también envían señales
+    if sender._meta.apps is not apps or sender._meta.app_label != 'core':
+        return
+    if sender in (AuditLog, GeneracionCambios, RosterDia, PersonalTermino):
+        return
+    nueva_generacion()
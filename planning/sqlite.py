@@ -0,0 +1,130 @@
+"""
+Perfil de conexión de SQLite para varios usuarios simultáneos
+
+El backend sqlite3 de Django abre la base de datos con la configuración por
+defecto de SQLite: journal en modo DELETE, donde un escritor bloquea a los
+lectores mientras confirma y los lectores impiden confirmar al escritor.
+Con varios planificadores trabajando a la vez aparecen esperas y errores
+"database is locked".
+
+Al abrir cada conexión (señal connection_created) se aplican estos PRAGMA:
+
+    busy_timeout = 5000     esperar hasta 5 s un bloqueo en vez de fallar
+    mmap_size    = 256 MiB  leer la base de datos con memoria mapeada
+    cache_size   = -65536   caché de páginas de 64 MiB por conexión
+
+y, si la base de datos está en modo WAL:
+
+    synchronous  = NORMAL   sincronizar al disco en cada checkpoint y no en
+                            cada commit (un corte de luz puede perder los
+                            últimos commits, pero no corrompe la base)
+
+El modo WAL (los lectores no bloquean al escritor ni al revés) queda
+guardado en el archivo de la base de datos, así que no se cambia al
+conectarse: se activa una vez en la base de producción con
+
+    python manage.py modo_journal wal
+
+y un manage.py check o makemigrations no reescribe el db.sqlite3 del
+repositorio.
+
+Se configuran con el setting PLANNING_SQLITE_PRAGMAS (un dict que se combina
+con los valores por defecto; None omite un PRAGMA y PLANNING_SQLITE_PRAGMAS
+= None no aplica ninguno). Las transacciones se abren con BEGIN IMMEDIATE
+(OPTIONS['transaction_mode'] en DATABASES), así un atomic() que va a
+escribir espera su turno al comenzar en vez de fallar al pasar de lectura a
+escritura.
+
+El rendimiento con lectores y escritores simultáneos se mide con:
+
+    python manage.py medir_concurrencia
+"""
+
+import re
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+PRAGMAS_SQLITE = {
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+}
+
+# Solo para bases en modo WAL (en modo DELETE, NORMAL puede corromper la base
+# si se corta la luz)
+PRAGMAS_WAL = {
+    'synchronous': 'NORMAL',
+}
+
+MODOS_JOURNAL = ('wal', 'delete')
+
+# Valores por defecto de SQLite (el comportamiento sin este perfil)
+PRAGMAS_SIN_PERFIL = {
+    'journal_mode': 'DELETE',
+    'busy_timeout': 5000,  # el timeout por defecto del módulo sqlite3 de Python
+    'synchronous': 'FULL',
+    'mmap_size': 0,
+    'cache_size': -2000,
+}
+
+_NOMBRE = re.compile(r'^[a-z_]+$')
+_VALOR = re.compile(r'^-?\w+$')
+
+
+def pragmas_configurados(wal=False):
+    """PRAGMA a aplicar a cada conexión: {nombre: valor}"""
+    configurados = getattr(settings, 'PLANNING_SQLITE_PRAGMAS', {})
+    if configurados is None:
+        return {}
+    pragmas = {**PRAGMAS_SQLITE, **(PRAGMAS_WAL if wal else {}), **configurados}
+    return {nombre: valor for nombre, valor in pragmas.items() if valor is not None}
+
+
+def aplicar_pragmas(conexion, pragmas):
+    """
+    Ejecutar los PRAGMA en una conexión sqlite3 (la de Python, no la de Django)
+
+    Se ejecutan directamente sobre la conexión para no aparecer entre las
+    consultas de los requests ni pasar por los execute_wrapper.
+    """
+    for nombre, valor in pragmas.items():
+        if not _NOMBRE.match(nombre) or not _VALOR.match(str(valor)):
+            raise ValueError(f'PRAGMA inválido: {nombre} = {valor!r}')
+        conexion.execute(f'PRAGMA {nombre} = {valor}').fetchall()
+
+
+def leer_pragmas(conexion, nombres=('journal_mode', 'synchronous', *PRAGMAS_SQLITE)):
+    """Valores vigentes de los PRAGMA en una conexión sqlite3: {nombre: valor}"""
+    return {nombre: conexion.execute(f'PRAGMA {nombre}').fetchone()[0] for nombre in nombres}
+
+
+@receiver(connection_created, dispatch_uid='planning.sqlite.configurar_conexion')
+def configurar_conexion(sender, connection, **kwargs):
+    """Aplicar el perfil a cada conexión nueva de SQLite"""
+    if connection.vendor != 'sqlite':
+        return
+    configurados = getattr(settings, 'PLANNING_SQLITE_PRAGMAS', {})
+    if configurados is None:
+        return
+    # El modo que deja este perfil (si lo cambia) o el guardado en la base
+    modo = configurados.get('journal_mode') or leer_pragmas(connection.connection, ['journal_mode'])['journal_mode']
+    aplicar_pragmas(connection.connection, pragmas_configurados(wal=str(modo).lower() == 'wal'))
+
+
+def cambiar_modo_journal(conexion, modo):
+    """
+    Cambiar el modo del journal de la base de datos (queda guardado en el archivo)
+
+    conexion: conexión de Django a SQLite
+    modo: 'wal' o 'delete'
+
+    Retorna: el modo vigente después del cambio. SQLite no lo cambia si hay
+    otras conexiones abiertas a la base o una transacción en curso.
+    """
+    if modo not in MODOS_JOURNAL:
+        raise ValueError(f'Modo de journal inválido: {modo!r}')
+    conexion.ensure_connection()
+    return conexion.connection.execute(f'PRAGMA journal_mode = {modo}').fetchone()[0]
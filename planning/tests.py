@@ -1,3 +1,1304 @@
-from django.test import TestCase
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Count, Q
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.admin import LIMITE_CONTEO, FechasIndexadas
+from core.models import (
+    AuditLog, Ausentismo, Cargo, Faena, InfoLaboral, LicenciaMedicaPorPersonal, Personal, PersonalFaena, PersonalTermino,
+    TipoAusentismo, fin_asignacion,
+)
+
+from . import archivo_auditoria
+from .archivo_auditoria import archivar, leer_archivados, leer_indice
+from .auditoria import ColaAuditoria, lote_auditoria, registrar_log
+from .cache_estados import cache_activo, estadisticas_cache, estados_con_cache, revisar_cache_estados
+from .cambios import generacion_cambios
+from .compacto import codificar_compacto
+from .datos_sinteticos import FECHA_BASE, PERSONAS_POR_ESCALA, digito_verificador, generar, limpiar
+from .estados import calcular_estados
+from .intervalos import superposiciones
+from .roster import leer_estados, reconstruir
+from .sqlite import cambiar_modo_journal, leer_pragmas
+from .turnos import DIAS_SIN_TURNO, calcular_mascaras, tramos_de_trabajo
+
+
+class DatosSinteticosTests(TestCase):
+    """Generador de datos sintéticos para las mediciones de rendimiento"""
+
+    def foto(self):
+        """Resumen comparable de los datos generados (sin IDs autoincrementales)"""
+        return {
+            'personal': list(Personal.objects.order_by('rut').values_list('rut', 'dvrut', 'nombre', 'apepat', 'comuna_id')),
+            'asignaciones': list(
+                PersonalFaena.objects.order_by('personal__rut', 'fecha_inicio', 'faena__nombre')
+                .values_list('personal__rut', 'faena__nombre', 'fecha_inicio', 'tipo_turno__nombre', 'activo')
+            ),
+            'licencias': list(
+                LicenciaMedicaPorPersonal.objects.order_by('personal_id__rut', 'fechaEmision')
+                .values_list('personal_id__rut', 'fechaEmision', 'fecha_fin_licencia')
+            ),
+        }
+
+    def test_digito_verificador(self):
+        self.assertEqual(digito_verificador(12345678), '5')
+        self.assertEqual(digito_verificador(11111111), '1')
+        self.assertEqual(digito_verificador(6), 'K')
+
+    def test_misma_semilla_mismos_datos(self):
+        resumen = generar(escala=1, semilla=7)
+        foto = self.foto()
+        self.assertEqual(generar(escala=1, semilla=7), resumen)
+        self.assertEqual(self.foto(), foto)
+
+        generar(escala=1, semilla=8)
+        self.assertNotEqual(self.foto(), foto)
+
+    def test_escala(self):
+        resumen = generar(escala=2)
+        self.assertEqual(resumen['personal'], 2 * PERSONAS_POR_ESCALA)
+        self.assertEqual(Personal.objects.count(), 2 * PERSONAS_POR_ESCALA)
+        # Toda persona tiene al menos una asignación activa
+        self.assertFalse(Personal.objects.exclude(personalfaena__activo=True).exists())
+
+    def test_limpiar_solo_borra_datos_sinteticos(self):
+        real = Personal.objects.create(rut='1111111', dvrut='4', nombre='real', apepat='real', apemat='', correo='real@empresa.cl')
+        generar(escala=1)
+        self.assertEqual(limpiar(), PERSONAS_POR_ESCALA)
+        self.assertEqual(list(Personal.objects.all()), [real])
+        self.assertFalse(Faena.objects.exists())
+        self.assertFalse(AuditLog.objects.exists())
+
+
+class GetPersonasTests(TestCase):
+    """get_personas hace la misma cantidad de consultas con cualquier cantidad de personas"""
+
+    def consultas_get_personas(self, **filtros):
+        cargos = list(Cargo.objects.values_list('cargo_id', flat=True))
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get('/get_personas/', {'cargos[]': cargos, **filtros})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.json()['results'])
+        return len(consultas)
+
+    def test_consultas_constantes(self):
+        generar(escala=1)
+        faena_id = PersonalFaena.objects.filter(activo=True).values_list('faena_id', flat=True).first()
+        pocas = self.consultas_get_personas()
+        pocas_faena = self.consultas_get_personas(faena_id=faena_id)
+
+        generar(escala=3)
+        faena_id = PersonalFaena.objects.filter(activo=True).values_list('faena_id', flat=True).first()
+        self.assertEqual(self.consultas_get_personas(), pocas)
+        self.assertEqual(self.consultas_get_personas(faena_id=faena_id), pocas_faena)
+        self.assertLessEqual(pocas, 10)
+
+    def test_cargos_y_comuna(self):
+        generar(escala=1)
+        cargos = list(Cargo.objects.values_list('cargo_id', flat=True))
+        personas = {p['id']: p for p in self.client.get('/get_personas/', {'cargos[]': cargos}).json()['results']}
+        for persona in Personal.objects.select_related('comuna_id')[:20]:
+            esperados = [info.cargo_id.cargo for info in persona.infolaboral_set.order_by('infolab_id')]
+            self.assertEqual(personas[persona.personal_id]['cargo_actual'], ', '.join(esperados))
+            self.assertEqual(personas[persona.personal_id]['comuna_nombre'], persona.comuna_id.nombre if persona.comuna_id else None)
+
+
+class FormatoCompactoTests(TestCase):
+    """El formato compacto se expande exactamente a la respuesta normal de get_estados"""
+
+    def expandir(self, respuesta):
+        """Misma reconstrucción que decodificarEstados en calendar.html"""
+        celdas = [
+            [
+                {**respuesta['plantillas'][codigo[0]], **(
+                    {'detalles': None if codigo[1] is None else respuesta['detalles'][codigo[1]]}
+                    if len(codigo) > 1 else {}
+                )}
+                for codigo in celda
+            ]
+            for celda in respuesta['celdas']
+        ]
+        estados = {}
+        for personal_id, tramos in respuesta['results'].items():
+            dias = iter(respuesta['dias'])
+            estados[personal_id] = {
+                next(dias): list(celdas[celda])
+                for celda, repeticiones in zip(tramos[::2], tramos[1::2])
+                for _ in range(repeticiones)
+            }
+        return estados
+
+    def test_ida_y_vuelta_de_un_mes(self):
+        generar(escala=1)
+        parametros = {'month': 3, 'year': 2025, 'personas': ','.join(map(str, Personal.objects.values_list('personal_id', flat=True)))}
+        normal = self.client.get('/get_estados/', parametros).json()['results']
+        compacto = self.client.get('/get_estados/', {**parametros, 'formato': 'compacto'}).json()
+
+        self.assertEqual(compacto['formato'], 'compacto')
+        self.assertEqual(compacto['dias'], [str(dia) for dia in range(1, 32)])
+        self.assertTrue(any(len(estados) > 1 for dias in normal.values() for estados in dias.values()))
+        self.assertEqual(self.expandir(compacto), normal)
+        # Los tramos comprimen: menos pares [celda, repeticiones] que días
+        self.assertLess(sum(len(tramos) for tramos in compacto['results'].values()) // 2, 31 * len(normal))
+
+    def test_dias_vacios_y_detalle_nulo(self):
+        disponible = {'tipo': 'disponible', 'color': 'gris', 'texto': 'Disp', 'prioridad': 1}
+        licencia = {'tipo': 'licencia', 'color': 'rojo', 'texto': 'LM', 'prioridad': 3, 'detalles': {'folio': '7'}}
+        results = {
+            1: {'1': [disponible], '2': [], '3': [], '4': [disponible, licencia], '5': [disponible, licencia]},
+            2: {'1': [], '2': [dict(licencia, detalles=None)], '3': [], '4': [], '5': [disponible]},
+        }
+        compacto = json.loads(json.dumps(codificar_compacto(results)))
+
+        self.assertEqual(compacto['results']['1'][1::2], [1, 2, 2])
+        self.assertEqual(len(compacto['detalles']), 1)
+        self.assertEqual(self.expandir(compacto), {str(pid): dias for pid, dias in results.items()})
+
+
+@override_settings(PLANNING_ROSTER_MATERIALIZADO=True, PLANNING_CACHE_ESTADOS=False)
+class RosterMaterializadoTests(TestCase):
+    """RosterDia sigue igual al cálculo directo después de cada tipo de edición"""
+
+    desde = FECHA_BASE
+    hasta = FECHA_BASE + timezone.timedelta(days=119)
+
+    @classmethod
+    def setUpTestData(cls):
+        generar(escala=1)
+        reconstruir()
+
+    def setUp(self):
+        self.comprobar()
+        self.asignacion = (
+            PersonalFaena.objects.filter(activo=True, faena__fecha_fin__gt=self.hasta, fecha_inicio__lte=self.desde)
+            .select_related('faena').order_by('personal_faena_id').first()
+        )
+
+    def comprobar(self):
+        personas = Personal.objects.all()
+        leidos = leer_estados(personas, self.desde, self.hasta)
+        calculados = calcular_estados(personas, self.desde, self.hasta)
+        self.assertEqual(leidos.keys(), calculados.keys())
+        self.assertEqual([pid for pid in calculados if leidos[pid] != calculados[pid]], [])
+
+    def post(self, url, datos):
+        respuesta = self.client.post(url, json.dumps(datos), content_type='application/json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertTrue(respuesta.json()['success'], respuesta.content)
+
+    def test_fin_de_faena_y_ciclo_de_turno(self):
+        faena = self.asignacion.faena
+        fecha_fin = faena.fecha_fin
+        faena.fecha_fin = self.desde + timezone.timedelta(days=40)
+        faena.save()
+        self.comprobar()
+        faena.fecha_fin = fecha_fin
+        faena.save()
+        self.comprobar()
+
+        turno = faena.tipo_turno
+        turno.dias_trabajo += 3
+        turno.save()
+        self.comprobar()
+
+    def test_ausentismos_y_licencias(self):
+        ausentismo = Ausentismo.objects.create(
+            personal_id_id=self.asignacion.personal_id,
+            tipoausen_id=TipoAusentismo.objects.first(),
+            fechaini=self.desde + timezone.timedelta(days=10),
+            fechafin=self.desde + timezone.timedelta(days=20),
+        )
+        self.comprobar()
+        ausentismo.fechaini += timezone.timedelta(days=30)
+        ausentismo.fechafin += timezone.timedelta(days=35)
+        ausentismo.save()
+        self.comprobar()
+        # Mover el ausentismo a otra persona recalcula a las dos
+        ausentismo.personal_id = Personal.objects.exclude(pk=self.asignacion.personal_id).first()
+        ausentismo.save()
+        self.comprobar()
+        ausentismo.delete()
+        self.comprobar()
+
+        licencia = LicenciaMedicaPorPersonal.objects.filter(fechaEmision__range=(self.desde, self.hasta)).first()
+        licencia.fechaEmision -= timezone.timedelta(days=5)
+        licencia.dias_licencia += 12
+        licencia.save()
+        self.comprobar()
+
+    def test_asignar_y_remover(self):
+        personal_id, faena_id = self.asignacion.personal_id, self.asignacion.faena_id
+        # Nueva fecha de inicio en la misma faena: desactiva la asignación anterior con update()
+        self.post('/assign_personal_to_faena/', {
+            'personal_id': personal_id,
+            'faena_id': faena_id,
+            'turno_id': self.asignacion.faena.tipo_turno_id,
+            'fecha_inicio': (self.desde + timezone.timedelta(days=15)).isoformat(),
+        })
+        self.comprobar()
+        self.post('/remove_personal_from_faena/', {'personal_id': personal_id, 'faena_id': faena_id})
+        self.comprobar()
+        otra = (
+            PersonalFaena.objects.filter(activo=True, fecha_inicio__lte=self.desde, faena__fecha_fin__gte=self.hasta)
+            .exclude(personal_id=personal_id).first()
+        )
+        self.post('/remove_personal_from_faena/', {'personal_id': otra.personal_id})
+        self.comprobar()
+
+        personas = list(
+            Personal.objects.exclude(personalfaena__faena_id=faena_id, personalfaena__activo=True)
+            .values_list('personal_id', flat=True)[:10]
+        )
+        self.post('/assign_personal_to_faena_bulk/', {
+            'faena_id': faena_id,
+            'fecha_inicio': (self.desde + timezone.timedelta(days=3)).isoformat(),
+            'asignaciones': [{'personal_id': p} for p in personas],
+        })
+        self.comprobar()
+        self.post('/remove_personal_from_faena_bulk/', {'faena_id': faena_id, 'personal_ids': personas[:5]})
+        self.comprobar()
+
+
+class CacheEstadosTests(TransactionTestCase):
+    """El caché de estados acierta en las consultas repetidas y se invalida al confirmar cada cambio"""
+
+    desde = FECHA_BASE
+    hasta = FECHA_BASE + timezone.timedelta(days=89)  # tres meses
+
+    def setUp(self):
+        # Un caché compartido entre procesos: con LocMemCache el setting se ignora
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        compartido = self.settings(
+            PLANNING_CACHE_ESTADOS=True,
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directorio.name}},
+        )
+        compartido.enable()
+        self.addCleanup(compartido.disable)
+
+        generar(escala=1)
+        self.asignacion = PersonalFaena.objects.filter(
+            activo=True, fecha_inicio__lte=self.desde, faena__fecha_fin__gt=self.hasta,
+        ).order_by('personal_faena_id').first()
+        otras = PersonalFaena.objects.filter(activo=True).exclude(personal_id=self.asignacion.personal_id)
+        self.personas = [self.asignacion.personal_id, *otras.values_list('personal_id', flat=True).distinct()[:4]]
+
+    def consultar(self):
+        """Estados de las personas en el rango y (aciertos, fallos) del caché en la consulta"""
+        antes = estadisticas_cache()
+        respuesta = self.client.get('/get_estados/', {
+            'desde': self.desde, 'hasta': self.hasta, 'personas': ','.join(map(str, self.personas)),
+        })
+        despues = estadisticas_cache()
+        return respuesta.json()['results'], (despues['aciertos'] - antes['aciertos'], despues['fallos'] - antes['fallos'])
+
+    def sin_cache(self):
+        with self.settings(PLANNING_CACHE_ESTADOS=False):
+            return calcular_estados(Personal.objects.filter(personal_id__in=self.personas), self.desde, self.hasta)
+
+    def test_aciertos_fallos_e_invalidacion(self):
+        meses = 3 * len(self.personas)
+        results, contadores = self.consultar()
+        self.assertEqual(contadores, (0, meses))
+        self.assertEqual(self.consultar(), (results, (meses, 0)))
+
+        # Un ausentismo en febrero invalida ese mes de esa persona, pero recién al confirmar la transacción
+        personal_id = self.asignacion.personal_id
+        with transaction.atomic():
+            Ausentismo.objects.create(
+                personal_id_id=personal_id, tipoausen_id=TipoAusentismo.objects.first(),
+                fechaini=self.desde.replace(month=2, day=3), fechafin=self.desde.replace(month=2, day=7),
+            )
+            self.assertEqual(self.consultar(), (results, (meses, 0)))
+        nuevos, contadores = self.consultar()
+        self.assertEqual(contadores, (meses - 1, 1))
+        self.assertNotEqual(nuevos[str(personal_id)], results[str(personal_id)])
+        self.assertEqual(nuevos, self.sin_cache())
+
+        # Los update() de las vistas invalidan todos los meses de la asignación
+        self.client.post('/remove_personal_from_faena/', json.dumps({
+            'personal_id': personal_id, 'faena_id': self.asignacion.faena_id,
+        }), content_type='application/json')
+        nuevos, contadores = self.consultar()
+        self.assertEqual(contadores, (meses - 3, 3))
+        self.assertEqual(nuevos, self.sin_cache())
+
+    def test_un_calculo_anterior_al_cambio_no_queda_en_cache(self):
+        personal_id = self.asignacion.personal_id
+
+        def calcular_y_cambiar(personas, desde, hasta, clave_dia=None):
+            # Otro request confirma un cambio mientras esta consulta calcula con los datos anteriores
+            resultado = calcular_estados(personas, desde, hasta, clave_dia)
+            Ausentismo.objects.create(
+                personal_id_id=personal_id, tipoausen_id=TipoAusentismo.objects.first(),
+                fechaini=self.desde.replace(month=2, day=3), fechafin=self.desde.replace(month=2, day=7),
+            )
+            return resultado
+
+        anteriores = estados_con_cache(Personal.objects.filter(personal_id__in=self.personas), self.desde, self.hasta, calcular_y_cambiar)
+        nuevos, contadores = self.consultar()
+        self.assertEqual(contadores, (3 * len(self.personas) - 1, 1))
+        self.assertNotEqual(nuevos[str(personal_id)], anteriores[str(personal_id)])
+        self.assertEqual(nuevos, self.sin_cache())
+
+    def test_se_ignora_con_cache_por_proceso(self):
+        self.assertTrue(cache_activo())
+        self.assertEqual(revisar_cache_estados(None), [])
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertFalse(cache_activo())
+            self.assertEqual([aviso.id for aviso in revisar_cache_estados(None)], ['planning.W001'])
+            self.assertEqual(self.consultar()[1], (0, 0))
+
+
+class ValidadoresHTTPTests(TestCase):
+    """Las APIs del calendario responden 304 hasta que cambian los datos, en cualquier proceso"""
+
+    def setUp(self):
+        generar(escala=1)
+        self.persona = Personal.objects.filter(personalfaena__activo=True).order_by('personal_id').first()
+        self.parametros = {'month': 3, 'year': 2025, 'personas': str(self.persona.personal_id)}
+
+    def consultar(self, etag=None, **parametros):
+        cabeceras = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get('/get_estados/', {**self.parametros, **parametros}, **cabeceras)
+
+    def test_304_hasta_un_cambio(self):
+        etag = self.consultar()['ETag']
+        self.assertEqual(self.consultar(etag).status_code, 304)
+        # El anti-caché de jQuery no cambia la respuesta
+        self.assertEqual(self.consultar(etag, _='1700000000000').status_code, 304)
+        self.assertEqual(self.consultar(etag, month=4).status_code, 200)
+
+        Ausentismo.objects.create(
+            personal_id=self.persona, tipoausen_id=TipoAusentismo.objects.first(),
+            fechaini=FECHA_BASE.replace(month=3, day=3), fechafin=FECHA_BASE.replace(month=3, day=5),
+        )
+        respuesta = self.consultar(etag)
+        self.assertEqual(respuesta.status_code, 200)
+        etag = respuesta['ETag']
+
+        # Personal no tiene fecha de modificación: solo mueve la generación de cambios
+        self.persona.direccion = 'Nueva dirección 123'
+        self.persona.save()
+        self.assertEqual(self.consultar(etag).status_code, 200)
+
+    def test_remocion_sin_log_cambia_el_etag(self):
+        etag = self.consultar()['ETag']
+        asignacion = PersonalFaena.objects.filter(personal=self.persona, activo=True).first()
+        # Aunque falle la escritura de los logs, la remoción mueve la generación
+        with mock.patch.object(AuditLog.objects, 'bulk_create', side_effect=RuntimeError), \
+                self.assertLogs('planning.auditoria', 'ERROR'), self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post('/remove_personal_from_faena/', json.dumps({
+                'personal_id': self.persona.personal_id, 'faena_id': asignacion.faena_id,
+            }), content_type='application/json')
+        self.assertTrue(respuesta.json()['success'])
+        asignacion.refresh_from_db()
+        self.assertFalse(asignacion.activo)
+        self.assertGreater(asignacion.fecha_modificacion, timezone.now() - timezone.timedelta(minutes=1))
+        self.assertEqual(self.consultar(etag).status_code, 200)
+
+    def test_generacion_compartida(self):
+        etag = self.consultar()['ETag']
+        # La generación está en la base de datos: vaciar el caché (otro proceso, un reinicio) no la cambia
+        cache.clear()
+        self.assertEqual(self.consultar(etag).status_code, 304)
+        antes = generacion_cambios()
+        self.persona.save()
+        self.assertEqual(generacion_cambios(), antes + 1)
+
+
+class EscrituraAuditoriaTests(TestCase):
+    """Los logs de auditoría se escriben en lote y solo si la transacción se confirma"""
+
+    def log(self, descripcion):
+        return AuditLog.construir_log(accion='crear', tabla_afectada='Prueba', registro_id=1, descripcion=descripcion)
+
+    def test_remover_escribe_los_logs_juntos(self):
+        generar(escala=1)
+        personal_id = (
+            PersonalFaena.objects.values('personal_id')
+            .annotate(activas=Count('pk', filter=Q(activo=True)))
+            .filter(activas__gte=2)
+            .order_by('personal_id')
+            .values_list('personal_id', flat=True)
+            .first()
+        )
+        AuditLog.objects.all().delete()
+
+        with CaptureQueriesContext(connection) as consultas, self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post(
+                '/remove_personal_from_faena/', json.dumps({'personal_id': personal_id}), content_type='application/json',
+            )
+        self.assertTrue(respuesta.json()['success'])
+
+        inserts = [c['sql'] for c in consultas.captured_queries if c['sql'].startswith('INSERT INTO "AuditLog"')]
+        self.assertEqual(len(inserts), 1)
+        logs = AuditLog.objects.filter(accion='remover')
+        self.assertGreaterEqual(logs.count(), 2)
+        self.assertEqual(set(logs.values_list('personal_id', flat=True)), {personal_id})
+        self.assertFalse(logs.filter(cargo=None).exists())
+
+    def test_transaccion_revertida_descarta_sus_logs(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with lote_auditoria():
+                try:
+                    with transaction.atomic():
+                        registrar_log(self.log('revertido'))
+                        raise ValueError
+                except ValueError:
+                    pass
+                registrar_log(self.log('confirmado'))
+                self.assertFalse(AuditLog.objects.exists())
+
+        self.assertEqual(list(AuditLog.objects.values_list('descripcion', flat=True)), ['confirmado'])
+
+
+    def test_cola_reintenta_los_logs_que_no_se_escribieron(self):
+        cola = ColaAuditoria()
+        cola.logs = [self.log('primero'), self.log('segundo')]
+        with mock.patch.object(AuditLog.objects, 'bulk_create', side_effect=RuntimeError), \
+                self.assertLogs('planning.auditoria', 'ERROR'):
+            cola.vaciar()
+        self.assertEqual([log.descripcion for log in cola.logs], ['primero', 'segundo'])
+
+        cola.logs.append(self.log('tercero'))
+        cola.vaciar()
+        self.assertEqual(cola.logs, [])
+        self.assertEqual(list(AuditLog.objects.order_by('log_id').values_list('descripcion', flat=True)), ['primero', 'segundo', 'tercero'])
+
+    def test_vaciar_espera_la_escritura_en_curso(self):
+        cola = ColaAuditoria()
+        cola.logs = [self.log('pendiente')]
+        with mock.patch('planning.auditoria.escribir_logs', return_value=True) as escribir:
+            # Otra escritura (el hilo de fondo) está en curso: atexit la espera
+            cola.escritura.acquire()
+            vaciado = threading.Thread(target=cola.vaciar)
+            vaciado.start()
+            vaciado.join(timeout=0.2)
+            self.assertTrue(vaciado.is_alive())
+            escribir.assert_not_called()
+            cola.escritura.release()
+            vaciado.join()
+        escribir.assert_called_once()
+
+
+class MigracionColumnasAuditoriaTests(TransactionTestCase):
+    """La migración 0012 completa persona, faena y cargo de los logs que ya existían"""
+
+    antes = [('core', '0011_personaltermino')]
+    despues = [('core', '0012_auditlog_columnas')]
+
+    def setUp(self):
+        ejecutor = MigrationExecutor(connection)
+        ejecutor.migrate(self.antes)
+        self.addCleanup(self.migrar_todo)
+        self.apps = ejecutor.loader.project_state(self.antes).apps
+
+    def migrar_todo(self):
+        ejecutor = MigrationExecutor(connection)
+        ejecutor.migrate(ejecutor.loader.graph.leaf_nodes())
+
+    def log(self, fecha, tabla='PersonalFaena', registro_id=0, **datos):
+        AuditLog = self.apps.get_model('core', 'AuditLog')
+        log = AuditLog.objects.create(
+            accion='asignar', tabla_afectada=tabla, registro_id=registro_id, descripcion='', datos_nuevos=datos,
+        )
+        fecha_hora = timezone.make_aware(timezone.datetime(fecha.year, fecha.month, fecha.day, 12))
+        AuditLog.objects.filter(pk=log.pk).update(fecha_hora=fecha_hora)
+        return log.pk
+
+    def test_completar_columnas(self):
+        modelo = self.apps.get_model
+        depto = modelo('core', 'DeptoEmpresa').objects.create(depto='Operaciones')
+        empresa = modelo('core', 'Empresa').objects.create(nombre='Empresa')
+        persona = modelo('core', 'Personal').objects.create(
+            rut='12345678', dvrut='5', nombre='JUAN', apepat='PÉREZ', apemat='SOTO', correo='JUAN@EMPRESA.CL',
+        )
+        for fecha, cargo in ((date(2024, 1, 1), 'Operador'), (date(2025, 1, 1), 'Supervisor')):
+            modelo('core', 'InfoLaboral').objects.create(
+                personal_id=persona, empresa_id=empresa, depto_id=depto, fechacontrata=fecha,
+                cargo_id=modelo('core', 'Cargo').objects.create(depto_id=depto, cargo=cargo),
+            )
+        faena = modelo('core', 'Faena').objects.create(nombre='FAENA NORTE', fecha_inicio=date(2023, 1, 1), fecha_fin=date(2026, 1, 1))
+        asignacion = modelo('core', 'PersonalFaena').objects.create(personal=persona, faena=faena, fecha_inicio=date(2024, 1, 1))
+
+        logs = {
+            # Persona y faena desde la asignación; cargo vigente a la fecha del log
+            'primer_contrato': self.log(date(2024, 6, 1), registro_id=asignacion.pk),
+            'segundo_contrato': self.log(date(2025, 6, 1), registro_id=asignacion.pk),
+            # Log anterior a todos los contratos: el primero
+            'sin_contrato': self.log(date(2023, 6, 1), registro_id=asignacion.pk),
+            # Asignación eliminada: IDs del JSON
+            'desde_json': self.log(date(2025, 6, 1), registro_id=999, personal_id=str(persona.pk), faena_id=faena.pk),
+            # Persona y faena eliminadas: nombres y RUT del JSON
+            'eliminadas': self.log(
+                date(2025, 6, 1), registro_id=998, personal_id=997, faena_id=996,
+                personal_nombre='ANA ROJAS', personal_rut='11111111-1', faena_nombre='FAENA CERRADA',
+            ),
+        }
+
+        ejecutor = MigrationExecutor(connection)
+        ejecutor.migrate(self.despues)
+        AuditLog = ejecutor.loader.project_state(self.despues).apps.get_model('core', 'AuditLog')
+        columnas = ('personal_id', 'personal_nombre', 'rut', 'cargo', 'faena_id', 'faena_nombre')
+        completados = {nombre: AuditLog.objects.values_list(*columnas).get(pk=pk) for nombre, pk in logs.items()}
+
+        juan = (persona.pk, 'JUAN PÉREZ', '12345678-5')
+        self.assertEqual(completados, {
+            'primer_contrato': (*juan, 'Operador', faena.pk, 'FAENA NORTE'),
+            'segundo_contrato': (*juan, 'Supervisor', faena.pk, 'FAENA NORTE'),
+            'sin_contrato': (*juan, 'Operador', faena.pk, 'FAENA NORTE'),
+            'desde_json': (*juan, 'Supervisor', faena.pk, 'FAENA NORTE'),
+            'eliminadas': (997, 'ANA ROJAS', '11111111-1', None, 996, 'FAENA CERRADA'),
+        })
+
+
+class BusquedaPersonalTests(TestCase):
+    """buscar_personal encuentra por prefijo sin importar tildes y por RUT en cualquier formato"""
+
+    def setUp(self):
+        self.jose = self.crear('José Ignacio', 'Muñoz', 'Pérez', '12345678', '5')
+        self.josefa = self.crear('Josefa', 'Munizaga', 'Soto', '11111111', '1')
+        self.k = self.crear('Ana', 'Núñez', 'Díaz', '6', 'k')
+
+    def crear(self, nombre, apepat, apemat, rut, dvrut):
+        return Personal.objects.create(
+            nombre=nombre, apepat=apepat, apemat=apemat, rut=rut, dvrut=dvrut, correo=f'{rut}@empresa.cl',
+        )
+
+    def ids(self, consulta):
+        respuesta = self.client.get('/buscar_personal/', {'q': consulta})
+        self.assertEqual(respuesta.status_code, 200)
+        return [persona['id'] for persona in respuesta.json()['results']]
+
+    def test_prefijo_sin_tildes(self):
+        jose, josefa = self.jose.personal_id, self.josefa.personal_id
+        self.assertEqual(self.ids('munoz'), [jose])
+        self.assertEqual(self.ids('MUÑOZ'), [jose])
+        self.assertEqual(self.ids('mun'), [josefa, jose])  # por apellido
+        self.assertEqual(self.ids('jose'), [jose, josefa])  # primero la palabra completa
+        self.assertEqual(self.ids('josé mu'), [josefa, jose])
+        self.assertEqual(self.ids('nunez'), [self.k.personal_id])
+        self.assertEqual(self.ids('m'), [])  # menos de MIN_CARACTERES
+
+    def test_rut_en_cualquier_formato(self):
+        jose = self.jose.personal_id
+        for consulta in ('12.345.678-5', '12345678-5', '123456785', '12345678', '12.345.678', '1234'):
+            self.assertEqual(self.ids(consulta), [jose], consulta)
+        self.assertEqual(self.ids('12345678-0'), [])
+        self.assertEqual(self.ids('6-k'), [self.k.personal_id])
+        self.assertEqual(self.ids('6K'), [self.k.personal_id])
+
+    def test_reindexa_al_guardar(self):
+        self.jose.apepat = 'Rojas'
+        self.jose.save()
+        self.assertEqual(self.ids('munoz'), [])
+        self.assertEqual(self.ids('rojas'), [self.jose.personal_id])
+        self.assertEqual(
+            set(PersonalTermino.objects.filter(personal=self.jose).values_list('termino', flat=True)),
+            {'JOSE', 'IGNACIO', 'ROJAS', 'PEREZ', '12345678', '123456785'},
+        )
+
+
+class ArchivoAuditoriaTests(TestCase):
+    """get_audit_logs lee igual los logs movidos al archivo histórico"""
+
+    def logs(self, **filtros):
+        respuesta = self.client.get('/get_audit_logs/', {'limit': 40, **filtros}).json()
+        logs = respuesta['logs']
+        while respuesta['hay_mas']:
+            respuesta = self.client.get('/get_audit_logs/', {'limit': 40, 'before_id': logs[-1]['id'], **filtros}).json()
+            logs += respuesta['logs']
+        return logs
+
+    def test_archivar_conserva_el_historial(self):
+        generar(escala=1)
+        filtros = [{}, {'accion': 'remover'}, {'personal': 'GONZ'}, {'faena': str(Faena.objects.first().faena_id)}]
+        antes = [self.logs(**f) for f in filtros]
+        total = AuditLog.objects.count()
+        corte = AuditLog.objects.order_by('fecha_hora')[total // 2].fecha_hora
+
+        with tempfile.TemporaryDirectory() as directorio, override_settings(PLANNING_AUDITORIA_ARCHIVO=directorio):
+            dias = (timezone.now() - corte).days
+            resumen = archivar(horizonte=dias)
+            self.assertGreater(resumen['archivados'], 0)
+            self.assertEqual(AuditLog.objects.count() + resumen['archivados'], total)
+            self.assertEqual([self.logs(**f) for f in filtros], antes)
+
+            # Los datos sintéticos pueden tener logs con fecha futura
+            ultimo = AuditLog.objects.order_by('-fecha_hora')[0].fecha_hora
+            self.assertEqual(archivar(horizonte=(timezone.now() - ultimo).days - 1)['archivados'], total - resumen['archivados'])
+            self.assertFalse(AuditLog.objects.exists())
+            self.assertEqual([self.logs(**f) for f in filtros], antes)
+
+    def test_filtros_abren_solo_los_meses_que_pueden_cumplirlos(self):
+        generar(escala=1)
+        faena = Faena.objects.order_by('fecha_fin').first()
+        antes = self.logs(faena=str(faena.faena_id))
+        self.assertTrue(antes)
+
+        with tempfile.TemporaryDirectory() as directorio, override_settings(PLANNING_AUDITORIA_ARCHIVO=directorio):
+            ultimo = AuditLog.objects.order_by('-fecha_hora')[0].fecha_hora
+            archivar(horizonte=(timezone.now() - ultimo).days - 1)
+            segmentos = leer_indice(directorio).values()
+            con_faena = {s['archivo'] for s in segmentos if faena.faena_id in s['valores']['faena_id']}
+            self.assertLess(len(con_faena), len(segmentos))
+
+            with mock.patch('planning.archivo_auditoria._leer_segmento', wraps=archivo_auditoria._leer_segmento) as leer:
+                self.assertEqual(self.logs(faena=str(faena.faena_id)), antes)
+                self.assertEqual({os.path.basename(c.args[0]) for c in leer.call_args_list}, con_faena)
+
+                # Ningún mes tiene la acción: no se abre ninguno
+                leer.reset_mock()
+                self.assertEqual(self.logs(accion='sin coincidencias'), [])
+                leer.assert_not_called()
+
+
+    def test_archivo_conserva_los_microsegundos(self):
+        fecha = timezone.now().replace(microsecond=123456) - timezone.timedelta(days=30)
+        creados = [
+            AuditLog.objects.create(accion='crear', tabla_afectada='Prueba', registro_id=1, descripcion=str(i), fecha_hora=fecha + timezone.timedelta(microseconds=i))
+            for i in range(3)
+        ]
+        with tempfile.TemporaryDirectory() as directorio:
+            archivar(horizonte=1, directorio=directorio)
+            archivados = list(leer_archivados(directorio=directorio))
+        self.assertEqual([log.fecha_hora for log in archivados], [log.fecha_hora for log in reversed(creados)])
+
+
+class AsignacionLoteTests(TestCase):
+    """assign_personal_to_faena_bulk guarda todas las filas o ninguna"""
+
+    def setUp(self):
+        generar(escala=1)
+        self.faena = Faena.objects.order_by('faena_id').first()
+        self.personas = list(
+            Personal.objects.exclude(personalfaena__faena=self.faena).order_by('personal_id').values_list('personal_id', flat=True)[:20]
+        )
+
+    def asignar(self, filas, **datos):
+        return self.client.post('/assign_personal_to_faena_bulk/', json.dumps({
+            'faena_id': self.faena.faena_id,
+            'fecha_inicio': self.faena.fecha_inicio.strftime('%Y-%m-%d'),
+            'asignaciones': filas,
+            **datos,
+        }), content_type='application/json')
+
+    def test_asigna_todas_con_consultas_constantes(self):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.asignar([{'personal_id': p} for p in self.personas])
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['creadas'], len(self.personas))
+        self.assertLessEqual(len(consultas), 20)
+        activas = PersonalFaena.objects.filter(faena=self.faena, activo=True, personal_id__in=self.personas)
+        self.assertEqual(activas.count(), len(self.personas))
+
+    def test_una_fila_invalida_no_guarda_ninguna(self):
+        filas = [{'personal_id': p} for p in self.personas]
+        filas.append({'personal_id': self.personas[0]})
+        filas.append({'personal_id': self.personas[1], 'fecha_inicio': '2000-01-01'})
+        respuesta = self.asignar(filas)
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual([e['indice'] for e in respuesta.json()['errores']], [len(self.personas), len(self.personas) + 1])
+        self.assertFalse(PersonalFaena.objects.filter(faena=self.faena, personal_id__in=self.personas).exists())
+
+    def test_turno_del_lote_en_filas_sin_turno(self):
+        turno = self.faena.tipo_turno
+        filas = [{'personal_id': self.personas[0]}, {'personal_id': self.personas[1], 'turno_id': None}]
+        respuesta = self.asignar(filas, turno_id=turno.pk)
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        turnos = PersonalFaena.objects.filter(faena=self.faena, personal_id__in=self.personas[:2]).values_list('tipo_turno_id', flat=True)
+        self.assertEqual(list(turnos), [turno.pk, turno.pk])
+
+
+class RemocionLoteTests(TestCase):
+    """remove_personal_from_faena_bulk remueve con un UPDATE y un INSERT de logs"""
+
+    def setUp(self):
+        generar(escala=1)
+        self.faena = (
+            Faena.objects.filter(personalfaena__activo=True)
+            .annotate(activas=Count('personalfaena')).filter(activas__gte=2).order_by('faena_id').first()
+        )
+        self.activas = PersonalFaena.objects.filter(faena=self.faena, activo=True)
+
+    def remover(self, datos):
+        return self.client.post('/remove_personal_from_faena_bulk/', json.dumps({
+            'faena_id': self.faena.faena_id, **datos,
+        }), content_type='application/json')
+
+    def test_remocion_de_todo_el_personal(self):
+        cantidad = self.activas.count()
+        fecha = timezone.localdate()
+        ultimo_log = AuditLog.objects.order_by('-log_id').values_list('log_id', flat=True).first() or 0
+        with CaptureQueriesContext(connection) as consultas, self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.remover({'todos': True, 'fecha': fecha.strftime('%Y-%m-%d')})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['removidas'], cantidad)
+        self.assertFalse(respuesta.json()['faena_cerrada'])
+        self.assertFalse(self.activas.exists())
+
+        sql = [c['sql'] for c in consultas.captured_queries]
+        self.assertEqual(len([s for s in sql if s.startswith('UPDATE "PersonalFaena" SET "activo"')]), 1)
+        # Un bulk_create: SQLite lo parte en lotes según su límite de parámetros
+        campos = [campo for campo in AuditLog._meta.concrete_fields if not campo.primary_key]
+        lotes = -(-cantidad // connection.ops.bulk_batch_size(campos, [None] * cantidad))
+        self.assertEqual(len([s for s in sql if s.startswith('INSERT INTO "AuditLog"')]), lotes)
+        logs = AuditLog.objects.filter(log_id__gt=ultimo_log, accion='remover', faena_id=self.faena.faena_id)
+        self.assertEqual(logs.count(), cantidad)
+        self.assertEqual(logs.first().datos_nuevos['fecha_remocion'], fecha.strftime('%Y-%m-%d'))
+
+    def test_los_dias_anteriores_a_la_remocion_se_siguen_mostrando(self):
+        hoy = timezone.localdate()
+        fecha = hoy - timezone.timedelta(days=10)
+        asignacion = PersonalFaena.objects.filter(
+            activo=True, fecha_inicio__lte=hoy - timezone.timedelta(days=40), faena__fecha_fin__gt=hoy,
+        ).order_by('personal_faena_id').first()
+
+        def estados():
+            """Estados de la persona antes de la fecha de remoción y desde ella"""
+            respuesta = self.client.get('/get_estados/', {
+                'desde': hoy - timezone.timedelta(days=40), 'hasta': hoy, 'personas': asignacion.personal_id,
+            })
+            dias = respuesta.json()['results'][str(asignacion.personal_id)]
+            return (
+                {dia: e for dia, e in dias.items() if dia < fecha.isoformat()},
+                {dia: e for dia, e in dias.items() if dia >= fecha.isoformat()},
+            )
+
+        antes, desde_remocion = estados()
+        respuesta = self.client.post('/remove_personal_from_faena_bulk/', json.dumps({
+            'faena_id': asignacion.faena_id, 'personal_ids': [asignacion.personal_id], 'fecha': fecha.strftime('%Y-%m-%d'),
+        }), content_type='application/json')
+        self.assertEqual(respuesta.json()['removidas'], 1)
+        asignacion.refresh_from_db()
+        self.assertFalse(asignacion.activo)
+        self.assertEqual(asignacion.fecha_termino, fecha - timezone.timedelta(days=1))
+        removida = estados()
+
+        # Los días anteriores no cambian; desde la remoción, como si no tuviera la asignación
+        self.assertEqual(removida[0], antes)
+        PersonalFaena.objects.filter(pk=asignacion.pk).update(fecha_termino=None)
+        sin_asignacion = estados()
+        self.assertNotEqual(sin_asignacion[0], antes)
+        self.assertEqual(removida[1], sin_asignacion[1])
+        self.assertNotEqual(removida[1], desde_remocion)
+
+        # Reactivarla la vuelve a mostrar completa
+        PersonalFaena.objects.filter(pk=asignacion.pk).update(fecha_termino=fecha)
+        asignacion.refresh_from_db()
+        asignacion.activo = True
+        asignacion.save()
+        self.assertIsNone(asignacion.fecha_termino)
+        self.assertEqual(estados(), (antes, desde_remocion))
+
+    def test_fecha_futura(self):
+        cantidad = self.activas.count()
+        manana = (timezone.localdate() + timezone.timedelta(days=1)).strftime('%Y-%m-%d')
+        self.assertEqual(self.remover({'todos': True, 'fecha': manana}).status_code, 400)
+        self.assertEqual(self.activas.count(), cantidad)
+
+    def test_cierre_de_faena(self):
+        cantidad = self.activas.count()
+        fecha = self.faena.fecha_inicio + timezone.timedelta(days=1)
+        ultimo_log = AuditLog.objects.order_by('-log_id').values_list('log_id', flat=True).first() or 0
+        with CaptureQueriesContext(connection) as consultas, self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.remover({'todos': True, 'cerrar': True, 'fecha': fecha.strftime('%Y-%m-%d')})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['removidas'], 0)
+        self.assertTrue(respuesta.json()['faena_cerrada'])
+        self.faena.refresh_from_db()
+        self.assertEqual(self.faena.fecha_fin, fecha)
+
+        # El personal sigue asignado hasta el cierre: no se desactiva a nadie
+        self.assertEqual(self.activas.count(), cantidad)
+        self.assertFalse(self.activas.filter(Q(fecha_fin_calculada__isnull=True) | Q(fecha_fin_calculada__gt=fecha)).exists())
+        sql = [c['sql'] for c in consultas.captured_queries]
+        self.assertFalse([s for s in sql if s.startswith('UPDATE "PersonalFaena" SET "activo"')])
+        logs = AuditLog.objects.filter(log_id__gt=ultimo_log, faena_id=self.faena.faena_id)
+        self.assertEqual(list(logs.values_list('accion', 'tabla_afectada')), [('editar', 'Faena')])
+        self.assertEqual(logs[0].datos_nuevos['fecha_fin'], fecha.strftime('%Y-%m-%d'))
+
+    def test_lista_de_personas(self):
+        personal_id = self.activas.order_by('personal_id').values_list('personal_id', flat=True).first()
+        respuesta = self.remover({'personal_ids': [personal_id, 0]})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['sin_asignacion'], [0])
+        self.assertFalse(self.activas.filter(personal_id=personal_id).exists())
+        self.assertTrue(self.activas.exists())
+
+        self.assertEqual(self.remover({'personal_ids': [personal_id], 'todos': True}).status_code, 400)
+        self.assertEqual(self.remover({'personal_ids': [personal_id], 'cerrar': True}).status_code, 400)
+
+
+class PerfilSQLiteTests(TestCase):
+    """Los PRAGMA de PLANNING_SQLITE_PRAGMAS se aplican a cada conexión nueva"""
+
+    def conectar(self, directorio):
+        conexion = connections['default'].__class__({**connection.settings_dict, 'NAME': os.path.join(directorio, 'perfil.sqlite3')}, 'perfil')
+        conexion.ensure_connection()
+        self.addCleanup(conexion.close)
+        return leer_pragmas(conexion.connection)
+
+    def test_perfil_por_defecto(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            pragmas = self.conectar(directorio)
+        # Conectarse no cambia el modo guardado en el archivo (ni synchronous, que sin WAL no es seguro bajar)
+        self.assertEqual(pragmas['journal_mode'], 'delete')
+        self.assertEqual(pragmas['synchronous'], 2)  # FULL
+        self.assertEqual(pragmas['busy_timeout'], 5000)
+        self.assertEqual(pragmas['cache_size'], -64 * 1024)
+
+    def test_configurable(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            with override_settings(PLANNING_SQLITE_PRAGMAS={'busy_timeout': 250, 'journal_mode': 'WAL'}):
+                pragmas = self.conectar(directorio)
+        self.assertEqual(pragmas['journal_mode'], 'wal')
+        self.assertEqual(pragmas['busy_timeout'], 250)
+        self.assertEqual(pragmas['synchronous'], 1)  # NORMAL
+
+    def test_modo_journal(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            nombre = os.path.join(directorio, 'perfil.sqlite3')
+            conexion = connections['default'].__class__({**connection.settings_dict, 'NAME': nombre}, 'perfil')
+            self.assertEqual(cambiar_modo_journal(conexion, 'wal'), 'wal')
+            conexion.close()
+            # El modo queda en el archivo y las conexiones siguientes usan synchronous NORMAL
+            pragmas = self.conectar(directorio)
+        self.assertEqual(pragmas['journal_mode'], 'wal')
+        self.assertEqual(pragmas['synchronous'], 1)
+
+
+@override_settings(PLANNING_CACHE_ESTADOS=False)
+class PlanesConsultaTests(TestCase):
+    """Las consultas del calendario buscan por índice en las tablas que crecen (EXPLAIN QUERY PLAN)"""
+
+    TABLAS = {modelo._meta.db_table for modelo in (PersonalFaena, Ausentismo, LicenciaMedicaPorPersonal)}
+
+    @classmethod
+    def setUpTestData(cls):
+        generar(escala=1)
+
+    def planes(self, funcion):
+        """Pasos de los planes de los SELECT que ejecuta la función: lista de (detalle, sql)"""
+        consultas = []
+
+        def capturar(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith('SELECT'):
+                consultas.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capturar):
+            self.assertEqual(funcion().status_code, 200)
+
+        pasos = []
+        with connection.cursor() as cursor:
+            for sql, params in consultas:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                pasos.extend((detalle, sql) for *_, detalle in cursor.fetchall())
+        return pasos
+
+    def escenarios(self):
+        cargos = {'cargos[]': list(Cargo.objects.values_list('cargo_id', flat=True))}
+        mes = {**cargos, 'month': FECHA_BASE.month, 'year': FECHA_BASE.year}
+        faena = Faena.objects.filter(personalfaena__activo=True).order_by('faena_id').first()
+        personas = ','.join(map(str, Personal.objects.values_list('personal_id', flat=True)))
+        de_faena = ','.join(map(str, PersonalFaena.objects.filter(faena=faena, activo=True).values_list('personal_id', flat=True)))
+        return {
+            'get_personas': lambda: self.client.get('/get_personas/', cargos),
+            'get_personas (faena)': lambda: self.client.get('/get_personas/', {**cargos, 'faena_id': faena.faena_id}),
+            'get_estados (mes)': lambda: self.client.get('/get_estados/', {**mes, 'personas': personas}),
+            'get_estados (faena)': lambda: self.client.get('/get_estados/', {**mes, 'personas': de_faena}),
+            'get_grid': lambda: self.client.get('/get_grid/', {**mes, 'formato': 'compacto', 'limit': 100}),
+        }
+
+    def test_sin_recorridos_completos(self):
+        for nombre, funcion in self.escenarios().items():
+            with self.subTest(nombre):
+                escaneos = [
+                    f'{detalle}: {sql}' for detalle, sql in self.planes(funcion)
+                    if (tabla := re.match(r'SCAN (\w+)', detalle)) and tabla.group(1) in self.TABLAS
+                ]
+                self.assertEqual(escaneos, [])
+
+    def test_estados_usan_indices_compuestos(self):
+        usados = {detalle for detalle, _ in self.planes(self.escenarios()['get_estados (mes)'])}
+        for indice in ('personalfaena_activa', 'ausentismo_personal_fechas', 'licencia_personal_fechas', 'personalfaena_modificacion'):
+            with self.subTest(indice):
+                self.assertTrue(any(re.search(rf'INDEX {indice}\b', detalle) for detalle in usados), usados)
+
+
+class FechaFinCalculadaTests(TestCase):
+    """PersonalFaena.fecha_fin_calculada se guarda y activas_en la consulta en SQL"""
+
+    def setUp(self):
+        generar(escala=1)
+
+    def assertFechasAlDia(self):
+        asignaciones = PersonalFaena.objects.select_related('faena__tipo_turno', 'tipo_turno')
+        self.assertEqual(
+            {a.pk: a.fecha_fin_calculada for a in asignaciones},
+            {a.pk: a.calcular_fecha_fin() for a in asignaciones},
+        )
+
+    @override_settings(PLANNING_ROSTER_MATERIALIZADO=True)
+    def test_se_mantiene_al_cambiar_faena_y_turno(self):
+        self.assertFechasAlDia()
+
+        faena = Faena.objects.filter(personalfaena__activo=True).order_by('faena_id').first()
+        faena.fecha_fin -= timezone.timedelta(days=20)
+        with CaptureQueriesContext(connection) as consultas:
+            faena.save()
+        self.assertFechasAlDia()
+
+        turno = faena.tipo_turno
+        turno.dias_trabajo += 3
+        with CaptureQueriesContext(connection) as consultas_turno:
+            turno.save()
+        self.assertFechasAlDia()
+
+        # Los valores anteriores se leen una sola vez por guardado
+        for capturadas, tabla in ((consultas, 'Faena'), (consultas_turno, 'TipoTurno')):
+            sql = [c['sql'] for c in capturadas.captured_queries]
+            self.assertEqual(len([s for s in sql if s.startswith('SELECT') and f'FROM "{tabla}" WHERE' in s]), 1)
+
+        asignacion = PersonalFaena.objects.filter(faena=faena).first()
+        asignacion.fecha_inicio += timezone.timedelta(days=1)
+        asignacion.save(update_fields=['fecha_inicio'])
+        self.assertFechasAlDia()
+
+    def test_activas_en_una_consulta(self):
+        fecha = FECHA_BASE
+        esperadas = {
+            a.pk for a in PersonalFaena.objects.all()
+            if a.activo and a.fecha_inicio <= fecha and (a.fecha_fin_calculada is None or fecha <= a.fecha_fin_calculada)
+        }
+        self.assertTrue(esperadas)
+        with self.assertNumQueries(1):
+            self.assertEqual(set(PersonalFaena.objects.activas_en(fecha).values_list('pk', flat=True)), esperadas)
+        self.assertNotIn('SCAN PersonalFaena', PersonalFaena.objects.activas_en(fecha).explain())
+
+        asignacion = PersonalFaena.objects.get(pk=min(esperadas))
+        self.assertIn(asignacion.pk, {a.pk for a in asignacion.faena.personalfaena_set.activas_entre(fecha, fecha)})
+        self.assertEqual(
+            set(asignacion.personal.faenas_activas.values_list('pk', flat=True)),
+            set(PersonalFaena.objects.activas_en().filter(personal=asignacion.personal).values_list('pk', flat=True)),
+        )
+
+
+def turnos_dia_a_dia(desde, hasta):
+    """
+    Turno de cada asignación activa día por día, con las reglas del calendario sin el motor de turnos
+
+    Retorna: dict {(faena, persona, día): 'trabajo' o 'descanso'}; si una
+    persona tiene dos asignaciones a la misma faena, gana 'trabajo'
+    """
+    dias = [desde + timezone.timedelta(days=i) for i in range((hasta - desde).days + 1)]
+    turno = {}
+    for a in PersonalFaena.objects.en_calendario().select_related('faena__tipo_turno', 'tipo_turno'):
+        t = a.turno_efectivo
+        fin = fin_asignacion(a.faena.fecha_fin, a.fecha_termino)
+        for dia in dias:
+            transcurridos = (dia - a.fecha_inicio).days
+            if transcurridos < 0 or (fin and dia > fin):
+                continue
+            if t and t.dias_trabajo and t.dias_descanso:
+                estado = 'trabajo' if transcurridos % (t.dias_trabajo + t.dias_descanso) < t.dias_trabajo else 'descanso'
+            elif transcurridos <= DIAS_SIN_TURNO:
+                estado = 'trabajo'
+            else:
+                continue
+            clave = (a.faena_id, a.personal_id, dia)
+            if turno.get(clave) != 'trabajo':
+                turno[clave] = estado
+    return turno
+
+
+class ConsultaPorRango:
+    """Consulta de un endpoint de toda la empresa por rango de fechas (mezcla para los tests)"""
+
+    url = None
+    desde = FECHA_BASE
+    hasta = FECHA_BASE + timezone.timedelta(days=89)
+
+    def consultar(self, **parametros):
+        respuesta = self.client.get(self.url, {'desde': self.desde, 'hasta': self.hasta, **parametros})
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def assertConsultasConstantes(self):
+        """La cantidad de consultas no crece con los datos; retorna la respuesta con más datos"""
+        with CaptureQueriesContext(connection) as pocas:
+            self.consultar()
+        generar(escala=3)
+        with CaptureQueriesContext(connection) as muchas:
+            datos = self.consultar()
+        self.assertEqual(len(muchas), len(pocas))
+        return datos
+
+    def assertRangoLimitado(self):
+        self.assertEqual(self.client.get(self.url, {'desde': '2025-01-01', 'hasta': '2026-12-31'}).status_code, 400)
+
+
+class DotacionTests(ConsultaPorRango, TestCase):
+    """get_dotacion cuenta por faena, cargo y día lo mismo que un cálculo día a día"""
+
+    url = '/get_dotacion/'
+
+    def esperada(self):
+        """Dotación calculada persona por persona y día por día"""
+        cargos = InfoLaboral.objects.cargos_vigentes(Personal.objects.values('personal_id'))
+
+        def ausente(registros, personal_id, dia, descanso):
+            return any(
+                r.personal_id_id == personal_id and r.fechaini <= dia <= r.fechafin
+                and ('descanso' in r.tipoausen_id.tipo.lower()) == descanso
+                for r in registros
+            )
+
+        ausentismos = list(Ausentismo.objects.select_related('tipoausen_id'))
+        licencias = list(LicenciaMedicaPorPersonal.objects.all())
+        conteos = {}
+        for (faena_id, personal_id, dia), estado in turnos_dia_a_dia(self.desde, self.hasta).items():
+            if any(l.personal_id_id == personal_id and l.fechaEmision <= dia <= l.fecha_fin_licencia for l in licencias) \
+                    or ausente(ausentismos, personal_id, dia, descanso=False):
+                categoria = 'licencia'
+            elif estado == 'trabajo' and not ausente(ausentismos, personal_id, dia, descanso=True):
+                categoria = 'trabajando'
+            else:
+                categoria = 'descansando'
+            clave = (faena_id, cargos.get(personal_id) or 'Sin cargo asignado', categoria, (dia - self.desde).days)
+            conteos[clave] = conteos.get(clave, 0) + 1
+        return conteos
+
+    def test_igual_al_calculo_dia_a_dia(self):
+        generar(escala=1)
+        conteos = {}
+        for faena in self.consultar()['faenas']:
+            for cargo in faena['cargos']:
+                for categoria in ('trabajando', 'descansando', 'licencia'):
+                    for i, cantidad in enumerate(cargo[categoria]):
+                        if cantidad:
+                            conteos[(faena['faena_id'], cargo['cargo'], categoria, i)] = cantidad
+        esperada = self.esperada()
+        self.assertTrue(any(clave[2] == 'licencia' for clave in esperada))
+        self.assertEqual(conteos, esperada)
+
+    def test_consultas_constantes(self):
+        generar(escala=1)
+        datos = self.assertConsultasConstantes()
+        faena = datos['faenas'][0]
+        por_faena = self.consultar(faena_id=faena['faena_id'])
+        self.assertEqual(por_faena['faenas'], [faena])
+        self.assertEqual(len(por_faena['dias']), 90)
+
+    def test_parametros_invalidos(self):
+        self.assertRangoLimitado()
+        self.assertEqual(self.client.get(self.url, {'month': 1, 'year': 2025, 'faena_id': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'month': 2, 'year': 2025}).json()['dias'][-1], '28')
+
+
+class ConflictosTests(ConsultaPorRango, TestCase):
+    """get_conflictos encuentra los mismos días en conflicto que un cálculo día a día"""
+
+    url = '/get_conflictos/'
+
+    def setUp(self):
+        generar(escala=1)
+        # Una persona asignada a dos faenas vigentes desde el primer día del rango
+        persona = Personal.objects.first()
+        for faena in Faena.objects.filter(Q(fecha_fin__isnull=True) | Q(fecha_fin__gte=self.hasta))[:2]:
+            PersonalFaena.objects.create(personal=persona, faena=faena, fecha_inicio=self.desde)
+
+    def esperados(self):
+        """Días en conflicto por (tipo, persona, faena, registro), calculados día por día"""
+        trabajo = {}  # (persona, día) → faenas con día de trabajo
+        for (faena_id, personal_id, dia), estado in turnos_dia_a_dia(self.desde, self.hasta).items():
+            if estado == 'trabajo':
+                trabajo.setdefault((personal_id, dia), set()).add(faena_id)
+
+        esperados = {}
+        for (personal_id, dia), faenas in trabajo.items():
+            claves = [('doble_asignacion', personal_id, min(faenas), max(faenas))] if len(faenas) > 1 else []
+            claves += [
+                ('licencia', personal_id, faena_id, l.pk)
+                for l in LicenciaMedicaPorPersonal.objects.filter(personal_id=personal_id) for faena_id in faenas
+                if l.fechaEmision <= dia <= l.fecha_fin_licencia
+            ]
+            claves += [
+                ('ausentismo', personal_id, faena_id, a.pk)
+                for a in Ausentismo.objects.filter(personal_id=personal_id) for faena_id in faenas
+                if a.fechaini <= dia <= a.fechafin
+            ]
+            for clave in claves:
+                esperados.setdefault(clave, []).append(dia.isoformat())
+        return {clave: (min(d), max(d), len(d)) for clave, d in esperados.items()}
+
+    def test_igual_al_calculo_dia_a_dia(self):
+        datos = self.consultar()
+        conflictos = {
+            (
+                c['tipo'], c['personal_id'], c['faena_id'],
+                c.get('licencia_id') or c.get('ausentismo_id') or c.get('otra_faena_id'),
+            ): (c['desde'], c['hasta'], c['dias'])
+            for c in datos['conflictos']
+        }
+        self.assertEqual(len(conflictos), datos['total'])
+        self.assertEqual(conflictos, self.esperados())
+        self.assertEqual(datos['resumen']['doble_asignacion'], 1)
+        self.assertTrue(datos['resumen']['licencia'] and datos['resumen']['ausentismo'])
+
+    def test_consultas_constantes(self):
+        self.assertConsultasConstantes()
+
+    def test_parametros_invalidos(self):
+        self.assertRangoLimitado()
+        self.assertEqual(self.client.get(self.url, {'desde': '2025-01-01'}).status_code, 400)
+
+
+class IntervalosTests(SimpleTestCase):
+    """superposiciones y tramos_de_trabajo, los bloques del cálculo de conflictos"""
+
+    def test_superposiciones_bordes(self):
+        def pares(intervalos):
+            return sorted(superposiciones(intervalos))
+
+        # Intervalos inclusive: se tocan el mismo día, o son contiguos sin superponerse
+        self.assertEqual(pares([(1, 1, 5, 'a'), (1, 5, 8, 'b')]), [(1, 5, 5, 'a', 'b')])
+        self.assertEqual(pares([(1, 1, 4, 'a'), (1, 5, 8, 'b')]), [])
+        # Anidados: el exterior con cada interior, los interiores disjuntos no
+        self.assertEqual(
+            pares([(1, 6, 7, 'c'), (1, 1, 10, 'a'), (1, 3, 4, 'b')]),
+            [(1, 3, 4, 'a', 'b'), (1, 6, 7, 'a', 'c')],
+        )
+        # Mismo inicio: valor_a es el que aparece primero; idénticos
+        self.assertEqual(pares([(1, 2, 5, 'a'), (1, 2, 3, 'b')]), [(1, 2, 3, 'a', 'b')])
+        self.assertEqual(pares([(1, 2, 2, 'a'), (1, 2, 2, 'b')]), [(1, 2, 2, 'a', 'b')])
+        # Solo pares de una misma persona
+        self.assertEqual(pares([(1, 1, 5, 'a'), (2, 1, 5, 'b')]), [])
+        self.assertEqual(pares([]), [])
+
+    def test_superposiciones_igual_a_comparar_todos_los_pares(self):
+        azar = random.Random(7)
+        intervalos = []
+        for i in range(300):
+            inicio = azar.randrange(100)
+            intervalos.append((azar.randrange(5), inicio, inicio + azar.randrange(15), i))
+        esperados = set()
+        for a in intervalos:
+            for b in intervalos:
+                if a[0] == b[0] and a[3] < b[3] and a[1] <= b[2] and b[1] <= a[2]:
+                    esperados.add((a[0], max(a[1], b[1]), min(a[2], b[2]), a[3], b[3]))
+        encontrados = [(p, desde, hasta, *sorted((va, vb))) for p, desde, hasta, va, vb in superposiciones(intervalos)]
+        self.assertEqual(len(encontrados), len(esperados))
+        self.assertEqual(set(encontrados), esperados)
+
+    def test_tramos_de_trabajo(self):
+        o = FECHA_BASE.toordinal()
+
+        def tramos(inicio, fin_faena, trabajo, descanso, desde, hasta):
+            dia = lambda n: None if n is None else FECHA_BASE + timezone.timedelta(days=n)
+            return [(a - o, b - o) for a, b in tramos_de_trabajo(dia(inicio), dia(fin_faena), trabajo, descanso, dia(desde), dia(hasta))]
+
+        # Turno 2x1: trabaja los días 0-1, 3-4, 6-7...
+        self.assertEqual(tramos(0, None, 2, 1, 0, 8), [(0, 1), (3, 4), (6, 7)])
+        # El rango corta los tramos en sus bordes (empieza a mitad de un tramo o en un descanso)
+        self.assertEqual(tramos(0, None, 2, 1, 1, 6), [(1, 1), (3, 4), (6, 6)])
+        self.assertEqual(tramos(0, None, 2, 1, 2, 4), [(3, 4)])
+        # La faena termina a mitad de un tramo; rangos antes del inicio o después del fin
+        self.assertEqual(tramos(0, 3, 2, 1, 0, 8), [(0, 1), (3, 3)])
+        self.assertEqual(tramos(5, None, 2, 1, 0, 4), [])
+        self.assertEqual(tramos(0, 3, 2, 1, 4, 8), [])
+        # Sin turno: los DIAS_SIN_TURNO días siguientes al inicio
+        self.assertEqual(tramos(0, None, None, None, 0, 60), [(0, DIAS_SIN_TURNO)])
+        self.assertEqual(tramos(0, None, 7, 0, 10, 60), [(10, DIAS_SIN_TURNO)])
+        self.assertEqual(tramos(0, None, None, None, DIAS_SIN_TURNO + 1, 60), [])
+
+    def test_tramos_igual_a_las_mascaras(self):
+        desde, hasta = FECHA_BASE, FECHA_BASE + timezone.timedelta(days=59)
+        casos = [
+            (inicio, fin, trabajo, descanso)
+            for inicio in (-20, 0, 13)
+            for fin in (None, 25, 70)
+            for trabajo, descanso in ((7, 7), (14, 7), (4, 3), (None, None))
+        ]
+        for inicio, fin, trabajo, descanso in casos:
+            fecha_inicio = FECHA_BASE + timezone.timedelta(days=inicio)
+            fecha_fin = FECHA_BASE + timezone.timedelta(days=fin) if fin is not None else None
+            mascara, _ = calcular_mascaras(
+                [{'fecha_inicio': fecha_inicio, 'fecha_fin_faena': fecha_fin, 'dias_trabajo': trabajo, 'dias_descanso': descanso}],
+                desde, hasta,
+            )
+            dias = {a + i for a, b in tramos_de_trabajo(fecha_inicio, fecha_fin, trabajo, descanso, desde, hasta) for i in range(b - a + 1)}
+            with self.subTest(inicio=inicio, fin=fin, turno=(trabajo, descanso)):
+                self.assertEqual(dias, {desde.toordinal() + i for i in mascara[0].nonzero()[0]})
+
+
+class AdminTablasGrandesTests(TestCase):
+    """Los listados del admin de AuditLog y PersonalFaena no recorren las tablas completas"""
+
+    def setUp(self):
+        generar(escala=1)
+        usuario = User.objects.create_superuser('admin', 'admin@empresa.cl', 'clave')
+        self.client.force_login(usuario)
+
+    def consultas(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta, [consulta['sql'] for consulta in consultas]
+
+    def test_jerarquia_de_fechas_igual_a_django(self):
+        for tipo in ('year', 'month', 'day'):
+            with self.subTest(tipo=tipo):
+                self.assertEqual(
+                    FechasIndexadas(AuditLog.objects.all(), 'fecha_hora').periodos(tipo),
+                    list(AuditLog.objects.datetimes('fecha_hora', tipo)),
+                )
+                self.assertEqual(
+                    FechasIndexadas(PersonalFaena.objects.all(), 'fecha_inicio').periodos(tipo),
+                    list(PersonalFaena.objects.dates('fecha_inicio', tipo)),
+                )
+
+    def test_auditlog_sin_distinct_ni_conteo_completo(self):
+        log = AuditLog.objects.order_by('log_id').first()
+        fecha = timezone.localtime(log.fecha_hora)
+        for url in (
+            '/admin/core/auditlog/',
+            f'/admin/core/auditlog/?accion={log.accion}',
+            f'/admin/core/auditlog/?fecha_hora__year={fecha.year}&fecha_hora__month={fecha.month}',
+        ):
+            with self.subTest(url=url):
+                respuesta, consultas = self.consultas(url)
+                self.assertFalse([sql for sql in consultas if 'DISTINCT' in sql])
+                self.assertFalse([sql for sql in consultas if 'COUNT(' in sql and 'LIMIT' not in sql])
+                # Los valores de los filtros y la jerarquía salen de las búsquedas en los índices
+                self.assertContains(respuesta, f'?accion={log.accion}')
+                self.assertContains(respuesta, f'fecha_hora__year={fecha.year}')
+
+    def test_personalfaena_vigencia_anotada(self):
+        url = '/admin/core/personalfaena/?vigente=si&o=8'
+        _, pocas = self.consultas(url)
+        generar(escala=3)
+        respuesta, muchas = self.consultas(url)
+        self.assertEqual(len(muchas), len(pocas))
+        filas = respuesta.context['cl'].result_list
+        self.assertTrue(filas)
+        self.assertTrue(all(fila.vigente == fila.esta_activa for fila in filas))
+        self.assertEqual(
+            respuesta.context['cl'].result_count,
+            min(PersonalFaena.objects.activas_en().count(), LIMITE_CONTEO),
+        )
@@ -0,0 +1,154 @@
+"""
+Motor vectorizado de ciclos de turno
+
+Calcula en bloque, para todas las asignaciones PersonalFaena de una consulta,
+qué días de un rango son de trabajo, de descanso o quedan fuera de la faena.
+En lugar de recorrer día por día cada asignación, se arma una matriz
+asignación × día y se resuelve con unas pocas operaciones de arreglos NumPy.
+"""
+
+from datetime import date
+
+import numpy as np
+
+
+# Días que se considera "en faena" a una asignación sin turno definido
+DIAS_SIN_TURNO = 30
+
+# Ordinal usado como fecha fin cuando la faena no tiene fecha de término
+_SIN_FECHA_FIN = date.max.toordinal()
+
+
+def calcular_mascaras(asignaciones, desde, hasta):
+    """
+    Calcular las máscaras de trabajo y descanso de cada asignación
+
+    Cada asignación es un dict con:
+    - fecha_inicio: fecha de inicio de la asignación
+    - dias_trabajo / dias_descanso: turno efectivo (None si no tiene turno)
+    - fecha_fin_faena: fecha de término de la faena (None si no tiene)
+
+    Reglas (las mismas del cálculo día a día original):
+    - Con turno: el día está en trabajo si (dias desde inicio % ciclo) < dias_trabajo,
+      si no está en descanso. Nunca antes del inicio ni después del fin de la faena.
+    - Sin turno: en faena los DIAS_SIN_TURNO días siguientes al inicio,
+      respetando la fecha fin de la faena.
+
+    Retorna: tupla (trabajo, descanso) de matrices booleanas asignación × día,
+    donde la columna 0 corresponde a `desde` y la última a `hasta`
+    """
+    n_dias = (hasta - desde).days + 1
+    n = len(asignaciones)
+    if n == 0 or n_dias <= 0:
+        vacia = np.zeros((n, max(n_dias, 0)), dtype=bool)
+        return vacia, vacia.copy()
+
+    inicio = np.fromiter((a['fecha_inicio'].toordinal() for a in asignaciones), dtype=np.int64, count=n)
+    fin = np.fromiter(
+        (a['fecha_fin_faena'].toordinal() if a['fecha_fin_faena'] else _SIN_FECHA_FIN for a in asignaciones),
+        dtype=np.int64, count=n,
+    )
+    trabajo = np.fromiter((a['dias_trabajo'] or 0 for a in asignaciones), dtype=np.int64, count=n)
+    descanso = np.fromiter((a['dias_descanso'] or 0 for a in asignaciones), dtype=np.int64, count=n)
+
+    con_turno = (trabajo > 0) & (descanso > 0)
+    # Evitar división por cero en asignaciones sin turno (se descartan más abajo)
+    ciclo = np.where(con_turno, trabajo + descanso, 1)
+
+    dias = np.arange(desde.toordinal(), hasta.toordinal() + 1, dtype=np.int64)
+    transcurridos = dias[None, :] - inicio[:, None]
+    dentro = (transcurridos >= 0) & (dias[None, :] <= fin[:, None])
+
+    en_trabajo = (transcurridos % ciclo[:, None]) < trabajo[:, None]
+    con_turno = con_turno[:, None]
+
+    mascara_trabajo = dentro & np.where(con_turno, en_trabajo, transcurridos <= DIAS_SIN_TURNO)
+    mascara_descanso = dentro & con_turno & ~en_trabajo
+    return mascara_trabajo, mascara_descanso
+
+
+def agrupar_por_persona(mascara, filas, n_personas):
+    """
+    Combinar (OR lógico) las filas de varias asignaciones en una fila por persona
+
+    Parámetros:
+    - mascara: matriz booleana asignación × día
+    - filas: para cada asignación, la fila de la persona en el resultado
+    - n_personas: cantidad de filas del resultado
+
+    Retorna: matriz booleana persona × día
+    """
+    resultado = np.zeros((n_personas, mascara.shape[1]), dtype=bool)
+    if len(filas) == 0:
+        return resultado
+
+    filas = np.asarray(filas, dtype=np.int64)
+    orden = np.argsort(filas, kind='stable')
+    filas_ordenadas = filas[orden]
+
+    # Posiciones donde empieza cada grupo de asignaciones de una misma persona
+    inicios = np.flatnonzero(np.r_[True, filas_ordenadas[1:] != filas_ordenadas[:-1]])
+    resultado[filas_ordenadas[inicios]] = np.logical_or.reduceat(mascara[orden], inicios, axis=0)
+    return resultado
+
+
+def calcular_roster(asignaciones, persona_ids, desde, hasta):
+    """
+    Calcular las máscaras persona × día para un grupo de personas
+
+    Parámetros:
+    - asignaciones: dicts como en calcular_mascaras, más 'personal_id'
+    - persona_ids: IDs de las personas, en el orden de las filas del resultado
+    - desde, hasta: rango de fechas (inclusive)
+
+    Retorna: dict con
+    - 'trabajo': días en faena (trabajando) de cada persona
+    - 'descanso': días de descanso del turno de cada persona
+    - 'fuera_faena': días sin ninguna asignación que los cubra
+    - 'filas': mapa personal_id → fila de las matrices
+    """
+    filas_personas = {pid: i for i, pid in enumerate(persona_ids)}
+    asignaciones = [a for a in asignaciones if a['personal_id'] in filas_personas]
+
+    mascara_trabajo, mascara_descanso = calcular_mascaras(asignaciones, desde, hasta)
+    filas = [filas_personas[a['personal_id']] for a in asignaciones]
+
+    trabajo = agrupar_por_persona(mascara_trabajo, filas, len(filas_personas))
+    descanso = agrupar_por_persona(mascara_descanso, filas, len(filas_personas))
+    return {
+        'trabajo': trabajo,
+        'descanso': descanso,
+        'fuera_faena': ~(trabajo | descanso),
+        'filas': filas_personas,
+    }
+
+
+def tramos_de_trabajo(fecha_inicio, fecha_fin_faena, dias_trabajo, dias_descanso, desde, hasta):
+    """
+    Tramos de días de trabajo consecutivos de una asignación dentro de un rango
+
+    Aplica las mismas reglas que calcular_mascaras, pero entrega un tramo por
+    ciclo del turno en lugar de un valor por día.
+
+    Retorna: generador de (inicio, fin) como ordinales de fecha (inclusive)
+    """
+    inicio = fecha_inicio.toordinal()
+    desde = max(desde.toordinal(), inicio)
+    hasta = min(hasta.toordinal(), fecha_fin_faena.toordinal() if fecha_fin_faena else _SIN_FECHA_FIN)
+    if desde > hasta:
+        return
+
+    if not (dias_trabajo and dias_descanso):
+        # Sin turno: en faena los DIAS_SIN_TURNO días siguientes al inicio
+        fin = min(inicio + DIAS_SIN_TURNO, hasta)
+        if desde <= fin:
+            yield desde, fin
+        return
+
+    ciclo = dias_trabajo + dias_descanso
+    comienzo = inicio + (desde - inicio) // ciclo * ciclo
+    while comienzo <= hasta:
+        tramo_desde, tramo_hasta = max(comienzo, desde), min(comienzo + dias_trabajo - 1, hasta)
+        if tramo_desde <= tramo_hasta:
+            yield tramo_desde, tramo_hasta
+        comienzo += ciclo
@@ -8,10 +8,17 @@ urlpatterns = [
     path('get_faenas_for_audit/', views.get_faenas_for_audit, name='get_faenas_for_audit'),
     path('get_cargos/', views.get_cargos, name='get_cargos'),
     path('get_estados/', views.get_estados, name='get_estados'),
+    path('get_grid/', views.get_grid, name='get_grid'),
+    path('get_dotacion/', views.get_dotacion, name='get_dotacion'),
+    path('get_conflictos/', views.get_conflictos, name='get_conflictos'),
+    path('buscar_personal/', views.buscar_personal, name='buscar_personal'),
+    path('get_cache_estados/', views.get_cache_estados, name='get_cache_estados'),
     path('get_turnos/', views.get_turnos, name='get_turnos'),
     path('get_faena_turno/<int:faena_id>/', views.get_faena_turno, name='get_faena_turno'),
     path('assign_personal_to_faena/', views.assign_personal_to_faena, name='assign_personal_to_faena'),
     path('remove_personal_from_faena/', views.remove_personal_from_faena, name='remove_personal_from_faena'),
+    path('assign_personal_to_faena_bulk/', views.assign_personal_to_faena_bulk, name='assign_personal_to_faena_bulk'),
+    path('remove_personal_from_faena_bulk/', views.remove_personal_from_faena_bulk, name='remove_personal_from_faena_bulk'),
     path('get_audit_logs/', views.get_audit_logs, name='get_audit_logs'),
 ]
 
@@ -0,0 +1,59 @@
+"""
+Validadores HTTP (ETag) para las APIs de lectura del calendario
+
+El calendario vuelve a pedir faenas, cargos, turnos, personas y estados en
+cada cambio de filtro o de mes. Estas APIs se decoran con
+django.views.decorators.http.condition usando etag_calendario: el ETag se
+calcula con unas pocas consultas agregadas y, si coincide con el
+If-None-Match del cliente, se responde 304 Not Modified sin ejecutar la
+vista.
+
+El ETag combina:
+- la fecha de modificación más reciente de TipoTurno, Faena y PersonalFaena
+- el último log_id de AuditLog
+- la generación de cambios (planning.cambios, guardada en la base de datos
+  para que la compartan todos los procesos), para los modelos sin fecha
+  de modificación (Personal, Ausentismo, LicenciaMedicaPorPersonal, etc.)
+- la ruta y los parámetros (filtros) de la consulta
+"""
+
+import hashlib
+
+from django.db.models import Max
+
+from core.models import AuditLog, Faena, PersonalFaena, TipoTurno
+
+from .cambios import generacion_cambios
+
+
+# Parámetros que no cambian la respuesta (ej: el anti-caché de jQuery)
+PARAMETROS_IGNORADOS = ('_',)
+
+
+def version_datos(request):
+    """
+    Estado actual de los datos que muestran las APIs del calendario
+
+    Se calcula una vez por request.
+    """
+    version = getattr(request, '_version_datos', None)
+    if version is None:
+        version = request._version_datos = (
+            TipoTurno.objects.aggregate(ultima=Max('fecha_modificacion'))['ultima'],
+            Faena.objects.aggregate(ultima=Max('fecha_modificacion'))['ultima'],
+            PersonalFaena.objects.aggregate(ultima=Max('fecha_modificacion'))['ultima'],
+            AuditLog.objects.aggregate(ultimo=Max('log_id'))['ultimo'],
+            generacion_cambios(),
+        )
+    return version
+
+
+def etag_calendario(request, *args, **kwargs):
+    """ETag de una respuesta de las APIs del calendario (para el decorador condition)"""
+    parametros = sorted(
+        (clave, sorted(valores))
+        for clave, valores in request.GET.lists()
+        if clave not in PARAMETROS_IGNORADOS
+    )
+    firma = repr((request.path, args, sorted(kwargs.items()), parametros, version_datos(request)))
+    return hashlib.md5(firma.encode()).hexdigest()
@@ -10,12 +10,15 @@ from datetime import timedelta
 # Importaciones de Django para manejo de HTTP, vistas y base de datos
 from django.http import JsonResponse
 from django.shortcuts import render
-from django.views.decorators.http import require_GET
+from django.views.decorators.http import require_GET, condition
+from django.views.decorators.cache import cache_control
+from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
 
 # Importación para manejo de idioma español en fechas
 import locale
+import logging
 
 # =============================================================================
 # CONFIGURACIÓN DE IDIOMA ESPAÑOL PARA FECHAS
@@ -53,6 +56,26 @@ from core.models import (
     AuditLog,          # Modelo de logs de auditoría
 )
 
+# Cálculo de estados del calendario por rango de fechas
+from .estados import calcular_estados, claves_rango, MAX_DIAS_RANGO
+from .conflictos import detectar_conflictos
+from .dotacion import calcular_dotacion
+from .compacto import codificar_compacto, FORMATO_COMPACTO
+from .roster import roster_activo, leer_estados
+from .cambios import afectados_asignaciones, nueva_generacion, registrar_cambio
+from .cache_estados import cache_activo, estados_con_cache, estadisticas_cache
+from .validadores import etag_calendario
+from .asignaciones import MAX_ASIGNACIONES, asignar_en_lote, logs_remocion, remover_en_lote
+from .auditoria import (
+    LIMITE_LOGS, MAX_LOGS, FiltroLogs, leer_cursor, paginar_logs, registrar_log, registrar_logs, serializar_log,
+)
+from .busqueda import LIMITE_RESULTADOS, MAX_RESULTADOS, buscar, filtrar_busqueda
+from .personal import MAX_POR_PAGINA, decodificar_cursor, filtrar_personal, paginar_personal, serializar_personal
+from .diagnostico import debug, diagnostico_activo, perezoso
+
+# Errores de las vistas (siempre activos); el diagnóstico opcional usa debug()
+logger = logging.getLogger(__name__)
+
 
 # =============================================================================
 # FUNCIONES AUXILIARES
@@ -112,7 +135,66 @@ def calendar_view(request):
 # API PARA OBTENER PERSONAL FILTRADO
 # =============================================================================
 
+def parametros_filtro_personal(request):
+    """
+    Leer los filtros de personal de la consulta
+    
+    Retorna: tupla (cargos_filter, faena_id)
+    """
+    # Intentar diferentes formas de obtener los cargos (compatibilidad con frontend)
+    cargos_filter = request.GET.getlist('cargos')
+    if not cargos_filter:
+        cargos_filter = request.GET.getlist('cargos[]')
+    if not cargos_filter:
+        cargos_filter = request.GET.getlist('cargo_id')
+    
+    # Obtener ID de faena para filtrar (puede ser específica o 'sin_asignar')
+    faena_id = request.GET.get('faena_id')
+    return cargos_filter, faena_id
+
+
+def personal_paginado(request):
+    """
+    Personal filtrado de la consulta, paginado si se pide
+    
+    Parámetros de la consulta:
+    - cargos[] / faena_id: filtros de personal (ver parametros_filtro_personal)
+    - q: búsqueda por nombre o RUT (ver planning.busqueda)
+    - limit: personas por página (máximo MAX_POR_PAGINA); sin limit se
+      retorna todo el personal filtrado
+    - cursor: valor 'siguiente' de la página anterior
+    
+    Retorna: tupla (personas_qs, faena_id, siguiente, error). siguiente es el
+    cursor de la página siguiente (None si no hay más); error es una
+    JsonResponse 400 si los parámetros de paginación son inválidos
+    """
+    cargos_filter, faena_id = parametros_filtro_personal(request)
+    personas_qs = filtrar_personal(cargos_filter, faena_id)
+    
+    busqueda = request.GET.get('q', '').strip()
+    if busqueda:
+        personas_qs = filtrar_busqueda(personas_qs, busqueda)
+    
+    limit = request.GET.get('limit')
+    cursor = request.GET.get('cursor')
+    if not limit and not cursor:
+        return personas_qs, faena_id, None, None
+    
+    try:
+        limit = min(int(limit or MAX_POR_PAGINA), MAX_POR_PAGINA)
+        if limit < 1:
+            raise ValueError(limit)
+        despues = decodificar_cursor(cursor) if cursor else None
+    except ValueError:
+        return None, faena_id, None, JsonResponse({'error': 'Parámetros limit/cursor inválidos'}, status=400)
+    
+    personas_qs, siguiente = paginar_personal(personas_qs, despues, limit)
+    return personas_qs, faena_id, siguiente, None
+
+
 @require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_calendario)
 def get_personas(request):
     """
     Obtener lista de personas filtradas por faena y cargos
@@ -126,245 +208,51 @@ def get_personas(request):
     Parámetros de entrada:
     - cargos[]: Lista de IDs de cargos para filtrar
     - faena_id: ID de faena específica o 'sin_asignar'
+    - q: búsqueda por nombre o RUT
+    - limit / cursor: paginación por cursor (ver personal_paginado)
     
-    Retorna: JSON con lista de personas y sus datos completos
+    Retorna: JSON con lista de personas y sus datos completos, ordenada por
+    apellido, nombre e ID, y el cursor 'siguiente' (None en la última página)
     """
     
     # =============================================================================
     # OBTENER PARÁMETROS DE FILTRADO
     # =============================================================================
     
-    # Intentar diferentes formas de obtener los cargos (compatibilidad con frontend)
-    cargos_filter = request.GET.getlist('cargos')
-    if not cargos_filter:
-        cargos_filter = request.GET.getlist('cargos[]')
-    if not cargos_filter:
-        cargos_filter = request.GET.getlist('cargo_id')
-    
-    # Obtener ID de faena para filtrar (puede ser específica o 'sin_asignar')
-    faena_id = request.GET.get('faena_id')
+    personas_qs, faena_id, siguiente, error = personal_paginado(request)
+    if error:
+        return error
     
     # =============================================================================
-    # DEBUG: IMPRIMIR PARÁMETROS RECIBIDOS
+    # DIAGNÓSTICO: PARÁMETROS RECIBIDOS Y ASIGNACIONES DE LA FAENA
     # =============================================================================
     
-    # Debug: imprimir los parámetros recibidos
-    print(f"DEBUG: cargos_filter recibido: {cargos_filter}")
-    print(f"DEBUG: faena_id recibido: {faena_id}")
-    print(f"DEBUG: request.GET completo: {dict(request.GET)}")
-    print(f"DEBUG: request.GET.getlist('cargos'): {request.GET.getlist('cargos')}")
-    print(f"DEBUG: request.GET.getlist('cargos[]'): {request.GET.getlist('cargos[]')}")
-    print(f"DEBUG: request.GET.getlist('cargo_id'): {request.GET.getlist('cargo_id')}")
-    
-    # =============================================================================
-    # VERIFICAR ASIGNACIONES A LA FAENA SELECCIONADA (DEBUG)
-    # =============================================================================
+    debug("faena_id recibido: %s", faena_id)
+    debug("request.GET completo: %s", perezoso(lambda: dict(request.GET)))
     
     # Si se selecciona una faena específica, verificar todas las asignaciones
-    if faena_id and faena_id != 'sin_asignar':
-        print(f"DEBUG: Verificando todas las asignaciones a la faena {faena_id}")
-        todas_asignaciones = PersonalFaena.objects.filter(
+    if diagnostico_activo() and faena_id and faena_id != 'sin_asignar':
+        todas_asignaciones = list(PersonalFaena.objects.filter(
             faena_id=faena_id,
             activo=True
-        ).select_related('personal', 'faena')
-        print(f"DEBUG: Total de asignaciones activas a la faena {faena_id}: {todas_asignaciones.count()}")
+        ).select_related('personal', 'faena'))
+        debug("Total de asignaciones activas a la faena %s: %s", faena_id, len(todas_asignaciones))
         for asignacion in todas_asignaciones:
-            print(f"DEBUG: Asignación encontrada - Personal ID: {asignacion.personal_id}, Nombre: {asignacion.personal.nombre} {asignacion.personal.apepat}, Faena: {asignacion.faena.nombre}, Activo: {asignacion.activo}")
-    elif faena_id == 'sin_asignar':
-        print(f"DEBUG: Modo 'SIN ASIGNAR' - no se verificarán asignaciones específicas")
-
-    # =============================================================================
-    # QUERY BASE: OBTENER TODO EL PERSONAL ACTIVO
-    # =============================================================================
-    
-    # Obtener todas las personas activas en el sistema
-    personas_qs = Personal.objects.filter(activo=True)
-    print(f"DEBUG: Total de personal activo: {personas_qs.count()}")
-    
-    # =============================================================================
-    # VERIFICAR RELACIÓN INFOLABORAL (DEBUG)
-    # =============================================================================
-    
-    # Debug: verificar que la relación InfoLaboral funcione correctamente
-    try:
-        test_person = personas_qs.first()
-        if test_person:
-            infolaboral_count = test_person.infolaboral_set.count()
-            print(f"DEBUG: Persona de prueba {test_person.personal_id} tiene {infolaboral_count} registros en InfoLaboral")
-            if infolaboral_count > 0:
-                cargo_test = test_person.infolaboral_set.first().cargo_id
-                print(f"DEBUG: Cargo de prueba: {cargo_test.cargo_id} - {cargo_test.cargo}")
-    except Exception as e:
-        print(f"DEBUG: Error al verificar InfoLaboral: {e}")
-    
-    # =============================================================================
-    # FILTRADO POR CARGOS (PRIMER FILTRO)
-    # =============================================================================
-    
-    # Aplicar filtro de cargos si se especifican
-    if cargos_filter:
-        print(f"DEBUG: Aplicando filtro de cargos: {cargos_filter}")
-        
-        # Filtrar por múltiples cargos usando Q objects para OR lógico
-        from django.db.models import Q
-        cargo_filters = Q()
-        for cargo_id in cargos_filter:
-            cargo_filters |= Q(infolaboral__cargo_id=cargo_id)
-        
-        # Aplicar el filtro de cargos
-        personas_qs = personas_qs.filter(cargo_filters)
-        print(f"DEBUG: Query de cargos aplicado: {cargo_filters}")
-        print(f"DEBUG: Personas después del filtro de cargos: {personas_qs.count()}")
-        
-        # Debug adicional: ver qué cargos tienen las personas
-        for persona in personas_qs:
-            cargos_persona = persona.infolaboral_set.values_list('cargo_id__cargo', flat=True)
-            print(f"DEBUG: Persona {persona.personal_id} tiene cargos: {list(cargos_persona)}")
-        
-        print(f"DEBUG: Personas después del filtro de cargos (antes del filtro de faena): {personas_qs.count()}")
-        for persona in personas_qs:
-            print(f"DEBUG: Persona {persona.personal_id} - {persona.nombre} {persona.apepat} - Cargos: {list(persona.infolaboral_set.values_list('cargo_id__cargo', flat=True))}")
-    else:
-        print("DEBUG: No hay filtro de cargos aplicado")
-        # Si no hay cargos seleccionados, no mostrar personal
-        personas_qs = Personal.objects.none()
-        print("DEBUG: No se mostrará personal porque no hay cargos seleccionados")
-    
-    # =============================================================================
-    # FILTRADO POR FAENA (SEGUNDO FILTRO)
-    # =============================================================================
-    
-    # Aplicar filtro de faena si se especifica
-    if faena_id:
-        if faena_id == 'sin_asignar':
-            print(f"DEBUG: Aplicando filtro 'SIN ASIGNAR'")
-            # Filtrar personas que NO tienen faenas asignadas activas
-            personas_qs = personas_qs.exclude(
-                personalfaena__activo=True
-            )
-            print(f"DEBUG: Personas sin asignar: {personas_qs.count()}")
-        else:
-            print(f"DEBUG: Aplicando filtro de faena {faena_id}")
-            # Filtrar personas que SÍ tienen la faena específica asignada
-            personas_qs = personas_qs.filter(
-                personalfaena__faena_id=faena_id,
-                personalfaena__activo=True
+            debug(
+                "Asignación encontrada - Personal ID: %s, Nombre: %s %s, Faena: %s",
+                asignacion.personal_id, asignacion.personal.nombre, asignacion.personal.apepat, asignacion.faena.nombre,
             )
-            print(f"DEBUG: Personas después del filtro de faena: {personas_qs.count()}")
-        
-        # Debug: mostrar qué personas pasan el filtro de faena
-        for persona in personas_qs:
-            print(f"DEBUG: Persona {persona.personal_id} - {persona.nombre} {persona.apepat} - Pasa filtro de faena")
-
-    # =============================================================================
-    # OPTIMIZACIÓN DE QUERY
-    # =============================================================================
-    
-    # Eliminar duplicados y optimizar con select_related
-    personas_qs = personas_qs.distinct().select_related()
 
     # =============================================================================
-    # OBTENER INFORMACIÓN DETALLADA DE FAENAS Y CARGOS
-    # =============================================================================
-    
-    # Diccionarios para almacenar información de faenas y cargos por persona
-    faenas_actuales = {}
-    cargos_actuales = {}
-    from datetime import date
-    today = date.today()
-    
-    # =============================================================================
-    # CONSULTA DE ASIGNACIONES DE FAENA
+    # FILTRAR PERSONAL Y CONSTRUIR RESPUESTA
     # =============================================================================
     
-    # Si se filtra por faena específica, obtener solo las asignaciones a esa faena
-    if faena_id and faena_id != 'sin_asignar':
-        asignaciones = PersonalFaena.objects.filter(
-            personal_id__in=personas_qs,
-            faena_id=faena_id,
-            activo=True
-        ).values('personal_id', 'faena__nombre', 'faena_id', 'fecha_inicio', 'tipo_turno__nombre', 'faena__tipo_turno__nombre')
-    else:
-        # Si no se filtra por faena o es 'sin_asignar', obtener todas las faenas activas de las personas
-        asignaciones = PersonalFaena.objects.filter(
-            personal_id__in=personas_qs,
-            activo=True
-        ).values('personal_id', 'faena__nombre', 'faena_id', 'fecha_inicio', 'tipo_turno__nombre', 'faena__tipo_turno__nombre')
-    
-    # Debug: imprimir las asignaciones encontradas
-    print(f"DEBUG: Asignaciones encontradas: {list(asignaciones)}")
+    data = serializar_personal(personas_qs, faena_id)
     
-    # =============================================================================
-    # PROCESAR ASIGNACIONES Y CONSTRUIR INFORMACIÓN DE FAENAS
-    # =============================================================================
+    debug("Datos enviados al frontend: %s", data)
     
-    # Agrupar múltiples faenas por persona
-    for asignacion in asignaciones:
-        personal_id = asignacion['personal_id']
-        if personal_id not in faenas_actuales:
-            faenas_actuales[personal_id] = []
-        
-        # Construir información de la faena con lógica de turno mejorada
-        # Si no hay turno específico asignado, usar el turno de la faena
-        turno_info = asignacion['tipo_turno__nombre'] or asignacion['faena__tipo_turno__nombre'] or 'Turno no especificado'
-        
-        faenas_actuales[personal_id].append({
-            'nombre': asignacion['faena__nombre'],
-            'faena_id': asignacion['faena_id'],
-            'fecha_inicio': asignacion['fecha_inicio'].isoformat() if asignacion['fecha_inicio'] else None,
-            'turno': turno_info
-        })
-        print(f"DEBUG: Asignación para personal {personal_id}: {asignacion['faena__nombre']}")
-    
-    # =============================================================================
-    # OBTENER CARGOS ACTUALES DE CADA PERSONA
-    # =============================================================================
-    
-    # Para cada persona, obtener su cargo más reciente desde InfoLaboral
-    for persona in personas_qs:
-        cargos = persona.infolaboral_set.values_list('cargo_id__cargo', flat=True)
-        if cargos:
-            cargos_actuales[persona.personal_id] = ', '.join(cargos)
-        else:
-            cargos_actuales[persona.personal_id] = 'Sin cargo'
-        print(f"DEBUG: Cargo para personal {persona.personal_id}: {cargos_actuales[persona.personal_id]}")
-
-    # =============================================================================
-    # CONSTRUIR RESPUESTA FINAL PARA EL FRONTEND
-    # =============================================================================
-    
-    # Lista que contendrá todos los datos de las personas
-    data = []
-    for p in personas_qs:
-        # Obtener faenas y cargo de la persona
-        faenas_persona = faenas_actuales.get(p.personal_id, [])
-        cargo_actual = cargos_actuales.get(p.personal_id, 'Sin cargo')
-        
-        # Para compatibilidad, mantener faena_actual como string (primera faena)
-        faena_actual = faenas_persona[0]['nombre'] if faenas_persona else None
-        
-        # Construir objeto de datos de la persona
-        data.append({
-            'id': p.personal_id,
-            'nombre': f"{p.nombre} {p.apepat} {p.apemat}",
-            'rut': f"{p.rut}-{p.dvrut}",
-            'faena_actual': faena_actual,
-            'faenas_detalladas': faenas_persona,  # Nueva información detallada
-            'cargo_actual': cargo_actual,
-            'correo': p.correo,
-            'direccion': p.direccion,
-            'comuna_nombre': p.comuna_id.nombre if p.comuna_id else None,
-            'fechanac': p.fechanac
-        })
-        
-        # Debug: imprimir los datos de cada persona
-        print(f"DEBUG: Persona {p.personal_id}: faena_actual = {faena_actual}, faenas_detalladas = {faenas_persona}, cargo_actual = {cargo_actual}")
-    
-    # Debug: imprimir el resultado final
-    print(f"DEBUG: Datos enviados al frontend: {data}")
-    
-    # Retornar respuesta JSON con todas las personas filtradas
-    return JsonResponse({'results': data})
+    # Retornar respuesta JSON con las personas filtradas (o la página pedida)
+    return JsonResponse({'results': data, 'siguiente': siguiente})
 
 
 # =============================================================================
@@ -372,6 +260,8 @@ def get_personas(request):
 # =============================================================================
 
 @require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_calendario)
 def get_faenas(request):
     """
     Obtener lista de todas las faenas activas más opción 'Sin Asignar'
@@ -445,6 +335,8 @@ def get_faenas_for_audit(request):
 # =============================================================================
 
 @require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_calendario)
 def get_cargos(request):
     """
     Obtener todos los cargos disponibles en el sistema
@@ -470,24 +362,21 @@ def get_cargos(request):
 # =============================================================================
 
 @require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_calendario)
 def get_estados(request):
     """
-    OBTENER ESTADOS DE PERSONAS PARA UN MES ESPECÍFICO
+    OBTENER ESTADOS DE PERSONAS PARA UN MES O UN RANGO DE FECHAS
     
     Esta es la función más importante del sistema de calendario:
-    - Calcula el estado de cada persona para cada día del mes
+    - Calcula el estado de cada persona para cada día consultado
     - Aplica múltiples capas de estados (faena, turno, descanso, licencias, etc.)
     - Respeta las fechas de inicio y fin de las faenas
     - Calcula automáticamente los ciclos de turnos (7x7, 14x7, etc.)
     
-    FLUJO DE PROCESAMIENTO:
-    1. Obtener parámetros (mes, año, personas)
-    2. Cargar datos de licencias médicas y ausentismos
-    3. Aplicar asignaciones de faena (ESTADO BASE)
-    4. Calcular días de trabajo y descanso según turnos
-    5. Aplicar licencias médicas (prioridad alta)
-    6. Aplicar ausentismos (vacaciones, permisos, etc.)
-    7. Ordenar estados por prioridad visual
+    El cálculo se hace en planning.estados.calcular_estados, que consulta
+    licencias, ausentismos y asignaciones una sola vez para todo el rango.
+    La consulta por mes es un caso particular de la consulta por rango.
     
     SISTEMA DE PRIORIDADES:
     - Prioridad 1: Estados base (disponible, en faena, descanso)
@@ -497,492 +386,277 @@ def get_estados(request):
     Parámetros de entrada:
     - month: Mes del año (1-12)
     - year: Año (ej: 2025)
+    - desde / hasta: Rango de fechas YYYY-MM-DD (alternativa a month/year,
+      máximo MAX_DIAS_RANGO días)
     - personas[]: Lista de IDs de personas a consultar
+    - formato: 'compacto' para recibir estados deduplicados y comprimidos
+      por tramos (ver planning.compacto); por defecto el formato completo
     
-    Retorna: JSON con estados de cada persona para cada día del mes
+    Retorna: JSON con estados de cada persona para cada día.
+    Por mes las claves de los días son el número de día ('1'..'31');
+    por rango son las fechas en formato ISO ('2025-08-01').
     """
     
     # =============================================================================
     # OBTENER PARÁMETROS DE ENTRADA
     # =============================================================================
     
-    month = int(request.GET.get('month'))
-    year = int(request.GET.get('year'))
     persona_ids = request.GET.getlist('personas[]') or request.GET.get('personas', '')
     if isinstance(persona_ids, str) and persona_ids:
         persona_ids = [pid for pid in persona_ids.split(',') if pid]
-    days_in_month = monthrange(year, month)[1]
 
-    # Debug: imprimir los IDs recibidos
-    print(f"DEBUG: persona_ids recibidos: {persona_ids}")
-    print(f"DEBUG: month: {month}, year: {year}, days_in_month: {days_in_month}")
+    debug("persona_ids recibidos: %s", persona_ids)
 
-    # =============================================================================
-    # PRELOAD DE DATOS PRINCIPALES
-    # =============================================================================
-    
     # Obtener objetos de Personal para las personas especificadas
     personas = Personal.objects.filter(personal_id__in=persona_ids)
 
     # =============================================================================
-    # CARGAR LICENCIAS MÉDICAS DEL MES
+    # CALCULAR ESTADOS EN EL RANGO CONSULTADO
     # =============================================================================
     
-    # Obtener licencias médicas que se superponen con el mes consultado
-    licencias = (
-        LicenciaMedicaPorPersonal.objects
-        .filter(
-            personal_id__in=personas,
-            fechaEmision__lte=date(year, month, days_in_month),
-            fecha_fin_licencia__gte=date(year, month, 1),
-        )
-        .values('personal_id', 'fechaEmision', 'fecha_fin_licencia')
-    )
-
-    # =============================================================================
-    # CARGAR AUSENTISMOS DEL MES
-    # =============================================================================
+    rango, error = leer_rango_consulta(request)
+    if error:
+        return error
     
-    # Obtener ausentismos (vacaciones, permisos, etc.) que se superponen con el mes
-    ausentismos = (
-        Ausentismo.objects
-        .filter(
-            personal_id__in=personas,
-            fechaini__lte=date(year, month, days_in_month),
-            fechafin__gte=date(year, month, 1),
-        )
-        .values('personal_id', 'fechaini', 'fechafin', 'tipoausen_id__tipo')
-    )
+    results = obtener_estados(personas, rango['desde'], rango['hasta'], clave_dia=rango['clave_dia'])
+    
+    # Retornar el mapa completo de estados para todas las personas y días
+    return respuesta_estados(request, results, **rango['extra'])
 
-    # =============================================================================
-    # INICIALIZAR MAPA DE ESTADOS
-    # =============================================================================
+
+def leer_rango_consulta(request):
+    """
+    Leer el rango de fechas de una consulta de estados
+    
+    Acepta desde/hasta (YYYY-MM-DD, máximo MAX_DIAS_RANGO días) o month/year.
+    La consulta por mes es un caso particular del rango: los días se
+    identifican por su número ('1'..'31') para compatibilidad con el frontend;
+    por rango, por la fecha en formato ISO.
+    
+    Retorna: tupla (rango, error). rango es un dict con desde, hasta,
+    clave_dia y extra (campos adicionales de la respuesta); error es una
+    JsonResponse 400 si los parámetros son inválidos
+    """
+    desde_param = request.GET.get('desde')
+    hasta_param = request.GET.get('hasta')
+    if desde_param or hasta_param:
+        try:
+            desde = date.fromisoformat(desde_param)
+            hasta = date.fromisoformat(hasta_param)
+        except (TypeError, ValueError):
+            return None, JsonResponse({'error': 'Parámetros desde/hasta inválidos (formato YYYY-MM-DD)'}, status=400)
+        
+        if hasta < desde:
+            return None, JsonResponse({'error': 'La fecha hasta no puede ser anterior a la fecha desde'}, status=400)
+        if (hasta - desde).days + 1 > MAX_DIAS_RANGO:
+            return None, JsonResponse({'error': f'El rango no puede superar {MAX_DIAS_RANGO} días'}, status=400)
+        
+        debug("desde: %s, hasta: %s", desde, hasta)
+        return {
+            'desde': desde,
+            'hasta': hasta,
+            'clave_dia': None,
+            'extra': {'desde': desde.isoformat(), 'hasta': hasta.isoformat()},
+        }, None
     
-    # Crear estructura de datos: persona -> día -> lista de estados
-    results = {}
-    for p in personas:
-        results[str(p.personal_id)] = {str(d): [] for d in range(1, days_in_month + 1)}
+    try:
+        month = int(request.GET.get('month'))
+        year = int(request.GET.get('year'))
+        days_in_month = monthrange(year, month)[1]
+    except (TypeError, ValueError):
+        return None, JsonResponse({'error': 'Parámetros month/year inválidos'}, status=400)
+    debug("month: %s, year: %s, days_in_month: %s", month, year, days_in_month)
+    
+    return {
+        'desde': date(year, month, 1),
+        'hasta': date(year, month, days_in_month),
+        'clave_dia': lambda fecha: str(fecha.day),
+        'extra': {},
+    }, None
 
-    # =============================================================================
-    # FUNCIÓN AUXILIAR PARA ITERAR DÍAS
-    # =============================================================================
+
+def obtener_estados(personas, desde, hasta, clave_dia=None):
+    """
+    Obtener los estados del calendario según la configuración:
+    desde el caché por persona y mes (si está activo), leyendo la tabla
+    RosterDia (si está activa) o calculándolos al vuelo
+    """
+    calcular = leer_estados if roster_activo() else calcular_estados
+    if cache_activo():
+        return estados_con_cache(personas, desde, hasta, calcular, clave_dia=clave_dia)
+    return calcular(personas, desde, hasta, clave_dia=clave_dia)
+
+
+def respuesta_estados(request, results, **extra):
+    """
+    Construir la respuesta JSON de estados en el formato pedido por el cliente
     
-    # Helper para iterar sobre un rango de días respetando límites del mes
-    def iter_days(start, end):
-        from datetime import timedelta
-        current = max(start, date(year, month, 1))
-        last = min(end, date(year, month, days_in_month))
-        while current <= last:
-            yield current.day
-            current += timedelta(days=1)
+    Con formato=compacto se envían tablas de estados y detalles únicos y, por
+    persona, códigos comprimidos por tramos de días (ver planning.compacto).
+    """
+    if request.GET.get('formato') == FORMATO_COMPACTO:
+        return JsonResponse({**extra, **codificar_compacto(results)})
+    return JsonResponse({**extra, 'results': results})
 
-    # =============================================================================
-    # APLICAR ASIGNACIONES DE FAENA (ESTADO BASE)
-    # =============================================================================
 
-    # Consulta optimizada para obtener todas las asignaciones de faena del mes
-    # Incluye información de turnos tanto de la persona como de la faena
-    asignaciones_faena = (
-        PersonalFaena.objects
-        .filter(
-            personal_id__in=personas,
-            activo=True,
-            fecha_inicio__lte=date(year, month, days_in_month)
-        )
-        .select_related('faena', 'tipo_turno', 'faena__tipo_turno')
-        .values('personal_id', 'faena_id', 'faena__nombre', 'fecha_inicio', 'faena__fecha_fin', 'tipo_turno__dias_trabajo', 
-                'tipo_turno__dias_descanso', 'faena__tipo_turno__dias_trabajo', 
-                'faena__tipo_turno__dias_descanso', 'faena__tipo_turno__nombre')
-    )
+# =============================================================================
+# API COMBINADA: PERSONAL Y ESTADOS DEL CALENDARIO
+# =============================================================================
+
+@require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_calendario)
+def get_grid(request):
+    """
+    Obtener en una sola llamada el personal filtrado y sus estados
     
-    # =============================================================================
-    # INICIALIZAR MAPAS DE DÍAS EN FAENA Y DESCANSO
-    # =============================================================================
+    Reemplaza la secuencia get_personas → get_estados del calendario: el
+    QuerySet de personal filtrado se usa directamente como subconsulta para
+    los estados, sin enviar la lista de IDs por la URL.
     
-    # Diccionarios para almacenar qué días cada persona está en faena o descanso
-    dias_en_faena = {}
-    dias_de_descanso = {}
+    Parámetros de entrada:
+    - cargos[] / faena_id / q: filtros de personal (igual que get_personas)
+    - limit / cursor: paginación por cursor (igual que get_personas); los
+      estados se calculan solo para las personas de la página
+    - month / year o desde / hasta: rango de fechas (igual que get_estados)
+    - formato: 'compacto' para los estados en formato compacto
+    
+    Retorna: JSON con 'personas' (igual que results de get_personas), el
+    cursor 'siguiente' y los estados en el formato de get_estados
+    """
+    rango, error = leer_rango_consulta(request)
+    if error:
+        return error
     
-    print(f"DEBUG: asignaciones_faena encontradas: {len(asignaciones_faena)}")
-    for a in asignaciones_faena:
-        print(f"DEBUG: Asignación - Personal: {a['personal_id']}, Faena: {a['faena__nombre']}, Fecha inicio: {a['fecha_inicio']}, Fecha fin faena: {a['faena__fecha_fin']}")
+    personas_qs, faena_id, siguiente, error = personal_paginado(request)
+    if error:
+        return error
     
-    # =============================================================================
-    # PROCESAR CADA ASIGNACIÓN DE FAENA
-    # =============================================================================
+    data = serializar_personal(personas_qs, faena_id)
+    results = obtener_estados(personas_qs, rango['desde'], rango['hasta'], clave_dia=rango['clave_dia'])
     
-    for a in asignaciones_faena:
-        personal_id_str = str(a['personal_id'])
-        
-        # Inicializar conjunto de días para esta persona si no existe
-        if personal_id_str not in dias_en_faena:
-            dias_en_faena[personal_id_str] = set()
-        
-        # =============================================================================
-        # LÓGICA DE CÁLCULO DE TURNOS
-        # =============================================================================
-        
-        # Obtener el turno específico de la persona o usar el de la faena
-        # Si la persona tiene turno específico, se usa ese; si no, se usa el de la faena
-        dias_trabajo = a['tipo_turno__dias_trabajo'] or a['faena__tipo_turno__dias_trabajo']
-        dias_descanso = a['tipo_turno__dias_descanso'] or a['faena__tipo_turno__dias_descanso']
-        
-        if dias_trabajo and dias_descanso:
-            print(f"DEBUG: Personal {personal_id_str} tiene turno {dias_trabajo}x{dias_descanso}")
-            
-            # =============================================================================
-            # CÁLCULO DE CICLOS DE TURNO
-            # =============================================================================
-            
-            # Calcular el ciclo completo del turno (trabajo + descanso)
-            duracion_ciclo = dias_trabajo + dias_descanso
-            
-            # Obtener la fecha fin de la faena para limitar los turnos
-            fecha_fin_faena = a['faena__fecha_fin']
-            if fecha_fin_faena:
-                print(f"DEBUG: Personal {personal_id_str} - Faena termina el {fecha_fin_faena}")
-            
-            # =============================================================================
-            # CALCULAR DÍAS DE TRABAJO Y DESCANSO PARA CADA DÍA DEL MES
-            # =============================================================================
-            
-            # Para cada día del mes, determinar si está en trabajo o descanso
-            print(f"DEBUG: Personal {personal_id_str} - Calculando días para mes {month}/{year}, faena termina: {fecha_fin_faena}")
-            for d in range(1, days_in_month + 1):
-                fecha_actual = date(year, month, d)
-                
-                # =============================================================================
-                # RESPETAR FECHA FIN DE FAENA
-                # =============================================================================
-                
-                # Verificar que la fecha actual no sobrepase la fecha fin de la faena
-                if fecha_fin_faena and fecha_actual > fecha_fin_faena:
-                    print(f"DEBUG: Personal {personal_id_str} - Día {d} ({fecha_actual}) sobrepasa fecha fin de faena ({fecha_fin_faena}) - SALTANDO")
-                    continue
-                
-                # =============================================================================
-                # CALCULAR POSICIÓN EN EL CICLO DE TURNO
-                # =============================================================================
-                
-                # Calcular cuántos días han pasado desde el inicio de la asignación
-                dias_desde_inicio_actual = (fecha_actual - a['fecha_inicio']).days
-                
-                if dias_desde_inicio_actual >= 0:  # Solo días futuros al inicio de la asignación
-                    # Calcular en qué posición del ciclo está este día
-                    dia_en_ciclo_actual = dias_desde_inicio_actual % duracion_ciclo
-                    
-                    if dia_en_ciclo_actual < dias_trabajo:
-                        # Está en días de trabajo - agregar a días en faena
-                        dias_en_faena[personal_id_str].add(d)
-                    else:
-                        # Está en días de descanso - agregar a días de descanso
-                        if personal_id_str not in dias_de_descanso:
-                            dias_de_descanso[personal_id_str] = set()
-                        dias_de_descanso[personal_id_str].add(d)
-            
-            # Debug: mostrar resultados del cálculo
-            print(f"DEBUG: Personal {personal_id_str} - Días en faena: {sorted(dias_en_faena[personal_id_str])}")
-            print(f"DEBUG: Personal {personal_id_str} - Días de descanso: {sorted(dias_de_descanso.get(personal_id_str, set()))}")
-            
-        else:
-            print(f"DEBUG: Personal {personal_id_str} NO tiene turno definido")
-            
-            # =============================================================================
-            # CASO SIN TURNO DEFINIDO
-            # =============================================================================
-            
-            # Si no hay turno definido, asumir que está en faena todos los días
-            # Pero respetar la fecha fin de la faena
-            fecha_fin = a['fecha_inicio'] + timedelta(days=30)
-            if a['faena__fecha_fin']:
-                fecha_fin = min(fecha_fin, a['faena__fecha_fin'])
-            fecha_fin = min(date(year, month, days_in_month), fecha_fin)
-            
-            print(f"DEBUG: Personal {personal_id_str} - Fecha fin calculada: {fecha_fin}")
-            
-            # Agregar todos los días desde inicio hasta fin como días en faena
-            for d in iter_days(a['fecha_inicio'], fecha_fin):
-                dias_en_faena[personal_id_str].add(d)
-    
-    # Aplicar estados múltiples por día
-    for pid, days in results.items():
-        for d, estados in days.items():
-            day_num = int(d)
-            
-            # Verificar si la persona está en faena en este día
-            en_faena = pid in dias_en_faena and day_num in dias_en_faena[pid]
-            
-            # Si está en faena, agregar el estado base
-            if en_faena:
-                # Buscar el nombre de la faena para este día
-                faena_nombre = "Faena"
-                for a in asignaciones_faena:
-                    if str(a['personal_id']) == pid:
-                        fecha_inicio = a['fecha_inicio']
-                        # Respetar la fecha fin de la faena
-                        fecha_fin = fecha_inicio + timedelta(days=30)
-                        if a['faena__fecha_fin']:
-                            fecha_fin = min(fecha_fin, a['faena__fecha_fin'])
-                        fecha_fin = min(date(year, month, days_in_month), fecha_fin)
-                        
-                        if fecha_inicio <= date(year, month, day_num) <= fecha_fin:
-                            faena_nombre = a['faena__nombre']
-                            break
-                
-                # Buscar información detallada de la faena para este día
-                faena_info = None
-                for a in asignaciones_faena:
-                    if str(a['personal_id']) == pid:
-                        fecha_inicio = a['fecha_inicio']
-                        # Calcular fecha fin basándose en el turno o usar un límite razonable
-                        # Pero respetar la fecha fin de la faena
-                        if a['tipo_turno__dias_trabajo'] and a['tipo_turno__dias_descanso']:
-                            # Si hay turno, calcular fecha fin basándose en el turno
-                            dias_ciclo = a['tipo_turno__dias_trabajo'] + a['tipo_turno__dias_descanso']
-                            fecha_fin = fecha_inicio + timedelta(days=dias_ciclo * 3)  # 3 ciclos como máximo
-                        else:
-                            # Si no hay turno, usar un límite de 30 días
-                            fecha_fin = fecha_inicio + timedelta(days=30)
-                        
-                        # Respetar la fecha fin de la faena si está definida
-                        if a['faena__fecha_fin']:
-                            fecha_fin = min(fecha_fin, a['faena__fecha_fin'])
-                        
-                        fecha_fin = min(date(year, month, days_in_month), fecha_fin)
-                        
-                        if fecha_inicio <= date(year, month, day_num) <= fecha_fin:
-                            # Formatear fecha en español
-                            fecha_inicio_str = a['fecha_inicio'].strftime('%d de %B de %Y') if a['fecha_inicio'] else 'No especificada'
-                            faena_info = {
-                                'faena_id': a['faena_id'],
-                                'faena_nombre': a['faena__nombre'],
-                                'fecha_inicio': fecha_inicio_str,
-                                'turno': f"{a['tipo_turno__dias_trabajo']}x{a['tipo_turno__dias_descanso']}" if a['tipo_turno__dias_trabajo'] and a['tipo_turno__dias_descanso'] else a['faena__tipo_turno__nombre'] or 'Turno no especificado'
-                            }
-                            break
-                
-                estados.append({
-                    'tipo': 'en_faena',
-                    'color': 'celeste',
-                    'texto': 'Faena',
-                    'prioridad': 1,  # Prioridad baja para estado base
-                    'detalles': faena_info
-                })
-            
-            # Si no está en faena, está disponible (pero esto puede cambiar después)
-            if not en_faena:
-                estados.append({
-                    'tipo': 'disponible',
-                    'color': 'gris',
-                    'texto': 'Disp',
-                    'prioridad': 1
-                })
+    return respuesta_estados(request, results, personas=data, siguiente=siguiente, **rango['extra'])
+
+
+# =============================================================================
+# API DE DOTACIÓN DIARIA POR FAENA Y CARGO
+# =============================================================================
+
+@require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_calendario)
+def get_dotacion(request):
+    """
+    Obtener la dotación diaria de cada faena por cargo
+
+    Para cada faena y día del rango, cuántas personas de cada cargo están
+    trabajando, descansando o con licencia/ausentismo (ver planning.dotacion).
+    Se calcula con unas pocas consultas en bloque para todas las faenas.
+
+    Parámetros de entrada:
+    - month / year o desde / hasta: rango de fechas (igual que get_estados)
+    - faena_id: una o más faenas (opcional, por defecto todas)
+
+    Retorna: JSON con 'dias' (claves de los días, igual que get_estados) y
+    'faenas': lista de {faena_id, nombre, cargos, total}, donde cada cargo
+    y el total tienen una lista por categoría con la cantidad por día
+    """
+    rango, error = leer_rango_consulta(request)
+    if error:
+        return error
+
+    faena_ids = request.GET.getlist('faena_id')
+    try:
+        faena_ids = [int(faena_id) for faena_id in faena_ids] or None
+    except ValueError:
+        return JsonResponse({'error': 'Parámetro faena_id inválido'}, status=400)
+
+    return JsonResponse({
+        **rango['extra'],
+        'dias': claves_rango(rango['desde'], rango['hasta'], rango['clave_dia']),
+        'faenas': calcular_dotacion(rango['desde'], rango['hasta'], faena_ids),
+    })
+
+
+# =============================================================================
+# API DE CONFLICTOS DE PROGRAMACIÓN
+# =============================================================================
+
+@require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_calendario)
+def get_conflictos(request):
+    """
+    Listar los conflictos de programación de todo el personal en un rango
+
+    Personas programadas para trabajar en una faena estando con licencia,
+    con ausentismo o programadas a la vez en otra faena (ver
+    planning.conflictos). Se calcula en una pasada para toda la empresa.
+
+    Parámetros de entrada:
+    - month / year o desde / hasta: rango de fechas (igual que get_estados)
+
+    Retorna: JSON con desde, hasta, total, 'resumen' (cantidad por tipo) y
+    'conflictos': lista de {tipo, personal_id, nombre, rut, faena_id, faena,
+    desde, hasta, dias, ...}
+    """
+    rango, error = leer_rango_consulta(request)
+    if error:
+        return error
+
+    resultado = detectar_conflictos(rango['desde'], rango['hasta'])
+    return JsonResponse({
+        'desde': rango['desde'],
+        'hasta': rango['hasta'],
+        'total': len(resultado['conflictos']),
+        **resultado,
+    })
+
+
+# =============================================================================
+# API DE BÚSQUEDA DE PERSONAL
+# =============================================================================
+
+@require_GET
+def buscar_personal(request):
+    """
+    Búsqueda de personal activo por nombre o RUT (autocompletado)
     
-    # Aplicar descanso del turno (estado base)
-    for pid, days in results.items():
-        for d, estados in days.items():
-            day_num = int(d)
-            
-            # Verificar si la persona está en descanso del turno en este día
-            en_descanso_turno = pid in dias_de_descanso and day_num in dias_de_descanso[pid]
-            
-            if en_descanso_turno:
-                # Buscar información de la faena para el descanso
-                faena_info = None
-                for a in asignaciones_faena:
-                    if str(a['personal_id']) == pid:
-                        fecha_inicio = a['fecha_inicio']
-                        # Calcular fecha fin basándose en el turno o usar un límite razonable
-                        # Pero respetar la fecha fin de la faena
-                        if a['tipo_turno__dias_trabajo'] and a['tipo_turno__dias_descanso']:
-                            # Si hay turno, calcular fecha fin basándose en el turno
-                            dias_ciclo = a['tipo_turno__dias_trabajo'] + a['tipo_turno__dias_descanso']
-                            fecha_fin = fecha_inicio + timedelta(days=dias_ciclo * 3)  # 3 ciclos como máximo
-                        else:
-                            # Si no hay turno, usar un límite de 30 días
-                            fecha_fin = fecha_inicio + timedelta(days=30)
-                        
-                        # Respetar la fecha fin de la faena si está definida
-                        if a['faena__fecha_fin']:
-                            fecha_fin = min(fecha_fin, a['faena__fecha_fin'])
-                        
-                        fecha_fin = min(date(year, month, days_in_month), fecha_fin)
-                        
-                        if fecha_inicio <= date(year, month, day_num) <= fecha_fin:
-                            # Formatear fecha en español
-                            fecha_inicio_str = a['fecha_inicio'].strftime('%d de %B de %Y') if a['fecha_inicio'] else 'No especificada'
-                            faena_info = {
-                                'faena_id': a['faena_id'],
-                                'faena_nombre': a['faena__nombre'],
-                                'fecha_inicio': fecha_inicio_str,
-                                'turno': f"{a['tipo_turno__dias_trabajo']}x{a['tipo_turno__dias_descanso']}" if a['tipo_turno__dias_trabajo'] and a['tipo_turno__dias_descanso'] else a['faena__tipo_turno__nombre'] or 'Turno no especificado'
-                            }
-                            break
-                
-                estados.append({
-                    'tipo': 'descanso',
-                    'color': 'verde',
-                    'texto': 'Descanso',
-                    'prioridad': 1,  # Prioridad alta (estado base)
-                    'detalles': faena_info
-                })
-                
-                # Remover estado "disponible" si existe (el descanso tiene prioridad)
-                estados[:] = [estado for estado in estados if estado['tipo'] != 'disponible']
-    
-    # Aplicar turnos (se superponen a la faena)
-    # Placeholder: En un sistema real, se conectaría con tabla de turnos
-    for pid, days in results.items():
-        for d, estados in days.items():
-            day_num = int(d)
-            
-            # Verificar si la persona está en faena en este día
-            en_faena = pid in dias_en_faena and day_num in dias_en_faena[pid]
-            
-            # Si está en faena, puede tener turno
-            if en_faena:
-                has_turno = False  # Reemplazar con lógica real después
-                if has_turno:
-                    estados.append({
-                        'tipo': 'turno',
-                        'color': 'orange',
-                        'texto': 'Turno',
-                        'prioridad': 2  # Prioridad media
-                    })
+    Usa el índice de términos de planning.busqueda: prefijos de palabras sin
+    importar tildes ni mayúsculas, y RUT con o sin puntos, guion y dígito
+    verificador.
     
-    # Aplicar licencias médicas (se superponen a la faena y turno)
-    for l in licencias:
-        personal_id_str = str(l['personal_id'])
-        if personal_id_str in results:
-            for d in iter_days(l['fechaEmision'], l['fecha_fin_licencia']):
-                if str(d) in results[personal_id_str]:
-                    # Buscar información detallada de la licencia
-                    # Formatear fechas en español
-                    fecha_inicio_str = l['fechaEmision'].strftime('%d de %B de %Y') if l['fechaEmision'] else 'No especificada'
-                    fecha_fin_str = l['fecha_fin_licencia'].strftime('%d de %B de %Y') if l['fecha_fin_licencia'] else 'No especificada'
-                    licencia_info = {
-                        'fecha_inicio': fecha_inicio_str,
-                        'fecha_fin': fecha_fin_str,
-                        'tipo': 'Licencia Médica'
-                    }
-                    
-                    # Agregar licencia
-                    results[personal_id_str][str(d)].append({
-                        'tipo': 'licencia',
-                        'color': 'salmon',
-                        'texto': 'Licencia',
-                        'prioridad': 3,  # Prioridad alta
-                        'detalles': licencia_info
-                    })
-                    
-                    # Remover estado "disponible" si existe (la licencia tiene prioridad)
-                    results[personal_id_str][str(d)] = [
-                        estado for estado in results[personal_id_str][str(d)] 
-                        if estado['tipo'] != 'disponible'
-                    ]
-    
-    # Aplicar ausentismos (se superponen a la faena)
-    for a in ausentismos:
-        personal_id_str = str(a['personal_id'])
-        if personal_id_str in results:
-            tipo = (a['tipoausen_id__tipo'] or '').lower()
-            tag = None
-            color = None
-            if 'vacacion' in tipo:
-                tag, color = 'vacaciones', 'amarillo'
-            elif 'descanso' in tipo:
-                tag, color = 'descanso', 'verde'
-                # El descanso es un estado base (prioridad 1), no un ausentismo secundario
-            elif 'permiso' in tipo:
-                tag, color = 'permiso', 'naranjo'
-            else:
-                tag, color = 'ausencia', 'gris'
-            
-            for d in iter_days(a['fechaini'], a['fechafin']):
-                if str(d) in results[personal_id_str]:
-                    # Personalizar el texto según el tipo
-                    if 'vacacion' in tipo:
-                        texto_mostrar = 'Vac'
-                    elif 'descanso' in tipo:
-                        texto_mostrar = 'Descanso'
-                    elif 'permiso' in tipo:
-                        texto_mostrar = 'Perm'
-                    else:
-                        texto_mostrar = a['tipoausen_id__tipo']
-                    
-                    # Agregar el ausentismo
-                    # El descanso es estado base (prioridad 1), los demás son secundarios (prioridad 2)
-                    prioridad_estado = 1 if tag == 'descanso' else 2
-                    
-                    # Buscar información detallada del ausentismo
-                    # Formatear fechas en español
-                    fecha_inicio_str = a['fechaini'].strftime('%d de %B de %Y') if a['fechaini'] else 'No especificada'
-                    fecha_fin_str = a['fechafin'].strftime('%d de %B de %Y') if a['fechafin'] else 'No especificada'
-                    ausentismo_info = {
-                        'fecha_inicio': fecha_inicio_str,
-                        'fecha_fin': fecha_fin_str,
-                        'tipo': a['tipoausen_id__tipo']
-                    }
-                    
-                    results[personal_id_str][str(d)].append({
-                        'tipo': tag,
-                        'color': color,
-                        'texto': texto_mostrar,
-                        'prioridad': prioridad_estado,
-                        'detalles': ausentismo_info
-                    })
-                    
-                    # Remover estado "disponible" si existe (los ausentismos tienen prioridad)
-                    results[personal_id_str][str(d)] = [
-                        estado for estado in results[personal_id_str][str(d)] 
-                        if estado['tipo'] != 'disponible'
-                    ]
-
-    # =============================================================================
-    # ORDENAR ESTADOS POR PRIORIDAD Y PREPARAR RESPUESTA FINAL
-    # =============================================================================
+    Parámetros de entrada:
+    - q: texto buscado (ej: 'gonz', 'juan gonzalez', '12.345.678-5')
+    - limit: cantidad máxima de resultados (default: 10, máximo: 50)
     
-    # SISTEMA DE PRIORIDADES VISUALES:
-    # Prioridad 1: Estados base (disponible, en faena, descanso) - Se muestran ARRIBA
-    # Prioridad 2: Estados secundarios (turno, vacaciones, permiso) - Se muestran ABAJO
-    # Prioridad 3: Estados de alta prioridad (licencia médica) - Se muestran AL FINAL
-    # 
-    # IMPORTANTE: El estado "disponible" se remueve automáticamente cuando hay otros estados
-    # porque no puede coexistir con licencia, descanso, permiso, vacaciones, etc.
-    
-    for pid, days in results.items():
-        for d, estados in days.items():
-            # =============================================================================
-            # ORDENAR ESTADOS POR PRIORIDAD VISUAL
-            # =============================================================================
-            
-            # Ordenar estados por prioridad (menor número = mayor prioridad visual)
-            # Esto determina el orden en que se muestran los estados en el calendario
-            estados.sort(key=lambda x: x['prioridad'])
-            
-            # Debug: mostrar el orden final de estados para cada día
-            if estados:
-                print(f"DEBUG: Persona {pid}, Día {d} - Estados ordenados: {[estado['tipo'] for estado in estados]}")
-
-    # =============================================================================
-    # DEBUG: IMPRIMIR RESULTADO FINAL
-    # =============================================================================
+    Retorna: JSON con las personas que mejor coinciden (id, nombre, rut)
+    """
+    try:
+        limit = min(int(request.GET.get('limit', LIMITE_RESULTADOS)), MAX_RESULTADOS)
+    except ValueError:
+        return JsonResponse({'error': 'Parámetro limit inválido'}, status=400)
     
-    # Debug: imprimir el resultado completo para verificación
-    print(f"DEBUG: resultados para {len(results)} personas")
-    for pid, days in results.items():
-        print(f"  Persona {pid}: {len([d for d in days.values() if d])} días con estados")
-        # Mostrar algunos ejemplos de estados (solo primeros 3 días para no saturar)
-        for day, estados in list(days.items())[:3]:  # Solo primeros 3 días
-            if estados:
-                print(f"    Día {day}: {estados}")
+    personas = buscar(request.GET.get('q', ''), limite=max(limit, 1))
+    return JsonResponse({'results': [
+        {
+            'id': p.personal_id,
+            'nombre': f"{p.nombre} {p.apepat} {p.apemat}",
+            'rut': f"{p.rut}-{p.dvrut}",
+        }
+        for p in personas
+    ]})
 
-    # =============================================================================
-    # RETORNAR RESPUESTA JSON AL FRONTEND
-    # =============================================================================
+
+@require_GET
+def get_cache_estados(request):
+    """
+    API para consultar los contadores del caché de estados
     
-    # Retornar el mapa completo de estados para todas las personas y días
-    return JsonResponse({'results': results})
+    Retorna: JSON con activo, aciertos, fallos y tasa_aciertos
+    (acumulados desde que se creó el caché)
+    """
+    return JsonResponse(estadisticas_cache())
 
 
 # =============================================================================
@@ -990,6 +664,8 @@ def get_estados(request):
 # =============================================================================
 
 @require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_calendario)
 def get_turnos(request):
     """
     Obtener lista de turnos disponibles en el sistema
@@ -997,31 +673,25 @@ def get_turnos(request):
     Esta función proporciona la lista de turnos para las asignaciones:
     - Obtiene todos los turnos activos (7x7, 14x7, etc.)
     - Se usa al asignar personal a faenas
-    - Incluye debug logs para troubleshooting
+    - Incluye mensajes de diagnóstico opcionales (ver planning.diagnostico)
     
     Retorna: JSON con lista de turnos activos
     """
     try:
-        print(f"DEBUG: get_turnos - Iniciando...")
-        
         # Obtener todos los turnos activos ordenados por nombre
         turnos = TipoTurno.objects.filter(activo=True).values('tipo_turno_id', 'nombre').order_by('nombre')
-        print(f"DEBUG: get_turnos - Query ejecutada, {turnos.count()} turnos encontrados")
         
         # Convertir QuerySet a lista para mejor manejo
         turnos_list = list(turnos)
-        print(f"DEBUG: get_turnos - Turnos convertidos a lista: {turnos_list}")
+        debug("get_turnos - %s turnos encontrados: %s", len(turnos_list), turnos_list)
         
         # Construir respuesta final
         response_data = {'results': turnos_list}
-        print(f"DEBUG: get_turnos - Respuesta final: {response_data}")
         
         return JsonResponse(response_data)
         
     except Exception as e:
-        print(f"ERROR en get_turnos: {str(e)}")
-        import traceback
-        print(f"Traceback completo: {traceback.format_exc()}")
+        logger.exception("Error en get_turnos")
         return JsonResponse({'error': str(e)}, status=500)
 
 
@@ -1113,31 +783,29 @@ def assign_personal_to_faena(request):
     Retorna: JSON con resultado de la operación
     """
     try:
-        print(f"DEBUG: assign_personal_to_faena - Request body: {request.body}")
-        print(f"DEBUG: Request method: {request.method}")
-        print(f"DEBUG: Request content type: {request.content_type}")
+        debug("assign_personal_to_faena - Request body: %s, content type: %s", request.body, request.content_type)
         
         # Verificar que el request tenga contenido
         if not request.body:
-            print("DEBUG: Request body está vacío")
+            debug("Request body está vacío")
             return JsonResponse({'success': False, 'error': 'Request body vacío'})
         
         # Intentar parsear como JSON primero, si falla, usar datos de formulario
         try:
             data = json.loads(request.body)
-            print(f"DEBUG: Datos parseados como JSON: {data}")
+            debug("Datos parseados como JSON: %s", data)
         except json.JSONDecodeError:
             # Si no es JSON, usar datos de formulario
-            print(f"DEBUG: Parseando como datos de formulario...")
+            debug("Parseando como datos de formulario...")
             data = {}
             if request.content_type == 'application/x-www-form-urlencoded':
                 # Parsear datos de formulario
                 from urllib.parse import parse_qs
                 form_data = parse_qs(request.body.decode('utf-8'))
                 data = {key: value[0] if value else None for key, value in form_data.items()}
-                print(f"DEBUG: Datos parseados como formulario: {data}")
+                debug("Datos parseados como formulario: %s", data)
             else:
-                print(f"DEBUG: Content type no reconocido: {request.content_type}")
+                debug("Content type no reconocido: %s", request.content_type)
                 return JsonResponse({'success': False, 'error': 'Formato de datos no soportado'})
         
         personal_id = data.get('personal_id')
@@ -1146,22 +814,13 @@ def assign_personal_to_faena(request):
         fecha_inicio = data.get('fecha_inicio')
         is_editing = data.get('is_editing', False)
         
-        print(f"DEBUG: personal_id: {personal_id}, faena_id: {faena_id}, turno_id: {turno_id}, fecha_inicio: {fecha_inicio}")
-        print(f"DEBUG: Modo: {'Edición' if is_editing else 'Nueva asignación'}")
-        print(f"DEBUG: Tipo de is_editing: {type(is_editing)}, Valor: {is_editing}")
-        print(f"DEBUG: is_editing es True?: {is_editing == True}")
-        print(f"DEBUG: is_editing es False?: {is_editing == False}")
-        print(f"DEBUG: is_editing == 'true'?: {is_editing == 'true'}")
-        print(f"DEBUG: is_editing == 'false'?: {is_editing == 'false'}")
-        print(f"DEBUG: is_editing == 1?: {is_editing == 1}")
-        print(f"DEBUG: is_editing == 0?: {is_editing == 0}")
-        print(f"DEBUG: Tipo de personal_id: {type(personal_id)}")
-        print(f"DEBUG: Tipo de faena_id: {type(faena_id)}")
-        print(f"DEBUG: Tipo de turno_id: {type(turno_id)}")
-        print(f"DEBUG: Tipo de fecha_inicio: {type(fecha_inicio)}")
+        debug(
+            "personal_id: %r, faena_id: %r, turno_id: %r, fecha_inicio: %r, is_editing: %r",
+            personal_id, faena_id, turno_id, fecha_inicio, is_editing,
+        )
         
         if not all([personal_id, faena_id, fecha_inicio]):
-            print(f"DEBUG: Faltan datos requeridos - personal_id: {personal_id}, faena_id: {faena_id}, fecha_inicio: {fecha_inicio}")
+            debug("Faltan datos requeridos - personal_id: %s, faena_id: %s, fecha_inicio: %s", personal_id, faena_id, fecha_inicio)
             return JsonResponse({'success': False, 'error': 'Faltan datos requeridos'})
         
         # Convertir a enteros si es necesario
@@ -1171,10 +830,10 @@ def assign_personal_to_faena(request):
             if turno_id:
                 turno_id = int(turno_id)
         except (ValueError, TypeError) as e:
-            print(f"DEBUG: Error al convertir IDs: {e}")
+            debug("Error al convertir IDs: %s", e)
             return JsonResponse({'success': False, 'error': 'IDs inválidos'})
         
-        print(f"DEBUG: IDs convertidos - personal_id: {personal_id}, faena_id: {faena_id}, turno_id: {turno_id}")
+        debug("IDs convertidos - personal_id: %s, faena_id: %s, turno_id: %s", personal_id, faena_id, turno_id)
         
         # Normalizar el valor de is_editing para manejar strings y booleanos
         if isinstance(is_editing, str):
@@ -1182,7 +841,7 @@ def assign_personal_to_faena(request):
         elif isinstance(is_editing, int):
             is_editing = bool(is_editing)
         
-        print(f"DEBUG: is_editing normalizado: {is_editing} (tipo: {type(is_editing)})")
+        debug("is_editing normalizado: %s", is_editing)
         
         # Validaciones adicionales antes de procesar
         try:
@@ -1236,7 +895,7 @@ def assign_personal_to_faena(request):
         
         if is_editing:
             # Modo edición: actualizar la asignación existente
-            print(f"DEBUG: Modo edición - actualizando asignación existente...")
+            debug("Modo edición - actualizando asignación existente...")
             try:
                 asignacion_existente = PersonalFaena.objects.get(
                     personal_id=personal_id,
@@ -1267,7 +926,7 @@ def assign_personal_to_faena(request):
                     
                     descripcion = f"Se editó la asignación de {personal.nombre} {personal.apepat} en la faena '{faena.nombre}' - Turno: {turno_anterior} → {turno_nuevo}, Fecha: {datos_anteriores['fecha_inicio']} → {fecha_inicio}"
                     
-                    AuditLog.crear_log(
+                    registrar_log(AuditLog.construir_log(
                         accion='editar',
                         tabla_afectada='PersonalFaena',
                         registro_id=asignacion_existente.personal_faena_id,
@@ -1279,31 +938,33 @@ def assign_personal_to_faena(request):
                             'fecha_inicio': fecha_inicio,
                             'personal_rut': f"{personal.rut}-{personal.dvrut}"
                         },
-                        ip_address=get_client_ip(request)
-                    )
-                    print(f"DEBUG: Log de auditoría para edición creado exitosamente")
-                except Exception as e:
-                    print(f"ERROR al crear log de auditoría para edición: {str(e)}")
+                        ip_address=get_client_ip(request),
+                        personal=personal,
+                        faena=faena
+                    ))
+                    debug("Log de auditoría para edición creado exitosamente")
+                except Exception:
+                    logger.exception("Error al crear log de auditoría para edición")
                 
-                print(f"DEBUG: Asignación actualizada exitosamente")
+                debug("Asignación actualizada exitosamente")
                 return JsonResponse({'success': True, 'assignment_id': asignacion_existente.personal_faena_id, 'message': 'Asignación actualizada'})
                 
             except PersonalFaena.DoesNotExist:
-                print(f"DEBUG: No se encontró asignación existente para editar")
+                debug("No se encontró asignación existente para editar")
                 return JsonResponse({'success': False, 'error': 'No se encontró asignación existente para editar'})
         else:
             # Modo nueva asignación: crear nueva
-            print(f"DEBUG: Modo nueva asignación - creando nueva asignación...")
+            debug("Modo nueva asignación - creando nueva asignación...")
             
             # Verificar si ya existe una asignación activa a la misma faena
             # Solo desactivar si es la misma faena, permitir múltiples faenas simultáneas
-            print(f"DEBUG: Verificando asignaciones existentes...")
+            debug("Verificando asignaciones existentes...")
             asignaciones_existentes = PersonalFaena.objects.filter(
                 personal_id=personal_id,
                 faena_id=faena_id,
                 activo=True
             )
-            print(f"DEBUG: Asignaciones existentes encontradas: {asignaciones_existentes.count()}")
+            debug("Asignaciones existentes encontradas: %s", perezoso(lambda: asignaciones_existentes.count()))
             
             # Verificar si ya existe una asignación con la misma fecha de inicio
             asignacion_misma_fecha = PersonalFaena.objects.filter(
@@ -1313,7 +974,7 @@ def assign_personal_to_faena(request):
             ).first()
             
             if asignacion_misma_fecha:
-                print(f"DEBUG: Ya existe una asignación con la misma fecha de inicio, actualizando...")
+                debug("Ya existe una asignación con la misma fecha de inicio, actualizando...")
                 # Actualizar la asignación existente
                 asignacion_misma_fecha.tipo_turno_id = turno_id
                 asignacion_misma_fecha.activo = True
@@ -1321,16 +982,19 @@ def assign_personal_to_faena(request):
                 asignacion_misma_fecha.save()
                 
                 nueva_asignacion = asignacion_misma_fecha
-                print(f"DEBUG: Asignación existente actualizada exitosamente")
+                debug("Asignación existente actualizada exitosamente")
             else:
                 # Desactivar asignaciones existentes a la misma faena
                 if asignaciones_existentes.exists():
-                    print(f"DEBUG: Desactivando asignaciones existentes...")
+                    debug("Desactivando asignaciones existentes...")
+                    # update() no dispara señales: registrar el cambio a mano
+                    afectados = afectados_asignaciones(asignaciones_existentes)
                     asignaciones_existentes.update(activo=False)
-                    print(f"DEBUG: Asignaciones desactivadas exitosamente")
+                    registrar_cambio(*afectados)
+                    debug("Asignaciones desactivadas exitosamente")
                 
                 # Crear nueva asignación
-                print(f"DEBUG: Creando nueva asignación...")
+                debug("Creando nueva asignación...")
                 nueva_asignacion = PersonalFaena(
                     personal_id=personal_id,
                     faena_id=faena_id,
@@ -1342,7 +1006,7 @@ def assign_personal_to_faena(request):
                 # Validar antes de guardar
                 nueva_asignacion.full_clean()
                 nueva_asignacion.save()
-                print(f"DEBUG: Nueva asignación creada exitosamente con ID: {nueva_asignacion.personal_faena_id}")
+                debug("Nueva asignación creada exitosamente con ID: %s", nueva_asignacion.personal_faena_id)
             
             # Crear log de auditoría
             try:
@@ -1353,7 +1017,6 @@ def assign_personal_to_faena(request):
                 
                 descripcion = f"Se asignó a {personal.nombre} {personal.apepat} a la faena '{faena.nombre}' desde {fecha_inicio}{turno_info}"
                 
-                # Debug: mostrar exactamente qué datos se van a guardar
                 datos_log = {
                     'personal_id': personal_id,
                     'personal_nombre': f"{personal.nombre} {personal.apepat}",
@@ -1363,28 +1026,27 @@ def assign_personal_to_faena(request):
                     'fecha_inicio': fecha_inicio,
                     'turno_id': turno_id
                 }
-                print(f"DEBUG: Datos que se van a guardar en el log: {datos_log}")
-                print(f"DEBUG: personal.rut = {personal.rut}, personal.dvrut = {personal.dvrut}")
+                debug("Datos que se van a guardar en el log: %s", datos_log)
                 
-                AuditLog.crear_log(
+                registrar_log(AuditLog.construir_log(
                     accion='asignar',
                     tabla_afectada='PersonalFaena',
                     registro_id=nueva_asignacion.personal_faena_id,
                     descripcion=descripcion,
                     usuario=get_current_user_name(request),
                     datos_nuevos=datos_log,
-                    ip_address=get_client_ip(request)
-                )
-                print(f"DEBUG: Log de auditoría creado exitosamente")
-            except Exception as e:
-                print(f"ERROR al crear log de auditoría: {str(e)}")
+                    ip_address=get_client_ip(request),
+                    personal=personal,
+                    faena=faena
+                ))
+                debug("Log de auditoría creado exitosamente")
+            except Exception:
+                logger.exception("Error al crear log de auditoría")
             
             return JsonResponse({'success': True, 'assignment_id': nueva_asignacion.personal_faena_id, 'message': 'Nueva asignación creada'})
         
     except Exception as e:
-        print(f"ERROR en assign_personal_to_faena: {str(e)}")
-        import traceback
-        print(f"Traceback completo: {traceback.format_exc()}")
+        logger.exception("Error en assign_personal_to_faena")
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
@@ -1407,54 +1069,44 @@ def remove_personal_from_faena(request):
     Retorna: JSON con resultado de la operación
     """
     try:
-        print(f"DEBUG: remove_personal_from_faena - Request body: {request.body}")
-        print(f"DEBUG: Request method: {request.method}")
-        print(f"DEBUG: Request content type: {request.content_type}")
-        
-        # Verificar que el modelo PersonalFaena esté disponible
-        print(f"DEBUG: Verificando importación del modelo PersonalFaena...")
-        print(f"DEBUG: PersonalFaena: {PersonalFaena}")
-        print(f"DEBUG: PersonalFaena.__module__: {PersonalFaena.__module__}")
+        debug("remove_personal_from_faena - Request body: %s, content type: %s", request.body, request.content_type)
         
         # Verificar que el request tenga contenido
         if not request.body:
-            print("DEBUG: Request body está vacío")
+            debug("Request body está vacío")
             return JsonResponse({'success': False, 'error': 'Request body vacío'})
         
         # Intentar parsear como JSON primero, si falla, usar datos de formulario
         try:
             data = json.loads(request.body)
-            print(f"DEBUG: Datos parseados como JSON: {data}")
+            debug("Datos parseados como JSON: %s", data)
         except json.JSONDecodeError:
             # Si no es JSON, usar datos de formulario
-            print(f"DEBUG: Parseando como datos de formulario...")
+            debug("Parseando como datos de formulario...")
             data = {}
             if request.content_type == 'application/x-www-form-urlencoded':
                 # Parsear datos de formulario
                 from urllib.parse import parse_qs
                 form_data = parse_qs(request.body.decode('utf-8'))
                 data = {key: value[0] if value else None for key, value in form_data.items()}
-                print(f"DEBUG: Datos parseados como formulario: {data}")
+                debug("Datos parseados como formulario: %s", data)
             else:
-                print(f"DEBUG: Content type no reconocido: {request.content_type}")
+                debug("Content type no reconocido: %s", request.content_type)
                 return JsonResponse({'success': False, 'error': 'Formato de datos no soportado'})
         
         personal_id = data.get('personal_id')
         faena_id = data.get('faena_id')  # Nueva: faena específica a remover
         
-        print(f"DEBUG: personal_id: {personal_id}, faena_id: {faena_id}")
-        print(f"DEBUG: Tipo de personal_id: {type(personal_id)}")
-        print(f"DEBUG: Tipo de faena_id: {type(faena_id)}")
-        print(f"DEBUG: Data completo: {data}")
+        debug("personal_id: %r, faena_id: %r", personal_id, faena_id)
         
         # Validar que personal_id no sea None, vacío o 0
         if not personal_id or personal_id == '' or personal_id == 0:
-            print(f"DEBUG: personal_id inválido: {personal_id}")
+            debug("personal_id inválido: %s", personal_id)
             return JsonResponse({'success': False, 'error': 'ID de personal requerido'})
         
         # Validar que faena_id sea válido si se proporciona
         if faena_id is not None and (faena_id == '' or faena_id == 0):
-            print(f"DEBUG: faena_id inválido: {faena_id}")
+            debug("faena_id inválido: %s", faena_id)
             return JsonResponse({'success': False, 'error': 'ID de faena inválido'})
         
         # Convertir a enteros si es necesario
@@ -1463,71 +1115,44 @@ def remove_personal_from_faena(request):
             if faena_id:
                 faena_id = int(faena_id)
         except (ValueError, TypeError) as e:
-            print(f"DEBUG: Error al convertir IDs: {e}")
+            debug("Error al convertir IDs: %s", e)
             return JsonResponse({'success': False, 'error': 'IDs inválidos'})
         
-        print(f"DEBUG: IDs convertidos - personal_id: {personal_id}, faena_id: {faena_id}")
+        debug("IDs convertidos - personal_id: %s, faena_id: %s", personal_id, faena_id)
         
         # Si se especifica una faena, remover solo esa
         if faena_id:
-            print(f"DEBUG: Removiendo faena específica {faena_id} para personal {personal_id}")
+            debug("Removiendo faena específica %s para personal %s", faena_id, personal_id)
             
-            # Verificar que el modelo PersonalFaena existe
-            print(f"DEBUG: Verificando modelo PersonalFaena...")
-            print(f"DEBUG: PersonalFaena.objects: {PersonalFaena.objects}")
-            
-            # Construir la query paso a paso para debug
-            print(f"DEBUG: Construyendo query...")
-            query = PersonalFaena.objects.filter(activo=True)
-            print(f"DEBUG: Query base (activo=True): {query.count()} resultados")
-            
-            query = query.filter(personal_id=personal_id)
-            print(f"DEBUG: Query con personal_id={personal_id}: {query.count()} resultados")
-            
-            query = query.filter(faena_id=faena_id)
-            print(f"DEBUG: Query final con faena_id={faena_id}: {query.count()} resultados")
-            
-            asignaciones = query
+            asignaciones = PersonalFaena.objects.filter(
+                personal_id=personal_id,
+                faena_id=faena_id,
+                activo=True
+            )
+            debug("Asignaciones activas encontradas: %s", perezoso(lambda: asignaciones.count()))
             
             if asignaciones.exists():
-                print(f"DEBUG: Actualizando asignaciones...")
+                debug("Actualizando asignaciones...")
                 
-                # Crear logs de auditoría antes de desactivar
-                for asignacion in asignaciones:
+                with transaction.atomic():
+                    # Logs de auditoría (se escriben al confirmar la transacción)
                     try:
-                        personal = Personal.objects.get(personal_id=asignacion.personal_id)
-                        faena = Faena.objects.get(faena_id=asignacion.faena_id)
-                        turno_info = f" (Turno: {asignacion.tipo_turno.nombre})" if asignacion.tipo_turno else ""
-                        
-                        descripcion = f"Se removió a {personal.nombre} {personal.apepat} de la faena '{faena.nombre}'{turno_info}"
-                        
-                        AuditLog.crear_log(
-                            accion='remover',
-                            tabla_afectada='PersonalFaena',
-                            registro_id=asignacion.personal_faena_id,
-                            descripcion=descripcion,
-                            usuario=get_current_user_name(request),
-                            datos_anteriores={
-                                'personal_id': asignacion.personal_id,
-                                'personal_rut': f"{personal.rut}-{personal.dvrut}",
-                                'faena_id': asignacion.faena_id,
-                                'tipo_turno_id': asignacion.tipo_turno_id,
-                                'fecha_inicio': asignacion.fecha_inicio.strftime('%Y-%m-%d') if asignacion.fecha_inicio else None,
-                                'activo': True
-                            },
-                            ip_address=get_client_ip(request)
-                        )
-                    except Exception as e:
-                        print(f"ERROR al crear log de auditoría para remoción: {str(e)}")
-                
-                asignaciones.update(activo=False)
-                print(f"DEBUG: Asignaciones actualizadas exitosamente")
+                        registrar_logs(logs_remocion(asignaciones, get_current_user_name(request), get_client_ip(request)))
+                    except Exception:
+                        logger.exception("Error al crear logs de auditoría para remoción")
+                    
+                    # update() no dispara señales: registrar el cambio y la nueva generación a mano
+                    afectados = afectados_asignaciones(asignaciones)
+                    asignaciones.update(activo=False, fecha_modificacion=timezone.now())
+                    registrar_cambio(*afectados)
+                    nueva_generacion()
+                debug("Asignaciones actualizadas exitosamente")
                 return JsonResponse({'success': True, 'message': f'Personal removido de la faena {faena_id}'})
             else:
-                print(f"DEBUG: No se encontraron asignaciones activas")
+                debug("No se encontraron asignaciones activas")
                 return JsonResponse({'success': False, 'error': f'No se encontró asignación activa a la faena {faena_id}'})
         else:
-            print(f"DEBUG: Removiendo todas las faenas para personal {personal_id}")
+            debug("Removiendo todas las faenas para personal %s", personal_id)
             
             # Si no se especifica faena, remover todas las asignaciones activas (comportamiento anterior)
             asignaciones = PersonalFaena.objects.filter(
@@ -1535,53 +1160,158 @@ def remove_personal_from_faena(request):
                 activo=True
             )
             
-            print(f"DEBUG: Total asignaciones activas encontradas: {asignaciones.count()}")
+            debug("Total asignaciones activas encontradas: %s", perezoso(lambda: asignaciones.count()))
             
             if asignaciones.exists():
-                print(f"DEBUG: Actualizando todas las asignaciones...")
+                debug("Actualizando todas las asignaciones...")
                 
-                # Crear logs de auditoría antes de desactivar
-                for asignacion in asignaciones:
+                with transaction.atomic():
+                    # Logs de auditoría (se escriben al confirmar la transacción)
                     try:
-                        personal = Personal.objects.get(personal_id=asignacion.personal_id)
-                        faena = Faena.objects.get(faena_id=asignacion.faena_id)
-                        turno_info = f" (Turno: {asignacion.tipo_turno_id})" if asignacion.tipo_turno_id else ""
-                        
-                        descripcion = f"Se removió a {personal.nombre} {personal.apepat} de la faena '{faena.nombre}'{turno_info}"
-                        
-                        AuditLog.crear_log(
-                            accion='remover',
-                            tabla_afectada='PersonalFaena',
-                            registro_id=asignacion.personal_faena_id,
-                            descripcion=descripcion,
-                            usuario=get_current_user_name(request),
-                            datos_anteriores={
-                                'personal_id': asignacion.personal_id,
-                                'personal_rut': f"{personal.rut}-{personal.dvrut}",
-                                'faena_id': asignacion.faena_id,
-                                'tipo_turno_id': asignacion.tipo_turno_id,
-                                'fecha_inicio': asignacion.fecha_inicio.strftime('%Y-%m-%d') if asignacion.fecha_inicio else None,
-                                'activo': True
-                            },
-                            ip_address=get_client_ip(request)
-                        )
-                    except Exception as e:
-                        print(f"ERROR al crear log de auditoría para remoción: {str(e)}")
-                
-                asignaciones.update(activo=False)
-                print(f"DEBUG: Todas las asignaciones actualizadas exitosamente")
+                        registrar_logs(logs_remocion(asignaciones, get_current_user_name(request), get_client_ip(request)))
+                    except Exception:
+                        logger.exception("Error al crear logs de auditoría para remoción")
+                    
+                    # update() no dispara señales: registrar el cambio y la nueva generación a mano
+                    afectados = afectados_asignaciones(asignaciones)
+                    asignaciones.update(activo=False, fecha_modificacion=timezone.now())
+                    registrar_cambio(*afectados)
+                    nueva_generacion()
+                debug("Todas las asignaciones actualizadas exitosamente")
                 return JsonResponse({'success': True, 'message': 'Personal removido de todas las faenas'})
             else:
-                print(f"DEBUG: No se encontraron asignaciones activas")
+                debug("No se encontraron asignaciones activas")
                 return JsonResponse({'success': False, 'error': 'No se encontró asignación activa'})
         
     except Exception as e:
-        print(f"ERROR en remove_personal_from_faena: {str(e)}")
-        import traceback
-        print(f"Traceback completo: {traceback.format_exc()}")
+        logger.exception("Error en remove_personal_from_faena")
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
+# =============================================================================
+# API PARA ASIGNAR Y REMOVER PERSONAL EN LOTE
+# =============================================================================
+
+def leer_json(request):
+    """
+    Cuerpo JSON de un request
+    
+    Retorna: (datos, error) donde error es un JsonResponse 400 o None
+    """
+    try:
+        datos = json.loads(request.body or b'null')
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None, JsonResponse({'success': False, 'error': 'El cuerpo debe ser JSON'}, status=400)
+    if not isinstance(datos, dict):
+        return None, JsonResponse({'success': False, 'error': 'El cuerpo debe ser un objeto JSON'}, status=400)
+    return datos, None
+
+
+@csrf_exempt
+@require_POST
+def assign_personal_to_faena_bulk(request):
+    """
+    ASIGNAR VARIAS PERSONAS A UNA FAENA EN UNA SOLA OPERACIÓN
+    
+    Para dotar una faena completa sin un request por persona. Todas las
+    filas se validan en memoria (con las mismas reglas de fechas y turnos
+    que assign_personal_to_faena) y se guardan en una sola transacción:
+    si alguna es inválida no se guarda ninguna (ver planning.asignaciones).
+    
+    Parámetros de entrada (JSON):
+    - faena_id: ID de la faena destino
+    - asignaciones: lista de {personal_id, turno_id (opcional), fecha_inicio (YYYY-MM-DD)}
+    - turno_id, fecha_inicio: valores para las filas que no los traen (opcionales)
+    
+    Retorna: JSON con la cantidad de asignaciones creadas, reactivadas y
+    desactivadas y el ID de la asignación de cada persona; o 400 con la
+    lista de errores por fila
+    """
+    datos, error = leer_json(request)
+    if error:
+        return error
+    
+    faena_id = datos.get('faena_id')
+    filas = datos.get('asignaciones')
+    if not isinstance(faena_id, (int, str)) or not str(faena_id).isdigit() or not isinstance(filas, list):
+        return JsonResponse({'success': False, 'error': 'Se requieren faena_id y la lista asignaciones'}, status=400)
+    if len(filas) > MAX_ASIGNACIONES:
+        return JsonResponse({'success': False, 'error': f'Máximo {MAX_ASIGNACIONES} asignaciones por request'}, status=400)
+    
+    debug("assign_personal_to_faena_bulk - faena_id: %s, filas: %s", faena_id, len(filas))
+    try:
+        resumen, errores = asignar_en_lote(
+            int(faena_id), filas,
+            fecha_inicio=datos.get('fecha_inicio'),
+            turno_id=datos.get('turno_id'),
+            usuario=get_current_user_name(request),
+            ip_address=get_client_ip(request),
+        )
+    except Exception as e:
+        logger.exception("Error en assign_personal_to_faena_bulk")
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+    
+    if errores:
+        debug("Asignación en lote rechazada: %s errores", len(errores))
+        return JsonResponse({'success': False, 'error': 'Hay asignaciones inválidas; no se guardó ninguna', 'errores': errores}, status=400)
+    return JsonResponse({'success': True, **resumen})
+
+
+@csrf_exempt
+@require_POST
+def remove_personal_from_faena_bulk(request):
+    """
+    REMOVER VARIAS PERSONAS (O TODO EL PERSONAL) DE UNA FAENA
+    
+    Para cerrar una faena o reducir su dotación sin un request por persona:
+    las asignaciones activas se desactivan con un solo UPDATE y sus logs de
+    auditoría se escriben juntos. El cierre solo adelanta el fin de la faena
+    (ver planning.asignaciones.remover_en_lote).
+    
+    Parámetros de entrada (JSON):
+    - faena_id: ID de la faena
+    - personal_ids: lista de IDs a remover, o todos: true para todo el personal
+    - fecha: fecha de la remoción YYYY-MM-DD, no posterior a hoy, o del
+      cierre (opcional, default hoy)
+    - cerrar: true para terminar la faena en esa fecha sin remover a su
+      personal (requiere todos)
+    
+    Retorna: JSON con la cantidad de asignaciones removidas, las personas
+    pedidas que no tenían asignación activa y si la faena se cerró
+    """
+    datos, error = leer_json(request)
+    if error:
+        return error
+    
+    faena_id = datos.get('faena_id')
+    personal_ids = datos.get('personal_ids')
+    todos = datos.get('todos') is True
+    if not isinstance(faena_id, (int, str)) or not str(faena_id).isdigit():
+        return JsonResponse({'success': False, 'error': 'Se requiere faena_id'}, status=400)
+    if todos == isinstance(personal_ids, list):
+        return JsonResponse({'success': False, 'error': 'Se requiere la lista personal_ids o todos: true'}, status=400)
+    if not todos and len(personal_ids) > MAX_ASIGNACIONES:
+        return JsonResponse({'success': False, 'error': f'Máximo {MAX_ASIGNACIONES} personas por request'}, status=400)
+    
+    debug("remove_personal_from_faena_bulk - faena_id: %s, personas: %s", faena_id, 'todas' if todos else len(personal_ids))
+    try:
+        resumen, error = remover_en_lote(
+            int(faena_id),
+            personal_ids=None if todos else personal_ids,
+            fecha=datos.get('fecha'),
+            cerrar=datos.get('cerrar') is True,
+            usuario=get_current_user_name(request),
+            ip_address=get_client_ip(request),
+        )
+    except Exception as e:
+        logger.exception("Error en remove_personal_from_faena_bulk")
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+    
+    if error:
+        return JsonResponse({'success': False, 'error': error}, status=400)
+    return JsonResponse({'success': True, **resumen})
+
+
 @require_GET
 def get_audit_logs(request):
     """
@@ -1593,178 +1323,68 @@ def get_audit_logs(request):
     - Incluye información detallada de cada cambio
     - Se usa para rastrear quién hizo qué y cuándo
     
-    SISTEMA DE FILTRADO:
+    SISTEMA DE FILTRADO (ver planning.auditoria):
     - accion: Filtrar por tipo de acción (asignar, remover, editar)
     - tabla: Filtrar por tabla afectada (PersonalFaena, Personal, etc.)
     - usuario: Filtrar por usuario que realizó el cambio
     - personal: Filtrar por nombre o RUT del personal afectado
     - faena: Filtrar por nombre o ID de la faena afectada
     
-    BÚSQUEDA INTELIGENTE:
-    - Busca en campos JSON (datos_nuevos, datos_anteriores)
-    - Busca en descripción del log
-    - Combina múltiples criterios con lógica OR
-    - Incluye búsqueda por RUT del personal
+    El personal, cargo y faena de cada log son los guardados al crearlo, en
+    columnas indexadas del propio log: la respuesta usa una sola consulta
+    sin importar cuántos logs se muestren.
+    
+    LECTURA INCREMENTAL:
+    Los logs van del más nuevo al más antiguo por log_id. El panel carga la
+    cabeza una vez, refresca pidiendo solo los logs nuevos (since_id) y
+    recorre el historial hacia atrás por páginas (before_id). Los logs
+    anteriores al horizonte de archivo (comando archivar_auditoria) se
+    siguen leyendo desde los archivos mensuales, con los mismos filtros.
     
     Parámetros de entrada:
-    - limit: Número máximo de logs a retornar (default: 50)
+    - limit: Número máximo de logs a retornar (default: 50, máximo 500)
+    - since_id: Solo logs con log_id mayor (los nuevos desde el último refresco)
+    - before_id: Solo logs con log_id menor (la página anterior del historial)
     - accion: Filtrar por tipo de acción
     - tabla: Filtrar por tabla afectada
     - usuario: Filtrar por usuario que realizó el cambio
     - personal: Filtrar por nombre o RUT del personal afectado
     - faena: Filtrar por nombre o ID de la faena afectada
     
-    Retorna: JSON con lista de logs filtrados y ordenados por fecha
+    Retorna: JSON con la lista de logs (del más nuevo al más antiguo) y
+    hay_mas, que indica si quedan logs en la dirección pedida
     """
+    try:
+        limit = int(request.GET.get('limit', LIMITE_LOGS))  # Límite de logs a mostrar
+        since_id = leer_cursor(request.GET.get('since_id'))
+        before_id = leer_cursor(request.GET.get('before_id'))
+        if limit < 1 or limit > MAX_LOGS or (since_id is not None and before_id is not None):
+            raise ValueError(limit)
+    except (TypeError, ValueError):
+        return JsonResponse({'success': False, 'error': 'Parámetros limit/since_id/before_id inválidos'}, status=400)
+    
     try:
         # Obtener parámetros de filtrado
-        limit = int(request.GET.get('limit', 50))  # Límite de logs a mostrar
         accion = request.GET.get('accion', '')  # Filtrar por tipo de acción
         tabla = request.GET.get('tabla', '')  # Filtrar por tabla afectada
         usuario = request.GET.get('usuario', '')  # Filtrar por usuario que realizó el cambio
         personal_filter = request.GET.get('personal', '')  # Filtrar por nombre o RUT del personal afectado
         faena_filter = request.GET.get('faena', '')  # Filtrar por faena
         
-        print(f"DEBUG: Parámetros recibidos - accion: {accion}, usuario: {usuario}, personal_filter: {personal_filter}, faena_filter: {faena_filter}")
-        
-        # Construir query base
-        logs = AuditLog.objects.all()
-        print(f"DEBUG: Total de logs antes de filtros: {logs.count()}")
-        
-        # Aplicar filtros si se especifican
-        if accion:
-            logs = logs.filter(accion__icontains=accion)
-            print(f"DEBUG: Después de filtro de acción: {logs.count()}")
-        if tabla:
-            logs = logs.filter(tabla_afectada__icontains=tabla)
-            print(f"DEBUG: Después de filtro de tabla: {logs.count()}")
-        
-        # Filtrar por usuario (quien realizó el cambio) - SOLO si se especifica explícitamente
-        if usuario and usuario.strip():
-            logs = logs.filter(usuario__icontains=usuario)
-            print(f"DEBUG: Después de filtro de usuario: {logs.count()}")
-        
-        # Filtrar por personal (nombre o RUT del personal afectado)
-        if personal_filter and personal_filter.strip():
-            print(f"DEBUG: Aplicando filtro de personal: {personal_filter}")
-            
-            # Debug: mostrar algunos logs antes de filtrar para entender la estructura
-            print(f"DEBUG: Estructura de logs antes de filtrar:")
-            sample_logs = logs[:3]
-            for i, log in enumerate(sample_logs):
-                print(f"  Log {i+1}:")
-                print(f"    - descripcion: '{log.descripcion}'")
-                print(f"    - datos_nuevos: {log.datos_nuevos}")
-                print(f"    - datos_anteriores: {log.datos_anteriores}")
-                if log.datos_nuevos:
-                    print(f"    - personal_nombre en datos_nuevos: {log.datos_nuevos.get('personal_nombre', 'N/A')}")
-                    print(f"    - personal_rut en datos_nuevos: {log.datos_nuevos.get('personal_rut', 'N/A')}")
-                if log.datos_anteriores:
-                    print(f"    - personal_nombre en datos_anteriores: {log.datos_anteriores.get('personal_nombre', 'N/A')}")
-                    print(f"    - personal_rut en datos_anteriores: {log.datos_anteriores.get('personal_rut', 'N/A')}")
-            
-            # Usar un solo query que busque en todos los campos relevantes
-            personal_q = Q(descripcion__icontains=personal_filter)
-            personal_q |= Q(datos_nuevos__personal_nombre__icontains=personal_filter)
-            personal_q |= Q(datos_nuevos__personal_rut__icontains=personal_filter)
-            personal_q |= Q(datos_anteriores__personal_nombre__icontains=personal_filter)
-            personal_q |= Q(datos_anteriores__personal_rut__icontains=personal_filter)
-            
-            # También buscar en cualquier parte de los datos JSON como fallback
-            personal_q |= Q(datos_nuevos__icontains=personal_filter)
-            personal_q |= Q(datos_anteriores__icontains=personal_filter)
-            
-            logs = logs.filter(personal_q)
-            print(f"DEBUG: Total de logs después de filtro de personal: {logs.count()}")
-            
-            # Debug: mostrar algunos ejemplos de lo que se encontró
-            if logs.count() > 0:
-                print(f"DEBUG: Ejemplos de logs encontrados:")
-                for i, log in enumerate(logs[:3]):
-                    print(f"  Log {i+1}: descripcion='{log.descripcion}', datos_nuevos={log.datos_nuevos}")
-            else:
-                print(f"DEBUG: No se encontraron logs con el filtro: {personal_filter}")
-                print(f"DEBUG: Intentando búsqueda más simple...")
-                
-                # Intentar búsqueda más simple solo en descripción
-                simple_logs = logs.filter(descripcion__icontains=personal_filter)
-                print(f"DEBUG: Logs encontrados solo en descripción: {simple_logs.count()}")
-                
-                if simple_logs.count() > 0:
-                    print(f"DEBUG: Ejemplos de logs encontrados en descripción:")
-                    for i, log in enumerate(simple_logs[:3]):
-                        print(f"  Log {i+1}: descripcion='{log.descripcion}'")
-        
-        # Filtrar por faena
-        if faena_filter and faena_filter.strip():
-            print(f"DEBUG: Aplicando filtro de faena: {faena_filter}")
-            # Buscar en todos los logs que puedan contener información de la faena
-            # Incluir búsqueda en descripción y datos JSON
-            faena_q = Q(descripcion__icontains=faena_filter)
-            
-            # Buscar en datos_nuevos y datos_anteriores JSON fields
-            faena_q |= Q(datos_nuevos__faena_nombre__icontains=faena_filter)
-            faena_q |= Q(datos_nuevos__faena_id__icontains=faena_filter)
-            faena_q |= Q(datos_anteriores__faena_nombre__icontains=faena_filter)
-            faena_q |= Q(datos_anteriores__faena_id__icontains=faena_filter)
-            
-            logs = logs.filter(faena_q)
-            print(f"DEBUG: Después de filtro de faena: {logs.count()}")
+        debug(
+            "Parámetros recibidos - accion: %s, usuario: %s, personal_filter: %s, faena_filter: %s, since_id: %s, before_id: %s",
+            accion, usuario, personal_filter, faena_filter, since_id, before_id,
+        )
         
-        # Limitar resultados y ordenar por fecha más reciente
-        logs = logs.order_by('-fecha_hora')[:limit]
-        print(f"DEBUG: Logs finales después de límite: {len(logs)}")
+        filtro = FiltroLogs(accion, tabla, usuario, personal_filter, faena_filter)
+        debug("Logs después de filtros: %s", perezoso(lambda: filtro.queryset().count()))
         
-        # Preparar datos para el frontend
-        logs_data = []
-        for log in logs:
-            # Obtener información adicional del cargo si es una asignación de personal
-            cargo_info = 'N/A'
-            personal_info = 'N/A'
-            faena_info = 'N/A'
-            
-            if log.tabla_afectada == 'PersonalFaena':
-                try:
-                    # Buscar la asignación para obtener el cargo
-                    asignacion = PersonalFaena.objects.get(personal_faena_id=log.registro_id)
-                    if asignacion.personal:
-                        # Obtener el cargo más reciente del personal
-                        ultimo_cargo = asignacion.personal.infolaboral_set.order_by('-fechacontrata').first()
-                        if ultimo_cargo and ultimo_cargo.cargo_id:
-                            cargo_info = ultimo_cargo.cargo_id.cargo
-                        else:
-                            cargo_info = 'Sin cargo asignado'
-                        
-                        # Información del personal
-                        personal_info = f"{asignacion.personal.nombre} {asignacion.personal.apepat} ({asignacion.personal.rut}-{asignacion.personal.dvrut})"
-                        
-                        # Información de la faena
-                        faena_info = asignacion.faena.nombre
-                            
-                except Exception as e:
-                    print(f"Error obteniendo información para log {log.log_id}: {str(e)}")
-                    cargo_info = 'Cargo no disponible'
-                    personal_info = 'Personal no disponible'
-                    faena_info = 'Faena no disponible'
-            
-            logs_data.append({
-                'id': log.log_id,
-                'usuario': log.usuario or 'Usuario Calendario',
-                'accion': log.accion,
-                'cargo': cargo_info,
-                'personal': personal_info,
-                'faena': faena_info,
-                'descripcion': log.descripcion,
-                'fecha_hora': timezone.localtime(log.fecha_hora).strftime('%d/%m/%Y %H:%M:%S'),
-                'datos_anteriores': log.datos_anteriores,
-                'datos_nuevos': log.datos_nuevos,
-                'detalles_adicionales': log.descripcion
-            })
+        pagina, hay_mas = paginar_logs(filtro, since_id, before_id, limit)
+        logs_data = [serializar_log(log) for log in pagina]
+        debug("Logs retornados: %s (hay más: %s)", len(logs_data), hay_mas)
         
-        return JsonResponse({'success': True, 'logs': logs_data})
+        return JsonResponse({'success': True, 'logs': logs_data, 'hay_mas': hay_mas})
         
     except Exception as e:
-        print(f"ERROR en get_audit_logs: {str(e)}")
-        import traceback
-        print(f"Traceback completo: {traceback.format_exc()}")
+        logger.exception("Error en get_audit_logs")
         return JsonResponse({'success': False, 'error': str(e)}, status=500)